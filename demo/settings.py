@@ -110,6 +110,8 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.doc.XViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'pagination.middleware.PaginationMiddleware',
+    'gstudio.middleware.NbhoodMiddleware',
+    'gstudio.middleware.PresenceMiddleware',
     )
 
 ROOT_URLCONF = 'demo.urls'
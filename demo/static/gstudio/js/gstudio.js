@@ -46,27 +46,29 @@ $ = django.jQuery
 
 
 	   $("#id_attributetype").change(function() {
-		   test = $("#id_attributetype").val()
-		   url = "/nodetypes/ajax/ajaxattribute/?id=" + test
-
-		   $.get(url,
-		   	 function(data){			     
-
-		   	             $("#id_subject").empty()
-			     
-		   	             for (var key in data) {
-		   			$('#id_subject').append(
-		   						$('<option></option>').val(key).html(data[key])
-		   						);
-		   		     }
-
-
-			     
-
-
-		   	 });
-
-	   
+		   var attributetype = $("#id_attributetype").val()
+		   $("#id_subject").empty()
+
+		   // the subjects are served page by page
+		   function loadSubjects(page) {
+		       var url = "/nodetypes/ajax/ajaxattribute/?id=" + attributetype + "&page=" + page
+		       $.get(url,
+		   	     function(data){
+		   	         // stop when another attribute type was chosen meanwhile
+		   	         if (attributetype != $("#id_attributetype").val()) {
+		   	             return;
+		   	         }
+		   	         $.each(data.results, function(index, result) {
+		   		     $('#id_subject').append(
+		   				$('<option></option>').val(result[0]).html(result[1])
+		   				);
+		   	         });
+		   	         if (data.has_next) {
+		   	             loadSubjects(data.page + 1);
+		   	         }
+		   	     });
+		   }
+		   loadSubjects(1);
 	       });
 	$(function() {
 		$( "#id_creation_date_0" ).datepicker();
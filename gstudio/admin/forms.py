@@ -49,17 +49,16 @@ from gstudio.models import Systemtype
 from gstudio.models import Processtype
 
 
-from gstudio.admin.widgets import TreeNodeChoiceField
-from gstudio.admin.widgets import MPTTFilteredSelectMultiple
-from gstudio.admin.widgets import MPTTModelMultipleChoiceField
+from gstudio.admin.widgets import AutocompleteSelect
+from gstudio.admin.widgets import AutocompleteSelectMultiple
 from reversion.models import Version
         
 class MetatypeAdminForm(forms.ModelForm):
     """Form for Metatype's Admin"""
-    parent = TreeNodeChoiceField(
+    parent = forms.ModelChoiceField(
         label=_('parent metatype').capitalize(),
-        required=False, empty_label=_('No parent metatype'),
-        queryset=Metatype.tree.all())
+        required=False, queryset=Metatype.objects.all(),
+        widget=AutocompleteSelect())
 
     def __init__(self, *args, **kwargs):
         super(MetatypeAdminForm, self).__init__(*args, **kwargs)
@@ -83,27 +82,24 @@ class MetatypeAdminForm(forms.ModelForm):
 class ObjecttypeAdminForm(forms.ModelForm):
     """Form for Objecttype's Admin"""
 
-    parent = TreeNodeChoiceField(
+    parent = forms.ModelChoiceField(
         label=_('parent nodetype').capitalize(),
-        required=False, empty_label=_('No parent nodetype'),
-        queryset=Nodetype.tree.all())
+        required=False, queryset=Nodetype.objects.all(),
+        widget=AutocompleteSelect())
 
-    metatypes = MPTTModelMultipleChoiceField(
+    metatypes = forms.ModelMultipleChoiceField(
         label=_('Metatypes'), required=False,
         queryset=Metatype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('metatypes'), False,
-                                          attrs={'rows': '10'}))
-    priornodes = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    priornodes = forms.ModelMultipleChoiceField(
         label=_('priornodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('nodetypes'), False,
-                                          attrs={'rows': '10'}))
+        widget=AutocompleteSelectMultiple())
 
-    posteriornodes = MPTTModelMultipleChoiceField(
+    posteriornodes = forms.ModelMultipleChoiceField(
         label=_('posteriornodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('nodetypes'), False,
-                                          attrs={'rows': '10'}))
+        widget=AutocompleteSelectMultiple())
 
 
 
@@ -139,16 +135,14 @@ class ObjecttypeAdminForm(forms.ModelForm):
 
 class RelationtypeAdminForm(forms.ModelForm):
     
-    priornodes = MPTTModelMultipleChoiceField(
+    priornodes = forms.ModelMultipleChoiceField(
         label=_('Priornodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('priornodes'), False,
-                                          attrs={'rows': '10'}))
-    posteriornodes = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    posteriornodes = forms.ModelMultipleChoiceField(
         label=_('Prosterior Nodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('prosteriornode'), False,
-                                          attrs={'rows': '10'}))
+        widget=AutocompleteSelectMultiple())
 
     def __init__(self, *args, **kwargs):
         super(RelationtypeAdminForm, self).__init__(*args, **kwargs)
@@ -216,26 +210,22 @@ class RelationAdminForm(forms.ModelForm):
 
 class ProcesstypeAdminForm(forms.ModelForm):
 
-    priornodes = MPTTModelMultipleChoiceField(
+    priornodes = forms.ModelMultipleChoiceField(
         label=_('Priornodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('priornodes'), False,
-                                          attrs={'rows': '10'}))
-    posteriornodes = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    posteriornodes = forms.ModelMultipleChoiceField(
         label=_('Prosterior Nodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('prosteriornode'), False,
-                                          attrs={'rows': '10'}))
-    attributetype_set = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    attributetype_set = forms.ModelMultipleChoiceField(
         label=_('Attributetype Sets'), required=False,
         queryset=Attributetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('Attributetype Set'), False,
-                                          attrs={'rows': '10'}))
-    relationtype_set = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    relationtype_set = forms.ModelMultipleChoiceField(
         label=_('Relationtype Set'), required=False,
         queryset=Relationtype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('Relationtype Set'), False,
-                                          attrs={'rows': '10'}))
+        widget=AutocompleteSelectMultiple())
 
 
     def __init__(self, *args, **kwargs):
@@ -263,16 +253,14 @@ class ProcesstypeAdminForm(forms.ModelForm):
         model = Processtype
 
 class AttributetypeAdminForm(forms.ModelForm):
-    priornodes = MPTTModelMultipleChoiceField(
+    priornodes = forms.ModelMultipleChoiceField(
         label=_('Priornodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('priornodes'), False,
-                                          attrs={'rows': '10'}))
-    posteriornodes = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    posteriornodes = forms.ModelMultipleChoiceField(
         label=_('Posterior Nodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('posteriornodes'), False,
-                                          attrs={'rows': '10'}))
+        widget=AutocompleteSelectMultiple())
     def __init__(self, *args, **kwargs):
         super(AttributetypeAdminForm, self).__init__(*args, **kwargs)
         prior = ManyToManyRel(Nodetype, 'id')
@@ -313,43 +301,36 @@ class AttributeAdminForm(forms.ModelForm):
 
 
 class SystemtypeAdminForm(forms.ModelForm):
-    nodetype_set = MPTTModelMultipleChoiceField(
+    nodetype_set = forms.ModelMultipleChoiceField(
         label=_('Nodetypeset'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('Nodetypesets'), False,
-                                          attrs={'rows': '10'}))
-    relationtype_set = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    relationtype_set = forms.ModelMultipleChoiceField(
         label=_('Relationtypeset'), required=False,
         queryset=Relationtype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('Relationtypesets'), False,
-                                          attrs={'rows': '10'}))
-    attributetype_set = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    attributetype_set = forms.ModelMultipleChoiceField(
         label=_('Attributetypeset'), required=False,
         queryset=Attributetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('Attributetypesets'), False,
-                                          attrs={'rows': '10'}))
-    metatype_set = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    metatype_set = forms.ModelMultipleChoiceField(
         label=_('Metatypeset'), required=False,
         queryset=Metatype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('metatypesets'), False,
-                                          attrs={'rows': '10'}))
-    processtype_set = MPTTModelMultipleChoiceField(
+        widget=AutocompleteSelectMultiple())
+    processtype_set = forms.ModelMultipleChoiceField(
         label=_('Processtypeset'), required=False,
         queryset=Processtype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('Processtypesets'), False,
-                                          attrs={'rows': '10'}))
+        widget=AutocompleteSelectMultiple())
 
-    priornodes = MPTTModelMultipleChoiceField(
+    priornodes = forms.ModelMultipleChoiceField(
         label=_('priornodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('nodetypes'), False,
-                                          attrs={'rows': '10'}))
+        widget=AutocompleteSelectMultiple())
 
-    posteriornodes = MPTTModelMultipleChoiceField(
+    posteriornodes = forms.ModelMultipleChoiceField(
         label=_('posteriornodes'), required=False,
         queryset=Nodetype.objects.all(),
-        widget=MPTTFilteredSelectMultiple(_('nodetypes'), False,
-                                          attrs={'rows': '10'}))
+        widget=AutocompleteSelectMultiple())
     def __init__(self, *args, **kwargs):
         super(SystemtypeAdminForm, self).__init__(*args, **kwargs)
         ot = ManyToManyRel(Nodetype,'id')
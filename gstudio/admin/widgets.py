@@ -4,10 +4,13 @@ from itertools import chain
 from django import forms
 from django.conf import settings
 from django.contrib.admin import widgets
+from django.core.urlresolvers import reverse
 from django.utils.html import escape
 from django.utils.html import conditional_escape
 from django.utils.encoding import smart_unicode
 from django.utils.encoding import force_unicode
+from django.utils.safestring import mark_safe
+from django.utils.translation import ugettext as _
 
 
 class TreeNodeChoiceField(forms.ModelChoiceField):
@@ -105,3 +108,56 @@ class MPTTFilteredSelectMultiple(widgets.FilteredSelectMultiple):
         js = (settings.ADMIN_MEDIA_PREFIX + 'js/core.js',
               settings.STATIC_URL + 'gstudio/js/mptt_m2m_selectbox.js',
               settings.ADMIN_MEDIA_PREFIX + 'js/SelectFilter2.js',)
+
+
+class AutocompleteMixin(object):
+    """Render only the selected options, hydrated by id in one
+    query, and search the others on the autocomplete view of
+    the model of the field, page by page"""
+
+    def render(self, name, value, attrs=None, choices=()):
+        """Rendering the select box with its search input"""
+        attrs = dict(attrs or {})
+        attrs['class'] = 'gstudio-autocomplete'
+        attrs['data-autocomplete-url'] = reverse(
+            'gstudio_autocomplete',
+            args=[self.choices.queryset.model._meta.module_name])
+        output = [super(AutocompleteMixin, self).render(name, value, attrs)]
+        field_id = escape(attrs.get('id', name))
+        output.append(u'<input type="text" id="%s_search" '
+                      'class="gstudio-autocomplete-search" '
+                      'placeholder="%s" />' % (field_id, _('Search')))
+        output.append(u'<ul id="%s_results" '
+                      'class="gstudio-autocomplete-results"></ul>' % field_id)
+        return mark_safe(u'\n'.join(output))
+
+    def render_options(self, choices, selected_choices):
+        """Rendering the selected options only"""
+        selected_choices = [force_unicode(v) for v in selected_choices
+                            if v is not None and force_unicode(v).isdigit()]
+        titles = dict([(force_unicode(pk), title) for pk, title in
+                       self.choices.queryset.filter(
+                           pk__in=selected_choices).values_list('pk', 'title')])
+        output = [u'<option value="%s" selected="selected">%s</option>' % (
+            escape(option_value),
+            conditional_escape(force_unicode(titles[option_value])))
+                  for option_value in selected_choices
+                  if option_value in titles]
+        return u'\n'.join(output)
+
+    class Media:
+        """AutocompleteMixin's Media"""
+        js = (settings.STATIC_URL + 'gstudio/js/autocomplete_select.js',)
+
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    """Select box of a ModelChoiceField searched on demand"""
+
+    def render_options(self, choices, selected_choices):
+        """Rendering an empty option before the selected one"""
+        return u'<option value="">---------</option>\n' + super(
+            AutocompleteSelect, self).render_options(choices, selected_choices)
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    """Select box of a ModelMultipleChoiceField searched on demand"""
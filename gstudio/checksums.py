@@ -0,0 +1,172 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Content checksum index of the media of Gstudio.
+
+The checksum of an uploaded file is stored as an attribute of its
+object.  Those attributes are mirrored in the indexed ``MediaChecksum``
+table, so that finding a duplicate upload is a single indexed lookup
+instead of a scan of all the attributes."""
+import hashlib
+
+from django.core.cache import cache
+
+from gstudio.settings import CHECKSUM_ATTRIBUTETYPES
+
+
+def file_checksum(path, chunk_size=8192):
+    """Return the md5 hex digest of a file, read by chunks"""
+    checksum = hashlib.md5()
+    media = open(path, 'rb')
+    try:
+        while True:
+            data = media.read(chunk_size)
+            if not data:
+                break
+            checksum.update(data)
+    finally:
+        media.close()
+    return checksum.hexdigest()
+
+
+CHECKSUM_ATTRIBUTETYPES_KEY = 'gstudio.checksums.attributetypes'
+
+
+def find_checksums(checksums, attributetype):
+    """Return the id of the last indexed object of each known checksum
+    of an attributetype, indexed by checksum, as the former scan of the
+    attributes reported the last matching one"""
+    from gstudio.models import MediaChecksum
+
+    found = {}
+    for checksum, subject in MediaChecksum.objects.filter(
+        checksum__in=list(checksums),
+        attributetype__title=attributetype).order_by(
+        '-pk').values_list('checksum', 'subject'):
+        found.setdefault(checksum, subject)
+    return found
+
+
+def find_checksum(checksum, attributetype):
+    """Return the id of an object having the checksum or None"""
+    return find_checksums([checksum], attributetype).get(checksum)
+
+
+def checksum_attributetype_ids():
+    """Return the cached ids of the checksum attributetypes"""
+    from gstudio.models import Attributetype
+
+    ids = cache.get(CHECKSUM_ATTRIBUTETYPES_KEY)
+    if ids is None:
+        ids = set(Attributetype.objects.filter(
+            title__in=CHECKSUM_ATTRIBUTETYPES).values_list('pk', flat=True))
+        cache.set(CHECKSUM_ATTRIBUTETYPES_KEY, ids)
+    return ids
+
+
+def invalidate_checksum_attributetypes(sender, instance, **kwargs):
+    """Expire the cached ids of the checksum attributetypes"""
+    cache.delete(CHECKSUM_ATTRIBUTETYPES_KEY)
+
+
+def is_checksum_attribute(attribute):
+    """Tell if an attribute holds a media checksum"""
+    return attribute.attributetype_id in checksum_attributetype_ids()
+
+
+def drop_checksum(attributetype_id, checksum, subject_id, attribute_id):
+    """Remove a checksum from the index, unless another attribute
+    than the given one still holds it"""
+    from gstudio.models import Attribute
+    from gstudio.models import MediaChecksum
+
+    if Attribute.objects.filter(
+        attributetype=attributetype_id, svalue=checksum,
+        subject=subject_id).exclude(pk=attribute_id).exists():
+        return
+    MediaChecksum.objects.filter(
+        attributetype=attributetype_id, checksum=checksum,
+        subject=subject_id).delete()
+
+
+def stash_checksum(sender, instance, **kwargs):
+    """Remember the stored checksum of a checksum attribute
+    before it is saved"""
+    if kwargs.get('raw') or instance.pk is None or \
+       not is_checksum_attribute(instance):
+        return
+    previous = sender._base_manager.filter(pk=instance.pk).values_list(
+        'attributetype', 'svalue', 'subject')
+    instance._previous_checksum = previous and previous[0] or None
+
+
+def index_checksum(sender, instance, **kwargs):
+    """Index the checksum attributes when they are saved,
+    removing their previous checksum from the index"""
+    from gstudio.models import MediaChecksum
+
+    if kwargs.get('raw') or not is_checksum_attribute(instance):
+        return
+    current = (instance.attributetype_id, instance.svalue,
+               instance.subject_id)
+    previous = getattr(instance, '_previous_checksum', None)
+    instance._previous_checksum = None
+    if previous and previous != current:
+        drop_checksum(*(previous + (instance.pk,)))
+    MediaChecksum.objects.get_or_create(
+        attributetype_id=instance.attributetype_id,
+        checksum=instance.svalue, subject_id=instance.subject_id)
+
+
+def unindex_checksum(sender, instance, **kwargs):
+    """Remove the checksum attributes from the index when deleted"""
+    if not is_checksum_attribute(instance):
+        return
+    drop_checksum(instance.attributetype_id, instance.svalue,
+                  instance.subject_id, instance.pk)
+
+
+def backfill_checksums(chunk_size=1000):
+    """Index the existing checksum attributes missing from the index
+    in the order of the attributes, returns the number of added entries"""
+    from gstudio.models import Attribute
+    from gstudio.models import MediaChecksum
+
+    attributes = Attribute.objects.filter(
+        attributetype__title__in=CHECKSUM_ATTRIBUTETYPES).order_by('pk')
+    last_pk = 0
+    added = 0
+    while True:
+        chunk = list(attributes.filter(pk__gt=last_pk).values_list(
+            'pk', 'attributetype', 'svalue', 'subject')[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        indexed = set(MediaChecksum.objects.filter(
+            checksum__in=[svalue for pk, attributetype, svalue, subject
+                          in chunk]).values_list(
+            'attributetype', 'checksum', 'subject'))
+        missing = []
+        for pk, attributetype, svalue, subject in chunk:
+            if (attributetype, svalue, subject) not in indexed:
+                indexed.add((attributetype, svalue, subject))
+                missing.append(MediaChecksum(
+                    attributetype_id=attributetype, checksum=svalue,
+                    subject_id=subject))
+        MediaChecksum.objects.bulk_create(missing)
+        added += len(missing)
+    return added
@@ -47,10 +47,26 @@
 #    OF THE POSSIBILITY OF SUCH DAMAGE.
 """Comparison tools for Gstudio
 Based on clustered_models app"""
+import os
+import cPickle as pickle
 from math import sqrt
+from threading import RLock
+
+from django.db.models import Max
+from django.db.models import Count
+from django.utils.datastructures import SortedDict
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
 
 from gstudio.settings import F_MIN
 from gstudio.settings import F_MAX
+from gstudio.settings import SIMILAR_METRIC
+from gstudio.settings import SIMILAR_CACHE_SIZE
+from gstudio.settings import SIMILAR_INDEX_PATH
 
 
 def pearson_score(list1, list2):
@@ -138,3 +154,284 @@ class VectorBuilder(object):
     def __call__(self):
         self.flush()
         return self.columns, self.dataset
+
+
+class SimilarityEngine(object):
+    """Sparse term matrix of a queryset, updated one document at a
+    time and queried for the most similar documents with matrix
+    operations.  Needs NumPy and SciPy.
+
+    The queryset may be a manager, so that a filter on the current
+    date is evaluated again on each read."""
+
+    def __init__(self, queryset, fields, metric=SIMILAR_METRIC,
+                 cache_size=SIMILAR_CACHE_SIZE, path=SIMILAR_INDEX_PATH):
+        self.queryset = queryset
+        self.fields = fields
+        self.metric = metric
+        self.cache_size = cache_size
+        self.path = path
+        self.lock = RLock()
+        self.vocabulary = {}
+        self.rows = {}
+        self.stamps = {}
+        self.results = SortedDict()
+        self.matrix = None
+        self.ids = []
+        if not (path and self.load()):
+            self.build()
+
+    def tokens(self, values):
+        """Return the term columns and counts of a document"""
+        counts = {}
+        for word in ' '.join([unicode(value) for value in values]).split():
+            column = self.vocabulary.setdefault(word, len(self.vocabulary))
+            counts[column] = counts.get(column, 0) + 1
+        columns = numpy.array(sorted(counts), dtype=numpy.int32)
+        return columns, numpy.array([counts[column] for column in columns],
+                                    dtype=numpy.float64)
+
+    def documents(self, queryset):
+        """Iterate over the id, last update and fields of documents"""
+        return queryset.values_list('pk', 'last_update',
+                                    *self.fields).iterator()
+
+    def changed(self):
+        """Drop the matrix and the cached results after an update"""
+        self.matrix = None
+        self.results.clear()
+
+    def build(self):
+        """Index the whole queryset"""
+        with self.lock:
+            self.vocabulary = {}
+            self.rows = {}
+            self.stamps = {}
+            for values in self.documents(self.queryset.all()):
+                self.rows[values[0]] = self.tokens(values[2:])
+                self.stamps[values[0]] = values[1]
+            self.changed()
+        if self.path:
+            self.save()
+
+    def refresh(self):
+        """Reindex the documents added, updated or removed since the
+        index was built"""
+        stamps = dict(self.queryset.values_list('pk', 'last_update'))
+        with self.lock:
+            for pk in set(self.rows) - set(stamps):
+                self.remove(pk)
+        outdated = [pk for pk, stamp in stamps.items()
+                    if self.stamps.get(pk) != stamp]
+        for values in self.documents(self.queryset.filter(pk__in=outdated)):
+            self.update(values[0], values[2:], values[1])
+
+    def is_stale(self):
+        """Whether documents were added, updated or removed since the
+        index was updated, by another process or as their publication
+        started or ended, comparing their number and last update"""
+        current = self.queryset.aggregate(count=Count('pk'),
+                                          last_update=Max('last_update'))
+        with self.lock:
+            indexed = (len(self.stamps),
+                       self.stamps and max(self.stamps.values()) or None)
+        return (current['count'], current['last_update']) != indexed
+
+    def update(self, pk, values, stamp=None):
+        """Index or reindex a single document"""
+        with self.lock:
+            self.rows[pk] = self.tokens(values)
+            self.stamps[pk] = stamp
+            self.changed()
+
+    def remove(self, pk):
+        """Remove a single document from the index"""
+        with self.lock:
+            if self.rows.pop(pk, None) is not None:
+                self.stamps.pop(pk, None)
+                self.changed()
+
+    def update_instance(self, instance):
+        """Reindex an instance, removing it when it left the queryset"""
+        values = list(self.queryset.filter(pk=instance.pk).values_list(
+            'last_update', *self.fields))
+        if values:
+            self.update(instance.pk, values[0][1:], values[0][0])
+        else:
+            self.remove(instance.pk)
+
+    def load(self):
+        """Load the index persisted on disk, returns False when
+        there is none usable"""
+        try:
+            with open(self.path, 'rb') as index:
+                state = pickle.load(index)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return False
+        if state.get('fields') != list(self.fields):
+            return False
+        with self.lock:
+            self.vocabulary = state['vocabulary']
+            self.rows = state['rows']
+            self.stamps = state['stamps']
+            self.changed()
+        self.refresh()
+        return True
+
+    def save(self):
+        """Persist the index on disk"""
+        with self.lock:
+            state = {'fields': list(self.fields),
+                     'vocabulary': self.vocabulary,
+                     'rows': self.rows, 'stamps': self.stamps}
+            temporary = '%s.%s.tmp' % (self.path, os.getpid())
+            with open(temporary, 'wb') as index:
+                pickle.dump(state, index, pickle.HIGHEST_PROTOCOL)
+            os.rename(temporary, self.path)
+
+    def get_matrix(self):
+        """Return the ids and the term matrix restricted to the words
+        whose frequency is between F_MIN and F_MAX"""
+        with self.lock:
+            if self.matrix is not None:
+                return self.ids, self.matrix
+            ids = sorted(self.rows)
+            width = len(self.vocabulary)
+            rows = [self.rows[pk] for pk in ids]
+            indptr = numpy.cumsum([0] + [len(row[0]) for row in rows])
+            if rows:
+                indices = numpy.concatenate([row[0] for row in rows])
+                data = numpy.concatenate([row[1] for row in rows])
+            else:
+                indices = numpy.zeros(0, dtype=numpy.int32)
+                data = numpy.zeros(0, dtype=numpy.float64)
+            matrix = sparse.csr_matrix((data, indices, indptr),
+                                       shape=(len(ids), width))
+            if ids:
+                frequency = numpy.asarray(matrix.sum(axis=0)).ravel() / \
+                            len(ids)
+                mask = ((frequency > F_MIN) & (frequency < F_MAX)).astype(
+                    numpy.float64)
+                matrix = (matrix * sparse.spdiags(mask, 0, width,
+                                                  width)).tocsr()
+                matrix.eliminate_zeros()
+                self.columns = int(mask.sum())
+            else:
+                self.columns = 0
+            self.ids, self.matrix = ids, matrix
+            return ids, matrix
+
+    def scores(self, positions, matrix):
+        """Return the distances between the documents at the positions
+        and all the documents, 0 meaning not comparable"""
+        products = (matrix[positions] * matrix.T).toarray()
+        squares = numpy.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        if self.metric == 'cosine':
+            numerator = products
+            denominator = numpy.sqrt(numpy.outer(squares[positions],
+                                                 squares))
+        else:
+            sums = numpy.asarray(matrix.sum(axis=1)).ravel()
+            variances = squares - sums ** 2 / self.columns
+            numerator = products - numpy.outer(sums[positions],
+                                               sums) / self.columns
+            denominator = numpy.sqrt(numpy.outer(variances[positions],
+                                                 variances).clip(0))
+        scores = numpy.zeros(products.shape)
+        valid = denominator > 0
+        scores[valid] = 1.0 - numerator[valid] / denominator[valid]
+        scores[numpy.abs(scores) < 1e-12] = 0.0
+        return scores
+
+    def similar(self, pks, number=5):
+        """Return the ids of the most similar documents of each id,
+        the closest first"""
+        related = {}
+        missing = []
+        with self.lock:
+            for pk in pks:
+                key = (pk, number)
+                if key in self.results:
+                    related[pk] = self.results.pop(key)
+                    self.results[key] = related[pk]
+                else:
+                    missing.append(pk)
+        if not missing:
+            return related
+
+        ids, matrix = self.get_matrix()
+        positions = dict([(pk, position) for position, pk in enumerate(ids)])
+        indexed = [pk for pk in missing if pk in positions]
+        for pk in set(missing) - set(indexed):
+            related[pk] = []
+        if indexed and self.columns:
+            scores = self.scores([positions[pk] for pk in indexed], matrix)
+            for row, pk in enumerate(indexed):
+                candidates = numpy.flatnonzero(scores[row])
+                candidates = candidates[candidates != positions[pk]]
+                order = numpy.lexsort((numpy.array(ids)[candidates],
+                                       scores[row][candidates]))
+                related[pk] = [ids[candidate]
+                               for candidate in candidates[order][:number]]
+        else:
+            for pk in indexed:
+                related[pk] = []
+
+        with self.lock:
+            for pk in missing:
+                self.results[(pk, number)] = related[pk]
+            while len(self.results) > self.cache_size:
+                del self.results[self.results.keyOrder[0]]
+        return related
+
+
+_engine = None
+
+
+def get_similarity_engine():
+    """Return the similarity engine of the published nodetypes,
+    None when NumPy or SciPy are missing.  The engine is refreshed
+    when the published nodetypes changed outside of its signals"""
+    global _engine
+    if sparse is None:
+        return None
+    if _engine is None:
+        from gstudio.models import Nodetype
+        _engine = SimilarityEngine(Nodetype.published,
+                                   ['title', 'excerpt', 'content'])
+    elif _engine.is_stale():
+        _engine.refresh()
+    return _engine
+
+
+def update_similarity_engine(sender, instance, **kwargs):
+    """Reindex a saved nodetype in the similarity engine"""
+    from gstudio.models import Nodetype
+
+    if _engine is None or not isinstance(instance, Nodetype) or \
+           kwargs.get('raw'):
+        return
+    _engine.update_instance(instance)
+
+
+def remove_from_similarity_engine(sender, instance, **kwargs):
+    """Remove a deleted nodetype from the similarity engine"""
+    from gstudio.models import Nodetype
+
+    if _engine is not None and isinstance(instance, Nodetype):
+        _engine.remove(instance.pk)
+
+
+def update_similarity_engine_sites(sender, instance, action, reverse,
+                                   **kwargs):
+    """Reindex the nodetypes whose sites changed in the similarity
+    engine, as they may enter or leave the published nodetypes"""
+    from gstudio.models import Nodetype
+
+    if _engine is None or \
+           action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        _engine.refresh()
+    elif isinstance(instance, Nodetype):
+        _engine.update_instance(instance)
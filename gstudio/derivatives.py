@@ -0,0 +1,212 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Derivative renditions of the uploaded images of Gstudio.
+
+Uploads only queue a ``DerivativeJob`` and link placeholders at the
+legacy ``-thumbnail``/``_display_1024`` paths used by the templates.
+The ``process_derivatives`` command renders the queued jobs in a
+process pool, decoding each source once for all the renditions, and
+stores them under their content checksum so that identical uploads
+share their derivatives.  The legacy paths are then linked to the
+rendered files.
+
+A claimed job is leased for ``GSTUDIO_DERIVATIVES_LEASE`` seconds, a
+job still running when its lease expires, because its worker crashed,
+is claimed again.
+
+PIL is only imported by the rendering functions, so that the models
+can be loaded without it."""
+import os
+import shutil
+from datetime import datetime
+from datetime import timedelta
+
+from django.db.models import Q
+
+from gstudio.managers import JOB_PENDING as PENDING
+from gstudio.managers import JOB_RUNNING as RUNNING
+from gstudio.managers import JOB_DONE as DONE
+from gstudio.managers import JOB_FAILED as FAILED
+from gstudio.settings import IMAGE_RENDITIONS
+from gstudio.settings import DERIVATIVES_ROOT
+from gstudio.settings import DERIVATIVES_URL
+from gstudio.settings import DERIVATIVES_LEASE
+
+
+def ensure_dir(path):
+    """Create the parent directories of a path"""
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            if not os.path.isdir(dirname):
+                raise
+
+
+def derivative_name(checksum, rendition):
+    """Return the content-addressed name of a rendition"""
+    return '%s/%s/%s-%s.jpg' % (checksum[:2], checksum[2:4],
+                                checksum, rendition)
+
+
+def derivative_path(checksum, rendition):
+    """Return the file path of a rendition"""
+    return os.path.join(DERIVATIVES_ROOT, derivative_name(checksum, rendition))
+
+
+def derivative_url(checksum, rendition):
+    """Return the URL of a rendition"""
+    return DERIVATIVES_URL + derivative_name(checksum, rendition)
+
+
+def legacy_path(source, suffix):
+    """Return the path where the templates look for a rendition"""
+    return os.path.splitext(source)[0] + suffix
+
+
+def has_derivatives(checksum):
+    """Tell if all the renditions of a checksum are rendered"""
+    return all([os.path.exists(derivative_path(checksum, name))
+                for name, size, suffix in IMAGE_RENDITIONS])
+
+
+def placeholder_path(rendition):
+    """Return the path of the placeholder of a rendition,
+    drawing it on first use"""
+    path = os.path.join(DERIVATIVES_ROOT, 'placeholders', '%s.jpg' % rendition)
+    if not os.path.exists(path):
+        from PIL import Image
+
+        size = dict([(name, size) for name, size, suffix
+                     in IMAGE_RENDITIONS])[rendition]
+        width = size[0]
+        height = size[1] or width * 3 / 4
+        ensure_dir(path)
+        Image.new('RGB', (width, height), (221, 221, 221)).save(path, 'JPEG')
+    return path
+
+
+def link(target, path):
+    """Point path at target, replacing what was there"""
+    if os.path.lexists(path):
+        os.remove(path)
+    try:
+        os.symlink(target, path)
+    except (AttributeError, OSError):
+        shutil.copyfile(target, path)
+
+
+def link_legacy(source, checksum=None):
+    """Link the legacy rendition paths of a source to its derivatives,
+    or to the placeholders when no checksum is given"""
+    for name, size, suffix in IMAGE_RENDITIONS:
+        if checksum:
+            target = derivative_path(checksum, name)
+        else:
+            target = placeholder_path(name)
+        link(target, legacy_path(source, suffix))
+
+
+def render_derivatives(source, checksum):
+    """Render all the renditions of a source, decoding it once"""
+    from PIL import Image
+
+    image = Image.open(source)
+    image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    width, height = image.size
+    for name, size, suffix in IMAGE_RENDITIONS:
+        bound = (size[0], size[1] or height)
+        rendition = image.copy()
+        if width > bound[0] or height > bound[1]:
+            rendition.thumbnail(bound, Image.ANTIALIAS)
+        path = derivative_path(checksum, name)
+        ensure_dir(path)
+        rendition.save(path, 'JPEG')
+
+
+def render_job(job):
+    """Render and link the derivatives of a (pk, source, checksum) job,
+    returns the pk and the error message if any"""
+    pk, source, checksum = job
+    try:
+        if not has_derivatives(checksum):
+            render_derivatives(source, checksum)
+        link_legacy(source, checksum)
+    except Exception, e:
+        return pk, '%s: %s' % (e.__class__.__name__, e)
+    return pk, None
+
+
+def enqueue_derivatives(source, checksum):
+    """Queue the renditions of an uploaded image, linking placeholders
+    until they are rendered"""
+    from gstudio.models import DerivativeJob
+
+    if has_derivatives(checksum):
+        link_legacy(source, checksum)
+        return None
+    link_legacy(source)
+    return DerivativeJob.objects.create(source=source, checksum=checksum)
+
+
+def claimable(now):
+    """Return the condition of the pending jobs and of the running
+    jobs whose lease expired"""
+    return Q(status=PENDING) | Q(status=RUNNING, leased_until__lt=now) | \
+           Q(status=RUNNING, leased_until__isnull=True)
+
+
+def claim_jobs(limit, lease=DERIVATIVES_LEASE):
+    """Lease up to limit pending or abandoned jobs for lease seconds,
+    mark them as running and return them"""
+    from gstudio.models import DerivativeJob
+
+    now = datetime.now()
+    leased_until = now + timedelta(seconds=lease)
+    claimed = []
+    for pk in DerivativeJob.objects.filter(claimable(now)).order_by(
+        'pk').values_list('pk', flat=True)[:limit]:
+        if DerivativeJob.objects.filter(claimable(now), pk=pk).update(
+            status=RUNNING, leased_until=leased_until):
+            claimed.append(pk)
+    return list(DerivativeJob.objects.filter(pk__in=claimed).values_list(
+        'pk', 'source', 'checksum'))
+
+
+def process_derivatives(limit=100, pool=None, lease=DERIVATIVES_LEASE):
+    """Render a batch of queued jobs, in the pool if given,
+    returns the number of jobs done and failed"""
+    from gstudio.models import DerivativeJob
+
+    jobs = claim_jobs(limit, lease)
+    if pool is not None:
+        results = pool.map(render_job, jobs)
+    else:
+        results = map(render_job, jobs)
+
+    done = [pk for pk, error in results if error is None]
+    DerivativeJob.objects.filter(pk__in=done).update(
+        status=DONE, error='', leased_until=None)
+    failed = [(pk, error) for pk, error in results if error is not None]
+    for pk, error in failed:
+        DerivativeJob.objects.filter(pk=pk).update(
+            status=FAILED, error=error, leased_until=None)
+    return len(done), len(failed)
@@ -0,0 +1,354 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Graph JSON of the neighbourhood of the nodes of Gstudio.
+
+The graph of a node only depends on the node and its neighbourhood,
+so it is built once per (node id, last_update, neighbourhood change)
+then kept in the cache.  The neighbourhood changes are stamped in the
+cache by ``touch_graphs`` whenever neighbourhoods are flushed, which
+leaves the user-visible ``last_update`` of the nodes alone.  The ids of
+the predicate and leaf nodes are derived from the node id and the
+neighbourhood keys, which keeps the output stable between workers.
+
+The ego network of a node is walked breadth first over its relations,
+parent and memberships, reading the links of a whole level with one
+query per kind of link. Groups of links larger than the fan-out are
+collapsed and served page by page by ``graph_group``."""
+import json
+from datetime import datetime
+from hashlib import md5
+from logging import getLogger
+
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Paginator
+from django.core.paginator import InvalidPage
+from django.core.urlresolvers import reverse
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils.encoding import smart_str
+
+from gstudio.settings import GRAPH_MAX_NEIGHBOURS
+from gstudio.settings import GRAPH_JSON_CACHE_TIMEOUT
+from gstudio.settings import GRAPH_MAX_DEPTH
+from gstudio.settings import GRAPH_MAX_NODES
+from gstudio.settings import GRAPH_GROUP_PAGINATION
+
+
+def absolute_url(item):
+    """Return the URL of a node of the graph"""
+    return item.get_absolute_url()
+
+
+def view_object_url(item):
+    """Return the view URL of an object of the graph, falling back
+    on its absolute URL for the nodetypes"""
+    return getattr(item, 'get_view_object_url', None) or \
+           item.get_absolute_url()
+
+
+def predicate_id(node, key):
+    """Return the graph id of a neighbourhood key of a node"""
+    return '%s-%s' % (node.id, key)
+
+
+def graph_changed_key(nid):
+    """Return the cache key of the last neighbourhood change of a node"""
+    return 'gstudio.graph_changed.%s' % nid
+
+
+def touch_graphs(nids):
+    """Stamp the neighbourhoods of the given node ids as changed now"""
+    now = datetime.now()
+    cache.set_many(dict([(graph_changed_key(nid), now) for nid in nids]),
+                   GRAPH_JSON_CACHE_TIMEOUT)
+
+
+def graph_changed(node):
+    """Return the last time the neighbourhood of a node changed,
+    now when the stamp was evicted so that the graph is rebuilt"""
+    key = graph_changed_key(node.id)
+    changed = cache.get(key)
+    if changed is None:
+        cache.add(key, datetime.now(), GRAPH_JSON_CACHE_TIMEOUT)
+        changed = cache.get(key) or datetime.now()
+    return changed
+
+
+def graph_last_modified(node):
+    """Return the last time the graph of a node changed"""
+    return max(node.last_update, graph_changed(node))
+
+
+def graph_version(node):
+    """Return a digest of the state the graph of a node depends on"""
+    return md5(smart_str('%s-%s-%s' % (node.id, node.last_update,
+                                       graph_changed(node)))).hexdigest()
+
+
+def graph_cache_key(node):
+    """Return the cache key of the graph of a node"""
+    return 'gstudio.graph_json.%s.%s' % (node.id, graph_version(node))
+
+
+def _neighbours(nbh):
+    """Return the ids of the nodes and relation subjects to resolve"""
+    from gstudio.models import NID
+    from gstudio.models import Relation
+
+    ids = []
+    for value in nbh.values():
+        if not isinstance(value, (list, QuerySet)) or \
+               len(value) > GRAPH_MAX_NEIGHBOURS:
+            continue
+        for item in value:
+            if isinstance(item, Relation):
+                ids.extend([item.left_subject_id, item.right_subject_id])
+            elif isinstance(item, NID):
+                ids.append(item.id)
+    return ids
+
+
+def build_graph(node, url=absolute_url):
+    """Return the graph of the neighbourhood of a node as a dict"""
+    from gstudio.models import NID
+
+    nbh = node.get_nbh
+    if callable(nbh):
+        nbh = nbh()
+    resolved = NID.objects.resolve_many(_neighbours(nbh))
+
+    g_json = {'node_metadata': [], 'relations': []}
+    g_json['node_metadata'].append({'_id': str(node.id), 'title': node.title,
+                                    'screen_name': node.title,
+                                    'url': url(node), 'refType': node.reftype})
+
+    for key in sorted(nbh.keys()):
+        value = nbh[key]
+        if not value:
+            continue
+        key_id = predicate_id(node, key)
+        metadata = [{'_id': key_id, 'screen_name': key}]
+        relations = [{'from': node.id, 'type': str(key), 'value': 1,
+                      'to': key_id}]
+        try:
+            if isinstance(value, basestring):
+                leaf_id = '%s-value' % key_id
+                metadata.append({'_id': leaf_id, 'screen_name': value})
+                relations.append({'from': key_id, 'type': str(key),
+                                  'value': 1, 'to': leaf_id})
+            elif len(value) > GRAPH_MAX_NEIGHBOURS:
+                leaf_id = '%s-more' % key_id
+                metadata.append({'_id': leaf_id,
+                                 'screen_name': '%s nodes...' % len(value),
+                                 'title': str(key),
+                                 'url': '/nodetypes/graphs/graph_label/%s/%s'
+                                 % (node.id, key)})
+                relations.append({'from': key_id, 'type': str(key),
+                                  'value': 1, 'to': leaf_id})
+            else:
+                for index, item in enumerate(value):
+                    if isinstance(item, basestring):
+                        leaf_id = '%s-%s' % (key_id, index)
+                        metadata.append({'_id': leaf_id,
+                                         'screen_name': item})
+                        relations.append({'from': key_id,
+                                          'type': str(key), 'value': 1,
+                                          'to': leaf_id})
+                    elif item.reftype != 'Relation':
+                        item = resolved.get(item.id, item)
+                        metadata.append({'_id': str(item.id),
+                                         'screen_name': item.title,
+                                         'title': node.title,
+                                         'url': url(item),
+                                         'refType': item.reftype})
+                        relations.append({'from': key_id,
+                                          'type': str(key), 'value': 1,
+                                          'to': item.id})
+                    else:
+                        if item.left_subject_id == node.id:
+                            other_id, flag = item.right_subject_id, 1
+                        else:
+                            other_id, flag = item.left_subject_id, 0
+                        other = resolved.get(other_id) or \
+                                NID.objects.resolve(other_id)
+                        metadata.append({'_id': str(other.id),
+                                         'screen_name': other.title,
+                                         'title': node.title,
+                                         'url': url(other),
+                                         'refType': item.reftype,
+                                         'inverse': item.relationtype.inverse,
+                                         'flag': flag})
+                        relations.append({'from': key_id,
+                                          'type': str(key), 'value': 1,
+                                          'to': other.id})
+        except (AttributeError, TypeError, ObjectDoesNotExist), error:
+            # a broken neighbour drops its key, not the whole graph
+            getLogger('gstudio.graphs').warning(
+                'Graph of node %s: key %s dropped (%s: %s)' % (
+                node.id, key, error.__class__.__name__, error))
+            continue
+        g_json['node_metadata'].extend(metadata)
+        g_json['relations'].extend(relations)
+    return g_json
+
+
+def get_graph_json(node, url=absolute_url):
+    """Return the graph JSON of a node, built once per version"""
+    key = graph_cache_key(node)
+    data = cache.get(key)
+    if data is None:
+        data = json.dumps(build_graph(node, url), sort_keys=True)
+        cache.set(key, data, GRAPH_JSON_CACHE_TIMEOUT)
+    return data
+
+
+def neighbour_edges(ids):
+    """Return the sorted (source, group, target) links of a set of
+    nodes, read with one query per kind of link"""
+    from gstudio.models import Nodetype
+    from gstudio.models import Relation
+    from objectapp.models import Gbobject
+
+    ids = set(ids)
+    edges = set()
+    relations = Relation.objects.filter(
+        Q(left_subject__in=ids) | Q(right_subject__in=ids)).values_list(
+        'left_subject', 'right_subject',
+        'relationtype__title', 'relationtype__inverse')
+    for left, right, title, inverse in relations:
+        if left in ids:
+            edges.add((left, title, right))
+        if right in ids:
+            edges.add((right, inverse or title, left))
+
+    for nid, parent in Nodetype._base_manager.filter(
+        pk__in=ids, parent__isnull=False).values_list('id', 'parent'):
+        edges.add((nid, 'parent', parent))
+    for nid, parent in Nodetype._base_manager.filter(
+        parent__in=ids).values_list('id', 'parent'):
+        edges.add((parent, 'contains_subtypes', nid))
+
+    memberships = Gbobject.objecttypes.through.objects.filter(
+        Q(gbobject__in=ids) | Q(nodetype__in=ids)).values_list(
+        'gbobject', 'nodetype')
+    for gbobject, nodetype in memberships:
+        if gbobject in ids:
+            edges.add((gbobject, 'member_of', nodetype))
+        if nodetype in ids:
+            edges.add((nodetype, 'contains_members', gbobject))
+    return sorted(edges)
+
+
+def group_url(nid, group):
+    """Return the URL of the pages of a collapsed group"""
+    return reverse('graph_group', args=[nid, group])
+
+
+def _metadata(node, url, **extra):
+    """Return the graph metadata of a node"""
+    metadata = {'_id': str(node.id), 'screen_name': node.title,
+                'title': node.title, 'url': url(node),
+                'refType': node.reftype}
+    metadata.update(extra)
+    return metadata
+
+
+def ego_network(node, depth=1, fanout=None, max_nodes=None,
+                url=absolute_url):
+    """Return the subgraph within depth hops of a node as a dict,
+    collapsing the groups of links larger than the fan-out"""
+    from gstudio.models import NID
+
+    depth = max(0, min(depth, GRAPH_MAX_DEPTH))
+    fanout = fanout or GRAPH_MAX_NEIGHBOURS
+    max_nodes = max_nodes or GRAPH_MAX_NODES
+    levels = {node.id: 0}
+    frontier = [node.id]
+    edges = []
+    collapsed = []
+    truncated = False
+
+    for level in range(1, depth + 1):
+        if not frontier:
+            break
+        groups = {}
+        for source, group, target in neighbour_edges(frontier):
+            groups.setdefault((source, group), []).append(target)
+        frontier = []
+        for (source, group), targets in sorted(groups.items()):
+            if len(targets) > fanout:
+                collapsed.append((source, group, len(targets)))
+                continue
+            for target in targets:
+                if target in levels:
+                    # links back to a previous level were emitted when
+                    # it was expanded, links within a level only once
+                    if levels[target] < levels[source] or \
+                           (levels[target] == levels[source] and
+                            target < source):
+                        continue
+                elif len(levels) >= max_nodes:
+                    truncated = True
+                    continue
+                else:
+                    levels[target] = level
+                    frontier.append(target)
+                edges.append((source, group, target))
+
+    nodes = NID.objects.resolve_many(levels.keys())
+    g_json = {'node_metadata': [], 'relations': [], 'depth': depth,
+              'truncated': truncated}
+    for nid in sorted(levels, key=lambda nid: (levels[nid], nid)):
+        if nid in nodes:
+            g_json['node_metadata'].append(
+                _metadata(nodes[nid], url, depth=levels[nid]))
+    for source, group, target in edges:
+        if source in nodes and target in nodes:
+            g_json['relations'].append({'from': source, 'type': group,
+                                        'value': 1, 'to': target})
+    for source, group, count in collapsed:
+        if source not in nodes:
+            continue
+        stub_id = '%s-%s-more' % (source, group)
+        g_json['node_metadata'].append({
+            '_id': stub_id, 'screen_name': '%s nodes...' % count,
+            'title': group, 'count': count, 'url': group_url(source, group),
+            'depth': levels[source] + 1})
+        g_json['relations'].append({'from': source, 'type': group,
+                                    'value': 1, 'to': stub_id})
+    return g_json
+
+
+def graph_group(nid, group, page=1, per_page=None, url=absolute_url):
+    """Return a page of the nodes linked to a node by a group as a dict"""
+    from gstudio.models import NID
+
+    targets = sorted(set([target for source, name, target
+                          in neighbour_edges([nid]) if name == group]))
+    paginator = Paginator(targets, per_page or GRAPH_GROUP_PAGINATION)
+    try:
+        page = paginator.page(page)
+    except InvalidPage:
+        page = paginator.page(paginator.num_pages)
+    nodes = NID.objects.resolve_many(page.object_list)
+    return {'node': nid, 'group': group, 'count': paginator.count,
+            'page': page.number, 'num_pages': paginator.num_pages,
+            'node_metadata': [_metadata(nodes[target], url)
+                              for target in page.object_list
+                              if target in nodes]}
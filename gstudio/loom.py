@@ -0,0 +1,271 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Loom statistics of Gstudio.
+
+The status panel of a thread reports, for each subscriber, the twists
+and responses posted, the ratings made and received and the responses
+received by their posts.  The response tree of the thread is fetched
+once, level by level, and every count is computed in a single pass
+over it.  The statistics of a thread are cached until one of its
+posts, authorships, subscriptions or votes changes, which bumps the
+generation of that thread only."""
+from django.core.cache import cache
+from django.db.models import Count
+from django.contrib.contenttypes.models import ContentType
+
+from gstudio.settings import LOOM_CACHE_TIMEOUT
+
+
+def generation_key(thread_id):
+    """Return the cache key of the generation of a thread"""
+    return 'gstudio.loom.generation.%s' % thread_id
+
+
+def loom_generation(thread_id):
+    """Return the current generation of the statistics of a thread"""
+    key = generation_key(thread_id)
+    generation = cache.get(key)
+    if generation is None:
+        generation = 1
+        cache.add(key, generation)
+    return generation
+
+
+def bump_loom_generations(thread_ids):
+    """Expire the cached statistics of the threads"""
+    for thread_id in thread_ids:
+        try:
+            cache.incr(generation_key(thread_id))
+        except ValueError:
+            cache.set(generation_key(thread_id), 2)
+
+
+def threads_of(ids):
+    """Return the ids of the threads whose statistics depend on the
+    posts or systems of the given ids, with the ids themselves"""
+    from objectapp.models import Gbobject
+    from objectapp.models import System
+
+    through = Gbobject.posterior_nodes.through
+    posts = set(ids)
+    frontier = list(posts)
+    while frontier:
+        parents = set(through.objects.filter(
+            to_gbobject__in=frontier).values_list('from_gbobject', flat=True))
+        frontier = list(parents - posts)
+        posts.update(frontier)
+    boxes = set(ids) | set(System.gbobject_set.through.objects.filter(
+        gbobject__in=posts).values_list('system', flat=True))
+    threads = set(System.system_set.through.objects.filter(
+        to_system__in=boxes).values_list('from_system', flat=True))
+    return threads | set(ids)
+
+
+def changed_ids(instance, model=None, pk_set=None):
+    """Return the ids of the posts and systems of a change"""
+    from objectapp.models import Gbobject
+
+    ids = set()
+    if isinstance(instance, Gbobject):
+        ids.add(instance.pk)
+    if model is not None and issubclass(model, Gbobject):
+        ids.update(pk_set or [])
+    return ids
+
+
+def cleared_ids(sender, instance):
+    """Return the ids of the posts and systems about to be unlinked
+    from an instance by clearing a many to many relation"""
+    from objectapp.models import Gbobject
+
+    fields = [field for field in sender._meta.fields if field.rel]
+    ids = set()
+    for source in fields:
+        model = source.rel.to._meta.proxy_for_model or source.rel.to
+        if not isinstance(instance, model):
+            continue
+        for target in fields:
+            if target is not source and issubclass(target.rel.to, Gbobject):
+                ids.update(sender.objects.filter(**{
+                    source.name: instance.pk}).values_list(
+                    target.name, flat=True))
+    return ids
+
+
+def prepare_loom_invalidation(sender, instance, **kwargs):
+    """Remember the threads of a post or of a relation before it is
+    removed, the links to them being gone afterwards"""
+    action = kwargs.get('action')
+    if action not in (None, 'pre_remove', 'pre_clear'):
+        return
+    ids = changed_ids(instance, kwargs.get('model'), kwargs.get('pk_set'))
+    if action == 'pre_clear':
+        ids.update(cleared_ids(sender, instance))
+    instance._loom_threads = threads_of(ids)
+
+
+def invalidate_loom_statistics(sender, instance, **kwargs):
+    """Expire the cached statistics of the threads of a changed post,
+    relation or vote"""
+    from objectapp.models import Gbobject
+    from djangoratings.models import Vote
+
+    action = kwargs.get('action')
+    if action is not None and action.startswith('pre_'):
+        prepare_loom_invalidation(sender, instance, **kwargs)
+        return
+    if isinstance(instance, Vote):
+        if instance.content_type_id != \
+               ContentType.objects.get_for_model(Gbobject).id:
+            return
+        ids = set([instance.object_id])
+    else:
+        ids = changed_ids(instance, kwargs.get('model'),
+                          kwargs.get('pk_set'))
+    threads = threads_of(ids) | instance.__dict__.pop('_loom_threads', set())
+    bump_loom_generations(threads)
+
+
+def response_tree(twist_ids):
+    """Return the children of the responses of the twists indexed by
+    parent id, walking the posterior nodes one level per query"""
+    from objectapp.models import Gbobject
+
+    through = Gbobject.posterior_nodes.through
+    children = {}
+    seen = set(twist_ids)
+    frontier = list(twist_ids)
+    while frontier:
+        next_frontier = []
+        for parent, child in through.objects.filter(
+            from_gbobject__in=frontier).values_list(
+            'from_gbobject', 'to_gbobject').order_by('pk'):
+            children.setdefault(parent, []).append(child)
+            if child not in seen:
+                seen.add(child)
+                next_frontier.append(child)
+        frontier = next_frontier
+    return children
+
+
+def descendant_counts(roots, children):
+    """Return the number of descendants of every node of the tree"""
+    counts = {}
+    visiting = set()
+    stack = [(root, False) for root in roots]
+    while stack:
+        node, expanded = stack.pop()
+        if node in counts:
+            continue
+        if expanded:
+            visiting.discard(node)
+            counts[node] = sum([1 + counts.get(child, 0)
+                                for child in children.get(node, [])])
+            continue
+        if node in visiting:
+            continue
+        visiting.add(node)
+        stack.append((node, True))
+        for child in children.get(node, []):
+            if child not in counts and child not in visiting:
+                stack.append((child, False))
+    return counts
+
+
+def first_authors(ids):
+    """Return the id of the first author of each object, in the
+    order of ``authors.all()``"""
+    from django.contrib.auth.models import User
+
+    authors = {}
+    for gbobject, user in User.objects.filter(gbobjects__in=ids).values_list(
+        'gbobjects', 'pk'):
+        authors.setdefault(gbobject, user)
+    return authors
+
+
+def compute_loom_statistics(thread_id):
+    """Return the statistics of the subscribers of a thread indexed
+    by user id, with the usernames of the subscribers"""
+    from gstudio.models import Objecttype
+    from objectapp.models import Gbobject
+    from objectapp.models import System
+    from djangoratings.models import Vote
+
+    thread = System.objects.get(id=thread_id)
+    box = thread.system_set.all()[0]
+    members = dict(box.member_set.values_list('id', 'username'))
+    twists = list(box.gbobject_set.values_list('id', flat=True))
+
+    children = response_tree(twists)
+    responses = []
+    for twist in twists:
+        # the responses of a twist, counted once per twist
+        seen = set([twist])
+        stack = list(children.get(twist, []))
+        while stack:
+            response = stack.pop()
+            if response in seen:
+                continue
+            seen.add(response)
+            responses.append(response)
+            stack.extend(children.get(response, []))
+    descendants = descendant_counts(twists, children)
+    authors = first_authors(set(twists) | set(responses))
+
+    content_type = ContentType.objects.get_for_model(Gbobject)
+    received = dict(Vote.objects.filter(
+        content_type=content_type, object_id__in=set(responses)).values(
+        'object_id').annotate(count=Count('id')).values_list(
+        'object_id', 'count'))
+    replies = Gbobject.objecttypes.through.objects.filter(
+        gbobject__in=set(responses),
+        nodetype__in=Objecttype.objects.filter(title='Reply')).values_list(
+        'gbobject', flat=True)
+    made = dict(Vote.objects.filter(
+        content_type=content_type, object_id__in=set(replies),
+        user__in=members.keys()).values('user').annotate(
+        count=Count('id')).values_list('user', 'count'))
+
+    statistics = dict([(user, {'username': username, 'twists': 0,
+                               'responses': 0, 'ratings_made': 0,
+                               'ratings_received': 0, 'posts_received': 0})
+                       for user, username in members.items()])
+    for twist in twists:
+        if authors.get(twist) in statistics:
+            statistics[authors[twist]]['twists'] += 1
+    for response in responses:
+        user_statistics = statistics.get(authors.get(response))
+        if user_statistics is None:
+            continue
+        user_statistics['responses'] += 1
+        user_statistics['ratings_received'] += received.get(response, 0)
+        user_statistics['posts_received'] += descendants.get(response, 0)
+    for user, count in made.items():
+        statistics[user]['ratings_made'] = count
+    return statistics
+
+
+def loom_statistics(thread_id):
+    """Return the cached statistics of the subscribers of a thread"""
+    key = 'gstudio.loom.%s.%s' % (thread_id, loom_generation(thread_id))
+    statistics = cache.get(key)
+    if statistics is None:
+        statistics = compute_loom_statistics(thread_id)
+        cache.set(key, statistics, LOOM_CACHE_TIMEOUT)
+    return statistics
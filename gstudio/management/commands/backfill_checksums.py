@@ -0,0 +1,40 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Media checksum backfill command module for Gstudio"""
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from gstudio.checksums import backfill_checksums
+
+
+class Command(NoArgsCommand):
+    """Command object for indexing the checksums of the existing media"""
+    help = 'Index the checksum attributes of the existing media.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--chunk-size', dest='chunk_size', type='int',
+                    default=1000, help='Number of attributes read per query.'),
+        )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        added = backfill_checksums(options.get('chunk_size'))
+
+        if verbosity:
+            print '%i media checksums indexed.' % added
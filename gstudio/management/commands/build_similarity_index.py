@@ -0,0 +1,38 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Similarity index build command module for Gstudio"""
+from django.core.management.base import NoArgsCommand
+from django.core.management.base import CommandError
+
+from gstudio.comparison import get_similarity_engine
+
+
+class Command(NoArgsCommand):
+    """Command object for rebuilding the index of similar nodetypes"""
+    help = 'Rebuild the index of similar nodetypes, and persist it \
+when GSTUDIO_SIMILAR_INDEX_PATH is set.'
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        engine = get_similarity_engine()
+        if engine is None:
+            raise CommandError('NumPy and SciPy are required.')
+        engine.build()
+
+        if verbosity:
+            print '%i nodetypes indexed.' % len(engine.rows)
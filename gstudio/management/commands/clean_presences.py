@@ -0,0 +1,32 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Presence cleanup command module for Gstudio"""
+from django.core.management.base import NoArgsCommand
+
+from gstudio.presence import clear_expired_presences
+
+
+class Command(NoArgsCommand):
+    """Command object for deleting the presences of the expired sessions"""
+    help = 'Delete the presences of the expired sessions.'
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        count = clear_expired_presences()
+        if verbosity:
+            print '%i presences deleted.' % count
@@ -1,183 +1,106 @@
 
-import rdflib
-from rdflib.graph import ConjunctiveGraph as Graph
-from rdflib import plugin
-from rdflib.store import Store, NO_STORE, VALID_STORE
-from rdflib.namespace import Namespace
-from rdflib.term import Literal
-from rdflib.term import URIRef
-from tempfile import mkdtemp
-from gstudio.models import *
-from objectapp.models import *
-from django.core.management.base import NoArgsCommand
-from django.core.management.base import BaseCommand
-
-
-
-
-def rdf_description(name,notation='xml' ):
-    """
-    Funtion takes  title of node, and rdf notation.
-    """
-    valid_formats = ["xml", "n3", "ntriples", "trix"]
-    default_graph_uri = "http://gstudio.gnowledge.org/rdfstore"
-   # default_graph_uri = "http://example.com/"
-    configString = "/var/tmp/rdfstore"
-
-    # Get the IOMemory plugin.
-    store = plugin.get('IOMemory', Store)('rdfstore')
-   
-
-
-    # Open previously created store, or create it if it doesn't exist yet
-    graph = Graph(store="IOMemory",
-               identifier = URIRef(default_graph_uri))
-    path = mkdtemp()
-    rt = graph.open(path, create=False)
-    if rt == NO_STORE:
-    
-        graph.open(path, create=True)
-    else:
-        assert rt == VALID_STORE, "The underlying store is corrupt"
-
-
-    # Now we'll add some triples to the graph & commit the changes
-    #rdflib = Namespace('http://sbox.gnowledge.org/gstudio/')
-    graph.bind("gstudio", "http://gnowledge.org/")
-    exclusion_fields = ["id", "rght", "node_ptr_id", "image", "lft", "_state", "_altnames_cache", "_tags_cache", "nid_ptr_id", "_mptt_cached_fields"]
-
-    #verifies the type of node 
-    
-    
-    node=NID.objects.get(title=name)
-    node_type=node.reftype
-    
-    
-
-    if (node_type=='Gbobject' ):
-    	node=Gbobject.objects.get(title=name)
-    	rdflib=link(node)
-    elif (node_type=='None'):
-    	node=Gbobject.objects.get(title=name)
-    	rdflib=link(node)  
-		   
-    elif (node_type=='Processes'):
-    	node=Gbobject.objects.get(title=name)
-    	rdflib=link(node)
-		  
-    elif (node_type=='System'):
-    	node=Gbobject.objects.get(title=name)
-    	rdflib=link(node)
-		
-    elif (node_type=='Objecttype'):
-    	node=Objecttype.objects.get(title=name)
-    	rdflib=link(node)
-
-    elif (node_type=='Attributetype'):
-    	node=Attributetype.objects.get(title=name)
-        rdflib=link(node)
-    	
-    elif (node_type=='Complement'):
-    	node=Complement.objects.get(title=name)
-    	rdflib=link(node)
-    
-    elif (node_type=='Union'):
-    	node=Union.objects.get(title=name)
-    	rdflib=link(node)
-    	
-    elif (node_type=='Intersection'):
-    	node=Intersection.objects.get(title=name)
-    	rdflib=link(node)
-    
-    elif (node_type=='Expression'):
-    	node=Expression.objects.get(title=name)
-    	rdflib=link(node)
-    
-    elif (node_type=='Processtype'):
-    	node=Processtype.objects.get(title=name)
-    	rdflib=link(node)
-    
-    elif (node_type=='Systemtype'):
-    	node=Systemtype.objects.get(title=name)
-    	rdflib=link(node)
-    
-    elif (node_type=='AttributeSpecification'):
-    	node=AttributeSpecification.objects.get(title=name)
-    	rdflib=link(node) 	 
-    
-    elif (node_type=='RelationSpecification'):
-    	node=RelationSpecification.objects.get(title=name)
-    	rdflib=link(node) 	 
-    
-    elif(node_type=='Attribute'):
-    	node=Attribute.objects.get(title=name)
-    	rdflib = Namespace('http://sbox.gnowledge.org/gstudio/')
-    
-    elif(node_type=='Relationtype' ):
-    	node=Relationtype.objects.get(title=name)
-    	rdflib = Namespace('http://sbox.gnowledge.org/gstudio/')
-    
-    elif(node_type=='Metatype'):
-    	node=Metatype.objects.get(title=name)
-    	rdflib = Namespace('http://sbox.gnowledge.org/gstudio/')
-    else:
-	rdflib = Namespace('http://sbox.gnowledge.org/gstudio/')
-		
-        
-    
-    node_dict=node.__dict__
-
-    subject=str(node_dict['id'])
-    for key in node_dict:
-        if key not in exclusion_fields:
-            predicate=str(key)
-            pobject=str(node_dict[predicate])
-            graph.add((rdflib[subject], rdflib[predicate], Literal(pobject)))
-
-     
-    rdf_code=graph.serialize(format=notation)
-    
-    graph.commit()
-    print rdf_code
-    graph.close()
-   
-
-
-
-
-#provides the url address of particular node.
-def link(node):
-	node_url=node.get_absolute_url()
-    	site_addr= node.sites.all() 
-    	a=site_addr[0]
-    	host_name=a.name
-   
-    	link='http://'
-    	#Concatenating the above variables will give the url address.
-
-    	url_addr=link+host_name+node_url
-    	rdflib=Namespace(url_addr) 
-        return rdflib
-
-
-
-
-
-
-
-class Command(BaseCommand):
-	def handle(self,*args,**options):
-		
-                # verifies and pass  the node rdf_discription() to display the rdf accordingly.
-		
-		inr=0
-		
-		object_list=NID.objects.all()
-		for each in object_list:
-    			rdf_description(object_list[inr],*args)
-    			inr=inr+1
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
 
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
 
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+"""Streaming RDF export command module for Gstudio"""
+import sys
+from datetime import datetime
+from optparse import make_option
+from multiprocessing import Pool
+
+from django.db import connection
+from django.core.management.base import CommandError
+from django.core.management.base import NoArgsCommand
 
+from gstudio.models import NID
+from gstudio.rdf import RDF_FORMATS
+from gstudio.rdf import export_rdf
+from gstudio.rdf import export_nodemodel_rdf
+
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+
+def parse_date(value):
+    """Parse the date of the --since option"""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise CommandError('%s is not a valid date' % value)
+
+
+class Command(NoArgsCommand):
+    """Command object for exporting the gnowledge base in RDF"""
+    help = 'Export the nodes, relations and attributes in RDF, ' \
+           'as they are read from the database.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--format', dest='notation', default='nt',
+                    help='RDF notation, %s.' % ' or '.join(RDF_FORMATS)),
+        make_option('--output', dest='output', default=None,
+                    help='File written, or directory of the files of '
+                    'the nodemodels with workers. Default to stdout.'),
+        make_option('--since', dest='since', default=None,
+                    help='Only export the nodes updated since this date. '
+                    'The deleted nodes are not reported.'),
+        make_option('--nodemodel', dest='nodemodels', action='append',
+                    default=[], help='Only export this nodemodel.'),
+        make_option('--workers', dest='workers', type='int', default=1,
+                    help='Number of processes exporting the nodemodels.'),
+        make_option('--chunk-size', dest='chunk_size', type='int',
+                    default=500, help='Number of nodes read per query.'),
+        )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        notation = options.get('notation')
+        output = options.get('output')
+        nodemodels = options.get('nodemodels')
+        workers = options.get('workers')
+        chunk_size = options.get('chunk_size')
+        since = options.get('since') and parse_date(options['since'])
+        if notation not in RDF_FORMATS:
+            raise CommandError('%s is not a supported RDF notation' %
+                               notation)
+
+        if workers > 1:
+            if not output:
+                raise CommandError('--output must be a directory '
+                                   'with workers')
+            if not nodemodels:
+                nodemodels = list(NID.objects.order_by(
+                    'nodemodel').values_list('nodemodel', flat=True
+                                             ).distinct())
+            # The workers open their own connections
+            connection.close()
+            pool = Pool(workers)
+            exported = sum(pool.map(export_nodemodel_rdf, [
+                (nodemodel, output, notation, since, chunk_size)
+                for nodemodel in nodemodels]))
+            pool.close()
+            pool.join()
+        else:
+            stream = output and open(output, 'w') or sys.stdout
+            try:
+                exported = export_rdf(stream, notation, nodemodels,
+                                      since, chunk_size)
+            finally:
+                if output:
+                    stream.close()
+
+        if verbosity and output:
+            print '%i nodes exported.' % exported
@@ -0,0 +1,80 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Triple store import command module for Gstudio"""
+from optparse import make_option
+
+from django.core.management.base import CommandError
+from django.core.management.base import NoArgsCommand
+
+from gstudio.settings import TRIPLESTORE_GRAPH
+from gstudio.settings import TRIPLESTORE_WORKERS
+from gstudio.settings import TRIPLESTORE_ENDPOINT
+from gstudio.settings import TRIPLESTORE_BATCH_SIZE
+from gstudio.triplestore import import_rdf
+from gstudio.triplestore import TripleStoreError
+from gstudio.management.commands.generate_all_rdf import parse_date
+
+
+class Command(NoArgsCommand):
+    """Command object for importing the gnowledge base
+    into a triple store"""
+    help = 'Import the nodes, relations and attributes into a 4store ' \
+           'triple store, by batches of triples.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--endpoint', dest='endpoint',
+                    default=TRIPLESTORE_ENDPOINT,
+                    help='URL of the triple store.'),
+        make_option('--graph', dest='graph', default=TRIPLESTORE_GRAPH,
+                    help='URI of the graph appended.'),
+        make_option('--since', dest='since', default=None,
+                    help='Only import the nodes updated since this date.'),
+        make_option('--nodemodel', dest='nodemodels', action='append',
+                    default=[], help='Only import this nodemodel.'),
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=TRIPLESTORE_BATCH_SIZE,
+                    help='Number of triples per upload.'),
+        make_option('--workers', dest='workers', type='int',
+                    default=TRIPLESTORE_WORKERS,
+                    help='Number of concurrent uploads.'),
+        make_option('--checkpoint', dest='checkpoint', default=None,
+                    help='File of the last node imported, to resume '
+                    'an interrupted import.'),
+        make_option('--chunk-size', dest='chunk_size', type='int',
+                    default=500, help='Number of nodes read per query.'),
+        )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        since = options.get('since') and parse_date(options['since'])
+        try:
+            stats = import_rdf(
+                options.get('endpoint'), options.get('graph'),
+                options.get('nodemodels'), since,
+                batch_size=options.get('batch_size'),
+                workers=options.get('workers'),
+                checkpoint=options.get('checkpoint'),
+                chunk_size=options.get('chunk_size'))
+        except TripleStoreError, e:
+            raise CommandError(str(e))
+
+        if verbosity:
+            print '%(nodes)i nodes, %(triples)i triples imported in ' \
+                  '%(batches)i batches, %(retries)i retries.' % stats
+            print '%.1f triples per second, %.1f seconds.' % (
+                stats['triples_per_second'], stats['seconds'])
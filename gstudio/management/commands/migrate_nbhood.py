@@ -0,0 +1,86 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Neighbourhood migration command module for Gstudio"""
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from gstudio.models import NID
+from gstudio.models import Node
+from gstudio.nbhood import update_nbhood
+from gstudio.nbhood_codec import decode
+from gstudio.nbhood_codec import encode
+from gstudio.nbhood_codec import is_legacy
+
+
+class Command(NoArgsCommand):
+    """Command object for rewriting the stored neighbourhoods
+    in the JSON format"""
+    help = 'Rewrite the neighbourhoods stored as Python literals in JSON.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--chunk-size', dest='chunk_size', type='int',
+                    default=500, help='Number of nodes read per query.'),
+        make_option('--rerender', action='store_true', dest='rerender',
+                    default=False,
+                    help='Render again the neighbourhoods which can not '
+                    'be decoded instead of skipping them.'),
+        )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        chunk_size = options.get('chunk_size')
+        rerender = options.get('rerender')
+
+        nodes = Node._base_manager.order_by('pk')
+        last_pk = 0
+        converted = rendered = skipped = 0
+        while True:
+            chunk = list(nodes.filter(pk__gt=last_pk).values_list(
+                'pk', 'nbhood')[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            unreadable = []
+            for pk, nbhood in chunk:
+                if not is_legacy(nbhood):
+                    continue
+                nbh = decode(nbhood)
+                if nbh:
+                    Node._base_manager.filter(pk=pk).update(nbhood=encode(nbh))
+                    converted += 1
+                else:
+                    unreadable.append(pk)
+
+            if rerender and unreadable:
+                resolved = NID.objects.resolve_many(unreadable)
+                for pk in unreadable:
+                    node = resolved.get(pk)
+                    if node is None or not hasattr(node, 'get_rendered_nbh'):
+                        skipped += 1
+                        continue
+                    node.nbhood = ''
+                    Node._base_manager.filter(pk=pk).update(
+                        nbhood=encode(update_nbhood(node, None)))
+                    rendered += 1
+            else:
+                skipped += len(unreadable)
+
+        if verbosity:
+            print '%i neighbourhoods converted, %i rendered again, ' \
+                  '%i skipped.' % (converted, rendered, skipped)
@@ -0,0 +1,87 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Image derivatives worker command module for Gstudio"""
+import time
+from multiprocessing import Pool
+from multiprocessing import cpu_count
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from gstudio.models import DerivativeJob
+from gstudio.derivatives import FAILED
+from gstudio.derivatives import PENDING
+from gstudio.derivatives import process_derivatives
+from gstudio.settings import DERIVATIVES_LEASE
+
+
+class Command(NoArgsCommand):
+    """Command object for rendering the queued image derivatives"""
+    help = 'Render the queued derivatives of the uploaded images.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--processes', dest='processes', type='int',
+                    default=cpu_count(),
+                    help='Number of rendering processes, 1 renders in '
+                    'the command process.'),
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=100, help='Number of jobs claimed at once.'),
+        make_option('--loop', action='store_true', dest='loop',
+                    default=False,
+                    help='Keep polling the queue instead of exiting '
+                    'when it is empty.'),
+        make_option('--interval', dest='interval', type='int', default=5,
+                    help='Seconds between two polls with --loop.'),
+        make_option('--lease', dest='lease', type='int',
+                    default=DERIVATIVES_LEASE,
+                    help='Seconds a claimed job may run before another '
+                    'worker claims it again.'),
+        make_option('--retry-failed', action='store_true',
+                    dest='retry_failed', default=False,
+                    help='Queue again the jobs which failed.'),
+        )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        processes = options.get('processes')
+        batch_size = options.get('batch_size')
+
+        if options.get('retry_failed'):
+            DerivativeJob.objects.filter(status=FAILED).update(
+                status=PENDING)
+
+        pool = processes > 1 and Pool(processes) or None
+        done = failed = 0
+        try:
+            while True:
+                batch_done, batch_failed = process_derivatives(
+                    batch_size, pool, options.get('lease'))
+                done += batch_done
+                failed += batch_failed
+                if batch_done or batch_failed:
+                    continue
+                if not options.get('loop'):
+                    break
+                time.sleep(options.get('interval'))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        if verbosity:
+            print '%i derivative jobs done, %i failed.' % (done, failed)
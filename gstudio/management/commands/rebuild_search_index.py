@@ -0,0 +1,55 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Search index rebuild command module for Gstudio"""
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from gstudio.models import Node
+from gstudio.resolver import resolve_many
+from gstudio.search_backends import get_search_backend
+
+
+class Command(NoArgsCommand):
+    """Command object for reindexing all the nodes in the search backend"""
+    help = 'Reindex all the nodes in the search backend.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--chunk-size', dest='chunk_size', type='int',
+                    default=500, help='Number of nodes read per query.'),
+        )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        chunk_size = options.get('chunk_size')
+        index_node = getattr(get_search_backend(), 'index_node')
+
+        nodes = Node.objects.order_by('pk').values_list('pk', 'nodemodel')
+        last_pk = 0
+        indexed = 0
+        while True:
+            chunk = list(nodes.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            for node in resolve_many(chunk).values():
+                index_node(node)
+                indexed += 1
+
+        if verbosity:
+            print '%i nodes indexed.' % indexed
@@ -55,6 +55,11 @@ DRAFT = 0
 HIDDEN = 1
 PUBLISHED = 2
 
+JOB_PENDING = 0
+JOB_RUNNING = 1
+JOB_DONE = 2
+JOB_FAILED = 3
+
 
 def tags_published():
     """Return the published tags"""
@@ -66,6 +71,41 @@ def tags_published():
     return Tag.objects.filter(name__in=[t.name for t in tags_nodetype_published])
 
 
+class NIDManager(models.Manager):
+    """Manager resolving NIDs into their typed nodes"""
+
+    def resolve_many(self, ids):
+        """Return a dict of typed nodes indexed by id,
+        with one query per nodemodel for the unresolved ids"""
+        from gstudio.resolver import get_resolved
+        from gstudio.resolver import resolve_many
+
+        ids = set(ids)
+        unresolved = set([nid for nid in ids if get_resolved(nid) is None])
+        pairs = [(nid, None) for nid in ids if nid not in unresolved]
+        if unresolved:
+            pairs.extend(self.get_query_set().filter(
+                id__in=list(unresolved)).values_list('id', 'nodemodel'))
+        return resolve_many(pairs)
+
+    def resolve(self, nid, nodemodel=None):
+        """Return the typed node of an id"""
+        from gstudio.resolver import get_resolved
+        from gstudio.resolver import resolve_many
+
+        node = get_resolved(nid)
+        if node is not None:
+            return node
+        if nodemodel is None:
+            nodemodel = self.get_query_set().values_list(
+                'nodemodel', flat=True).get(id=nid)
+        node = resolve_many([(nid, nodemodel)]).get(nid)
+        if node is None:
+            raise self.model.DoesNotExist(
+                '%s matching id %s does not exist.' % (nodemodel, nid))
+        return node
+
+
 class AuthorPublishedManager(models.Manager):
     """Manager to retrieve published authors"""
 
@@ -102,11 +142,10 @@ class NodePublishedManager(models.Manager):
             ).filter(sites=Site.objects.get_current())
 
     def search(self, pattern):
-        """Top level search method on nodes"""
-        try:
-            return self.advanced_search(pattern)
-        except:
-            return self.basic_search(pattern)
+        """Top level search method on nodes, with the search
+        backend"""
+        from gstudio.search_backends import get_search_backend
+        return get_search_backend().search(self, pattern)
 
     def advanced_search(self, pattern):
         """Advanced search on nodes"""
@@ -152,11 +191,10 @@ class NodetypePublishedManager(models.Manager):
             ).filter(sites=Site.objects.get_current())
 
     def search(self, pattern):
-        """Top level search method on nodetypes"""
-        try:
-            return self.advanced_search(pattern)
-        except:
-            return self.basic_search(pattern)
+        """Top level search method on nodetypes, with the search
+        backend"""
+        from gstudio.search_backends import get_search_backend
+        return get_search_backend().search(self, pattern)
 
     def advanced_search(self, pattern):
         """Advanced search on nodetypes"""
@@ -6,7 +6,9 @@ import datetime as date_methds
 import os
 import shutil
 import urllib
-from demo.settings import PYSCRIPT_URL_GSTUDIO
+from gstudio.orgrender import render_org
+from gstudio.loom import loom_statistics
+from objectapp.discussions import box_of_twist
 from demo.settings import FILE_URL
 #from demo.settings import MATHJAX_FILE_URL
 from django.contrib.auth.models import User
@@ -17,38 +19,24 @@ from django.template.loader import render_to_string
 from django.contrib.sites.models import Site
 #from django.contrib.comments.signals import comment_will_be_posted
 from django.core.mail import send_mail
-from django.contrib.sessions.models import Session
+from gstudio.presence import online_user_ids
+from gstudio.presence import user_sessions
 from djangoratings.models import *
 lst1=[]
 count=0
 response_set=[]
 
 
-def get_all_logged_in_users():
-    # Query all non-expired sessions
-    sessions = Session.objects.filter(expire_date__gte=date_methds.datetime.now())
-    uid_list = []
-
-    # Build a list of user ids from that query
-    for session in sessions:
-        data = session.get_decoded()
-        uid_list.append(data.get('_auth_user_id', None))
-
-    # Query all logged in users based on id list
-    return User.objects.filter(id__in=uid_list)
+def get_all_logged_in_users(user_ids=None):
+    # Users seen lately, among the given ids, from the presence table
+    return User.objects.filter(id__in=online_user_ids(user_ids))
 
 def delete_all_unexpired_sessions_for_user(user, session_to_omit=None):
     for session in all_unexpired_sessions_for_user(user):
-        if session is not session_to_omit:
+        if session != session_to_omit:
             session.delete()
 def all_unexpired_sessions_for_user(user):
-    user_sessions = []
-    all_sessions  = Session.objects.filter(expire_date__gte=date_methds.datetime.now())
-    for session in all_sessions:
-        session_data = session.get_decoded()
-        if user.pk == session_data.get('_auth_user_id'):
-            user_sessions.append(session)
-    return user_sessions
+    return list(user_sessions(user))
 
 def recur_responses(twist):
     global lst1
@@ -92,22 +80,6 @@ def posts_recd_for_subscr(subscrid,thdid):
                resp=recur_responses(eachres)
                c +=len(resp)
     return c
-def get_all_logged_in_users():
-    # Query all non-expired sessions                                                                                                        \
-                                                                                                                                             
-    sessions = Session.objects.filter(expire_date__gte=date_time.now())
-    uid_list = []
-
-    # Build a list of user ids from that query                                                                                              \
-                                                                                                                                             
-    for session in sessions:
-        data = session.get_decoded()
-        uid_list.append(data.get('_auth_user_id', None))
-
-    # Query all logged in users based on id list                                                                                            \
-                                                                                                                                             
-    return User.objects.filter(id__in=uid_list)
-
 # def get_authors_of_response(user,thread):
 #        count =0
 #        for each in thread.system_set.all()[0].gbobject_set.all():
@@ -154,65 +126,21 @@ def get_no_of_twist_posted(user,thread):
 
 def loom_status(pageid):
   retdict={}
-  userdet=[]
-  thdid=pageid
-  #get subscribers                                                                                                                        
-  sys=System.objects.get(id=pageid)
-  box=sys.system_set.all()[0]
-  twistset=box.gbobject_set.all()
-  logged_users=get_all_logged_in_users()
-  #get online-offline                                                                                                                       
-  for eachsubscbr in box.member_set.all():
-      count =0
-      ratngs = 0
-      nooftwists=0
-      pstc=0
-      voteofuser = Vote.objects.filter(user = eachsubscbr)
-      rating_made = 0
-#      eachuser=User.objects.get(username=eachsubscbr)
-      if eachsubscbr in logged_users:
+  statistics=loom_statistics(int(pageid))
+  #get online-offline
+  logged_users=online_user_ids(statistics.keys())
+  for userid,stats in statistics.items():
+      userdet=[]
+      if userid in logged_users:
          userdet.append("green1")
       else:
          userdet.append("grey")
-#  get no-of-posts(twist/responses)
-      for eachtwist in twistset:
-           respns=0
-           if str(eachtwist.authors.all()[0])==str(eachsubscbr):
-               nooftwists+=1
-           response_set=recur_responses(eachtwist)
-           for each1 in response_set:
-               if str(each1.authors.all()[0])==str(eachsubscbr):
-#                   print "eachte",eachtwist,each1.id
-                   respns=recur_responses(each1)
-                   pstc +=len(respns)
-                   count=count+1
-                   lst=each1.rating.get_ratings()
-                   if lst:
-                       ratngs+=lst.count()
-
-#      resps=get_authors_of_response(each,sys)                                                                                              
-#      thds=get_no_of_twist_posted(each,sys)                                                                                                
-      strng=str(nooftwists)+"/"+str(count)
-      userdet.append(strng) 
-#get Ratings user made
-      for vote in voteofuser:
-          objectofvote = vote.content_object
-          if objectofvote.objecttypes.all():
-              if objectofvote.objecttypes.all()[0].title=='Reply':
-                  print "pr",objectofvote
-                  objectofvoteid = objectofvote.getthread_of_response.id
-                  if thdid== objectofvoteid:
-                      rating_made = rating_made + 1                                                                                 
-#      ratngsuser=get_rate_of_object_of_user(eachsubscbr,sys.id)
-      userdet.append(str(rating_made))
-      userdet.append(str(ratngs))                                                                                                   
-#      print "rantngs",userdet
-#responses his post received
-#      psts=posts_recd_for_subscr(each.id,thdid)
-      userdet.append(str(pstc))
-      retdict[eachsubscbr.username]=userdet
-      userdet=[]
-#      print "fin",retdict
+      # twists/responses posted, ratings made and received, responses received
+      userdet.append(str(stats['twists'])+"/"+str(stats['responses']))
+      userdet.append(str(stats['ratings_made']))
+      userdet.append(str(stats['ratings_received']))
+      userdet.append(str(stats['posts_received']))
+      retdict[stats['username']]=userdet
   return retdict
 
 
@@ -241,15 +169,10 @@ def check_page_exists(pgetocheck):
 
 
 def get_threadbox_of_twist(twistid):
- thid=""
- for each in System.objects.all():
-        sys_set=each.system_set.all()
-        if sys_set:
-               sys_set=each.system_set.all()[0]
-               for eachsys in sys_set.gbobject_set.all():
-                      if eachsys.id==twistid:
-                             return sys_set
- return thid
+ box = box_of_twist(twistid)
+ if box is None:
+        return ""
+ return box
 
 def delete(idnum):
  del_ob = Gbobject.objects.get(id=idnum)
@@ -301,36 +224,7 @@ def make_rep_object(replytext,auth_id,usr):
  ext='.org'
  html='.html'
  # write to file
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(new_ob.content_org)
- myfile.close()
-
- # read again to remove carriage return character
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
-
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- # read 
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- 
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- # remove header content information
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
-
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(new_ob.content_org)
  new_ob.content = newdata
  new_ob.title = "re-"
  new_ob.status = 2
@@ -354,33 +248,7 @@ def edit_section(sec_id,title,usr):
  fname=str(ssid)+"-"+usr
  ext='.org'
  html='.html'
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(new_ob.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
- #myfile.readline()
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- #myfile.write("\n#+MATHJAX: align:"left" path:MATHJAX_FILE_URL mathml:t")
- 
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- 
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(new_ob.content_org)
  new_ob.content = newdata
  new_ob.save()
  return True
@@ -394,30 +262,7 @@ def make_topic_object(title,auth_id,content,usr):
  new_ob.content_org=contorg.encode('utf8') 
  ext='.org'
  html='.html'
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(new_ob.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
- #myfile.readline()
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(new_ob.content_org)
  new_ob.content = newdata
  new_ob.status = 2
  new_ob.slug = slugify(title)
@@ -441,30 +286,7 @@ def make_sectionreply_object(content_org,title,auth_id,usr):
  new_ob.content_org=contorg.encode('utf8')
  ext='.org'
  html='.html'
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(new_ob.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
- #myfile.readline()
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(new_ob.content_org)
  new_ob.content = newdata
  myfile = open('/tmp/file.org', 'w')
  # myfile.write(new_ob.content_org)
@@ -489,30 +311,7 @@ def make_section_object(title,auth_id,content_org,usr):
  new_ob.content_org=contorg.encode('utf8')
  ext='.org'
  html='.html'
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(new_ob.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
- #myfile.readline()
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(new_ob.content_org)
  new_ob.content = newdata
  new_ob.save()
  new_ob.slug = new_ob.slug + "-" + str(new_ob.id)
@@ -562,30 +361,7 @@ def create_meeting(title,idusr,content,usr):
  fname=slugify(title)+"-"+usr
  ext='.org'
  html='.html'
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(sys.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
-# myfile.readline()
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(sys.content_org)
  sys.content = newdata
  sys.slug = slugify(title)
  sys.save()
@@ -635,35 +411,7 @@ def create_wikipage(title,idusr,content_org,usr,collection,list1,status):
  ext='.org'
  html='.html'
  fname=slugify(title)+"-"+usr
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(sys.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- #reptext=MATHJAX_FILE_URL
- #findtext="http://orgmode.org/mathjax/MathJax.js"
- #if findtext in newcontent:
-  #      newcontent=newcontent.replace(findtext,reptext)
- 
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
- #myfile.readline()
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(sys.content_org)
  sys.content = newdata
  sys.slug = slugify(title)
  sys.save()
@@ -808,30 +556,7 @@ def edit_topic(topic_id,title,usr):
  fname=str(ssid)+"-"+usr
  ext='.org'
  html='.html'
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(ob.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
- #myfile.readline()
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(ob.content_org)
  ob.content = newdata
  ob.save()
  return True
@@ -844,30 +569,7 @@ def edit_thread(thread_id,title,usr):
  ob.content_org=contorg.encode('utf8')
  ext='.org'
  html='.html'
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(ob.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
- #myfile.readline()
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(ob.content_org)
  ob.content = newdata
  ob.save()
 
@@ -883,30 +585,7 @@ def edit_nodetype(iden,rep,usr):
  ext='.org'
  html='.html'
  #usr=str(request.user)
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(refobj.content_org)
- myfile.close()
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- rfile=myfile.readlines()
- scontent="".join(rfile)
- newcontent=scontent.replace("\r","")
- myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- myfile.write(newcontent)
-
- myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- myfile.write("\n#+TITLE: ")
- myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- output = stdout.read()
- data = open(os.path.join(FILE_URL,fname+html))
- data1 = data.readlines()
- data2 = data1[107:]
- dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
- data3 = data2[:-6]
- newdata=""
- for line in data3:
-        newdata += line.lstrip()
+ newdata = render_org(refobj.content_org)
  refobj.content= newdata
  refobj.save()
  return True
@@ -0,0 +1,58 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Middlewares of Gstudio"""
+from django.db import transaction
+
+from gstudio.nbhood import begin_batch
+from gstudio.nbhood import end_batch
+from gstudio.nbhood import reset_batch
+from gstudio.presence import touch
+
+
+class NbhoodMiddleware(object):
+    """Coalesce the neighbourhood updates made while handling a request
+    and flush them once the response is built.
+
+    Place it after django.middleware.transaction.TransactionMiddleware
+    so that the flush happens before the transaction is committed.
+    On an exception the updates are dropped only when that transaction
+    is rolled back, otherwise the writes are already committed and the
+    updates are flushed."""
+
+    def process_request(self, request):
+        reset_batch()
+        begin_batch()
+
+    def process_exception(self, request, exception):
+        end_batch(flush=not transaction.is_managed())
+        begin_batch()
+
+    def process_response(self, request, response):
+        end_batch()
+        return response
+
+
+class PresenceMiddleware(object):
+    """Record the last time the authenticated users were seen,
+    for the online status of the users.
+
+    Place it after django.contrib.auth.middleware.AuthenticationMiddleware."""
+
+    def process_request(self, request):
+        if request.user.is_authenticated():
+            touch(request)
@@ -60,6 +60,12 @@ from django.utils.html import linebreaks
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 from django.db.models.signals import post_save
+from django.db.models.signals import post_delete
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import pre_save
+from django.core.signals import request_started
+from django.core.signals import request_finished
+from django.core.signals import got_request_exception
 from django.utils.importlib import import_module
 from django.contrib import comments
 from django.contrib.comments.models import CommentFlag
@@ -83,11 +89,46 @@ from gstudio.managers import nodetypes_published
 from gstudio.managers import NodetypePublishedManager
 from gstudio.managers import NodePublishedManager
 from gstudio.managers import AuthorPublishedManager
+from gstudio.managers import NIDManager
 from gstudio.managers import DRAFT, HIDDEN, PUBLISHED
+from gstudio.managers import JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED
 from gstudio.moderator import NodetypeCommentModerator
 from gstudio.url_shortener import get_url_shortener
 from gstudio.signals import ping_directories_handler
 from gstudio.signals import ping_external_urls_handler
+from gstudio.resolver import clear_resolver_cache
+from gstudio.resolver import open_resolver_scope
+from gstudio.resolver import close_resolver_scope
+from gstudio.resolver import invalidate_resolved_node
+from gstudio.resolver import forget_resolved
+from gstudio.nbhood import render_nbhood
+from gstudio.nbhood import render_history
+from gstudio.nbhood import load_nbhood
+from gstudio.nbhood import dump_nbhood
+from gstudio.nbhood import stored_values
+from gstudio.nbhood import mark_dirty
+from gstudio.nbhood import mark_nodetype_dirty
+from gstudio.nbhood import mark_relationtype_subjects_dirty
+from gstudio.nbhood import mark_attributetype_subjects_dirty
+from gstudio.nbhood import mark_relation_dirty
+from gstudio.nbhood import mark_attribute_dirty
+from gstudio.nbhood import nbhood_batch
+from gstudio.nbhood import reset_batch
+from gstudio.nbhood import add_subjects_to_revision
+from gstudio.nbhood import m2m_nbhood_receiver
+from gstudio.nbhood import M2M_NBHOOD_GROUPS
+from gstudio.graphs import get_graph_json
+from gstudio.typeahead import invalidate_typeahead
+from gstudio.typeahead import stash_typeahead_parent
+from gstudio.checksums import stash_checksum
+from gstudio.checksums import index_checksum
+from gstudio.checksums import unindex_checksum
+from gstudio.checksums import invalidate_checksum_attributetypes
+from gstudio.preferences import invalidate_preference_attribute
+from gstudio.comparison import update_similarity_engine
+from gstudio.search_backends import index_search_node
+from gstudio.comparison import remove_from_similarity_engine
+from gstudio.comparison import update_similarity_engine_sites
 
 import json
 if GSTUDIO_VERSIONING:
@@ -159,9 +200,39 @@ STATUS_CHOICES = ((DRAFT, _('draft')),
                   (HIDDEN, _('hidden')),
                   (PUBLISHED, _('published')))
 
-
-counter = 1
-attr_counter = -1
+JOB_STATUS_CHOICES = ((JOB_PENDING, _('pending')),
+                      (JOB_RUNNING, _('running')),
+                      (JOB_DONE, _('done')),
+                      (JOB_FAILED, _('failed')))
+
+
+def tree_ancestors(node, model, include_self=False):
+    """Return the ancestors of a tree node, root first, read from
+    its MPTT fields in a single query"""
+    if node.lft is None:
+        return model._base_manager.none()
+    lookups = {'tree_id': node.tree_id}
+    if include_self:
+        lookups.update({'lft__lte': node.lft, 'rght__gte': node.rght})
+    else:
+        lookups.update({'lft__lt': node.lft, 'rght__gt': node.rght})
+    return model._base_manager.filter(**lookups).order_by('lft')
+
+def tree_descendants(node, model, include_self=False):
+    """Return the descendants of a tree node, read from
+    its MPTT fields in a single query"""
+    if node.lft is None:
+        return model._base_manager.none()
+    lookups = {'tree_id': node.tree_id}
+    if include_self:
+        lookups.update({'lft__gte': node.lft, 'rght__lte': node.rght})
+    else:
+        lookups.update({'lft__gt': node.lft, 'rght__lt': node.rght})
+    return model._base_manager.filter(**lookups).order_by('lft')
+
+def tree_ids(queryset):
+    """Return the primary keys of a tree queryset as a subquery"""
+    return queryset.values_list('pk', flat=True)
 
 class Author(User):
     """Proxy Model around User"""
@@ -202,6 +273,8 @@ class NID(models.Model):
                             max_length=255)
     nodemodel = models.CharField(_('nodemodel'),max_length=255)
 
+    objects = NIDManager()
+
     @property
     def get_revisioncount(self):
         """
@@ -276,8 +349,8 @@ class NID(models.Model):
 
     @property
     def ref(self):
-        from objectapp.models import *
-        return eval(self.nodemodel).objects.get(id=self.id)
+        """Returns the typed node the id belongs to"""
+        return NID.objects.resolve(self.id, self.nodemodel)
 
         # """
         # Returns the object reference the id belongs to.
@@ -318,24 +391,14 @@ class NID(models.Model):
 
         """This is will give the possible attributetypes """
         try:
-            pt = []
-            attributetype = []
             returndict = {}
 
-            pt.append(self.ref)
-            obj = self.ref
-            while obj.parent:
-                pt.append((obj.parent).ref)
-                obj=obj.parent
-
-            for each in pt:
-                attributetype.append(each.subjecttype_of.all())
-
-            attributetype = [num for elem in attributetype for num in elem]
+            pt = self.ref.get_ancestor_ids(include_self=True)
+            attributetype = Attributetype.objects.filter(subjecttype__in=pt,
+                                                         applicable_nodetypes='OT')
 
             for i in attributetype:
-                if str(i.applicable_nodetypes) == 'OT':
-                    returndict.update({str(i.title):i.id})
+                returndict.update({str(i.title):i.id})
 
             return returndict.keys()
         except:
@@ -343,49 +406,21 @@ class NID(models.Model):
 
     @property
     def getrt(self):
-        """pt =[] contains parenttype
-        reltype =[] contains relationtype
-        titledict = {} contains relationtype's title
-        inverselist = [] contains relationtype's inverse
-        finaldict = {} contains either title of relationtype or inverse of relationtype
-        listval=[] contains keys of titledict to check whether parenttype id is equals to listval's left or right subjecttypeid"""
-
-        pt =[]
-        reltype =[]
-        titledict = {}
-        inverselist = []
-        finaldict = {}
-        listval=[]
-
-        pt.append(self.ref)
-        obj = self.ref
-        while obj.parent:
-            pt.append((obj.parent).ref)
-            obj=obj.parent
+        """pt contains the ids of the node and its parenttypes
+        reltype contains the relationtypes having one of them as a role
+        finaldict = {} contains either title of relationtype or inverse of relationtype"""
 
-        for i in range(len(pt)):
-            if Relationtype.objects.filter(left_subjecttype = pt[i].id):
-                reltype.append(Relationtype.objects.filter(left_subjecttype = pt[i].id))
-            if Relationtype.objects.filter(right_subjecttype = pt[i].id):
-                reltype.append(Relationtype.objects.filter(right_subjecttype = pt[i].id))
-        reltype = [num for elem in reltype for num in elem] #this rqud for filtering
-
-        for i in reltype:
-            titledict.update({i.title:i.id})
-
-
-        for i in range(len(titledict)):
-            listval.append(Relationtype.objects.get(title = titledict.keys()[i]))
-            obj=Relationtype.objects.get(title=titledict.keys()[i])
-            inverselist.append(str(obj.inverse))
+        finaldict = {}
 
-        for j in range(len(pt)):
-            for i in range(len(listval)):
-                if pt[j].id == listval[i].left_subjecttype_id and str(listval[i].left_applicable_nodetypes) == 'OT' :
-                    finaldict.update({titledict.keys()[i]:titledict.values()[i]})
-                if pt[j].id == listval[i].right_subjecttype_id and str(listval[i].right_applicable_nodetypes)=='OT':
-                    finaldict.update({inverselist[i]:titledict.values()[i]})
+        pt = list(self.ref.get_ancestor_ids(include_self=True))
+        reltype = Relationtype.objects.filter(Q(left_subjecttype__in=pt) |
+                                              Q(right_subjecttype__in=pt))
 
+        for rt in reltype:
+            if rt.left_subjecttype_id in pt and str(rt.left_applicable_nodetypes) == 'OT':
+                finaldict.update({rt.title:rt.id})
+            if rt.right_subjecttype_id in pt and str(rt.right_applicable_nodetypes) == 'OT':
+                finaldict.update({str(rt.inverse):rt.id})
 
         return finaldict.keys()
 
@@ -494,24 +529,15 @@ class Metatype(Node):
     def get_possible_attributetypes(self):
         """
         Gets the relations possible for this metatype
-        1. Recursively create a set of all the ancestors i.e. parent/subtypes of the MT.
+        1. Get the ids of all the ancestors i.e. parent/subtypes of the MT from the tree fields.
         2. Get all the AT's linked to each ancestor
         """
         #Step 1.
-        ancestor_list = []
-        this_parent = self.parent
-
-        # recursive thru parent field and append
-        while this_parent:
-            ancestor_list.append(this_parent)
-            this_parent = this_parent.parent
+        ancestor_list = self.get_ancestor_ids()
 
         #Step 2.
-        attrtypes = []
-
-        for each in ancestor_list:
-            # retrieve all the AT's from each ancestor
-            attrtypes.extend(Attributetype.objects.filter(subjecttype=each.id))
+        # retrieve all the AT's of the ancestors at once
+        attrtypes = list(Attributetype.objects.filter(subjecttype__in=ancestor_list))
 
         return attrtypes
 
@@ -520,28 +546,19 @@ class Metatype(Node):
     def get_possible_rels(self):
         """
         Gets the relations possible for this metatype
-        1. Recursively create a set of all the ancestors i.e. parent/subtypes of the MT.
+        1. Get the ids of all the ancestors i.e. parent/subtypes of the MT from the tree fields.
         2. Get all the R's linked to each ancestor
         """
         #Step 1.
-        ancestor_list = []
-        this_parent = self.parent
-
-        # append
-        while this_parent:
-            ancestor_list.append(this_parent)
-            this_parent = this_parent.parent
+        ancestor_list = self.get_ancestor_ids()
 
         #Step 2.
         rels = {}
         rt_set = Relation.objects.all()
-        right_subset = []
-        left_subset = []
 
-        for each in ancestor_list:
-            # retrieve all the RT's from each ancestor
-            right_subset.extend(rt_set.filter(subject1=each.id))
-            left_subset.extend(rt_set.filter(subject2=each.id))
+        # retrieve all the R's of the ancestors at once
+        right_subset = list(rt_set.filter(left_subject__in=ancestor_list))
+        left_subset = list(rt_set.filter(right_subject__in=ancestor_list))
 
         rels['possible_leftroles'] = left_subset
         rels['possible_rightroles'] = right_subset
@@ -554,24 +571,15 @@ class Metatype(Node):
     def get_possible_attributes(self):
         """
         Gets the relations possible for this metatype
-        1. Recursively create a set of all the ancestors i.e. parent/subtypes of the MT.
+        1. Get the ids of all the ancestors i.e. parent/subtypes of the MT from the tree fields.
         2. Get all the RT's linked to each ancestor
         """
         #Step 1.
-        ancestor_list = []
-        this_parent = self.parent
-
-        # recursive thru parent field and append
-        while this_parent:
-            ancestor_list.append(this_parent)
-            this_parent = this_parent.parent
+        ancestor_list = self.get_ancestor_ids()
 
         #Step 2.
-        attrs = []
-
-        for each in ancestor_list:
-            # retrieve all the AT's from each ancestor
-            attrs.extend(Attribute.objects.filter(subject=each.id))
+        # retrieve all the A's of the ancestors at once
+        attrs = list(Attribute.objects.filter(subject__in=ancestor_list))
 
         return attrs
 
@@ -586,9 +594,9 @@ class Metatype(Node):
             length=len(version_list)
             history_ssid=version_list[length-1]
             history_dict=self.version_info(history_ssid)
-            history_nbh_dict=ast.literal_eval(history_dict['nbhood'])
+            history_nbh_dict=load_nbhood(history_dict['nbhood'])
             #ssid_current.append(history_ssid)
-            history=history_nbh_dict['history']
+            history=history_nbh_dict.get('history', [])
             history.append(history_ssid)
         else:
             history.append(0)
@@ -616,11 +624,20 @@ class Metatype(Node):
         return nbh
 
 
+    def get_ancestor_ids(self, include_self=False):
+        """Returns the ids of the ancestors of the metatype"""
+        return tree_ids(tree_ancestors(self, Metatype, include_self))
+
+    def get_descendant_ids(self, include_self=False):
+        """Returns the ids of the descendants of the metatype"""
+        return tree_ids(tree_descendants(self, Metatype, include_self))
+
     @property
     def tree_path(self):
         """Return metatype's tree path, by its ancestors"""
-        if self.parent:
-            return u'%s/%s' % (self.parent.tree_path, self.slug)
+        if self.parent_id:
+            slugs = tree_ancestors(self, Metatype).values_list('slug', flat=True)
+            return u'/'.join(list(slugs) + [self.slug])
         return self.slug
 
     def __unicode__(self):
@@ -652,10 +669,11 @@ class Metatype(Node):
     def save(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
         self.nbhood=[]
-        super(Metatype, self).save(*args, **kwargs) # Call the "real" save() method.
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Metatype, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(Metatype, self).save(*args, **kwargs) # Call the "real" save() method.
 
 class Edge(NID):
     
@@ -674,8 +692,8 @@ class Edge(NID):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Edge, self).save(*args, **kwargs) # Call the "real" save() method.
-
-        super(Edge, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(Edge, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -745,28 +763,19 @@ class Nodetype(Node):
     def get_possible_reltypes(self):
         """
         Gets the relations possible for this metatype
-        1. Recursively create a set of all the ancestors i.e. parent/subtypes of the MT.
+        1. Get the ids of all the ancestors i.e. parent/subtypes of the MT from the tree fields.
         2. Get all the RT's linked to each ancestor
         """
         #Step 1.
-        ancestor_list = []
-        this_parent = self.parent
-
-        # append
-        while this_parent:
-            ancestor_list.append(this_parent)
-            this_parent = this_parent.parent
+        ancestor_list = self.get_ancestor_ids()
 
         #Step 2.
         reltypes = {}
         rt_set = Relationtype.objects.all()
-        right_subset = []
-        left_subset = []
 
-        for each in ancestor_list:
-            # retrieve all the RT's from each ancestor
-            right_subset.extend(rt_set.filter(subjecttypeLeft=each.id))
-            left_subset.extend(rt_set.filter(subjecttypeRight=each.id))
+        # retrieve all the RT's of the ancestors at once
+        right_subset = list(rt_set.filter(left_subjecttype__in=ancestor_list))
+        left_subset = list(rt_set.filter(right_subjecttype__in=ancestor_list))
 
         reltypes['possible_leftroles'] = left_subset
         reltypes['possible_rightroles'] = right_subset
@@ -866,24 +875,15 @@ class Nodetype(Node):
     def get_possible_attributetypes(self):
         """
         Gets the relations possible for this metatype
-        1. Recursively create a set of all the ancestors i.e. parent/subtypes of the MT.
+        1. Get the ids of all the ancestors i.e. parent/subtypes of the MT from the tree fields.
         2. Get all the AT's linked to each ancestor
         """
         #Step 1.
-        ancestor_list = []
-        this_parent = self.parent
-
-        # recursive thru parent field and append
-        while this_parent:
-            ancestor_list.append(this_parent)
-            this_parent = this_parent.parent
+        ancestor_list = self.get_ancestor_ids()
 
         #Step 2.
-        attrtypes = []
-
-        for each in ancestor_list:
-            # retrieve all the AT's from each ancestor
-            attrtypes.extend(Attributetype.objects.filter(subjecttype=each.id))
+        # retrieve all the AT's of the ancestors at once
+        attrtypes = list(Attributetype.objects.filter(subjecttype__in=ancestor_list))
 
         return attrtypes
 
@@ -892,28 +892,19 @@ class Nodetype(Node):
     def get_possible_rels(self):
         """
         Gets the relations possible for this metatype
-        1. Recursively create a set of all the ancestors i.e. parent/subtypes of the MT.
+        1. Get the ids of all the ancestors i.e. parent/subtypes of the MT from the tree fields.
         2. Get all the R's linked to each ancestor
         """
         #Step 1.
-        ancestor_list = []
-        this_parent = self.parent
-
-        # append
-        while this_parent:
-            ancestor_list.append(this_parent)
-            this_parent = this_parent.parent
+        ancestor_list = self.get_ancestor_ids()
 
         #Step 2.
         rels = {}
         rt_set = Relation.objects.all()
-        right_subset = []
-        left_subset = []
 
-        for each in ancestor_list:
-            # retrieve all the RT's from each ancestor
-            right_subset.extend(rt_set.filter(subject1=each.id))
-            left_subset.extend(rt_set.filter(subject2=each.id))
+        # retrieve all the R's of the ancestors at once
+        right_subset = list(rt_set.filter(left_subject__in=ancestor_list))
+        left_subset = list(rt_set.filter(right_subject__in=ancestor_list))
 
         rels['possible_leftroles'] = left_subset
         rels['possible_rightroles'] = right_subset
@@ -921,126 +912,84 @@ class Nodetype(Node):
         return rels
 
 
-    def get_graph_json(self):
-        
-        
-        
-	g_json = {}
-	g_json["node_metadata"]= [] 
-	g_json["relations"]=[]
-	
-
-	global counter 
-	global attr_counter
-	nbh = self.get_nbh
-	predicate_id = {}
-        
-        for key in nbh.keys():
-            val = str(counter) + "b"
-            predicate_id[key] = val
-            counter = counter + 1
-        #print predicate_id
-
-       
+    @property
+    def get_rendered_nbh(self):
+        """
+        Returns the rendered neighbourhood of the nodetype
+        """
+        nbh = render_nbhood(self)
+        nbh['history'] = render_history(self)
+        return nbh
 
-        this_node = {"_id":str(self.id),"title":self.title,"screen_name":self.title, "url":self.get_absolute_url(),"refType":self.reftype}
-        g_json["node_metadata"].append(this_node)      
-	
-
-	for key in predicate_id.keys():
-		if nbh[key]:
-                    try:
-				
-                        g_json["node_metadata"].append({"_id":str(predicate_id[key]),"screen_name":key})
-                        
-                        g_json["relations"].append({"from":self.id ,"type":str(key),"value":1,"to":predicate_id[key] })
-
-                        if not isinstance(nbh[key],basestring) and len(nbh[key])<=10:
-                            for item in nbh[key]:
-                                if isinstance(item,unicode):
-                                    g_json["node_metadata"].append({"_id":(str(attr_counter)+"b"),"screen_name":str(item)})
-                                    g_json["relations"].append({"from":predicate_id[key] ,"type":str(key) ,"value":1,"to":(str(attr_counter)+"b") })
-                                    attr_counter-=1
-                                    
-                                elif item.reftype!="Relation":
-                                    # create nodes
-                                    g_json["node_metadata"].append({"_id":str(item.id),"screen_name":item.title,"title":self.title, "url":item.get_absolute_url(),"refType":item.reftype})
-                                    g_json["relations"].append({"from":predicate_id[key] ,"type":str(key), "value":1,"to":item.id  })
-                                    
-                                else:
-                                    
-                                    if item.left_subject.id==self.id:
-                                        item1=item.right_subject
-                                        flag=1
-                                        
-                                    elif item.right_subject.id==self.id:
-                                        item1=item.left_subject
-                                        flag=0						
-                                        
-                                    g_json["node_metadata"].append({"_id":str(item1.id),"screen_name":item1.title,"title":self.title, "url":item1.get_absolute_url(),"refType":item.reftype,"inverse":item.relationtype.inverse,"flag":flag})
-                                        
-                                        
-                                    g_json["relations"].append({"from":predicate_id[key] ,"type":str(key), "value":1,"to":item1.id  })
-                        else:
-                            if not isinstance(nbh[key],basestring):
-                                g_json["node_metadata"].append({"_id":(str(attr_counter))+"a","screen_name":str(len(nbh[key]))+" nodes...","title":str(key),"url":"/nodetypes/graphs/graph_label/"+str(self.id)+"/"+str(key)})
-					#g_json["relations"].append({"from":predicate_id[key] ,"type":str(key) ,"value":1,"to":(str(attr_counter))})
-                            else:
-                                g_json["node_metadata"].append({"_id":(str(attr_counter)+"a"),"screen_name":nbh[key]})
-    
-                            g_json["relations"].append({"from":predicate_id[key] ,"type":str(key) ,"value":1,"to":(str(attr_counter)+"a")})
+    def save_with_nbhood(self, save, *args, **kwargs):
+        """
+        Saves the nodetype once with the given save method, in a
+        revision when versioning, then renders and stores its
+        neighbourhood without saving it again. The snapshot of the
+        revision, taken when it ends, holds the stored neighbourhood
+        """
+        if GSTUDIO_VERSIONING:
+            with reversion.create_revision():
+                save(*args, **kwargs)
+                self.store_nbhood()
+        else:
+            save(*args, **kwargs)
+            self.store_nbhood()
+        forget_resolved(self.pk)
 
-                            attr_counter-=1
+    def store_nbhood(self):
+        """
+        Renders and stores the neighbourhood of the saved nodetype
+        """
+        self.nbhood = dump_nbhood(self.get_rendered_nbh)
+        Node._base_manager.filter(pk=self.pk).update(nbhood=self.nbhood)
 
-                    except:
-                            pass
-                            
-        #print g_json
-        return json.dumps(g_json)   
+    def get_graph_json(self):
+        """Returns the graph JSON of the neighbourhood of the nodetype"""
+        return get_graph_json(self)
 
 
     def get_label(self,key):
         nbh=self.get_nbh
+        nodes=NID.objects.resolve_many([item.id for item in nbh[key]])
         list_of_nodes=[]
         for item in nbh[key]:
-            node=NID.objects.get(id=item.id)
-            node=node.ref
-            list_of_nodes.append(node)
+            list_of_nodes.append(nodes[item.id])
         return list_of_nodes
 
     @property
     def get_possible_attributes(self):
         """
         Gets the relations possible for this metatype
-        1. Recursively create a set of all the ancestors i.e. parent/subtypes of the MT.
+        1. Get the ids of all the ancestors i.e. parent/subtypes of the MT from the tree fields.
         2. Get all the RT's linked to each ancestor
         """
         #Step 1.
-        ancestor_list = []
-        this_parent = self.parent
-
-        # recursive thru parent field and append
-        while this_parent:
-            ancestor_list.append(this_parent)
-            this_parent = this_parent.parent
+        ancestor_list = self.get_ancestor_ids()
 
         #Step 2.
-        attrs = []
-
-        for each in ancestor_list:
-            # retrieve all the AT's from each ancestor
-            attrs.extend(Attribute.objects.filter(subject=each.id))
+        # retrieve all the A's of the ancestors at once
+        attrs = list(Attribute.objects.filter(subject__in=ancestor_list))
 
         return attrs
 
 
 
 
+    def get_ancestor_ids(self, include_self=False):
+        """Returns the ids of the ancestors of the nodetype"""
+        return tree_ids(tree_ancestors(self, Nodetype, include_self))
+
+    def get_descendant_ids(self, include_self=False):
+        """Returns the ids of the descendants of the nodetype"""
+        return tree_ids(tree_descendants(self, Nodetype, include_self))
+
     @property
     def tree_path(self):
         """Return nodetype's tree path, by its ancestors"""
-        if self.parent:
-            return u'%s/%s' % (self.parent.tree_path, self.slug)
+        if self.parent_id:
+            slugs = tree_ancestors(self, Nodetype).values_list('slug', flat=True)
+            return u'/'.join(list(slugs) + [self.slug])
         return self.slug
 
     @property
@@ -1442,138 +1391,6 @@ class Objecttype(Nodetype):
         #nbh['authors'] = self.authors.all()
 
         return nbh
-    @property
-    def get_rendered_nbh(self):
-        """
-        Returns the neighbourhood of the nodetype
-        """
-        history=[]
-        version_list=self.get_ssid
-        if version_list:
-            length=len(version_list)
-            history_ssid=version_list[length-1]
-            history_dict=self.version_info(history_ssid)
-            # history_nbh_dict=ast.literal_eval(history_dict['nbhood'])
-            #ssid_current.append(history_ssid)
-            # history=history_nbh_dict['history']
-            history.append(history_ssid)
-        else:
-            history.append(0)
-        nbh = {}
-        nbh['title'] = self.title
-        nbh['count_title'] = len(nbh['title'])
-        nbh['altnames'] = self.altnames
-        nbh['count_altnames'] = len(nbh['altnames'])
-        nbh['plural'] = self.plural
-        #nbh['count_plural'] = len(nbh['plural'])
-        #get all MTs
-        member_of_dict = {}
-        for each in self.metatypes.all():
-            member_of_dict[each.title]= each.get_absolute_url()
-        nbh['member_of_metatypes']=member_of_dict
-        nbh['count_member_of_metatypes'] = len(nbh['member_of_metatypes'])
-        typeof={}
-        parentid=self.parent_id
-        if parentid:
-            parent=Nodetype.objects.get(id=parentid)
-            if parent:
-                typeof[parent] = parent.get_absolute_url()
-        nbh['type_of']=typeof
-        nbh['count_type_of'] = len(nbh['type_of'])
-        #get all subtypes
-        subtypes={}
-        for each in Nodetype.objects.filter(parent=self.id):
-            subtypes[each.title] =each.get_absolute_url()
-        nbh['contains_subtypes']=subtypes
-        nbh['count_contains_subtypes'] = len(nbh['contains_subtypes'])
-        # get all the objects inheriting this OT
-        contains_members_dict = {}
-        for each in self.member_objects.all():
-            contains_members_dict[each.title]= each.get_absolute_url()
-        nbh['contains_members'] = contains_members_dict
-        nbh['count_contains_members'] = len(nbh['contains_members'])
-        #get prior nodes
-        priornodes_dict = {}
-        for each in self.prior_nodes.all():
-            priornodes_dict[each.title]= each.get_absolute_url()
-        nbh['priornodes'] = priornodes_dict
-        nbh['count_priornodes'] = len(nbh['priornodes'])
-        #get posterior nodes
-        posteriornodes_dict = {}
-        for each in self.posterior_nodes.all():
-            posteriornodes_dict[each.title]= each.get_absolute_url()
-        nbh['posteriornodes'] = posteriornodes_dict
-        nbh['count_posteriornodes'] = len(nbh['posteriornodes'])
-        #get authors
-        author_dict = {}
-        for each in self.authors.all():
-            author_dict['User'] = each.get_absolute_url()
-        nbh['authors'] = author_dict
-        #get siblings
-        siblings={}
-        for each in self.get_siblings():
-            siblings[each.title]=each.get_absolute_url()
-        nbh['siblings']=siblings
-        nbh['count_siblings'] = len(nbh['siblings'])
-        #get Relations
-        relns={}
-        rellft={}
-        relrgt={}
-        if self.get_rendered_relations:
-            NTrelns=self.get_rendered_relations
-            for key,value in NTrelns.items():
-                if key=="rrelations":
-                    relrgt={}
-                    for rgtkey,rgtvalue in value.items():
-                        relnvalue={}
-                        if isinstance(rgtvalue,list):
-                            for items in rgtvalue:
-                                relnvalue[items.title]=items.get_absolute_url()
-                        else:
-                            relnvalue[rgtvalue]=rgtvalue.get_absolute_url()
-
-                        relrgt[rgtkey]=relnvalue
-
-                else:
-                    rellft={}
-                    relns['left']=rellft
-                    for lftkey,lftvalue in value.items():
-                        relnvalue={}
-                        if isinstance(lftvalue,list):
-                            for items in lftvalue:
-                                relnvalue[items.title]=items.get_absolute_url()
-                        else:
-                            relnvalue[lftvalue]=lftvalue.get_absolute_url()
-
-                        rellft[lftkey]=relnvalue
-
-        nbh['relations']=relrgt
-
-        nbh['relations'].update(rellft)
-        nbh['count_relations'] = len(nbh['relations'])
-        #get Attributes
-        attributes =self.get_attributes
-        nbh['attributes']=attributes
-        nbh['count_attributes'] = len(nbh['attributes'])
-        #get ATs
-        attributetypes={}
-        for each in self.subjecttype_of.all():
-            attributetypes[each.title]=each.get_absolute_url()
-        nbh['ats']=attributetypes
-        #get RTs as leftroles and rightroles
-        leftroles = {}
-        for each in self.left_subjecttype_of.all():
-            leftroles[each.title]=each.get_absolute_url()
-        nbh['leftroles']=leftroles
-        nbh['count_leftroles'] = len(nbh['leftroles'])
-        rightroles = {}
-        for each in self.right_subjecttype_of.all():
-            rightroles[each.title]=each.get_absolute_url()
-        nbh['rightroles']=rightroles
-        nbh['count_rightroles'] = len(nbh['rightroles'])
-        nbh['history']=history
-        return nbh
-
     def get_Version_graph_json(self,ssid):
 
 
@@ -1582,7 +1399,7 @@ class Objecttype(Nodetype):
         ver_dict=self.version_info(ssid)
         ver_dict1=self.version_info(ssid)
         #ver_dict=str(ver['nbhood'])
-        ver_dict=ast.literal_eval(ver_dict['nbhood'])
+        ver_dict=load_nbhood(ver_dict['nbhood'])
         g_json = {}
         g_json["node_metadata"]= []
         g_json["relations"]=[]
@@ -1641,15 +1458,9 @@ class Objecttype(Nodetype):
     # @reversion.create_revision()
     def save(self,*args, **kwargs):
         self.nodemodel = self.__class__.__name__
-        super(Objecttype, self).save(*args, **kwargs) # Call the "real" save() method.
-        self.nbhood=self.get_rendered_nbh
-        if GSTUDIO_VERSIONING:
-            with reversion.create_revision():
-                self.nodemodel = self.__class__.__name__
-                if self.parent:
-                    ot=NID.objects.get(id=self.parent.id)
-                    ot.ref.save()
-                super(Objecttype, self).save(*args, **kwargs) # Call the "real" save() method.
+        previous = stored_values(Nodetype, self.pk, 'parent', 'title', 'slug')
+        self.save_with_nbhood(super(Objecttype, self).save, *args, **kwargs)
+        mark_nodetype_dirty(self, previous)
 
     def save_revert_or_merge(self,*args, **kwargs):
         if GSTUDIO_VERSIONING:
@@ -1689,140 +1500,6 @@ class Relationtype(Nodetype):
         displayname="RT: "+self.title
         return displayname
 
-    @property
-
-    def get_rendered_nbh(self):
-        """
-        Returns the neighbourhood of the Relationtype
-        """
-        history=[]
-        version_list=self.get_ssid
-        if version_list:
-            length=len(version_list)
-            history_ssid=version_list[length-1]
-            history_dict=self.version_info(history_ssid)
-            history_nbh_dict=ast.literal_eval(history_dict['nbhood'])
-            #ssid_current.append(history_ssid)
-            history=history_nbh_dict['history']
-            history.append(history_ssid)
-        else:
-            history.append(0)
-        nbh = {}
-        nbh['title'] = self.title
-        nbh['count_title'] = len(nbh['title'])
-        nbh['altnames'] = self.altnames
-        nbh['count_altnames'] = len(nbh['altnames'])
-        nbh['plural'] = self.plural
-#       nbh['count_plural'] = len(nbh['plural'])
-        #get all MTs
-        member_of_dict = {}
-        for each in self.metatypes.all():
-            member_of_dict[each.title]= each.get_absolute_url()
-        nbh['member_of_metatypes']=member_of_dict
-        nbh['count_member_of_metatypes'] = len(nbh['member_of_metatypes'])
-        typeof={}
-        parent=self.parent_id
-        if parent:
-            obj=NID.objects.get(id=parent)
-            typeof[parent] = obj.ref.get_absolute_url()
-        nbh['type_of']=typeof
-        nbh['count_type_of'] = len(nbh['type_of'])
-        #get all subtypes
-        subtypes={}
-        for each in Nodetype.objects.filter(parent=self.id):
-            subtypes[each.title] =each.get_absolute_url()
-        nbh['contains_subtypes']=subtypes
-        nbh['count_contains_subtypes'] = len(nbh['contains_subtypes'])
-        # get all the objects inheriting this OT
-        contains_members_dict = {}
-        for each in self.member_objects.all():
-            contains_members_dict[each.title]= each.get_absolute_url()
-        nbh['contains_members'] = contains_members_dict
-        nbh['count_contains_members'] = len(nbh['contains_members'])
-        #get prior nodes
-        priornodes_dict = {}
-        for each in self.prior_nodes.all():
-            priornodes_dict[each.title]= each.get_absolute_url()
-        nbh['priornodes'] = priornodes_dict
-        nbh['count_priornodes'] = len(nbh['priornodes'])
-        #get posterior nodes
-        posteriornodes_dict = {}
-        for each in self.posterior_nodes.all():
-            posteriornodes_dict[each.title]= each.get_absolute_url()
-        nbh['posteriornodes'] = posteriornodes_dict
-        nbh['count_posteriornodes'] = len(nbh['posteriornodes'])
-        #get authors
-        author_dict = {}
-        for each in self.authors.all():
-            author_dict['User'] = each.get_absolute_url()
-        nbh['authors'] = author_dict
-        #get siblings
-        siblings={}
-        for each in self.get_siblings():
-            siblings[each.title]=each.get_absolute_url()
-        nbh['siblings']=siblings
-        nbh['count_siblings'] = len(nbh['siblings'])
-        #get Relations
-        relns={}
-        rellft={}
-        relrgt={}
-        if self.get_rendered_relations:
-            NTrelns=self.get_rendered_relations
-            for key,value in NTrelns.items():
-                if key=="rrelations":
-                    relrgt={}
-                    for rgtkey,rgtvalue in value.items():
-                        relnvalue={}
-                        if isinstance(rgtvalue,list):
-                            for items in rgtvalue:
-                                relnvalue[items]=items.get_absolute_url()
-                        else:
-                            relnvalue[rgtvalue]=rgtvalue.get_absolute_url()
-
-                        relrgt[rgtkey]=relnvalue
-
-                else:
-                    rellft={}
-                    relns['left']=rellft
-                    for lftkey,lftvalue in value.items():
-                        relnvalue={}
-                        if isinstance(lftvalue,list):
-                            for items in lftvalue:
-                                relnvalue[items]=items.get_absolute_url()
-                        else:
-                            relnvalue[lftvalue]=lftvalue.get_absolute_url()
-
-                        rellft[lftkey]=relnvalue
-
-        nbh['relations']=relrgt
-
-        nbh['relations'].update(rellft)
-        nbh['count_relations'] = len(nbh['relations'])
-        #get Attributes
-        attributes =self.get_attributes
-        nbh['attributes']=attributes
-        nbh['count_attributes'] = len(nbh['attributes'])
-        #get ATs
-        attributetypes={}
-        for each in self.subjecttype_of.all():
-            attributetypes[each.title]=each.get_absolute_url()
-        nbh['ats']=attributetypes
-        #get RTs as leftroles and rightroles
-        leftroles = {}
-        for each in self.left_subjecttype_of.all():
-            leftroles[each.title]=each.get_absolute_url()
-        nbh['leftroles']=leftroles
-        nbh['count_leftroles'] = len(nbh['leftroles'])
-        rightroles = {}
-        for each in self.right_subjecttype_of.all():
-            rightroles[each.title]=each.get_absolute_url()
-        nbh['rightroles']=rightroles
-        nbh['count_rightroles'] = len(nbh['rightroles'])
-        nbh['history']=history
-        return nbh
-
-
-
     def get_nbh(self):
         """
         Returns the neighbourhood of the nodetype
@@ -1866,12 +1543,17 @@ class Relationtype(Nodetype):
     # @reversion.create_revision()
     def save(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
-        super(Relationtype, self).save(*args, **kwargs) # Call the "real" save() method.
-        self.nbhood=self.get_rendered_nbh
-        if GSTUDIO_VERSIONING:
-            with reversion.create_revision():
-                self.nodemodel = self.__class__.__name__
-                super(Relationtype, self).save(*args, **kwargs) # Call the "real" save() method.
+        previous = stored_values(Relationtype, self.pk, 'parent', 'title', 'slug',
+                                 'left_subjecttype', 'right_subjecttype',
+                                 'inverse')
+        self.save_with_nbhood(super(Relationtype, self).save, *args, **kwargs)
+        with nbhood_batch():
+            mark_nodetype_dirty(self, previous and previous[:3])
+            roles = previous and previous[3:5] or ()
+            for each in set(roles + (self.left_subjecttype_id, self.right_subjecttype_id)):
+                mark_dirty(each, 'roles')
+            if previous and (previous[1], previous[5]) != (self.title, self.inverse):
+                mark_relationtype_subjects_dirty(self)
 
 
 
@@ -1906,139 +1588,6 @@ class Attributetype(Nodetype):
 
 
 
-    @property
-    def get_rendered_nbh(self):
-        """
-        Returns the neighbourhood of the Attributetype
-        """
-        history=[]
-        version_list=self.get_ssid
-        if version_list:
-            length=len(version_list)
-            history_ssid=version_list[length-1]
-            history_dict=self.version_info(history_ssid)
-            history_nbh_dict=ast.literal_eval(history_dict['nbhood'])
-            #ssid_current.append(history_ssid)
-            history=history_nbh_dict['history']
-            history.append(history_ssid)
-        else:
-            history.append(0)
-        nbh = {}
-        nbh['title'] = self.title
-        nbh['count_title'] = len(nbh['title'])
-        nbh['altnames'] = self.altnames
-        nbh['count_altnames'] = len(nbh['altnames'])
-       # nbh['plural'] = self.plural
-       # nbh['count_plural'] = len(nbh['plural'])
-        #get all MTs
-        member_of_dict = {}
-        for each in self.metatypes.all():
-            member_of_dict[each.title]= each.get_absolute_url()
-        nbh['member_of_metatypes']=member_of_dict
-        nbh['count_member_of_metatypes'] = len(nbh['member_of_metatypes'])
-        typeof={}
-        parent=self.parent_id
-        if parent:
-            obj=NID.objects.get(id=parent)
-            typeof[parent] = obj.ref.get_absolute_url()
-        nbh['type_of']=typeof
-        nbh['count_type_of'] = len(nbh['type_of'])
-        #get all subtypes
-        subtypes={}
-        for each in Nodetype.objects.filter(parent=self.id):
-            subtypes[each.title] =each.get_absolute_url()
-        nbh['contains_subtypes']=subtypes
-        nbh['count_contains_subtypes'] = len(nbh['contains_subtypes'])
-        # get all the objects inheriting this OT
-        contains_members_dict = {}
-        for each in self.member_objects.all():
-            contains_members_dict[each.title]= each.get_absolute_url()
-        nbh['contains_members'] = contains_members_dict
-        nbh['count_contains_members'] = len(nbh['contains_members'])
-        #get prior nodes
-        priornodes_dict = {}
-        for each in self.prior_nodes.all():
-            priornodes_dict[each.title]= each.get_absolute_url()
-        nbh['priornodes'] = priornodes_dict
-        nbh['count_priornodes'] = len(nbh['priornodes'])
-        #get posterior nodes
-        posteriornodes_dict = {}
-        for each in self.posterior_nodes.all():
-            posteriornodes_dict[each.title]= each.get_absolute_url()
-        nbh['posteriornodes'] = posteriornodes_dict
-        nbh['count_posteriornodes'] = len(nbh['posteriornodes'])
-        #get authors
-        author_dict = {}
-        for each in self.authors.all():
-            author_dict['User'] = each.get_absolute_url()
-        nbh['authors'] = author_dict
-        #get siblings
-        siblings={}
-        for each in self.get_siblings():
-            siblings[each.title]=each.get_absolute_url()
-        nbh['siblings']=siblings
-        nbh['count_siblings'] = len(nbh['siblings'])
-        #get Relations
-        relns={}
-        rellft={}
-        relrgt={}
-        if self.get_rendered_relations:
-            NTrelns=self.get_rendered_relations
-            for key,value in NTrelns.items():
-                if key=="rrelations":
-                    relrgt={}
-                    for rgtkey,rgtvalue in value.items():
-                        relnvalue={}
-                        if isinstance(rgtvalue,list):
-                            for items in rgtvalue:
-                                relnvalue[items]=items.get_absolute_url()
-                        else:
-                            relnvalue[rgtvalue]=rgtvalue.get_absolute_url()
-
-                        relrgt[rgtkey]=relnvalue
-
-                else:
-                    rellft={}
-                    relns['left']=rellft
-                    for lftkey,lftvalue in value.items():
-                        relnvalue={}
-                        if isinstance(lftvalue,list):
-                            for items in lftvalue:
-                                relnvalue[items]=items.get_absolute_url()
-                        else:
-                            relnvalue[lftvalue]=lftvalue.get_absolute_url()
-
-                        rellft[lftkey]=relnvalue
-
-        nbh['relations']=relrgt
-
-        nbh['relations'].update(rellft)
-        nbh['count_relations'] = len(nbh['relations'])
-        #get Attributes
-        attributes =self.get_attributes
-        nbh['attributes']=attributes
-        nbh['count_attributes'] = len(nbh['attributes'])
-        #get ATs
-        attributetypes={}
-        for each in self.subjecttype_of.all():
-            attributetypes[each.title]=each.get_absolute_url()
-        nbh['ats']=attributetypes
-        #get RTs as leftroles and rightroles
-        leftroles = {}
-        for each in self.left_subjecttype_of.all():
-            leftroles[each.title]=each.get_absolute_url()
-        nbh['leftroles']=leftroles
-        nbh['count_leftroles'] = len(nbh['leftroles'])
-        rightroles = {}
-        for each in self.right_subjecttype_of.all():
-            rightroles[each.title]=each.get_absolute_url()
-        nbh['rightroles']=rightroles
-        nbh['count_rightroles'] = len(nbh['rightroles'])
-        nbh['history']=history
-
-        return nbh
-
-
     def __unicode__(self):
         displayname="AT: "+self.title
         return displayname
@@ -2063,11 +1612,16 @@ class Attributetype(Nodetype):
 
     def save(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
-        super(Attributetype, self).save(*args, **kwargs) # Call the "real" save() method.
-        self.nbhood=self.get_rendered_nbh
-        if GSTUDIO_VERSIONING:
-            with reversion.create_revision():
-                super(Attributetype, self).save(*args, **kwargs) # Call the "real" save() method.
+        previous = stored_values(Attributetype, self.pk, 'parent', 'title', 'slug',
+                                 'subjecttype')
+        self.save_with_nbhood(super(Attributetype, self).save, *args, **kwargs)
+        with nbhood_batch():
+            mark_nodetype_dirty(self, previous and previous[:3])
+            subjecttypes = previous and previous[3:] or ()
+            for each in set(subjecttypes + (self.subjecttype_id,)):
+                mark_dirty(each, 'ats')
+            if previous and previous[1] != self.title:
+                mark_attributetype_subjects_dirty(self)
     def save_revert_or_merge(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
         if GSTUDIO_VERSIONING:
@@ -2178,11 +1732,9 @@ class Relation(Edge):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Relation, self).save(*args, **kwargs) # Call the "real" save() method.
-                left_subject = self.left_subject
-                right_subject = self.right_subject
-                left_subject.ref.save()
-                right_subject.ref.save()
-        super(Relation, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.left_subject_id, self.right_subject_id)
+        else:
+            super(Relation, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class Attribute(Edge):
@@ -2269,9 +1821,9 @@ class Attribute(Edge):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Attribute, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(Attribute, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(Attribute, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -2292,9 +1844,9 @@ class AttributeCharField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeCharField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeCharField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeCharField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -2313,9 +1865,9 @@ class AttributeTextField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeTextField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeTextField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeTextField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeIntegerField(Attribute):
@@ -2332,9 +1884,9 @@ class AttributeIntegerField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -2354,9 +1906,9 @@ class AttributeCommaSeparatedIntegerField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeCommaSeparatedIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeCommaSeparatedIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeCommaSeparatedIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 class AttributeBigIntegerField(Attribute):
 
@@ -2374,9 +1926,9 @@ class AttributeBigIntegerField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeBigIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeBigIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeBigIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributePositiveIntegerField(Attribute):
@@ -2395,9 +1947,9 @@ class AttributePositiveIntegerField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributePositiveIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributePositiveIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributePositiveIntegerField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeDecimalField(Attribute):
@@ -2414,9 +1966,9 @@ class AttributeDecimalField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeDecimalField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeDecimalField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeDecimalField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 class AttributeFloatField(Attribute):
 
@@ -2434,9 +1986,9 @@ class AttributeFloatField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeFloatField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeFloatField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeFloatField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeBooleanField(Attribute):
@@ -2453,9 +2005,9 @@ class AttributeBooleanField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeBooleanField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeBooleanField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeBooleanField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeNullBooleanField(Attribute):
@@ -2474,9 +2026,9 @@ class AttributeNullBooleanField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeNullBooleanField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeNullBooleanField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeNullBooleanField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeDateField(Attribute):
@@ -2495,9 +2047,9 @@ class AttributeDateField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeDateField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeDateField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeDateField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeDateTimeField(Attribute):
@@ -2516,9 +2068,9 @@ class AttributeDateTimeField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeDateTimeField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeDateTimeField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeDateTimeField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeTimeField(Attribute):
@@ -2537,9 +2089,9 @@ class AttributeTimeField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeTimeField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeTimeField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeTimeField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeEmailField(Attribute):
@@ -2558,9 +2110,9 @@ class AttributeEmailField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeEmailField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeEmailField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeEmailField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeFileField(Attribute):
@@ -2579,9 +2131,9 @@ class AttributeFileField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeFileField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeFileField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeFileField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeFilePathField(Attribute):
@@ -2600,9 +2152,9 @@ class AttributeFilePathField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeFilePathField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeFilePathField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeFilePathField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeImageField(Attribute):
@@ -2621,9 +2173,9 @@ class AttributeImageField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeImageField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeImageField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeImageField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeURLField(Attribute):
@@ -2642,9 +2194,9 @@ class AttributeURLField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeURLField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeURLField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeURLField, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeIPAddressField(Attribute):
@@ -2663,11 +2215,87 @@ class AttributeIPAddressField(Attribute):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeIPAddressField, self).save(*args, **kwargs) # Call the "real" save() method.
-                subject=self.subject
-                subject.ref.save()
-        super(AttributeIPAddressField, self).save(*args, **kwargs) # Call the "real" save() method.
+                add_subjects_to_revision(self.subject_id)
+        else:
+            super(AttributeIPAddressField, self).save(*args, **kwargs) # Call the "real" save() method.
+
+
+
+class MediaChecksum(models.Model):
+    """
+    Index of the content checksums of the uploaded media, kept in sync
+    with their checksum attributes.
+    """
+    checksum = models.CharField(_('checksum'), max_length=100, db_index=True)
+    attributetype = models.ForeignKey(Attributetype, verbose_name=_('checksum type'))
+    subject = models.ForeignKey(NID, related_name='media_checksums', verbose_name=_('subject'))
+
+    def __unicode__(self):
+        return self.checksum
+
+    class Meta:
+        unique_together = (('attributetype', 'checksum', 'subject'),)
+        verbose_name = _('media checksum')
+        verbose_name_plural = _('media checksums')
+
+
+class SearchTerm(models.Model):
+    """
+    Inverted index of the words of the nodes, weighted by the field
+    holding them, for the inverted search backend.
+    """
+    term = models.CharField(_('term'), max_length=100, db_index=True)
+    field = models.CharField(_('field'), max_length=20)
+    weight = models.PositiveIntegerField(_('weight'), default=1)
+    node = models.ForeignKey(NID, related_name='search_terms', verbose_name=_('node'))
+
+    def __unicode__(self):
+        return self.term
+
+    class Meta:
+        verbose_name = _('search term')
+        verbose_name_plural = _('search terms')
 
 
+class DerivativeJob(models.Model):
+    """
+    Queued rendering of the derivatives of an uploaded image.
+    """
+    source = models.CharField(_('source'), max_length=500)
+    checksum = models.CharField(_('checksum'), max_length=100, db_index=True)
+    status = models.IntegerField(_('status'), choices=JOB_STATUS_CHOICES,
+                                 default=JOB_PENDING, db_index=True)
+    error = models.TextField(_('error'), blank=True)
+    leased_until = models.DateTimeField(_('leased until'), null=True, blank=True,
+                                        db_index=True)
+    creation_date = models.DateTimeField(_('creation date'), default=datetime.now)
+
+    def __unicode__(self):
+        return self.source
+
+    class Meta:
+        ordering = ['creation_date']
+        verbose_name = _('derivative job')
+        verbose_name_plural = _('derivative jobs')
+
+
+class Presence(models.Model):
+    """
+    Last time a user was seen through one of their sessions,
+    recorded by the presence middleware.
+    """
+    session_key = models.CharField(_('session key'), max_length=40, unique=True)
+    user = models.ForeignKey(User, related_name='presences', verbose_name=_('user'))
+    last_seen = models.DateTimeField(_('last seen'), default=datetime.now, db_index=True)
+    expire_date = models.DateTimeField(_('expire date'), db_index=True)
+
+    def __unicode__(self):
+        return self.session_key
+
+    class Meta:
+        verbose_name = _('presence')
+        verbose_name_plural = _('presences')
+
 
 class Processtype(Nodetype):
 
@@ -2696,11 +2324,9 @@ class Processtype(Nodetype):
     # @reversion.create_revision()
     def save(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
-        super(Processtype, self).save(*args, **kwargs) # Call the "real" save() method.
-        self.nbhood=self.get_rendered_nbh
-        if GSTUDIO_VERSIONING:
-            with reversion.create_revision():
-                super(Processtype, self).save(*args, **kwargs) # Call the "real" save() method.
+        previous = stored_values(Nodetype, self.pk, 'parent', 'title', 'slug')
+        self.save_with_nbhood(super(Processtype, self).save, *args, **kwargs)
+        mark_nodetype_dirty(self, previous)
 
 
 
@@ -2745,11 +2371,12 @@ class Systemtype(Nodetype):
     def save(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
         self.nbhood=[]
-        super(Systemtype, self).save(*args, **kwargs) # Call the "real" save() method.
 #        self.nbhood=self.get_rendered_nbh
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Systemtype, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(Systemtype, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class AttributeSpecification(Node):
@@ -2794,8 +2421,8 @@ class AttributeSpecification(Node):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(AttributeSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
-
-        super(AttributeSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(AttributeSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -2838,8 +2465,8 @@ class RelationSpecification(Node):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(RelationSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
-
-        super(RelationSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(RelationSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -2884,8 +2511,8 @@ class NodeSpecification(Node):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(NodeSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
-
-        super(NodeSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(NodeSpecification, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -2927,8 +2554,8 @@ class Expression(Node):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Expression, self).save(*args, **kwargs) # Call the "real" save() method.
-
-        super(Expression, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(Expression, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -2959,8 +2586,8 @@ class Union(Node):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Union, self).save(*args, **kwargs) # Call the "real" save() method.
-
-        super(Union, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(Union, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 
@@ -2993,8 +2620,8 @@ class Complement(Node):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Complement, self).save(*args, **kwargs) # Call the "real" save() method.
-
-        super(Complement, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(Complement, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 class Intersection(Node):
@@ -3022,8 +2649,8 @@ class Intersection(Node):
         if GSTUDIO_VERSIONING:
             with reversion.create_revision():
                 super(Intersection, self).save(*args, **kwargs) # Call the "real" save() method.
-
-        super(Intersection, self).save(*args, **kwargs) # Call the "real" save() method.
+        else:
+            super(Intersection, self).save(*args, **kwargs) # Call the "real" save() method.
 
 
 if GSTUDIO_VERSIONING == True:
@@ -3076,6 +2703,61 @@ post_save.connect(ping_directories_handler, sender=Nodetype,
                   dispatch_uid='gstudio.nodetype.post_save.ping_directories')
 post_save.connect(ping_external_urls_handler, sender=Nodetype,
                   dispatch_uid='gstudio.nodetype.post_save.ping_external_urls')
+request_started.connect(open_resolver_scope,
+                        dispatch_uid='gstudio.resolver.request_started')
+request_finished.connect(close_resolver_scope,
+                         dispatch_uid='gstudio.resolver.request_finished')
+got_request_exception.connect(clear_resolver_cache,
+                              dispatch_uid='gstudio.resolver.got_request_exception')
+post_save.connect(invalidate_resolved_node,
+                  dispatch_uid='gstudio.resolver.post_save')
+post_delete.connect(invalidate_resolved_node,
+                    dispatch_uid='gstudio.resolver.post_delete')
+request_finished.connect(reset_batch,
+                         dispatch_uid='gstudio.nbhood.request_finished')
+for field_name in M2M_NBHOOD_GROUPS:
+    m2m_changed.connect(m2m_nbhood_receiver(field_name), weak=False,
+                        sender=getattr(Nodetype, field_name).through,
+                        dispatch_uid='gstudio.nodetype.%s.m2m_changed.nbhood' % field_name)
+post_save.connect(mark_relation_dirty, sender=Relation,
+                  dispatch_uid='gstudio.relation.post_save.nbhood')
+post_delete.connect(mark_relation_dirty, sender=Relation,
+                    dispatch_uid='gstudio.relation.post_delete.nbhood')
+for attribute_model in [Attribute] + Attribute.__subclasses__():
+    post_save.connect(mark_attribute_dirty, sender=attribute_model,
+                      dispatch_uid='gstudio.%s.post_save.nbhood' % attribute_model.__name__.lower())
+    post_delete.connect(mark_attribute_dirty, sender=attribute_model,
+                        dispatch_uid='gstudio.%s.post_delete.nbhood' % attribute_model.__name__.lower())
+pre_save.connect(stash_checksum, sender=Attribute,
+                 dispatch_uid='gstudio.attribute.pre_save.checksum')
+post_save.connect(index_checksum, sender=Attribute,
+                  dispatch_uid='gstudio.attribute.post_save.checksum')
+post_delete.connect(unindex_checksum, sender=Attribute,
+                    dispatch_uid='gstudio.attribute.post_delete.checksum')
+post_save.connect(invalidate_checksum_attributetypes, sender=Attributetype,
+                  dispatch_uid='gstudio.attributetype.post_save.checksum')
+post_delete.connect(invalidate_checksum_attributetypes, sender=Attributetype,
+                    dispatch_uid='gstudio.attributetype.post_delete.checksum')
+post_save.connect(index_search_node,
+                  dispatch_uid='gstudio.search.post_save')
+post_save.connect(update_similarity_engine,
+                  dispatch_uid='gstudio.comparison.post_save')
+post_delete.connect(remove_from_similarity_engine,
+                    dispatch_uid='gstudio.comparison.post_delete')
+m2m_changed.connect(update_similarity_engine_sites, sender=Node.sites.through,
+                    dispatch_uid='gstudio.node.m2m_changed.comparison')
+post_save.connect(invalidate_preference_attribute, sender=Attribute,
+                  dispatch_uid='gstudio.attribute.post_save.preferences')
+post_delete.connect(invalidate_preference_attribute, sender=Attribute,
+                    dispatch_uid='gstudio.attribute.post_delete.preferences')
+pre_save.connect(stash_typeahead_parent,
+                 dispatch_uid='gstudio.typeahead.pre_save')
+post_save.connect(invalidate_typeahead,
+                  dispatch_uid='gstudio.typeahead.post_save')
+post_delete.connect(invalidate_typeahead,
+                    dispatch_uid='gstudio.typeahead.post_delete')
+m2m_changed.connect(invalidate_typeahead, sender=Nodetype.metatypes.through,
+                    dispatch_uid='gstudio.nodetype.m2m_changed.typeahead')
 
 class Peer(User):
     """Subclass for non-human users"""
@@ -0,0 +1,468 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Incremental neighbourhood (nbhood) engine of Gstudio.
+
+The rendered neighbourhood stored in ``Node.nbhood`` is split into
+groups of keys, each one computed by its own renderer.  Writes mark the
+groups they affect as dirty on the nodes they touch, and the dirty
+groups are re-rendered and stored in one pass when the pending batch is
+flushed, without re-saving the nodes.
+
+Outside of a batch the updates are flushed immediately.  Inside a
+``nbhood_batch`` block, or a request handled by
+``gstudio.middleware.NbhoodMiddleware``, the updates are coalesced per
+node and flushed at the end of the block."""
+from threading import local
+
+from django.db.models import Q
+
+from gstudio.nbhood_codec import decode
+from gstudio.nbhood_codec import encode
+from gstudio.graphs import touch_graphs
+
+_state = local()
+
+
+def _titles_urls(nodes):
+    """Returns a dict of title: url of nodes"""
+    return dict([(each.title, each.get_absolute_url()) for each in nodes])
+
+
+def render_names(node):
+    """Renders the names of the node"""
+    return {'title': node.title,
+            'count_title': len(node.title or ''),
+            'altnames': node.altnames,
+            'count_altnames': len(node.altnames or ''),
+            'plural': node.plural}
+
+
+def render_member_of_metatypes(node):
+    """Renders the metatypes of the node"""
+    member_of = _titles_urls(node.metatypes.all())
+    return {'member_of_metatypes': member_of,
+            'count_member_of_metatypes': len(member_of)}
+
+
+def render_type_of(node):
+    """Renders the parent of the node"""
+    typeof = {}
+    if node.parent_id:
+        typeof = _titles_urls([node.parent])
+    return {'type_of': typeof, 'count_type_of': len(typeof)}
+
+
+def render_contains_subtypes(node):
+    """Renders the subtypes of the node"""
+    from gstudio.models import Nodetype
+    subtypes = _titles_urls(Nodetype.objects.filter(parent=node.id))
+    return {'contains_subtypes': subtypes,
+            'count_contains_subtypes': len(subtypes)}
+
+
+def render_contains_members(node):
+    """Renders the objects inheriting the node"""
+    members = _titles_urls(node.member_objects.all())
+    return {'contains_members': members,
+            'count_contains_members': len(members)}
+
+
+def render_priornodes(node):
+    """Renders the prior nodes of the node"""
+    priornodes = _titles_urls(node.prior_nodes.all())
+    return {'priornodes': priornodes, 'count_priornodes': len(priornodes)}
+
+
+def render_posteriornodes(node):
+    """Renders the posterior nodes of the node"""
+    posteriornodes = _titles_urls(node.posterior_nodes.all())
+    return {'posteriornodes': posteriornodes,
+            'count_posteriornodes': len(posteriornodes)}
+
+
+def render_authors(node):
+    """Renders the authors of the node"""
+    authors = {}
+    for each in node.authors.all():
+        authors['User'] = each.get_absolute_url()
+    return {'authors': authors}
+
+
+def render_siblings(node):
+    """Renders the siblings of the node"""
+    siblings = _titles_urls(node.get_siblings())
+    return {'siblings': siblings, 'count_siblings': len(siblings)}
+
+
+def render_relations(node):
+    """Renders the relations of the node, indexed by relation type
+    title when it is the left subject and by inverse otherwise"""
+    from gstudio.models import NID
+    from gstudio.models import Relation
+
+    relations = list(Relation.objects.filter(
+        Q(left_subject=node.id) | Q(right_subject=node.id)).select_related(
+        'relationtype', 'left_subject', 'right_subject'))
+    subject_ids = [each.left_subject_id for each in relations] + \
+                  [each.right_subject_id for each in relations]
+    NID.objects.resolve_many(subject_ids)
+
+    left, right = {}, {}
+    for each in relations:
+        if each.left_subject_id == node.id:
+            left.setdefault(each.relationtype.title, {}).update(
+                _titles_urls([each.right_subject]))
+        if each.right_subject_id == node.id:
+            right.setdefault(each.relationtype.inverse, {}).update(
+                _titles_urls([each.left_subject]))
+    right.update(left)
+    return {'relations': right, 'count_relations': len(right)}
+
+
+def render_attributes(node):
+    """Renders the attributes of the node"""
+    attributes = node.get_attributes
+    return {'attributes': attributes, 'count_attributes': len(attributes)}
+
+
+def render_ats(node):
+    """Renders the attribute types of the node"""
+    return {'ats': _titles_urls(node.subjecttype_of.all())}
+
+
+def render_roles(node):
+    """Renders the relation types of the node as leftroles and rightroles"""
+    leftroles = _titles_urls(node.left_subjecttype_of.all())
+    rightroles = _titles_urls(node.right_subjecttype_of.all())
+    return {'leftroles': leftroles, 'count_leftroles': len(leftroles),
+            'rightroles': rightroles, 'count_rightroles': len(rightroles)}
+
+
+NBHOOD_RENDERERS = {
+    'names': render_names,
+    'member_of_metatypes': render_member_of_metatypes,
+    'type_of': render_type_of,
+    'contains_subtypes': render_contains_subtypes,
+    'contains_members': render_contains_members,
+    'priornodes': render_priornodes,
+    'posteriornodes': render_posteriornodes,
+    'authors': render_authors,
+    'siblings': render_siblings,
+    'relations': render_relations,
+    'attributes': render_attributes,
+    'ats': render_ats,
+    'roles': render_roles,
+    }
+
+
+def render_nbhood(node, groups=None):
+    """Renders the given groups of the neighbourhood of a nodetype,
+    all of them by default"""
+    nbh = {}
+    for group in groups or NBHOOD_RENDERERS.keys():
+        nbh.update(NBHOOD_RENDERERS[group](node))
+    return nbh
+
+
+def render_history(node):
+    """Renders the snapshot ids the neighbourhood went through"""
+    version_list = node.get_ssid
+    if not version_list:
+        return [0]
+    history_ssid = version_list[-1]
+    history = load_nbhood(node.version_info(history_ssid).get('nbhood'),
+                          ['history'])
+    return list(history.get('history', [])) + [history_ssid]
+
+
+def load_nbhood(text, keys=None):
+    """Returns the neighbourhood dict stored in a nbhood field,
+    restricted to the given keys, an empty dict if it can not be read"""
+    return decode(text, keys)
+
+
+def dump_nbhood(nbh):
+    """Returns the value stored in a nbhood field for a neighbourhood"""
+    return encode(nbh)
+
+
+def update_nbhood(node, groups):
+    """Returns the neighbourhood of a node with the given groups
+    re-rendered, the whole neighbourhood if it can not be updated"""
+    from gstudio.models import Nodetype
+
+    if not isinstance(node, Nodetype):
+        return node.get_rendered_nbh
+    nbh = load_nbhood(node.nbhood)
+    if not nbh:
+        return node.get_rendered_nbh
+    nbh.update(render_nbhood(node, groups))
+    return nbh
+
+
+def _pending():
+    """Returns the dirty groups of the current thread indexed by node id"""
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        pending = _state.pending = {}
+    return pending
+
+
+def mark_dirty(nid, *groups):
+    """Marks groups of the neighbourhood of a node as dirty,
+    all of them when no group is given"""
+    if not nid:
+        return
+    dirty = _pending().setdefault(nid, set())
+    dirty.update(groups or NBHOOD_RENDERERS.keys())
+    if not getattr(_state, 'depth', 0):
+        flush_nbhood()
+
+
+def flush_nbhood(nids=None):
+    """Re-renders and stores the dirty groups of the pending nodes,
+    only of the given node ids when nids is given"""
+    from gstudio.models import NID
+    from gstudio.models import Node
+
+    pending = _pending()
+    if nids is not None:
+        pending = dict([(nid, pending.pop(nid)) for nid in nids
+                        if nid in pending])
+    else:
+        _state.pending = {}
+    if not pending:
+        return
+    nodes = NID.objects.resolve_many(pending.keys())
+    for nid, groups in pending.items():
+        node = nodes.get(nid)
+        if node is None:
+            continue
+        node.nbhood = dump_nbhood(update_nbhood(node, groups))
+        Node._base_manager.filter(pk=nid).update(nbhood=node.nbhood)
+    touch_graphs(pending.keys())
+
+
+def begin_batch():
+    """Starts coalescing the neighbourhood updates"""
+    _state.depth = getattr(_state, 'depth', 0) + 1
+
+
+def end_batch(flush=True):
+    """Stops coalescing the neighbourhood updates, flushing them
+    when leaving the outermost batch"""
+    _state.depth = max(getattr(_state, 'depth', 0) - 1, 0)
+    if _state.depth:
+        return
+    if flush:
+        flush_nbhood()
+    else:
+        _state.pending = {}
+
+
+def reset_batch(*args, **kwargs):
+    """Flushes the pending updates and leaves all the batches,
+    so that a batch left open by an interrupted request does not
+    leak into the next one handled by the thread"""
+    _state.depth = 0
+    flush_nbhood()
+
+
+class nbhood_batch(object):
+    """Context manager coalescing the neighbourhood updates
+    of a block of writes and flushing them at its end"""
+
+    def __enter__(self):
+        begin_batch()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end_batch(flush=exc_type is None)
+
+
+def stored_values(model, pk, *fields):
+    """Returns the stored values of fields of an instance,
+    None when it is not saved yet"""
+    if pk is None:
+        return None
+    values = model._base_manager.filter(pk=pk).values_list(*fields)
+    return values and values[0] or None
+
+
+def mark_nodetype_dirty(nodetype, previous):
+    """Marks the neighbourhoods showing a saved nodetype as dirty,
+    previous being its stored (parent, title, slug) before saving"""
+    parent_id, title, slug = previous or (None, None, None)
+    moved = previous is None or parent_id != nodetype.parent_id
+    renamed = previous is not None and (title, slug) != \
+              (nodetype.title, nodetype.slug)
+    if not (moved or renamed):
+        return
+
+    with nbhood_batch():
+        _mark_nodetype_neighbours_dirty(nodetype, parent_id, renamed)
+
+
+def _mark_nodetype_neighbours_dirty(nodetype, parent_id, renamed):
+    """Marks the parents, siblings and, on renaming, the children,
+    members, relation partners and the nodes listing it as prior or
+    posterior node of a nodetype as dirty"""
+    from gstudio.models import Nodetype
+    from gstudio.models import Relation
+
+    parent_ids = set([parent_id, nodetype.parent_id])
+    for each in parent_ids:
+        mark_dirty(each, 'contains_subtypes')
+    siblings = Nodetype.objects.filter(parent__in=[each for each in parent_ids
+                                                   if each]).exclude(
+        pk=nodetype.pk).values_list('pk', flat=True)
+    for each in siblings:
+        mark_dirty(each, 'siblings')
+
+    if renamed:
+        for each in Nodetype.objects.filter(parent=nodetype.pk).values_list(
+            'pk', flat=True):
+            mark_dirty(each, 'type_of')
+        for each in nodetype.member_objects.values_list('pk', flat=True):
+            mark_dirty(each)
+        for left, right in Relation.objects.filter(
+            Q(left_subject=nodetype.pk) | Q(right_subject=nodetype.pk)
+            ).values_list('left_subject', 'right_subject'):
+            mark_dirty(left == nodetype.pk and right or left, 'relations')
+        for each in nodetype.nodetype_prior_nodes.values_list(
+            'pk', flat=True):
+            mark_dirty(each, 'priornodes')
+        for each in nodetype.nodetype_posterior_nodes.values_list(
+            'pk', flat=True):
+            mark_dirty(each, 'posteriornodes')
+
+
+def mark_relationtype_subjects_dirty(relationtype):
+    """Marks the relations of the subjects of the relations of a
+    relation type as dirty, on renaming its title or its inverse"""
+    from gstudio.models import Relation
+
+    with nbhood_batch():
+        for left, right in Relation.objects.filter(
+            relationtype=relationtype.pk).values_list(
+            'left_subject', 'right_subject'):
+            mark_dirty(left, 'relations')
+            mark_dirty(right, 'relations')
+
+
+def mark_attributetype_subjects_dirty(attributetype):
+    """Marks the attributes of the subjects of the attributes of an
+    attribute type as dirty, on renaming it"""
+    from gstudio.models import Attribute
+
+    with nbhood_batch():
+        for each in Attribute.objects.filter(
+            attributetype=attributetype.pk).values_list(
+            'subject', flat=True).distinct():
+            mark_dirty(each, 'attributes')
+
+
+def mark_relation_dirty(sender, instance, **kwargs):
+    """Marks the relations of the subjects of a relation as dirty"""
+    with nbhood_batch():
+        mark_dirty(instance.left_subject_id, 'relations')
+        mark_dirty(instance.right_subject_id, 'relations')
+
+
+def mark_attribute_dirty(sender, instance, **kwargs):
+    """Marks the attributes of the subject of an attribute as dirty"""
+    mark_dirty(instance.subject_id, 'attributes')
+
+
+def mark_members_dirty(sender, instance, action, reverse, pk_set, **kwargs):
+    """Marks the members of nodetypes as dirty when objects join or
+    leave them"""
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            mark_dirty(instance.pk, 'contains_members')
+        return
+    if action == 'pre_clear':
+        instance._cleared_objecttypes = list(
+            instance.objecttypes.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_objecttypes', [])
+    elif action not in ('post_add', 'post_remove'):
+        return
+    with nbhood_batch():
+        for each in pk_set or []:
+            mark_dirty(each, 'contains_members')
+
+
+def add_subjects_to_revision(*nids):
+    """Adds the nodes of the given ids, with their neighbourhoods
+    flushed, to the revision being created, so that the subjects of
+    an edge keep a snapshot of each change of their neighbourhood"""
+    import reversion
+    from reversion.models import VERSION_CHANGE
+    from gstudio.models import NID
+
+    nids = [nid for nid in nids if nid]
+    if not nids or not reversion.revision_context_manager.is_active():
+        return
+    flush_nbhood(nids)
+    for node in NID.objects.resolve_many(nids).values():
+        if not reversion.is_registered(node.__class__):
+            continue
+        adapter = reversion.get_adapter(node.__class__)
+        reversion.revision_context_manager.add_to_context(
+            reversion.revision, node,
+            adapter.get_version_data(node, VERSION_CHANGE))
+
+
+M2M_NBHOOD_GROUPS = {
+    'metatypes': 'member_of_metatypes',
+    'prior_nodes': 'priornodes',
+    'posterior_nodes': 'posteriornodes',
+    'authors': 'authors',
+    }
+
+
+def m2m_nbhood_receiver(field_name):
+    """Returns a m2m_changed receiver marking the group rendered from
+    a many to many field of Nodetype as dirty on the nodetypes whose
+    field changed"""
+    from gstudio.models import Nodetype
+
+    field = Nodetype._meta.get_field(field_name)
+    group = M2M_NBHOOD_GROUPS[field_name]
+
+    def mark_m2m_dirty(sender, instance, action, reverse, pk_set, **kwargs):
+        if not reverse:
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                mark_dirty(instance.pk, group)
+            return
+        if action == 'pre_clear':
+            instance._nbhood_cleared = list(sender.objects.filter(**{
+                field.m2m_reverse_field_name(): instance.pk}).values_list(
+                field.m2m_field_name(), flat=True))
+            return
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_nbhood_cleared', [])
+        elif action not in ('post_add', 'post_remove'):
+            return
+        with nbhood_batch():
+            for each in pk_set or []:
+                mark_dirty(each, group)
+
+    return mark_m2m_dirty
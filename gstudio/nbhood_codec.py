@@ -0,0 +1,91 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Codec of the neighbourhoods stored in Node.nbhood.
+
+Neighbourhoods are stored as compact JSON with sorted keys.  Model
+instances are reduced to their id and title, querysets to lists, and
+dict keys to strings, so that the stored value can be decoded without
+evaluating Python literals and indexed by the database.
+
+Neighbourhoods written by older versions as ``str()`` of a Python dict
+are still decoded, with ``ast.literal_eval``, until they are rewritten
+by the ``migrate_nbhood`` management command."""
+import ast
+import json
+from datetime import date
+
+from django.db.models import Model
+from django.db.models.query import QuerySet
+
+
+def simplify(value):
+    """Returns a JSON serializable copy of a neighbourhood value"""
+    if isinstance(value, Model):
+        return {'id': value.pk, 'title': unicode(getattr(value, 'title', value))}
+    if isinstance(value, dict):
+        return dict([(isinstance(key, Model) and unicode(key.title) or
+                      unicode(key), simplify(item))
+                     for key, item in value.items()])
+    if isinstance(value, (list, tuple, set, QuerySet)):
+        return [simplify(item) for item in value]
+    if isinstance(value, date):
+        return value.isoformat()
+    if value is None or isinstance(value, (basestring, bool, int, long, float)):
+        return value
+    return unicode(value)
+
+
+def encode(nbh):
+    """Encodes a neighbourhood dict to its stored form"""
+    return json.dumps(simplify(nbh), separators=(',', ':'), sort_keys=True)
+
+
+def is_legacy(text):
+    """Checks if a stored neighbourhood is in the Python literal format"""
+    if not text:
+        return False
+    try:
+        json.loads(text)
+    except ValueError:
+        return True
+    return False
+
+
+def decode(text, keys=None):
+    """Decodes a stored neighbourhood, restricted to the given keys.
+    Returns an empty dict if the value can not be decoded"""
+    if isinstance(text, dict):
+        nbh = text
+    else:
+        try:
+            nbh = json.loads(text or '{}')
+        except ValueError:
+            try:
+                nbh = ast.literal_eval(text)
+            except (ValueError, SyntaxError):
+                nbh = {}
+    if not isinstance(nbh, dict):
+        return {}
+    if keys is not None:
+        return dict([(key, nbh[key]) for key in keys if key in nbh])
+    return nbh
+
+
+def decode_key(text, key, default=None):
+    """Decodes a single key of a stored neighbourhood"""
+    return decode(text, [key]).get(key, default)
@@ -0,0 +1,253 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Org-mode to HTML rendering service of Gstudio.
+
+The org sources are exported by emacs.  Instead of spawning the export
+script for every save, the service keeps a pool of persistent emacs
+servers, writes each source once and caches the exported HTML under the
+content hash of the source, so that rendering the same content again
+costs a cache lookup.  ``render_org_many`` renders a batch of sources
+concurrently through the pool."""
+import os
+import re
+import atexit
+import tempfile
+import subprocess
+import threading
+from hashlib import md5
+from Queue import Queue
+from multiprocessing.pool import ThreadPool
+
+from django.core.cache import cache
+
+from gstudio.settings import ORG_EMACS
+from gstudio.settings import ORG_EMACSCLIENT
+from gstudio.settings import ORG_RENDER_DIR
+from gstudio.settings import ORG_RENDER_DAEMON
+from gstudio.settings import ORG_RENDER_WORKERS
+from gstudio.settings import ORG_RENDER_CACHE_TIMEOUT
+
+ORG_OPTIONS = '\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 ' \
+              'num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t' \
+              '\n#+TITLE: '
+ORG_HEADER_LINES = 107
+ORG_FOOTER_LINES = 6
+ORG_LEGACY_HEADER_LINES = 72
+ORG_LEGACY_FOOTER_LINES = 3
+CONTENT_DIV = '<div id="content">\n'
+# The lines are split and stripped as the views did on the bytes read
+# from the exported file
+LINE = re.compile(r'[^\n]*\n|[^\n]+$')
+WHITESPACE = ' \t\n\r\x0b\x0c'
+
+_lock = threading.Lock()
+_state = {}
+
+
+def call_quietly(args):
+    """Run a command, discarding its output, and return its status"""
+    devnull = open(os.devnull, 'w')
+    try:
+        return subprocess.call(args, stdout=devnull,
+                               stderr=subprocess.STDOUT)
+    finally:
+        devnull.close()
+
+
+class BatchConverter(object):
+    """Converter spawning emacs in batch mode for every export"""
+
+    def convert(self, path):
+        call_quietly([ORG_EMACS, '--batch', path,
+                      '--eval', '(org-export-as-html nil)'])
+
+
+class EmacsServerConverter(object):
+    """Converter exporting through a persistent emacs server"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def start(self):
+        # like --batch, skip the init file so that the exported HTML
+        # has the header and footer of the batch export
+        call_quietly([ORG_EMACS, '-q', '--daemon=%s' % self.name])
+
+    def evaluate(self, expression):
+        return call_quietly([ORG_EMACSCLIENT, '-s', self.name,
+                             '--eval', expression])
+
+    def stop(self):
+        self.evaluate('(kill-emacs)')
+
+    def convert(self, path):
+        expression = '(with-current-buffer (find-file-noselect "%s") ' \
+                     '(org-export-as-html nil) (kill-buffer))' % path
+        if self.evaluate(expression):
+            self.start()
+            self.evaluate(expression)
+
+
+def _converters():
+    """Return the queue of the idle converters, filling it on first use"""
+    converters = _state.get('converters')
+    if converters is None:
+        _lock.acquire()
+        try:
+            converters = _state.get('converters')
+            if converters is None:
+                converters = Queue()
+                for index in range(ORG_RENDER_WORKERS):
+                    if ORG_RENDER_DAEMON:
+                        converter = EmacsServerConverter(
+                            'gstudio-org-%s-%s' % (os.getpid(), index))
+                        atexit.register(converter.stop)
+                        converters.put(converter)
+                    else:
+                        converters.put(BatchConverter())
+                _state['converters'] = converters
+        finally:
+            _lock.release()
+    return converters
+
+
+def _pool():
+    """Return the thread pool rendering the batches"""
+    pool = _state.get('pool')
+    if pool is None:
+        _lock.acquire()
+        try:
+            pool = _state.get('pool')
+            if pool is None:
+                pool = _state['pool'] = ThreadPool(ORG_RENDER_WORKERS)
+        finally:
+            _lock.release()
+    return pool
+
+
+def org_source(content, footer=''):
+    """Return the org document exported for a content"""
+    if isinstance(content, unicode):
+        content = content.encode('utf-8')
+    if isinstance(footer, unicode):
+        footer = footer.encode('utf-8')
+    return content.replace('\r', '') + footer + ORG_OPTIONS
+
+
+def source_digest(source):
+    """Return the content hash of an org document"""
+    return md5(source).hexdigest()
+
+
+def render_key(digest):
+    """Return the cache key of the HTML of an org document"""
+    return 'gstudio.orgrender.%s' % digest
+
+
+def convert_file(path):
+    """Export an org file next to it with an idle converter"""
+    converters = _converters()
+    converter = converters.get()
+    try:
+        converter.convert(path)
+    finally:
+        converters.put(converter)
+
+
+def convert_source(source):
+    """Return the HTML exported from an org document, written once"""
+    descriptor, path = tempfile.mkstemp(
+        suffix='.org', prefix=source_digest(source), dir=ORG_RENDER_DIR)
+    base = path[:-len('.org')]
+    org = os.fdopen(descriptor, 'w')
+    try:
+        org.write(source)
+    finally:
+        org.close()
+    try:
+        convert_file(base + '.org')
+        exported = open(base + '.html')
+        try:
+            return exported.read().decode('utf-8')
+        finally:
+            exported.close()
+    finally:
+        for path in (base + '.org', base + '.html'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _export(source):
+    """Return the cached HTML of an org document, exporting it on miss"""
+    key = render_key(source_digest(source))
+    html = cache.get(key)
+    if html is None:
+        html = convert_source(source)
+        cache.set(key, html, ORG_RENDER_CACHE_TIMEOUT)
+    return html
+
+
+def export_org(content, footer=''):
+    """Return the whole HTML document exported from an org content"""
+    return _export(org_source(content, footer))
+
+
+def org_body(html):
+    """Return the body of an exported HTML document, as stored
+    in the content of the nodes"""
+    lines = LINE.findall(html)[ORG_HEADER_LINES:]
+    if CONTENT_DIV in lines:
+        lines[lines.index(CONTENT_DIV)] = '<div id=" "\n'
+    return ''.join([line.lstrip(WHITESPACE)
+                    for line in lines[:-ORG_FOOTER_LINES]])
+
+
+def org_legacy_body(html):
+    """Return the body of an exported HTML document as the document
+    views of docu1 sliced it, with fewer header and footer lines and
+    the content div kept"""
+    lines = LINE.findall(html)[ORG_LEGACY_HEADER_LINES:]
+    return ''.join([line.lstrip(WHITESPACE)
+                    for line in lines[:-ORG_LEGACY_FOOTER_LINES]])
+
+
+def render_org(content):
+    """Return the HTML body rendered from an org content"""
+    return org_body(export_org(content))
+
+
+def render_org_legacy(content):
+    """Return the HTML body rendered from an org content,
+    sliced as the document views of docu1 did"""
+    return org_legacy_body(export_org(content))
+
+
+def render_org_many(contents):
+    """Return the HTML bodies rendered from a list of org contents,
+    the uncached ones being exported concurrently"""
+    sources = [org_source(content) for content in contents]
+    keys = [render_key(source_digest(source)) for source in sources]
+    rendered = cache.get_many(keys)
+    missing = dict([(key, source) for key, source in zip(keys, sources)
+                    if key not in rendered])
+    if missing:
+        exported = _pool().map(convert_source, missing.values())
+        exported = dict(zip(missing.keys(), exported))
+        cache.set_many(exported, ORG_RENDER_CACHE_TIMEOUT)
+        rendered.update(exported)
+    return [org_body(rendered[key]) for key in keys]
@@ -0,0 +1,180 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""User preferences of Gstudio.
+
+The colours a user picks for the posts are attributes of an object
+titled after the username.  They are cached per user id in the shared
+cache and in a small process local LRU, so that rendering a thread
+resolves each author once.  Saving or deleting an attribute of a
+preference object drops the cached preferences of its user; other
+processes pick the change up when their local entry expires."""
+import time
+from threading import Lock
+
+from django.core.cache import cache
+from django.utils.datastructures import SortedDict
+
+from gstudio.settings import PREFERENCE_CACHE_SIZE
+from gstudio.settings import PREFERENCE_CACHE_TIMEOUT
+from gstudio.settings import PREFERENCE_LOCAL_TIMEOUT
+
+PREFERENCE_SUFFIX = '_preference'
+PREFERENCE_KEYS = ('bg_color', 'font_color')
+
+
+class PreferenceLRU(object):
+    """Process local LRU of the preferences, indexed by user id"""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.entries = SortedDict()
+        self.lock = Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.pop(user_id, None)
+            if entry is None or entry[0] < time.time():
+                return None
+            self.entries[user_id] = entry
+            return entry[1]
+
+    def set(self, user_id, preferences):
+        with self.lock:
+            self.entries.pop(user_id, None)
+            self.entries[user_id] = (time.time() + self.timeout, preferences)
+            while len(self.entries) > self.size:
+                del self.entries[self.entries.keyOrder[0]]
+
+    def delete(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = PreferenceLRU(PREFERENCE_CACHE_SIZE, PREFERENCE_LOCAL_TIMEOUT)
+
+
+def preference_key(user_id):
+    """Return the shared cache key of the preferences of a user"""
+    return 'gstudio.preferences.%s' % user_id
+
+
+def load_preferences(user_ids):
+    """Return the preferences of the users read from their preference
+    objects, the last value of each attribute winning"""
+    from django.contrib.auth.models import User
+    from gstudio.models import Attribute
+    from objectapp.models import Gbobject
+
+    usernames = dict(User.objects.filter(pk__in=user_ids).values_list(
+        'username', 'pk'))
+    owners = {}
+    for pk, title in Gbobject.objects.filter(title__in=[
+        username + PREFERENCE_SUFFIX for username in usernames]).values_list(
+        'pk', 'title'):
+        owners[pk] = usernames[title[:-len(PREFERENCE_SUFFIX)]]
+
+    preferences = dict([(user_id, {}) for user_id in user_ids])
+    for subject, key, value in Attribute.objects.filter(
+        subject__in=owners.keys(),
+        attributetype__title__in=PREFERENCE_KEYS).order_by('pk').values_list(
+        'subject', 'attributetype__title', 'svalue'):
+        preferences[owners[subject]][key] = str(value)
+    return preferences
+
+
+def user_preferences(user_ids):
+    """Return the preferences of the users indexed by user id"""
+    preferences = {}
+    missing = []
+    for user_id in set(user_ids):
+        cached = _local.get(user_id)
+        if cached is None:
+            missing.append(user_id)
+        else:
+            preferences[user_id] = cached
+    if not missing:
+        return preferences
+
+    shared = cache.get_many([preference_key(user_id) for user_id in missing])
+    loaded = [user_id for user_id in missing
+              if preference_key(user_id) not in shared]
+    fresh = loaded and load_preferences(loaded) or {}
+    cache.set_many(dict([(preference_key(user_id), value)
+                         for user_id, value in fresh.items()]),
+                   PREFERENCE_CACHE_TIMEOUT)
+    for user_id in missing:
+        value = fresh.get(user_id, shared.get(preference_key(user_id)))
+        _local.set(user_id, value)
+        preferences[user_id] = value
+    return preferences
+
+
+def user_preference(user_id, key):
+    """Return a preference of a user or an empty string"""
+    return user_preferences([user_id]).get(user_id, {}).get(key, '')
+
+
+def author_preferences(gbobjects):
+    """Return the preferences of the first author of each object,
+    indexed by object id"""
+    from gstudio.loom import first_authors
+
+    authors = first_authors([gbobject.id for gbobject in gbobjects])
+    preferences = user_preferences(authors.values())
+    return dict([(gbobject.id, preferences.get(authors.get(gbobject.id), {}))
+                 for gbobject in gbobjects])
+
+
+def prefetch_author_preferences(gbobjects):
+    """Resolve the preferences of the authors of a list of objects at
+    once and keep them on the objects"""
+    gbobjects = list(gbobjects)
+    preferences = author_preferences(gbobjects)
+    for gbobject in gbobjects:
+        gbobject._author_preferences = preferences[gbobject.id]
+    return gbobjects
+
+
+def invalidate_preferences(user_id):
+    """Drop the cached preferences of a user"""
+    _local.delete(user_id)
+    cache.delete(preference_key(user_id))
+
+
+def invalidate_preference_attribute(sender, instance, **kwargs):
+    """Drop the cached preferences of the owner of a preference object
+    when one of its attributes is saved or deleted"""
+    from django.contrib.auth.models import User
+    from gstudio.models import NID
+
+    titles = dict(NID.objects.filter(pk__in=[
+        instance.subject_id, instance.attributetype_id]).values_list(
+        'pk', 'title'))
+    title = titles.get(instance.subject_id) or ''
+    if titles.get(instance.attributetype_id) not in PREFERENCE_KEYS or \
+           not title.endswith(PREFERENCE_SUFFIX):
+        return
+    for user_id in User.objects.filter(
+        username=title[:-len(PREFERENCE_SUFFIX)]).values_list(
+        'pk', flat=True):
+        invalidate_preferences(user_id)
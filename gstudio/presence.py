@@ -0,0 +1,116 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Online presence of the users of Gstudio.
+
+The presence middleware records, for every session of an authenticated
+user, the last time it was seen.  The rows are indexed by session and
+by user, so finding who is online among a set of users or the sessions
+of a user never decodes the session table.  A session is written at
+most once per GSTUDIO_PRESENCE_UPDATE_INTERVAL, and a user is online
+when seen within GSTUDIO_PRESENCE_TIMEOUT."""
+from datetime import datetime
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.contrib.sessions.models import Session
+from django.contrib.auth.signals import user_logged_in
+from django.contrib.auth.signals import user_logged_out
+
+from gstudio.models import Presence
+from gstudio.settings import PRESENCE_TIMEOUT
+from gstudio.settings import PRESENCE_UPDATE_INTERVAL
+
+TOUCHED_KEY = 'gstudio.presence.%s'
+
+
+def touch(request, user=None, force=False):
+    """Record that the user of the request was seen, unless
+    the session was already recorded within the update interval"""
+    session_key = request.session.session_key
+    if not session_key:
+        return False
+    if not cache.add(TOUCHED_KEY % session_key, True,
+                     PRESENCE_UPDATE_INTERVAL) and not force:
+        return False
+    values = {'user': user or request.user, 'last_seen': datetime.now(),
+              'expire_date': request.session.get_expiry_date()}
+    if not Presence.objects.filter(session_key=session_key).update(**values):
+        presence, created = Presence.objects.get_or_create(
+            session_key=session_key, defaults=values)
+        if not created:
+            Presence.objects.filter(pk=presence.pk).update(**values)
+    return True
+
+
+def forget(session_key):
+    """Remove the presence of a session"""
+    cache.delete(TOUCHED_KEY % session_key)
+    Presence.objects.filter(session_key=session_key).delete()
+
+
+def online_presences(now=None):
+    """Return the presences seen within the timeout and not expired"""
+    now = now or datetime.now()
+    return Presence.objects.filter(
+        last_seen__gte=now - timedelta(seconds=PRESENCE_TIMEOUT),
+        expire_date__gte=now)
+
+
+def online_user_ids(user_ids=None):
+    """Return the ids of the users online, among the given ones"""
+    presences = online_presences()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        presences = presences.filter(user__in=user_ids)
+    return set(presences.values_list('user', flat=True))
+
+
+def user_sessions(user):
+    """Return the unexpired sessions of a user"""
+    now = datetime.now()
+    session_keys = Presence.objects.filter(
+        user=user, expire_date__gte=now).values_list('session_key', flat=True)
+    return Session.objects.filter(session_key__in=list(session_keys),
+                                  expire_date__gte=now)
+
+
+def clear_expired_presences():
+    """Delete the presences of the expired sessions"""
+    expired = Presence.objects.filter(expire_date__lt=datetime.now())
+    count = expired.count()
+    expired.delete()
+    return count
+
+
+def record_login(sender, request, user, **kwargs):
+    """Record the presence of the session opened by the login"""
+    touch(request, user, force=True)
+
+
+def record_logout(sender, request, user, **kwargs):
+    """Forget the presence of the session closed by the logout"""
+    if request.session.session_key:
+        forget(request.session.session_key)
+
+
+user_logged_in.connect(record_login,
+                       dispatch_uid='gstudio.presence.record_login')
+user_logged_out.connect(record_logout,
+                        dispatch_uid='gstudio.presence.record_logout')
@@ -14,58 +14,227 @@
 #     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+"""RDF export of the gnowledge base of Gstudio.
 
-import rdflib
-from rdflib.graph import ConjunctiveGraph as Graph
-from rdflib import plugin
-from rdflib.store import Store, NO_STORE, VALID_STORE
-from rdflib.namespace import Namespace
+The exporter walks the NIDs in chunks of primary keys, resolves each
+chunk with one query per nodemodel and hands the triples of the nodes,
+of the relations and of the attributes to a writer as it goes, so the
+graph of the whole base is never held in memory."""
+import os
+import codecs
+
+from rdflib.graph import Graph
 from rdflib.term import Literal
 from rdflib.term import URIRef
-from tempfile import mkdtemp
-from gstudio.models import *
 
-def rdf_description(name, notation='xml' ):
+from django.core.urlresolvers import NoReverseMatch
+
+from gstudio.models import NID
+from gstudio.models import Node
+from gstudio.models import Relation
+from gstudio.models import Attribute
+from gstudio.resolver import resolve_many
+from gstudio.resolver import clear_resolver_cache
+from gstudio.settings import RDF_NAMESPACE
+
+EXCLUDED_FIELDS = ('id', 'lft', 'rght', 'image')
+RDF_FORMATS = {'nt': 'nt', 'turtle': 'ttl'}
+
+
+def nt_term(term):
+    """Return the N-Triples form of an URIRef or of a Literal"""
+    if isinstance(term, URIRef):
+        return u'<%s>' % term
+    value = unicode(term)
+    for char, escape in (('\\', '\\\\'), ('"', '\\"'),
+                         ('\n', '\\n'), ('\r', '\\r')):
+        value = value.replace(char, escape)
+    return u'"%s"' % value
+
+
+class StreamWriter(object):
+    """Write the triples to a stream, in N-Triples or in Turtle
+    with the statements grouped by subject"""
+
+    def __init__(self, stream, notation='nt'):
+        if notation not in RDF_FORMATS:
+            raise ValueError('%s is not a supported RDF notation' % notation)
+        self.stream = codecs.getwriter('utf-8')(stream)
+        self.notation = notation
+        if notation == 'turtle':
+            self.stream.write(u'@prefix gstudio: <%s> .\n\n' % RDF_NAMESPACE)
+
+    def predicate(self, predicate):
+        if self.notation == 'turtle' and predicate.startswith(RDF_NAMESPACE):
+            return u'gstudio:%s' % predicate[len(RDF_NAMESPACE):]
+        return nt_term(predicate)
+
+    def write(self, subject, statements):
+        """Write the statements (predicate, object) of a subject"""
+        subject = nt_term(subject)
+        statements = [u'%s %s' % (self.predicate(predicate), nt_term(pobject))
+                      for predicate, pobject in statements]
+        if not statements:
+            return
+        if self.notation == 'nt':
+            for statement in statements:
+                self.stream.write(u'%s %s .\n' % (subject, statement))
+        else:
+            self.stream.write(u'%s %s .\n\n' % (
+                subject, u' ;\n    '.join(statements)))
+
+
+class GraphWriter(object):
+    """Add the triples to a rdflib graph"""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def write(self, subject, statements):
+        for predicate, pobject in statements:
+            self.graph.add((subject, predicate, pobject))
+
+
+class RDFExporter(object):
+    """Export the NIDs, chunk by chunk, to a writer"""
+
+    def __init__(self, writer, chunk_size=500):
+        self.writer = writer
+        self.chunk_size = chunk_size
+        self.fields = {}
+        self.predicates = {}
+
+    def uri(self, name):
+        return URIRef(u'%s%s' % (RDF_NAMESPACE, name))
+
+    def model_fields(self, model):
+        """Return the attnames of the fields of a model
+        exported as literals, without the parent links"""
+        if model not in self.fields:
+            self.fields[model] = [
+                field.attname for field in model._meta.fields
+                if field.attname not in EXCLUDED_FIELDS and
+                not (field.rel and getattr(field.rel, 'parent_link', False))]
+        return self.fields[model]
+
+    def site_domains(self, nodes):
+        """Return the domain of the first site of the nodes, by id"""
+        ids = [node.pk for node in nodes if isinstance(node, Node)]
+        domains = {}
+        if ids:
+            for node_id, domain in Node.sites.through.objects.filter(
+                node__in=ids).order_by('site').values_list(
+                'node', 'site__domain'):
+                domains.setdefault(node_id, domain)
+        return domains
+
+    def load_predicates(self, nodes):
+        """Fetch the slugs of the relationtypes and of the
+        attributetypes of the edges not seen yet"""
+        ids = set()
+        for node in nodes:
+            if isinstance(node, Relation):
+                ids.add(node.relationtype_id)
+            elif isinstance(node, Attribute):
+                ids.add(node.attributetype_id)
+        ids.difference_update(self.predicates)
+        if ids:
+            for nid, slug in NID.objects.filter(pk__in=ids).values_list(
+                'pk', 'slug'):
+                self.predicates[nid] = self.uri(slug or nid)
+
+    def statements(self, node, domains):
+        """Return the statements of the fields of a node"""
+        statements = []
+        for attname in self.model_fields(node.__class__):
+            value = getattr(node, attname)
+            if value is not None and value != '':
+                statements.append((self.uri(attname), Literal(value)))
+        if node.pk in domains:
+            try:
+                statements.append((self.uri('url'), URIRef(
+                    'http://%s%s' % (domains[node.pk],
+                                     node.get_absolute_url()))))
+            except NoReverseMatch:
+                pass
+        return statements
+
+    def export_nodes(self, nodes):
+        """Write the triples of some typed nodes"""
+        domains = self.site_domains(nodes)
+        self.load_predicates(nodes)
+        for node in nodes:
+            self.writer.write(self.uri(node.pk),
+                              self.statements(node, domains))
+            if isinstance(node, Relation):
+                self.writer.write(self.uri(node.left_subject_id), [(
+                    self.predicates[node.relationtype_id],
+                    self.uri(node.right_subject_id))])
+            elif isinstance(node, Attribute):
+                self.writer.write(self.uri(node.subject_id), [(
+                    self.predicates[node.attributetype_id],
+                    Literal(node.svalue))])
+        return len(nodes)
+
+    def chunks(self, nodemodels=None, since=None, after=0):
+        """Yield the last id and the typed nodes of the chunks of
+        the NIDs of some nodemodels, or all of them, updated since
+        a date if given, and following the id after"""
+        nids = NID.objects.order_by('pk')
+        if nodemodels:
+            nids = nids.filter(nodemodel__in=nodemodels)
+        if since:
+            nids = nids.filter(last_update__gte=since)
+        nids = nids.values_list('pk', 'nodemodel')
+
+        last_pk = after
+        while True:
+            chunk = list(nids.filter(pk__gt=last_pk)[:self.chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            nodes = resolve_many(chunk)
+            yield last_pk, [nodes[nid] for nid, nodemodel in chunk
+                            if nid in nodes]
+            clear_resolver_cache()
+
+    def export(self, nodemodels=None, since=None):
+        """Export the NIDs of some nodemodels, or all of them,
+        updated since a date if given, and return their number"""
+        exported = 0
+        for last_pk, nodes in self.chunks(nodemodels, since):
+            exported += self.export_nodes(nodes)
+        return exported
+
+
+def export_rdf(stream, notation='nt', nodemodels=None, since=None,
+               chunk_size=500):
+    """Stream the triples of the gnowledge base to a stream"""
+    exporter = RDFExporter(StreamWriter(stream, notation), chunk_size)
+    return exporter.export(nodemodels, since)
+
+
+def export_nodemodel_rdf(arguments):
+    """Export a nodemodel into its own file of a directory,
+    used by the workers of the export"""
+    nodemodel, directory, notation, since, chunk_size = arguments
+    path = os.path.join(directory, '%s.%s' % (nodemodel,
+                                              RDF_FORMATS[notation]))
+    stream = open(path, 'w')
+    try:
+        return export_rdf(stream, notation, [nodemodel], since, chunk_size)
+    finally:
+        stream.close()
+
+
+def rdf_description(name, notation='xml'):
     """
     Funtion takes  title of node, and rdf notation.
     """
-    valid_formats = ["xml", "n3", "ntriples", "trix"]
-    default_graph_uri = "http://gstudio.gnowledge.org/rdfstore"
-    configString = "/var/tmp/rdfstore"
-
-    # Get the Sleepycat plugin.
-    store = plugin.get('Sleepycat', Store)('rdfstore')
-
-    # Open previously created store, or create it if it doesn't exist yet
-    graph = Graph(store="Sleepycat",
-               identifier = URIRef(default_graph_uri))
-    path = mkdtemp()
-    rt = graph.open(path, create=False)
-    if rt == NO_STORE:
-    #There is no underlying Sleepycat infrastructure, create it
-        graph.open(path, create=True)
-    else:
-        assert rt == VALID_STORE, "The underlying store is corrupt"
-
-
-    # Now we'll add some triples to the graph & commit the changes
-    rdflib = Namespace('http://sbox.gnowledge.org/gstudio/')
-    graph.bind("gstudio", "http://gnowledge.org/")
-    exclusion_fields = ["id", "rght", "node_ptr_id", "image", "lft", "_state", "_altnames_cache", "_tags_cache", "nid_ptr_id", "_mptt_cached_fields"]
-    node=Objecttype.objects.get(title=name)
-    node_dict=node.__dict__
-
-    subject=str(node_dict['id'])
-    for key in node_dict:
-        if key not in exclusion_fields:
-            predicate=str(key)
-            pobject=str(node_dict[predicate])
-            graph.add((rdflib[subject], rdflib[predicate], Literal(pobject)))
-     
-     
-    graph.commit()
+    graph = Graph()
+    graph.bind('gstudio', RDF_NAMESPACE)
+    node = NID.objects.get(title=name)
+    RDFExporter(GraphWriter(graph)).export_nodes(
+        resolve_many([(node.pk, node.nodemodel)]).values())
 
     print graph.serialize(format=notation)
-
-    graph.close()
-
@@ -0,0 +1,145 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Typed node resolver of Gstudio.
+
+NID rows only know the name of their concrete model in ``nodemodel``.
+The resolver groups ids by that name, fetches each concrete model with
+a single ``in_bulk`` query and memoizes the instances, so that
+``NID.ref`` and ``NID.reftype`` are dictionary lookups after the first
+hit.
+
+The instances are only memoized inside a resolver scope: a request,
+opened on ``request_started`` and closed on ``request_finished``, or an
+explicit ``with resolver_scope():`` block in commands and workers.
+Outside of a scope every lookup hits the database, so long running
+processes never read stale nodes."""
+from threading import local
+
+from django.db.models import get_model
+
+from gstudio.settings import RESOLVER_CACHE_SIZE
+
+NODEMODEL_APPS = ('gstudio', 'objectapp')
+
+_state = local()
+
+
+def _get_cache():
+    """Return the resolved nodes of the current scope, or None
+    outside of a scope"""
+    return getattr(_state, 'nodes', None)
+
+
+def open_resolver_scope(*args, **kwargs):
+    """Start memoizing the resolved nodes from scratch,
+    used as request_started signal handler"""
+    _state.depth = 1
+    _state.nodes = {}
+
+
+def close_resolver_scope(*args, **kwargs):
+    """Stop memoizing the resolved nodes and forget them,
+    used as request_finished signal handler"""
+    _state.depth = 0
+    _state.nodes = None
+
+
+class resolver_scope(object):
+    """Context manager memoizing the resolved nodes for its block,
+    nested scopes sharing the nodes of the outermost one"""
+
+    def __enter__(self):
+        _state.depth = getattr(_state, 'depth', 0) + 1
+        if _state.depth == 1:
+            _state.nodes = {}
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.depth = max(getattr(_state, 'depth', 0) - 1, 0)
+        if not _state.depth:
+            _state.nodes = None
+
+
+def get_nodemodel_class(nodemodel):
+    """Return the model class registered under a nodemodel name"""
+    for app_label in NODEMODEL_APPS:
+        model = get_model(app_label, nodemodel)
+        if model is not None:
+            return model
+    return None
+
+
+def get_resolved(nid):
+    """Return the memoized node for an id or None"""
+    cache = _get_cache()
+    if cache is None:
+        return None
+    return cache.get(nid)
+
+
+def store_resolved(nodes):
+    """Memoize a dict of resolved nodes indexed by id"""
+    cache = _get_cache()
+    if cache is None:
+        return
+    if len(cache) + len(nodes) > RESOLVER_CACHE_SIZE:
+        cache.clear()
+    cache.update(nodes)
+
+
+def forget_resolved(nid):
+    """Drop a node from the memoized nodes"""
+    cache = _get_cache()
+    if cache is not None:
+        cache.pop(nid, None)
+
+
+def clear_resolver_cache(*args, **kwargs):
+    """Forget all the resolved nodes, keeping the scope open"""
+    cache = _get_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def invalidate_resolved_node(sender, **kwargs):
+    """Forget a saved or deleted node, used as model signal handler"""
+    instance = kwargs['instance']
+    if hasattr(instance, 'nodemodel') and instance.pk is not None:
+        forget_resolved(instance.pk)
+
+
+def resolve_many(pairs):
+    """Resolve an iterable of (id, nodemodel) pairs into a dict
+    of typed instances indexed by id, one query per nodemodel"""
+    resolved = {}
+    missing = {}
+    for nid, nodemodel in pairs:
+        node = get_resolved(nid)
+        if node is not None:
+            resolved[nid] = node
+        elif nodemodel:
+            missing.setdefault(nodemodel, set()).add(nid)
+
+    for nodemodel, ids in missing.items():
+        model = get_nodemodel_class(nodemodel)
+        if model is None:
+            continue
+        nodes = model._base_manager.in_bulk(list(ids))
+        store_resolved(nodes)
+        resolved.update(nodes)
+    return resolved
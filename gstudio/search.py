@@ -47,6 +47,12 @@
 #    OF THE POSSIBILITY OF SUCH DAMAGE.
 
 """Search module with complex query parsing for Gstudio"""
+from copy import deepcopy
+from time import time
+from logging import getLogger
+from threading import RLock
+from threading import local
+
 from pyparsing import Word
 from pyparsing import alphas
 from pyparsing import WordEnd
@@ -61,15 +67,60 @@ from pyparsing import removeQuotes
 from pyparsing import ParseResults
 from pyparsing import CaselessLiteral
 from pyparsing import operatorPrecedence
+from pyparsing import ParserElement
+from pyparsing import ParseBaseException
 
 from django.db.models import Q
+from django.utils.datastructures import SortedDict
 
 from gstudio.models import Node
 from gstudio.settings import STOP_WORDS
+from gstudio.settings import SEARCH_PARSE_CACHE_SIZE
+from gstudio.settings import SEARCH_PARSE_MAX_LENGTH
+from gstudio.settings import SEARCH_PARSE_TIME_BUDGET
 
+# Packrat is global to pyparsing, the grammars of objectapp.search
+# are memoized too
+ParserElement.enablePackrat()
 
-def createQ(token):
-    """Creates the Q() object"""
+
+class SearchQueryError(ValueError):
+    """A pattern which cannot be parsed, or not within the budget"""
+
+
+class SearchBudgetError(SearchQueryError):
+    """A pattern whose parsing is aborted over the time budget"""
+
+budget = local()
+
+
+def check_budget(string, location, tokens):
+    """Abort the parsing of a pattern once its deadline is over"""
+    deadline = getattr(budget, 'deadline', None)
+    if deadline is not None and time() > deadline:
+        raise SearchBudgetError(
+            'Pattern not parsed within the budget of %.3fs' %
+            SEARCH_PARSE_TIME_BUDGET)
+
+
+class Term(object):
+    """A term of a parsed query, with its meta, its searched text
+    and its wildcards"""
+
+    def __init__(self, meta=None, search='', wildcards=None):
+        self.meta = meta
+        self.search = search
+        self.wildcards = wildcards
+
+    @property
+    def ignored(self):
+        """Connective words (of, a, an...) and STOP_WORDS are ignored"""
+        return (len(self.search) < 3 and not self.search.isdigit()) or \
+               self.search in STOP_WORDS
+
+
+def parse_term(token):
+    """Creates the Term() object"""
     meta = getattr(token, 'meta', None)
     query = getattr(token, 'query', '')
     wildcards = None
@@ -89,10 +140,21 @@ def createQ(token):
             else:
                 wildcards = 'END'
                 search = query[0]
+    return Term(meta, search, wildcards)
+
+
+def createQ(token):
+    """Creates the Q() object"""
+    return termQ(parse_term(token))
+
 
-    # Ignore connective words (of, a, an...) and STOP_WORDS
-    if (len(search) < 3 and not search.isdigit()) or \
-           search in STOP_WORDS:
+def termQ(term):
+    """Creates the Q() object of a Term()"""
+    meta = term.meta
+    search = term.search
+    wildcards = term.wildcards
+
+    if term.ignored:
         return Q()
 
     if not meta:
@@ -163,6 +225,7 @@ TERM = Combine(Optional(Word(alphas).setResultsName('meta') + ':') +
                (QUOTED.setResultsName('query') |
                 WILDCARDS.setResultsName('query')))
 TERM.setParseAction(createQ)
+TERM.addParseAction(check_budget, callDuringTry=True)
 
 EXPRESSION = operatorPrecedence(TERM, [
     (OPER_NOT, 1, opAssoc.RIGHT),
@@ -174,8 +237,188 @@ QUERY = OneOrMore(EXPRESSION) + StringEnd()
 QUERY.setParseAction(unionQ)
 
 
+EMPTY = ('empty',)
+
+
+def union_tree(token):
+    """Appends all the Term() objects in a tree of ('and', left, right),
+    ('or', left, right) and ('not', term) tuples, EMPTY matching
+    like an empty Q()"""
+    query = EMPTY
+    operation = 'and'
+    negation = False
+
+    for t in token:
+        if type(t) is ParseResults:  # See tokens recursively
+            query = combine_tree('and', query, union_tree(t))
+        else:
+            if t in ('or', 'and'):  # Set the new op and go to next token
+                operation = t
+            elif t == '-':  # Next tokens needs to be negated
+                negation = True
+            else:  # Append to query the token
+                if isinstance(t, Term) and t.ignored:
+                    t = EMPTY
+                if negation and t is not EMPTY:
+                    t = ('not', t)
+                query = combine_tree(operation, query, t)
+    return query
+
+
+def combine_tree(operation, left, right):
+    """Combine two trees, EMPTY being neutral"""
+    if left is EMPTY:
+        return right
+    if right is EMPTY:
+        return left
+    return (operation, left, right)
+
+
+TREE_TERM = TERM.copy()
+TREE_TERM.setParseAction(parse_term)
+TREE_TERM.addParseAction(check_budget, callDuringTry=True)
+
+TREE_EXPRESSION = operatorPrecedence(TREE_TERM, [
+    (OPER_NOT, 1, opAssoc.RIGHT),
+    (OPER_OR, 2, opAssoc.LEFT),
+    (Optional(OPER_AND, default='and'), 2, opAssoc.LEFT)])
+TREE_EXPRESSION.setParseAction(union_tree)
+
+TREE_QUERY = OneOrMore(TREE_EXPRESSION) + StringEnd()
+TREE_QUERY.setParseAction(union_tree)
+
+
+class ParseCache(object):
+    """LRU of the parsed patterns, keyed by grammar and normalized
+    pattern. The invalid or too long patterns are kept too, so they are
+    not parsed again, but not the ones aborted over the time budget,
+    which may fit in it under a lighter load"""
+
+    def __init__(self, size):
+        self.size = size
+        self.items = SortedDict()
+        self.lock = RLock()
+
+    def get(self, key):
+        """Return the entry of a key, as the most recent one"""
+        self.lock.acquire()
+        try:
+            entry = self.items.pop(key, None)
+            if entry is not None:
+                self.items[key] = entry
+            return entry
+        finally:
+            self.lock.release()
+
+    def set(self, key, entry):
+        """Store an entry, evicting the least recently used ones"""
+        self.lock.acquire()
+        try:
+            self.items.pop(key, None)
+            self.items[key] = entry
+            while len(self.items) > self.size:
+                del self.items[self.items.keyOrder[0]]
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.items.clear()
+        finally:
+            self.lock.release()
+
+parse_cache = ParseCache(SEARCH_PARSE_CACHE_SIZE)
+
+
+def normalize_pattern(pattern):
+    """Normalize the whitespaces of a pattern,
+    keeping the quoted strings untouched"""
+    if '"' in pattern or "'" in pattern:
+        return pattern.strip()
+    return ' '.join(pattern.split())
+
+
+def parse_pattern(grammar, pattern):
+    """Parse a pattern with a grammar, through the parse cache.
+    Return the parsed result, whether it was cached and the
+    parse time, or raise SearchQueryError. The parsing is aborted once
+    it takes more than SEARCH_PARSE_TIME_BUDGET seconds"""
+    pattern = normalize_pattern(pattern)
+    key = (grammar is TREE_QUERY and 'tree' or 'query', pattern)
+    entry = parse_cache.get(key)
+    if entry is not None:
+        result, error = entry
+        if error is not None:
+            raise SearchQueryError(error)
+        return result, True, 0.0
+
+    start = time()
+    if len(pattern) > SEARCH_PARSE_MAX_LENGTH:
+        error = 'Pattern longer than %i characters' % \
+                SEARCH_PARSE_MAX_LENGTH
+    else:
+        budget.deadline = start + SEARCH_PARSE_TIME_BUDGET
+        try:
+            result = grammar.parseString(pattern)[0]
+            error = None
+        except ParseBaseException, e:
+            error = str(e)
+        except SearchBudgetError, e:
+            getLogger('gstudio.search').info('%s : %s' % (pattern, e))
+            raise
+        finally:
+            budget.deadline = None
+    parse_time = time() - start
+
+    if error is not None:
+        parse_cache.set(key, (None, error))
+        getLogger('gstudio.search').info('%s : %s' % (pattern, error))
+        raise SearchQueryError(error)
+    parse_cache.set(key, (result, None))
+    return result, False, parse_time
+
+
+def compile_query(pattern):
+    """Return the Q() object of a pattern"""
+    # The cached Q() is copied, the querysets may alter its children
+    return deepcopy(parse_pattern(QUERY, pattern)[0])
+
+
+def parse_tree(pattern):
+    """Parse the grammar of a pattern into a tree of terms,
+    for the search backends"""
+    return parse_pattern(TREE_QUERY, pattern)[0]
+
+
 def advanced_search(pattern):
     """Parse the grammar of a pattern
     and build a queryset with it"""
-    query_parsed = QUERY.parseString(pattern)
-    return Node.published.filter(query_parsed[0]).distinct()
+    return Node.published.filter(compile_query(pattern)).distinct()
+
+
+def explain(pattern, manager=None):
+    """Explain the search of a pattern with the selected backend,
+    reporting the time spent in parsing it and the time spent
+    in the database"""
+    from gstudio.search_backends import get_search_backend
+
+    manager = manager or Node.published
+    backend = get_search_backend()
+    report = {'pattern': pattern, 'backend': backend.__name__,
+              'normalized': normalize_pattern(pattern),
+              'cached': False, 'fallback': False, 'error': None,
+              'parse_time': 0.0}
+    try:
+        report['cached'], report['parse_time'] = backend.parse(
+            pattern)[1:]
+    except SearchQueryError, e:
+        report['fallback'] = True
+        report['error'] = str(e)
+    queryset = backend.search(manager, pattern)
+
+    start = time()
+    report['results'] = len(list(queryset))
+    report['db_time'] = time() - start
+    report['sql'] = str(queryset.query)
+    return report
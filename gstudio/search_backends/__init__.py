@@ -0,0 +1,59 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Search backends for Gstudio.
+
+A search backend is a module providing ``search(manager, pattern)``,
+which returns the queryset of the published nodes of the manager
+matching the pattern, ``parse(pattern)``, which returns the parsed
+pattern as ``gstudio.search.parse_pattern`` does, for ``explain``,
+and ``index_node(node)``, called when a node is saved."""
+import warnings
+
+from django.utils.importlib import import_module
+from django.core.exceptions import ImproperlyConfigured
+
+from gstudio.settings import SEARCH_BACKEND
+
+FALLBACK_SEARCH_BACKEND = 'gstudio.search_backends.database'
+
+
+def get_search_backend():
+    """Return the selected search backend"""
+    try:
+        backend = import_module(SEARCH_BACKEND)
+        getattr(backend, 'search')
+    except (ImportError, AttributeError):
+        warnings.warn('%s backend cannot be imported' % SEARCH_BACKEND,
+                      RuntimeWarning)
+        backend = import_module(FALLBACK_SEARCH_BACKEND)
+    except ImproperlyConfigured, e:
+        warnings.warn(str(e), RuntimeWarning)
+        backend = import_module(FALLBACK_SEARCH_BACKEND)
+
+    return backend
+
+
+def index_search_node(sender, instance, **kwargs):
+    """Index a saved node in the search backend"""
+    from gstudio.models import Node
+
+    if kwargs.get('raw') or not isinstance(instance, Node):
+        return
+    index_node = getattr(get_search_backend(), 'index_node', None)
+    if index_node is not None:
+        index_node(instance)
@@ -0,0 +1,43 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Database search backend for Gstudio, compiling the queries into
+lookups on the fields of the nodes"""
+
+
+def search(manager, pattern):
+    """Search with the advanced grammar, falling back on the basic
+    search when the pattern cannot be parsed"""
+    from gstudio.search import SearchQueryError
+
+    try:
+        return manager.advanced_search(pattern)
+    except SearchQueryError:
+        return manager.basic_search(pattern)
+
+
+def parse(pattern):
+    """Parse a pattern with the grammar of the advanced search"""
+    from gstudio.search import QUERY
+    from gstudio.search import parse_pattern
+
+    return parse_pattern(QUERY, pattern)
+
+
+def index_node(node):
+    """Nothing to index, the fields are searched directly"""
+    pass
@@ -0,0 +1,225 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Inverted index search backend for Gstudio.
+
+The words of the title, the tags, the excerpt and the content of each
+node are stored in the ``SearchTerm`` table with a weight, reindexed
+when the node is saved.  A query is parsed with the grammar of
+``gstudio.search``, each term is looked up in the index and the
+matching nodes are combined as sets and ranked by the sum of the
+weights of their matching words.
+
+The index is filled by ``manage.py rebuild_search_index`` after the
+backend is selected, the database backend answers the searches while
+it is empty.  ``GSTUDIO_SEARCH_MAX_RESULTS`` keeps only the best
+ranked nodes of a search, 500 by default, so that the ranking query
+stays within the number of variables the database accepts."""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from gstudio.settings import STOP_WORDS
+from gstudio.settings import SEARCH_FIELD_WEIGHTS
+from gstudio.settings import SEARCH_MAX_RESULTS
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Return the indexable words of a text"""
+    return [word for word in WORD.findall(text.lower())
+            if (len(word) > 2 or word.isdigit()) and
+            word not in STOP_WORDS and len(word) <= 100]
+
+
+def node_terms(node):
+    """Return the weights of the words of a node by (word, field)"""
+    weights = {}
+    for field, weight in SEARCH_FIELD_WEIGHTS.items():
+        for word in tokenize(unicode(getattr(node, field, '') or '')):
+            weights[(word, field)] = weights.get((word, field), 0) + weight
+    return weights
+
+
+def index_node(node):
+    """Reindex the words of a node"""
+    from gstudio.models import SearchTerm
+
+    SearchTerm.objects.filter(node=node.pk).delete()
+    SearchTerm.objects.bulk_create(
+        [SearchTerm(term=word, field=field, weight=weight, node_id=node.pk)
+         for (word, field), weight in node_terms(node).items()])
+
+
+class Complement(object):
+    """The nodes not matching a set of nodes"""
+
+    def __init__(self, excluded):
+        self.excluded = excluded
+
+
+def lookup_word(word, wildcards, fields=None):
+    """Return the weights of the nodes holding a word"""
+    from gstudio.models import SearchTerm
+
+    if wildcards == 'BOTH':
+        terms = SearchTerm.objects.filter(term__contains=word)
+    elif wildcards == 'START':
+        terms = SearchTerm.objects.filter(term__endswith=word)
+    elif wildcards == 'END':
+        terms = SearchTerm.objects.filter(term__startswith=word)
+    else:
+        terms = SearchTerm.objects.filter(term=word)
+    if fields:
+        terms = terms.filter(field__in=fields)
+    scores = {}
+    for node, weight in terms.values_list('node', 'weight'):
+        scores[node] = scores.get(node, 0) + weight
+    return scores
+
+
+def lookup_term(term, queryset):
+    """Return the weights of the nodes matching a term"""
+    from gstudio.search import termQ
+
+    if term.meta in ('author', 'metatype'):
+        return dict([(pk, 0) for pk in queryset.filter(
+            termQ(term)).values_list('pk', flat=True)])
+    fields = term.meta == 'tag' and ['tags'] or None
+    words = tokenize(term.search) or [term.search.lower()]
+    scores = None
+    for word in words:
+        found = lookup_word(word, len(words) == 1 and term.wildcards or None,
+                            fields)
+        if scores is None:
+            scores = found
+        else:
+            scores = dict([(node, scores[node] + weight)
+                           for node, weight in found.items()
+                           if node in scores])
+    if ' ' in term.search.strip() and scores:
+        # check the phrase on the few nodes holding all its words
+        names = queryset.model._meta.get_all_field_names()
+        phrase = Q()
+        for field in SEARCH_FIELD_WEIGHTS:
+            if field in names and field != 'tags':
+                phrase |= Q(**{'%s__icontains' % field: term.search})
+        matching = set(queryset.filter(pk__in=scores.keys()).filter(
+            phrase).values_list('pk', flat=True))
+        scores = dict([(node, weight) for node, weight in scores.items()
+                       if node in matching])
+    return scores
+
+
+def evaluate(tree, queryset):
+    """Evaluate a tree of terms into the weights of the matching
+    nodes, or the Complement of the nodes not matching"""
+    from gstudio.search import EMPTY
+
+    if tree is EMPTY:
+        return Complement({})
+    if not isinstance(tree, tuple):
+        return lookup_term(tree, queryset)
+    if tree[0] == 'not':
+        result = evaluate(tree[1], queryset)
+        if isinstance(result, Complement):
+            return result.excluded
+        return Complement(result)
+
+    left = evaluate(tree[1], queryset)
+    right = evaluate(tree[2], queryset)
+    if tree[0] == 'or':
+        if isinstance(left, Complement) and isinstance(right, Complement):
+            return Complement(dict([(node, 0) for node in left.excluded
+                                    if node in right.excluded]))
+        if isinstance(left, Complement) or isinstance(right, Complement):
+            if isinstance(left, Complement):
+                left, right = right, left
+            return Complement(dict([(node, 0) for node in right.excluded
+                                    if node not in left]))
+        scores = dict(left)
+        for node, weight in right.items():
+            scores[node] = scores.get(node, 0) + weight
+        return scores
+
+    if isinstance(left, Complement) and isinstance(right, Complement):
+        excluded = dict(left.excluded)
+        excluded.update(right.excluded)
+        return Complement(excluded)
+    if isinstance(left, Complement) or isinstance(right, Complement):
+        if isinstance(left, Complement):
+            left, right = right, left
+        return dict([(node, weight) for node, weight in left.items()
+                     if node not in right.excluded])
+    return dict([(node, weight + right[node])
+                 for node, weight in left.items() if node in right])
+
+
+def ranked(queryset, scores):
+    """Return the queryset restricted to the scored nodes,
+    the best ranked first"""
+    ids = [node for weight, node in sorted(
+        [(-weight, node) for node, weight in scores.items()])]
+    if SEARCH_MAX_RESULTS:
+        ids = ids[:SEARCH_MAX_RESULTS]
+    if not ids:
+        return queryset.none()
+    qn = connection.ops.quote_name
+    column = '%s.%s' % (qn(queryset.model._meta.db_table),
+                        qn(queryset.model._meta.pk.column))
+    rank = 'CASE %s END' % ' '.join(
+        ['WHEN %s = %i THEN %i' % (column, node, position)
+         for position, node in enumerate(ids)])
+    return queryset.filter(pk__in=ids).extra(
+        select={'search_rank': rank}, order_by=['search_rank'])
+
+
+def search(manager, pattern):
+    """Search the published nodes of the manager in the inverted
+    index, falling back on the basic search when the pattern cannot
+    be parsed and on the database backend while the index is empty"""
+    from gstudio.models import SearchTerm
+    from gstudio.search import parse_tree
+    from gstudio.search import SearchQueryError
+    from gstudio.search_backends import database
+
+    if not SearchTerm.objects.exists():
+        return database.search(manager, pattern)
+    queryset = manager.get_query_set()
+    try:
+        tree = parse_tree(pattern)
+    except SearchQueryError:
+        return manager.basic_search(pattern)
+    result = evaluate(tree, queryset)
+    if isinstance(result, Complement):
+        return queryset.exclude(pk__in=result.excluded.keys())
+    return ranked(queryset, result)
+
+
+def parse(pattern):
+    """Parse a pattern with the grammar searched in the index,
+    or the one of the database backend while the index is empty"""
+    from gstudio.models import SearchTerm
+    from gstudio.search import TREE_QUERY
+    from gstudio.search import parse_pattern
+    from gstudio.search_backends import database
+
+    if not SearchTerm.objects.exists():
+        return database.parse(pattern)
+    return parse_pattern(TREE_QUERY, pattern)
@@ -65,6 +65,9 @@
 
 
 """Settings of Gstudio"""
+import os
+import tempfile
+
 from django.conf import settings
 
 PING_DIRECTORIES = getattr(settings, 'GSTUDIO_PING_DIRECTORIES',
@@ -121,6 +124,9 @@ PINGBACK_CONTENT_LENGTH = getattr(settings,
 
 F_MIN = getattr(settings, 'GSTUDIO_F_MIN', 0.1)
 F_MAX = getattr(settings, 'GSTUDIO_F_MAX', 1.0)
+SIMILAR_METRIC = getattr(settings, 'GSTUDIO_SIMILAR_METRIC', 'pearson')
+SIMILAR_CACHE_SIZE = getattr(settings, 'GSTUDIO_SIMILAR_CACHE_SIZE', 1000)
+SIMILAR_INDEX_PATH = getattr(settings, 'GSTUDIO_SIMILAR_INDEX_PATH', None)
 
 SPAM_CHECKER_BACKENDS = getattr(settings, 'GSTUDIO_SPAM_CHECKER_BACKENDS',
                                 ())
@@ -154,3 +160,78 @@ USE_TWITTER = getattr(settings, 'GSTUDIO_USE_TWITTER',
                            TWITTER_CONSUMER_KEY and TWITTER_CONSUMER_SECRET))
 
 GSTUDIO_VERSIONING = True
+
+RESOLVER_CACHE_SIZE = getattr(settings, 'GSTUDIO_RESOLVER_CACHE_SIZE', 5000)
+
+GRAPH_MAX_NEIGHBOURS = getattr(settings, 'GSTUDIO_GRAPH_MAX_NEIGHBOURS', 10)
+GRAPH_JSON_CACHE_TIMEOUT = getattr(settings, 'GSTUDIO_GRAPH_JSON_CACHE_TIMEOUT',
+                                   60 * 60 * 24)
+GRAPH_MAX_DEPTH = getattr(settings, 'GSTUDIO_GRAPH_MAX_DEPTH', 3)
+GRAPH_MAX_NODES = getattr(settings, 'GSTUDIO_GRAPH_MAX_NODES', 500)
+GRAPH_GROUP_PAGINATION = getattr(settings, 'GSTUDIO_GRAPH_GROUP_PAGINATION', 50)
+
+CHECKSUM_ATTRIBUTETYPES = getattr(settings, 'GSTUDIO_CHECKSUM_ATTRIBUTETYPES',
+                                  ('md5_checksum_image',
+                                   'md5_checksum_document'))
+
+IMAGE_RENDITIONS = getattr(settings, 'GSTUDIO_IMAGE_RENDITIONS',
+                           (('thumbnail', (128, 128), '-thumbnail'),
+                            ('display_1024', (1024, None), '_display_1024')))
+DERIVATIVES_ROOT = getattr(settings, 'GSTUDIO_DERIVATIVES_ROOT',
+                           os.path.join(settings.MEDIA_ROOT, 'derivatives'))
+DERIVATIVES_URL = getattr(settings, 'GSTUDIO_DERIVATIVES_URL',
+                          '%s/derivatives/' % settings.MEDIA_URL.rstrip('/'))
+DERIVATIVES_LEASE = getattr(settings, 'GSTUDIO_DERIVATIVES_LEASE', 600)
+
+ORG_EMACS = getattr(settings, 'GSTUDIO_ORG_EMACS', 'emacs')
+ORG_EMACSCLIENT = getattr(settings, 'GSTUDIO_ORG_EMACSCLIENT', 'emacsclient')
+ORG_RENDER_DAEMON = getattr(settings, 'GSTUDIO_ORG_RENDER_DAEMON', True)
+ORG_RENDER_WORKERS = getattr(settings, 'GSTUDIO_ORG_RENDER_WORKERS', 2)
+ORG_RENDER_DIR = getattr(settings, 'GSTUDIO_ORG_RENDER_DIR',
+                         getattr(settings, 'FILE_URL', tempfile.gettempdir()))
+ORG_RENDER_CACHE_TIMEOUT = getattr(settings, 'GSTUDIO_ORG_RENDER_CACHE_TIMEOUT',
+                                   60 * 60 * 24 * 7)
+
+LOOM_CACHE_TIMEOUT = getattr(settings, 'GSTUDIO_LOOM_CACHE_TIMEOUT', 60 * 15)
+
+PREFERENCE_CACHE_SIZE = getattr(settings, 'GSTUDIO_PREFERENCE_CACHE_SIZE', 1000)
+PREFERENCE_CACHE_TIMEOUT = getattr(settings, 'GSTUDIO_PREFERENCE_CACHE_TIMEOUT',
+                                   60 * 60 * 24)
+PREFERENCE_LOCAL_TIMEOUT = getattr(settings, 'GSTUDIO_PREFERENCE_LOCAL_TIMEOUT',
+                                   60)
+
+SEARCH_BACKEND = getattr(settings, 'GSTUDIO_SEARCH_BACKEND',
+                         'gstudio.search_backends.database')
+SEARCH_FIELD_WEIGHTS = getattr(settings, 'GSTUDIO_SEARCH_FIELD_WEIGHTS',
+                               {'title': 4, 'tags': 3,
+                                'excerpt': 2, 'content': 1})
+SEARCH_MAX_RESULTS = getattr(settings, 'GSTUDIO_SEARCH_MAX_RESULTS', 500)
+SEARCH_PARSE_CACHE_SIZE = getattr(settings, 'GSTUDIO_SEARCH_PARSE_CACHE_SIZE',
+                                  500)
+SEARCH_PARSE_MAX_LENGTH = getattr(settings, 'GSTUDIO_SEARCH_PARSE_MAX_LENGTH',
+                                  256)
+SEARCH_PARSE_TIME_BUDGET = getattr(settings,
+                                   'GSTUDIO_SEARCH_PARSE_TIME_BUDGET', 0.5)
+
+RDF_NAMESPACE = getattr(settings, 'GSTUDIO_RDF_NAMESPACE',
+                        'http://sbox.gnowledge.org/gstudio/')
+
+TRIPLESTORE_ENDPOINT = getattr(settings, 'GSTUDIO_TRIPLESTORE_ENDPOINT',
+                               'http://localhost:8067')
+TRIPLESTORE_GRAPH = getattr(settings, 'GSTUDIO_TRIPLESTORE_GRAPH',
+                            'http://gstudio.gnowledge.org/rdfstore')
+TRIPLESTORE_BATCH_SIZE = getattr(settings, 'GSTUDIO_TRIPLESTORE_BATCH_SIZE',
+                                 5000)
+TRIPLESTORE_WORKERS = getattr(settings, 'GSTUDIO_TRIPLESTORE_WORKERS', 4)
+TRIPLESTORE_TIMEOUT = getattr(settings, 'GSTUDIO_TRIPLESTORE_TIMEOUT', 60)
+
+XMLRPC_PAGE_SIZE = getattr(settings, 'GSTUDIO_XMLRPC_PAGE_SIZE', 100)
+XMLRPC_LIST_LIMIT = getattr(settings, 'GSTUDIO_XMLRPC_LIST_LIMIT', 1000)
+
+PRESENCE_TIMEOUT = getattr(settings, 'GSTUDIO_PRESENCE_TIMEOUT', 60 * 5)
+PRESENCE_UPDATE_INTERVAL = getattr(settings,
+                                   'GSTUDIO_PRESENCE_UPDATE_INTERVAL', 60)
+
+TYPEAHEAD_PAGE_SIZE = getattr(settings, 'GSTUDIO_TYPEAHEAD_PAGE_SIZE', 50)
+TYPEAHEAD_CACHE_TIMEOUT = getattr(settings, 'GSTUDIO_TYPEAHEAD_CACHE_TIMEOUT',
+                                  60 * 15)
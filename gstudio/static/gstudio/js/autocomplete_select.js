@@ -0,0 +1,96 @@
+/* Autocomplete of the select boxes of Gstudio admin.
+
+   The server renders the selected options only, the other nodes are
+   searched by the prefix of their title on the url given by the
+   data-autocomplete-url attribute, one page at a time. */
+(function($) {
+    function bind(select) {
+        var $select = $(select);
+        var url = $select.attr('data-autocomplete-url');
+        var multiple = !!$select.attr('multiple');
+        var $search = $('#' + select.id + '_search');
+        var $results = $('#' + select.id + '_results');
+        var timer = null;
+        var request = null;
+        var query = null;
+        var page = 1;
+
+        function label(text) {
+            return window.gettext ? gettext(text) : text;
+        }
+
+        function load(append) {
+            if (request) {
+                request.abort();
+            }
+            request = $.getJSON(url, {q: query, page: page}, function(data) {
+                if (!append) {
+                    $results.empty();
+                }
+                $results.find('li.more').remove();
+                $.each(data.results, function(i, result) {
+                    $('<li></li>').text(result[1]).data('id', result[0])
+                        .appendTo($results);
+                });
+                if (data.has_next) {
+                    $('<li class="more"></li>').text(label('More...'))
+                        .appendTo($results);
+                }
+            });
+        }
+
+        function choose(id, title) {
+            var value = String(id);
+            if (!multiple) {
+                $select.find('option[value!=""]').remove();
+            }
+            if (!$select.find('option[value="' + value + '"]').length) {
+                $('<option></option>').val(value).text(title).appendTo($select);
+            }
+            $select.find('option[value="' + value + '"]')
+                .attr('selected', 'selected');
+        }
+
+        $search.keyup(function() {
+            var value = $.trim($search.val());
+            if (value === query) {
+                return;
+            }
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                query = value;
+                page = 1;
+                load(false);
+            }, 250);
+        });
+
+        $results.delegate('li', 'click', function() {
+            var $item = $(this);
+            if ($item.hasClass('more')) {
+                page += 1;
+                load(true);
+            } else {
+                choose($item.data('id'), $item.text());
+            }
+        });
+
+        if (multiple) {
+            // a double click removes a selected node, all the options
+            // left are submitted
+            $select.dblclick(function(event) {
+                if (event.target.tagName == 'OPTION') {
+                    $(event.target).remove();
+                }
+            });
+            $select.closest('form').submit(function() {
+                $select.find('option').attr('selected', 'selected');
+            });
+        }
+    }
+
+    $(function() {
+        $('select.gstudio-autocomplete').each(function() {
+            bind(this);
+        });
+    });
+})(typeof django !== 'undefined' ? django.jQuery : jQuery);
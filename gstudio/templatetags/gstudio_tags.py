@@ -43,12 +43,16 @@ from gstudio.gnowql import get_node
 from gstudio.managers import tags_published
 from gstudio.comparison import VectorBuilder
 from gstudio.comparison import pearson_score
+from gstudio.comparison import get_similarity_engine
 from gstudio.templatetags.zcalendar import GstudioCalendar
 from gstudio.templatetags.zbreadcrumbs import retrieve_breadcrumbs
 from django.http import HttpResponseRedirect
 
 from gstudio.CNL import *
 from gstudio.methods import check_release_or_not
+from objectapp.discussions import thread_of_twist
+from objectapp.viewurls import prefetch_view_object_urls
+from gstudio.preferences import prefetch_author_preferences
 import os
 from settings import STATIC_URL
 from gstudio.methods import *
@@ -141,6 +145,17 @@ def get_similar_nodetypes(context, number=5,
     global VECTORS
     global CACHE_NODETYPES_RELATED
 
+    engine = get_similarity_engine()
+    if engine is not None:
+        if flush:
+            engine.build()
+        object_id = context['object'].pk
+        related = engine.similar([object_id], number)[object_id]
+        object_dict = Nodetype.published.in_bulk(related)
+        return {'template': template,
+                'nodetypes': [object_dict[pk] for pk in related
+                              if pk in object_dict]}
+
     if VECTORS is None or flush:
         VECTORS = VECTORS_FACTORY()
         CACHE_NODETYPES_RELATED = {}
@@ -399,28 +414,29 @@ def show_commentpage(comment,idusr,flag,admin_id,attob):
 
 @register.simple_tag
 def show_nodesystem(object_id):
-    search=object_id    
-    nbh=""
-    url=""
-    for each in System.objects.all():
-        sysid=each.id
-        for eachsys in each.systemtypes.all():
-            if eachsys.title=="Meeting":
-                url="group/gnowsys-grp/"
-		objecttitle = "TWIST"
-            elif eachsys.title=="Wikipage":
-                url="page/gnowsys-page/"
-		objecttitle = "WIKIPAGE"
-        for eachob in each.system_set.all():
-            if eachob.gbobject_set.all():
-                for eachgbob in eachob.gbobject_set.all():
-                    if search==eachgbob.id:
-                        nbh=url+str(sysid)
-            	
-        if search==sysid:
-            nbh=url+str(sysid)
-    		   
-    return nbh
+    system = thread_of_twist(object_id)
+    if system is None:
+        try:
+            system = System.objects.get(id=object_id)
+        except (System.DoesNotExist, ValueError):
+            return ""
+    url = ""
+    for eachsys in system.systemtypes.all():
+        if eachsys.title == "Meeting":
+            url = "group/gnowsys-grp/"
+        elif eachsys.title == "Wikipage":
+            url = "page/gnowsys-page/"
+    return url + str(system.id)
+
+@register.assignment_tag
+def view_object_urls(gbobjects):
+  """Resolve the view urls of a listing of objects at once"""
+  return prefetch_view_object_urls(gbobjects)
+
+@register.assignment_tag
+def author_preferences(gbobjects):
+  """Resolve the preferences of the authors of a listing at once"""
+  return prefetch_author_preferences(gbobjects)
 
 @register.assignment_tag
 def check_release(meeting):
@@ -74,6 +74,7 @@ from gstudio.tests.signals import SignalsTestCase
 from gstudio.tests.metatype import MetatypeTestCase
 from gstudio.tests.admin import NodetypeAdminTestCase
 from gstudio.tests.admin import MetatypeAdminTestCase
+from gstudio.tests.admin import AutocompleteAdminTestCase
 from gstudio.tests.managers import ManagersTestCase  # ~1.2s
 from gstudio.tests.feeds import GstudioFeedsTestCase  # ~0.4s
 from gstudio.tests.views import GstudioViewsTestCase  # ~1.5s ouch...
@@ -89,6 +90,20 @@ from gstudio.tests.templatetags import TemplateTagsTestCase  # ~0.4s
 from gstudio.tests.moderator import NodetypeCommentModeratorTestCase  # ~0.1s
 from gstudio.tests.spam_checker import SpamCheckerTestCase
 from gstudio.tests.url_shortener import URLShortenerTestCase
+from gstudio.tests.nbhood import NbhoodTestCase
+from gstudio.tests.graphs import GraphsTestCase
+from gstudio.tests.checksums import ChecksumsTestCase
+from gstudio.tests.derivatives import DerivativesTestCase
+from gstudio.tests.orgrender import OrgRenderTestCase
+from gstudio.tests.loom import LoomTestCase
+from gstudio.tests.preferences import PreferencesTestCase
+from gstudio.tests.search_backends import InvertedSearchTestCase
+from gstudio.tests.search import SearchParseTestCase
+from gstudio.tests.rdf import RDFExportTestCase
+from gstudio.tests.triplestore import TripleStoreTestCase
+from gstudio.tests.presence import PresenceTestCase
+from gstudio.tests.typeahead import TypeaheadTestCase
+from gstudio.tests.resolver import ResolverTestCase
 from gstudio.signals import disconnect_gstudio_signals
 # TOTAL ~ 6.6s
 
@@ -107,7 +122,14 @@ def suite():
                   TemplateTagsTestCase, QuickNodetypeTestCase,
                   URLShortenerTestCase, NodetypeCommentModeratorTestCase,
                   GstudioCustomDetailViews, SpamCheckerTestCase,
-                  NodetypeAdminTestCase, MetatypeAdminTestCase)
+                  NodetypeAdminTestCase, MetatypeAdminTestCase,
+                  AutocompleteAdminTestCase,
+                  NbhoodTestCase, GraphsTestCase, ChecksumsTestCase,
+                  DerivativesTestCase, OrgRenderTestCase, LoomTestCase,
+                  PreferencesTestCase, InvertedSearchTestCase,
+                  SearchParseTestCase, RDFExportTestCase,
+                  TripleStoreTestCase, PresenceTestCase,
+                  TypeaheadTestCase, ResolverTestCase)
 
     if 'django_xmlrpc' in settings.INSTALLED_APPS:
         test_cases += (PingBackTestCase, MetaWeblogTestCase)
@@ -64,12 +64,17 @@
 
 
 """Test cases for Gstudio's admin"""
+import json
+
+from django import forms
 from django.test import TestCase
 from django.contrib.auth.models import User
 
 from gstudio import settings
 from gstudio.models import Nodetype
 from gstudio.models import Metatype
+from gstudio.admin.widgets import AutocompleteSelect
+from gstudio.admin.widgets import AutocompleteSelectMultiple
 
 
 class NodetypeAdminTestCase(TestCase):
@@ -149,3 +154,48 @@ class MetatypeAdminTestCase(TestCase):
         self.assertEquals(response.redirect_chain,
                           [('http://testserver/admin/gstudio/metatype/', 302)])
         self.assertEquals(Metatype.objects.count(), 2)
+
+
+class AutocompleteAdminTestCase(TestCase):
+    """Test cases for the autocomplete widgets of the admin"""
+    urls = 'gstudio.tests.urls'
+
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.metatypes = [Metatype.objects.create(title=title, slug=title)
+                          for title in ('beta', 'alpha', 'alpine', 'gamma')]
+
+    def test_autocomplete_view(self):
+        url = '/autocomplete/metatype/'
+        response = self.client.get(url)
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue('login' in response.content)
+        self.client.login(username='admin', password='password')
+        data = json.loads(self.client.get(url, {'q': 'AL'}).content)
+        self.assertEquals(data['results'], [[self.metatypes[1].pk, 'alpha'],
+                                            [self.metatypes[2].pk, 'alpine']])
+        self.assertEquals(data['has_next'], False)
+        data = json.loads(self.client.get(url).content)
+        self.assertEquals([title for pk, title in data['results']],
+                          ['alpha', 'alpine', 'beta', 'gamma'])
+        response = self.client.get('/autocomplete/user/')
+        self.assertEquals(response.status_code, 404)
+
+    def test_widgets_render_selected_options(self):
+        field = forms.ModelMultipleChoiceField(
+            queryset=Metatype.objects.all(),
+            widget=AutocompleteSelectMultiple())
+        output = field.widget.render('metatypes', [self.metatypes[3].pk,
+                                                   self.metatypes[0].pk],
+                                     {'id': 'id_metatypes'})
+        self.assertEquals(output.count('<option'), 2)
+        self.assertTrue(output.index('gamma') < output.index('beta'))
+        self.assertTrue('data-autocomplete-url="/autocomplete/metatype/"'
+                        in output)
+        self.assertTrue('id="id_metatypes_search"' in output)
+        field = forms.ModelChoiceField(queryset=Metatype.objects.all(),
+                                       widget=AutocompleteSelect())
+        output = field.widget.render('parent', None)
+        self.assertEquals(output.count('<option'), 1)
+        output = field.widget.render('parent', 'bad')
+        self.assertEquals(output.count('<option'), 1)
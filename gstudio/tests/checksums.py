@@ -0,0 +1,79 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's media checksum index"""
+from django.test import TestCase
+
+from gstudio.models import Attribute
+from gstudio.models import Attributetype
+from gstudio.models import MediaChecksum
+from gstudio.models import Objecttype
+from gstudio.checksums import backfill_checksums
+from gstudio.checksums import find_checksum
+from gstudio.checksums import find_checksums
+
+
+class ChecksumsTestCase(TestCase):
+    """Test cases for the media checksum index"""
+
+    def setUp(self):
+        self.image = Objecttype.objects.create(title='Image', slug='image')
+        self.attributetype = Attributetype.objects.create(
+            title='md5_checksum_image', slug='md5-checksum-image',
+            subjecttype=self.image)
+
+    def test_find_checksum(self):
+        self.assertEquals(find_checksum('abc', 'md5_checksum_image'), None)
+        attribute = Attribute.objects.create(
+            attributetype=self.attributetype, subject=self.image,
+            svalue='abc')
+        self.assertEquals(find_checksum('abc', 'md5_checksum_image'),
+                          self.image.pk)
+        self.assertEquals(find_checksum('abc', 'md5_checksum_document'),
+                          None)
+        self.assertEquals(find_checksums(['abc', 'def'],
+                                         'md5_checksum_image'),
+                          {'abc': self.image.pk})
+        attribute.delete()
+        self.assertEquals(find_checksum('abc', 'md5_checksum_image'), None)
+
+    def test_change_checksum(self):
+        attribute = Attribute.objects.create(
+            attributetype=self.attributetype, subject=self.image,
+            svalue='abc')
+        attribute.svalue = 'def'
+        attribute.save()
+        self.assertEquals(find_checksum('abc', 'md5_checksum_image'), None)
+        self.assertEquals(find_checksum('def', 'md5_checksum_image'),
+                          self.image.pk)
+
+    def test_last_duplicate(self):
+        video = Objecttype.objects.create(title='Video', slug='video')
+        for subject in (video, self.image):
+            Attribute.objects.create(attributetype=self.attributetype,
+                                     subject=subject, svalue='abc')
+        self.assertEquals(find_checksum('abc', 'md5_checksum_image'),
+                          self.image.pk)
+
+    def test_backfill_checksums(self):
+        Attribute.objects.create(attributetype=self.attributetype,
+                                 subject=self.image, svalue='abc')
+        MediaChecksum.objects.all().delete()
+        self.assertEquals(backfill_checksums(chunk_size=1), 1)
+        self.assertEquals(backfill_checksums(), 0)
+        self.assertEquals(find_checksum('abc', 'md5_checksum_image'),
+                          self.image.pk)
@@ -64,12 +64,20 @@
 
 
 """Test cases for Gstudio's comparison"""
+from datetime import datetime
+
 from django.test import TestCase
+from django.utils.unittest import skipUnless
+from django.contrib.sites.models import Site
 
+from gstudio import comparison
 from gstudio.models import Nodetype
+from gstudio.managers import PUBLISHED
 from gstudio.comparison import pearson_score
 from gstudio.comparison import VectorBuilder
 from gstudio.comparison import ClusteredModel
+from gstudio.comparison import SimilarityEngine
+from gstudio.comparison import sparse
 
 
 class ComparisonTestCase(TestCase):
@@ -113,3 +121,72 @@ class ComparisonTestCase(TestCase):
                                     'second', '2', 'first'])
         self.assertEquals(dataset.values(), [[1, 1, 1, 1, 1, 0, 0, 1],
                                              [0, 0, 0, 0, 0, 1, 1, 0]])
+
+    @skipUnless(sparse, 'NumPy and SciPy are required')
+    def test_similarity_engine(self):
+        contents = ['apple banana cherry', 'apple banana date',
+                    'apple kiwi lemon', 'banana cherry date',
+                    'kiwi lemon mango']
+        for i, content in enumerate(contents):
+            Nodetype.objects.create(title='Nodetype %s' % i, content=content,
+                                    slug='nodetype-%s' % i)
+        fields = ['title', 'excerpt', 'content']
+        engine = SimilarityEngine(Nodetype.objects.all(), fields, path=None)
+        columns, dataset = VectorBuilder(Nodetype.objects.all(), fields)()
+        vectors = dict([(nodetype.pk, vector)
+                        for nodetype, vector in dataset.items()])
+        pks = sorted(vectors)
+        related = engine.similar(pks, 3)
+        for pk in pks:
+            scores = dict([(other, pearson_score(vectors[pk], vectors[other]))
+                           for other in pks if other != pk])
+            expected = sorted([round(score, 6) for score in scores.values()
+                               if score])[:3]
+            self.assertEquals([round(scores[other], 6)
+                               for other in related[pk]], expected)
+
+        nodetype = Nodetype.objects.get(pk=pks[0])
+        nodetype.content = 'kiwi lemon mango'
+        nodetype.save()
+        engine.update_instance(nodetype)
+        self.assertEquals(engine.similar([pks[0]], 1)[pks[0]], [pks[4]])
+        nodetype.delete()
+        engine.remove(pks[0])
+        self.assertEquals(engine.similar([pks[0]], 1)[pks[0]], [])
+
+    @skipUnless(sparse, 'NumPy and SciPy are required')
+    def test_similarity_engine_sites(self):
+        nodetype = Nodetype.objects.create(title='Nodetype', content='apple',
+                                           slug='nodetype', status=PUBLISHED)
+        original_engine = comparison._engine
+        comparison._engine = engine = SimilarityEngine(
+            Nodetype.published, ['title', 'excerpt', 'content'], path=None)
+        try:
+            self.assertFalse(nodetype.pk in engine.rows)
+            nodetype.sites.add(Site.objects.get_current())
+            self.assertTrue(nodetype.pk in engine.rows)
+            Site.objects.get_current().nodetypes.clear()
+            self.assertFalse(nodetype.pk in engine.rows)
+        finally:
+            comparison._engine = original_engine
+
+    @skipUnless(sparse, 'NumPy and SciPy are required')
+    def test_similarity_engine_staleness(self):
+        nodetype = Nodetype.objects.create(
+            title='Nodetype', content='apple', slug='nodetype',
+            status=PUBLISHED, start_publication=datetime(3000, 1, 1))
+        nodetype.sites.add(Site.objects.get_current())
+        original_engine = comparison._engine
+        comparison._engine = engine = SimilarityEngine(
+            Nodetype.published, ['title', 'excerpt', 'content'], path=None)
+        try:
+            self.assertFalse(engine.is_stale())
+            # the publication starts without any signal
+            Nodetype.objects.filter(pk=nodetype.pk).update(
+                start_publication=datetime(2000, 1, 1))
+            self.assertTrue(engine.is_stale())
+            self.assertTrue(nodetype.pk in
+                            comparison.get_similarity_engine().rows)
+            self.assertFalse(engine.is_stale())
+        finally:
+            comparison._engine = original_engine
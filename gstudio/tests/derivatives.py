@@ -0,0 +1,81 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's image derivatives"""
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from datetime import timedelta
+
+from PIL import Image
+from django.test import TestCase
+
+from gstudio import derivatives
+from gstudio.models import DerivativeJob
+from gstudio.derivatives import DONE
+from gstudio.derivatives import RUNNING
+from gstudio.derivatives import claim_jobs
+from gstudio.derivatives import enqueue_derivatives
+from gstudio.derivatives import process_derivatives
+
+
+class DerivativesTestCase(TestCase):
+    """Test cases for the image derivatives pipeline"""
+
+    def setUp(self):
+        self.original_root = derivatives.DERIVATIVES_ROOT
+        self.root = derivatives.DERIVATIVES_ROOT = tempfile.mkdtemp()
+        self.source = os.path.join(self.root, 'user', 'picture.png')
+        os.makedirs(os.path.dirname(self.source))
+        Image.new('RGBA', (2048, 1024)).save(self.source, 'PNG')
+
+    def tearDown(self):
+        derivatives.DERIVATIVES_ROOT = self.original_root
+        shutil.rmtree(self.root)
+
+    def test_pipeline(self):
+        thumbnail = os.path.join(self.root, 'user', 'picture-thumbnail')
+        job = enqueue_derivatives(self.source, 'abcdef')
+        self.assertEquals(os.path.realpath(thumbnail),
+                          os.path.realpath(derivatives.placeholder_path(
+                              'thumbnail')))
+        self.assertEquals(process_derivatives(), (1, 0))
+        self.assertEquals(DerivativeJob.objects.get(pk=job.pk).status, DONE)
+        self.assertEquals(Image.open(thumbnail).size, (128, 64))
+        display = os.path.join(self.root, 'user', 'picture_display_1024')
+        self.assertEquals(Image.open(display).size, (1024, 512))
+        self.assertEquals(process_derivatives(), (0, 0))
+
+    def test_shared_derivatives(self):
+        enqueue_derivatives(self.source, 'abcdef')
+        process_derivatives()
+        copy = os.path.join(self.root, 'user', 'copy.png')
+        shutil.copyfile(self.source, copy)
+        self.assertEquals(enqueue_derivatives(copy, 'abcdef'), None)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.root, 'user', 'copy-thumbnail')))
+
+    def test_expired_lease(self):
+        job = enqueue_derivatives(self.source, 'abcdef')
+        self.assertEquals(len(claim_jobs(10)), 1)
+        self.assertEquals(claim_jobs(10), [])
+        DerivativeJob.objects.filter(pk=job.pk).update(
+            leased_until=datetime.now() - timedelta(seconds=1))
+        self.assertEquals(DerivativeJob.objects.get(pk=job.pk).status, RUNNING)
+        self.assertEquals(process_derivatives(), (1, 0))
+        self.assertEquals(DerivativeJob.objects.get(pk=job.pk).status, DONE)
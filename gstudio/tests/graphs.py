@@ -0,0 +1,94 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's graph JSON"""
+import json
+
+from django.test import TestCase
+
+from gstudio.models import Objecttype
+from gstudio.graphs import build_graph
+from gstudio.graphs import ego_network
+from gstudio.graphs import graph_group
+from gstudio.graphs import get_graph_json
+from gstudio.graphs import graph_version
+from gstudio.graphs import predicate_id
+
+
+class GraphsTestCase(TestCase):
+    """Test cases for the graph JSON builder"""
+    urls = 'gstudio.tests.urls'
+
+    def setUp(self):
+        self.parent = Objecttype.objects.create(title='My parent',
+                                                slug='my-parent')
+        self.child = Objecttype.objects.create(title='My child',
+                                               slug='my-child',
+                                               parent=self.parent)
+        self.grandchild = Objecttype.objects.create(title='My grandchild',
+                                                    slug='my-grandchild',
+                                                    parent=self.child)
+        self.parent = Objecttype.objects.get(pk=self.parent.pk)
+
+    def test_build_graph_is_deterministic(self):
+        graph = build_graph(self.parent)
+        self.assertEquals(build_graph(self.parent), graph)
+        ids = [item['_id'] for item in graph['node_metadata']]
+        self.assertEquals(ids[0], str(self.parent.pk))
+        self.assertTrue(predicate_id(self.parent, 'contains_subtypes') in ids)
+
+    def test_get_graph_json(self):
+        data = get_graph_json(self.parent)
+        self.assertEquals(json.loads(data), build_graph(self.parent))
+        self.assertEquals(get_graph_json(self.parent), data)
+
+    def test_graph_version(self):
+        version = graph_version(self.parent)
+        Objecttype.objects.create(title='My other child',
+                                  slug='my-other-child', parent=self.parent)
+        parent = Objecttype.objects.get(pk=self.parent.pk)
+        self.assertNotEquals(graph_version(parent), version)
+        self.assertEquals(parent.last_update, self.parent.last_update)
+        version = graph_version(parent)
+        parent.prior_nodes.add(self.grandchild)
+        self.assertNotEquals(graph_version(parent), version)
+
+    def test_ego_network(self):
+        graph = ego_network(self.parent, depth=2)
+        self.assertEquals([item['_id'] for item in graph['node_metadata']],
+                          [str(self.parent.pk), str(self.child.pk),
+                           str(self.grandchild.pk)])
+        self.assertEquals(
+            [(item['from'], item['type'], item['to'])
+             for item in graph['relations']],
+            [(self.parent.pk, 'contains_subtypes', self.child.pk),
+             (self.child.pk, 'contains_subtypes', self.grandchild.pk)])
+        graph = ego_network(self.parent, depth=1)
+        self.assertEquals(len(graph['node_metadata']), 2)
+
+    def test_ego_network_fanout(self):
+        Objecttype.objects.create(title='My other child',
+                                  slug='my-other-child', parent=self.parent)
+        graph = ego_network(self.parent, depth=2, fanout=1)
+        self.assertEquals(graph['node_metadata'][-1]['_id'],
+                          '%s-contains_subtypes-more' % self.parent.pk)
+        self.assertEquals(graph['node_metadata'][-1]['count'], 2)
+        group = graph_group(self.parent.pk, 'contains_subtypes', per_page=1)
+        self.assertEquals(group['count'], 2)
+        self.assertEquals(group['num_pages'], 2)
+        self.assertEquals([item['_id'] for item in group['node_metadata']],
+                          [str(self.child.pk)])
@@ -0,0 +1,69 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's loom statistics"""
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from objectapp.models import Gbobject
+from objectapp.models import System
+from gstudio.loom import descendant_counts
+from gstudio.loom import first_authors
+from gstudio.loom import loom_generation
+from gstudio.loom import response_tree
+
+
+class LoomTestCase(TestCase):
+    """Test cases for the loom statistics"""
+
+    def test_descendant_counts(self):
+        children = {1: [2, 3], 2: [4], 4: [5], 6: [6]}
+        self.assertEquals(descendant_counts([1, 6], children),
+                          {1: 4, 2: 2, 3: 0, 4: 1, 5: 0, 6: 1})
+
+    def test_response_tree(self):
+        twist = Gbobject.objects.create(title='Twist', slug='twist')
+        response = Gbobject.objects.create(title='Response', slug='response')
+        reply = Gbobject.objects.create(title='Reply', slug='reply')
+        twist.posterior_nodes.add(response)
+        response.posterior_nodes.add(reply)
+        self.assertEquals(response_tree([twist.pk]),
+                          {twist.pk: [response.pk], response.pk: [reply.pk]})
+
+    def test_posts_invalidate_statistics(self):
+        thread = System.objects.create(title='Thread', slug='thread')
+        box = System.objects.create(title='Box', slug='box')
+        other = System.objects.create(title='Other', slug='other')
+        thread.system_set.add(box)
+        twist = Gbobject.objects.create(title='Twist', slug='twist')
+        response = Gbobject.objects.create(title='Response', slug='response')
+        box.gbobject_set.add(twist)
+        generation = loom_generation(thread.pk)
+        other_generation = loom_generation(other.pk)
+        twist.posterior_nodes.add(response)
+        self.assertEquals(loom_generation(thread.pk), generation + 1)
+        self.assertEquals(loom_generation(other.pk), other_generation)
+        twist.posterior_nodes.remove(response)
+        self.assertEquals(loom_generation(thread.pk), generation + 2)
+
+    def test_first_authors(self):
+        twist = Gbobject.objects.create(title='Twist', slug='twist')
+        first = User.objects.create(username='first')
+        second = User.objects.create(username='second')
+        twist.authors.add(second, first)
+        self.assertEquals(first_authors([twist.pk]),
+                          {twist.pk: twist.authors.all()[0].pk})
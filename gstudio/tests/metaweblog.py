@@ -15,22 +15,6 @@
 #     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-s# Copyright (c) 2011,  2012 Free Software Foundation
-
-#     This program is free software: you can redistribute it and/or modify
-#     it under the terms of the GNU Affero General Public License as
-#     published by the Free Software Foundation, either version 3 of the
-#     License, or (at your option) any later version.
-
-#     This program is distributed in the hope that it will be useful,
-#     but WITHOUT ANY WARRANTY; without even the implied warranty of
-#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
-#     GNU Affero General Public License for more details.
-
-#     You should have received a copy of the GNU Affero General Public License
-#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
-
-
 # This project incorporates work covered by the following copyright and permission notice:  
 
 #    Copyright (c) 2009, Julien Fache
@@ -65,6 +49,7 @@ s# Copyright (c) 2011,  2012 Free Software Foundation
 """Test cases for Gstudio's MetaWeblog API"""
 from xmlrpclib import Binary
 from xmlrpclib import Fault
+from xmlrpclib import MultiCall
 from xmlrpclib import ServerProxy
 from datetime import datetime
 from tempfile import TemporaryFile
@@ -76,9 +61,15 @@ from django.core.files.storage import default_storage
 
 from gstudio.models import Nodetype
 from gstudio.models import Metatype
+from gstudio.models import Node
+from gstudio.models import Objecttype
 from gstudio.managers import DRAFT
 from gstudio.managers import PUBLISHED
 from gstudio.settings import UPLOAD_TO
+from gstudio.nbhood import mark_dirty
+from gstudio.nbhood import dump_nbhood
+from gstudio.nbhood import nbhood_batch
+from gstudio.xmlrpc import metaweblog
 from gstudio.xmlrpc.metaweblog import authenticate
 from gstudio.xmlrpc.metaweblog import post_structure
 from gstudio.tests.utils import TestTransport
@@ -358,3 +349,135 @@ class MetaWeblogTestCase(TestCase):
         self.assertTrue('/gstudio_test_file' in new_media['url'])
         default_storage.delete('/'.join([
             UPLOAD_TO, new_media['url'].split('/')[-1]]))
+
+    def create_objecttypes(self):
+        self.objecttypes = [
+            Objecttype.objects.create(title='My objecttype 1',
+                                      slug='my-objecttype-1'),
+            Objecttype.objects.create(title='My objecttype 2',
+                                      slug='my-objecttype-2')]
+
+    def test_get_neighbourhoods(self):
+        self.create_objecttypes()
+        ids = [self.objecttypes[0].pk, self.objecttypes[1].pk, 9999, 'bad']
+        response = self.server.metaWeblog.getNeighbourhoods(
+            ids, 'rendered_nbh')
+        self.assertEquals(response['page'], 1)
+        self.assertEquals(response['has_next'], False)
+        self.assertEquals(response['errors'],
+                          {'9999': 'Node Does Not Exist',
+                           'bad': 'Node Does Not Exist'})
+        nbh_1, nbh_2 = response['neighbourhoods']
+        self.assertEquals(nbh_1['id'], self.objecttypes[0].pk)
+        self.assertEquals(nbh_1['title'], 'My objecttype 1')
+        self.assertEquals(nbh_1['type'], 'Objecttype')
+        self.assertEquals(nbh_1['url'], 'http://%s%s' % (
+            self.site.domain, self.objecttypes[0].get_absolute_url()))
+        self.assertEquals(nbh_1['nbh']['title'], 'My objecttype 1')
+        self.assertEquals(nbh_2['id'], self.objecttypes[1].pk)
+
+        objecttype_id = self.objecttypes[0].pk
+        response = self.server.metaWeblog.getGbobjectNeighbourhoods(
+            [objecttype_id], 'rendered_nbh')
+        self.assertEquals(response['errors'],
+                          {str(objecttype_id): 'Not of type Gbobject'})
+
+    def test_get_neighbourhoods_pages(self):
+        self.create_objecttypes()
+        original_page_size = metaweblog.XMLRPC_PAGE_SIZE
+        metaweblog.XMLRPC_PAGE_SIZE = 1
+        ids = [self.objecttypes[0].pk, self.objecttypes[1].pk]
+        response = self.server.metaWeblog.getNeighbourhoods(
+            ids, 'rendered_nbh')
+        self.assertEquals(response['has_next'], True)
+        self.assertEquals(response['neighbourhoods'][0]['id'],
+                          self.objecttypes[0].pk)
+        response = self.server.metaWeblog.getNeighbourhoods(
+            ids, 'rendered_nbh', 2)
+        self.assertEquals(response['has_next'], False)
+        self.assertEquals(response['neighbourhoods'][0]['id'],
+                          self.objecttypes[1].pk)
+        metaweblog.XMLRPC_PAGE_SIZE = original_page_size
+
+    def test_get_neighbourhoods_multicall(self):
+        self.create_objecttypes()
+        multicall = MultiCall(self.server)
+        multicall.metaWeblog.getNeighbourhoods(
+            [self.objecttypes[0].pk], 'rendered_nbh')
+        multicall.metaWeblog.getNeighbourhoods(
+            [self.objecttypes[1].pk], 'rendered_nbh')
+        responses = list(multicall())
+        self.assertEquals([response['neighbourhoods'][0]['id']
+                           for response in responses],
+                          [self.objecttypes[0].pk, self.objecttypes[1].pk])
+
+    def test_get_neighbourhoods_pending(self):
+        self.create_objecttypes()
+        objecttype_id = self.objecttypes[0].pk
+        Node._base_manager.filter(pk=objecttype_id).update(
+            nbhood=dump_nbhood({'title': 'Stale'}))
+        with nbhood_batch():
+            mark_dirty(objecttype_id, 'names')
+            response = self.server.metaWeblog.getNeighbourhoods(
+                [objecttype_id], 'rendered_nbh')
+        self.assertEquals(response['neighbourhoods'][0]['nbh']['title'],
+                          'My objecttype 1')
+
+    def test_get_neighbourhoods_stored(self):
+        self.create_objecttypes()
+        objecttype_id = self.objecttypes[0].pk
+        Node._base_manager.filter(pk=objecttype_id).update(
+            nbhood=dump_nbhood({'title': 'Stored'}))
+        response = self.server.metaWeblog.getNeighbourhoods(
+            [objecttype_id], 'nbh')
+        self.assertEquals(response['neighbourhoods'][0]['nbh']['title'],
+                          'Stored')
+
+    def test_get_neighbourhood(self):
+        self.create_objecttypes()
+        response = self.server.metaWeblog.getNeighbourhood(
+            [self.objecttypes[0].pk, 9999], 'rendered_nbh')
+        self.assertEquals(response['9999'], 'Node Does Not Exist')
+        self.assertTrue('My objecttype 1' in response[str(self.objecttypes[0].pk)])
+        response = self.server.metaWeblog.getGbobjectNeighbourhood(
+            [self.objecttypes[0].pk], 'rendered_nbh')
+        self.assertEquals(response[str(self.objecttypes[0].pk)],
+                          'Not of type Gboject')
+
+    def test_get_all(self):
+        self.create_objecttypes()
+        self.assertEquals(self.server.metaWeblog.getAll('Objecttype'),
+                          {'My objecttype 1': self.objecttypes[0].pk,
+                           'My objecttype 2': self.objecttypes[1].pk})
+        self.assertEquals(self.server.metaWeblog.getAll('Unknown'),
+                          'The class with the given name Does not exist')
+
+    def test_get_all_page(self):
+        self.create_objecttypes()
+        response = self.server.metaWeblog.getAllPage('Objecttype', 0, 1)
+        self.assertEquals(response['nodes'],
+                          [[self.objecttypes[0].pk, 'My objecttype 1']])
+        self.assertEquals(response['has_next'], True)
+        response = self.server.metaWeblog.getAllPage(
+            'Objecttype', response['after'], 1)
+        self.assertEquals(response['nodes'],
+                          [[self.objecttypes[1].pk, 'My objecttype 2']])
+        self.assertEquals(response['has_next'], False)
+        response = self.server.metaWeblog.getAllPage(
+            'Objecttype', 0, 0, '3000-01-01T00:00:00')
+        self.assertEquals(response, {'nodes': [], 'after': 0,
+                                     'has_next': False})
+        self.assertEquals(
+            len(self.server.metaWeblog.getAllPage(
+                'Objecttype', 0, 0, '2000-01-01T00:00:00')['nodes']), 2)
+
+    def test_get_snapshots_page(self):
+        self.create_objecttypes()
+        objecttype_id = self.objecttypes[0].pk
+        ssids = self.server.metaWeblog.getAllSnapshots(objecttype_id)
+        response = self.server.metaWeblog.getSnapshotsPage(objecttype_id)
+        self.assertEquals([snapshot[0] for snapshot in
+                           response['snapshots']], ssids)
+        self.assertEquals(response['has_next'], False)
+        self.assertEquals(self.server.metaWeblog.getSnapshotsPage(9999),
+                          'Node Does Not Exist')
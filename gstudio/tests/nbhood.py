@@ -0,0 +1,162 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's incremental neighbourhood"""
+from __future__ import with_statement
+from django.db import transaction
+from django.test import TestCase
+
+from gstudio import nbhood
+from gstudio.middleware import NbhoodMiddleware
+from gstudio.models import Objecttype
+from gstudio.models import Relation
+from gstudio.models import Relationtype
+from gstudio.nbhood import load_nbhood
+from gstudio.nbhood import dump_nbhood
+from gstudio.nbhood import mark_dirty
+from gstudio.nbhood import nbhood_batch
+from gstudio.nbhood_codec import decode
+from gstudio.nbhood_codec import decode_key
+from gstudio.nbhood_codec import encode
+from gstudio.nbhood_codec import is_legacy
+
+
+class NbhoodTestCase(TestCase):
+    """Test cases for the nbhood engine"""
+
+    def test_load_dump_nbhood(self):
+        nbh = {'title': u'My objecttype', 'contains_subtypes': {},
+               'history': [0]}
+        self.assertEquals(load_nbhood(dump_nbhood(nbh)), nbh)
+        self.assertEquals(load_nbhood(''), {})
+        self.assertEquals(load_nbhood('[]'), {})
+        self.assertEquals(load_nbhood('{<Nodetype: broken>: 1}'), {})
+
+    def test_codec(self):
+        objecttype = Objecttype.objects.create(title='My objecttype',
+                                               slug='my-objecttype')
+        text = encode({'title': u'My objecttype', 'history': [0],
+                       'type_of': {objecttype: '/url/'},
+                       'contains_members': [objecttype]})
+        self.assertFalse(is_legacy(text))
+        self.assertEquals(decode(text, ['title', 'missing']),
+                          {'title': u'My objecttype'})
+        self.assertEquals(decode_key(text, 'type_of'),
+                          {u'My objecttype': u'/url/'})
+        self.assertEquals(decode_key(text, 'contains_members'),
+                          [{u'id': objecttype.pk, u'title': u'My objecttype'}])
+        self.assertTrue(is_legacy("{'title': u'My objecttype'}"))
+        self.assertEquals(decode("{'title': u'My objecttype'}"),
+                          {'title': u'My objecttype'})
+
+    def test_batch_coalesces_updates(self):
+        flushed = []
+        original_flush = nbhood.flush_nbhood
+        nbhood.flush_nbhood = lambda: flushed.append(dict(nbhood._pending()))
+        try:
+            with nbhood_batch():
+                mark_dirty(1, 'relations')
+                mark_dirty(1, 'attributes')
+                mark_dirty(2, 'ats')
+                self.assertEquals(flushed, [])
+        finally:
+            nbhood.flush_nbhood = original_flush
+        self.assertEquals(flushed, [{1: set(['relations', 'attributes']),
+                                     2: set(['ats'])}])
+        nbhood._state.pending = {}
+
+    def test_subtype_updates_parent(self):
+        parent = Objecttype.objects.create(title='My parent',
+                                           slug='my-parent')
+        Objecttype.objects.create(title='My child', slug='my-child',
+                                  parent=parent)
+        parent = Objecttype.objects.get(pk=parent.pk)
+        self.assertEquals(load_nbhood(parent.nbhood)['contains_subtypes'].keys(),
+                          [u'My child'])
+
+    def test_reset_batch(self):
+        nbhood.begin_batch()
+        nbhood.begin_batch()
+        mark_dirty(-1, 'relations')
+        nbhood.reset_batch()
+        self.assertEquals(nbhood._state.depth, 0)
+        self.assertEquals(nbhood._pending(), {})
+
+    def test_m2m_updates_nbhood(self):
+        prior = Objecttype.objects.create(title='My prior', slug='my-prior')
+        objecttype = Objecttype.objects.create(title='My objecttype',
+                                               slug='my-objecttype')
+        objecttype.prior_nodes.add(prior)
+        objecttype = Objecttype.objects.get(pk=objecttype.pk)
+        self.assertEquals(load_nbhood(objecttype.nbhood)['priornodes'].keys(),
+                          [u'My prior'])
+        prior.nodetype_prior_nodes.clear()
+        objecttype = Objecttype.objects.get(pk=objecttype.pk)
+        self.assertEquals(load_nbhood(objecttype.nbhood)['priornodes'], {})
+
+    def test_rename_updates_listing_nodes(self):
+        prior = Objecttype.objects.create(title='My prior', slug='my-prior')
+        objecttype = Objecttype.objects.create(title='My objecttype',
+                                               slug='my-objecttype')
+        objecttype.prior_nodes.add(prior)
+        prior.title = 'My renamed prior'
+        prior.save()
+        objecttype = Objecttype.objects.get(pk=objecttype.pk)
+        self.assertEquals(load_nbhood(objecttype.nbhood)['priornodes'].keys(),
+                          [u'My renamed prior'])
+
+    def test_rename_relationtype_updates_subjects(self):
+        left = Objecttype.objects.create(title='My left', slug='my-left')
+        right = Objecttype.objects.create(title='My right', slug='my-right')
+        relationtype = Relationtype.objects.create(
+            title='knows', slug='knows', inverse='known by',
+            left_subjecttype=left, right_subjecttype=right)
+        Relation.objects.create(left_subject=left, right_subject=right,
+                                relationtype=relationtype)
+        relationtype.title = 'meets'
+        relationtype.inverse = 'met by'
+        relationtype.save()
+        left = Objecttype.objects.get(pk=left.pk)
+        self.assertEquals(load_nbhood(left.nbhood)['relations'].keys(),
+                          [u'meets'])
+        right = Objecttype.objects.get(pk=right.pk)
+        self.assertEquals(load_nbhood(right.nbhood)['relations'].keys(),
+                          [u'met by'])
+
+    def test_middleware_exception(self):
+        flushed = []
+        original_flush = nbhood.flush_nbhood
+        original_is_managed = transaction.is_managed
+
+        def flush_nbhood():
+            flushed.append(dict(nbhood._pending()))
+            nbhood._state.pending = {}
+        nbhood.flush_nbhood = flush_nbhood
+        middleware = NbhoodMiddleware()
+        try:
+            for managed in (False, True):
+                transaction.is_managed = lambda: managed
+                middleware.process_request(None)
+                mark_dirty(1, 'relations')
+                middleware.process_exception(None, Exception())
+                middleware.process_response(None, None)
+        finally:
+            nbhood.flush_nbhood = original_flush
+            transaction.is_managed = original_is_managed
+            nbhood._state.pending = {}
+        self.assertEquals([each for each in flushed if each],
+                          [{1: set(['relations'])}])
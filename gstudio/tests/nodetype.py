@@ -252,6 +252,27 @@ class NodetypeTestCase(TestCase):
         self.assertEquals(len(self.nodetype.related_published), 1)
         self.assertEquals(len(self.second_nodetype.related_published), 1)
 
+    def test_ancestors_and_tree_path(self):
+        params = {'title': 'My child nodetype',
+                  'content': 'My child content',
+                  'slug': 'my-child-nodetype',
+                  'parent': self.nodetype}
+        child = Nodetype.objects.create(**params)
+        params = {'title': 'My grandchild nodetype',
+                  'content': 'My grandchild content',
+                  'slug': 'my-grandchild-nodetype',
+                  'parent': child}
+        grandchild = Nodetype.objects.create(**params)
+        self.nodetype = Nodetype.objects.get(pk=self.nodetype.pk)
+        self.assertEquals(list(grandchild.get_ancestor_ids()),
+                          [self.nodetype.pk, child.pk])
+        self.assertEquals(list(grandchild.get_ancestor_ids(include_self=True)),
+                          [self.nodetype.pk, child.pk, grandchild.pk])
+        self.assertEquals(list(self.nodetype.get_descendant_ids()),
+                          [child.pk, grandchild.pk])
+        self.assertEquals(grandchild.tree_path,
+                          'my-nodetype/my-child-nodetype/my-grandchild-nodetype')
+
 
 class NodetypeHtmlContentTestCase(TestCase):
 
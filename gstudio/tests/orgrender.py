@@ -0,0 +1,82 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's org-mode rendering service"""
+from StringIO import StringIO
+
+from django.test import TestCase
+from django.core.cache import cache
+
+from gstudio import orgrender
+from gstudio.orgrender import org_body
+from gstudio.orgrender import org_legacy_body
+from gstudio.orgrender import org_source
+from gstudio.orgrender import render_org
+from gstudio.orgrender import render_org_many
+
+
+def fake_export(source):
+    header = ['head\n'] * orgrender.ORG_HEADER_LINES
+    footer = ['foot\n'] * orgrender.ORG_FOOTER_LINES
+    body = source.split('\n#+OPTIONS')[0]
+    return u''.join(header + ['<div id="content">\n', '  <p>%s</p>\n' % body]
+                    + footer)
+
+
+class OrgRenderTestCase(TestCase):
+    """Test cases for the org-mode rendering service"""
+
+    def setUp(self):
+        self.exported = []
+        self.original_convert = orgrender.convert_source
+
+        def convert(source):
+            self.exported.append(source)
+            return fake_export(source)
+        orgrender.convert_source = convert
+        cache.clear()
+
+    def tearDown(self):
+        orgrender.convert_source = self.original_convert
+
+    def test_org_source(self):
+        self.assertEquals(org_source(u'a\r\nb'),
+                          'a\nb' + orgrender.ORG_OPTIONS)
+
+    def test_org_body(self):
+        self.assertEquals(org_body(fake_export('text')),
+                          '<div id=" "\n<p>text</p>\n')
+
+    def test_org_legacy_body(self):
+        html = u''.join(['head\n'] * orgrender.ORG_LEGACY_HEADER_LINES +
+                        ['<div id="content">\n', u'\xa0 <p>text\u2028</p>\n'] +
+                        ['foot\n'] * orgrender.ORG_LEGACY_FOOTER_LINES)
+        lines = StringIO(html.encode('utf-8')).readlines()
+        sliced = ''.join([line.lstrip() for line in lines[72:][:-3]])
+        self.assertEquals(org_legacy_body(html).encode('utf-8'), sliced)
+
+    def test_render_org_is_cached(self):
+        self.assertEquals(render_org('text'), '<div id=" "\n<p>text</p>\n')
+        self.assertEquals(render_org('text\r'), render_org('text'))
+        self.assertEquals(len(self.exported), 1)
+
+    def test_render_org_many(self):
+        render_org('one')
+        self.assertEquals(render_org_many(['one', 'two', 'three']),
+                          ['<div id=" "\n<p>%s</p>\n' % text
+                           for text in ('one', 'two', 'three')])
+        self.assertEquals(len(self.exported), 3)
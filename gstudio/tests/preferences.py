@@ -0,0 +1,77 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's user preferences"""
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from gstudio.models import Attribute
+from gstudio.models import Attributetype
+from gstudio.models import Objecttype
+from gstudio.preferences import PreferenceLRU
+from gstudio.preferences import author_preferences
+from gstudio.preferences import user_preference
+from gstudio.preferences import invalidate_preferences
+from objectapp.models import Gbobject
+
+
+class PreferencesTestCase(TestCase):
+    """Test cases for the user preferences"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='webmaster',
+                                             email='webmaster@example.com')
+        factory = Objecttype.objects.create(title='Factory_Object',
+                                            slug='factory-object')
+        self.bg_color = Attributetype.objects.create(
+            title='bg_color', slug='bg_color', subjecttype=factory)
+        self.preference = Gbobject.objects.create(
+            title='webmaster_preference', slug='webmaster_loom_preference')
+        invalidate_preferences(self.user.pk)
+
+    def test_preference_lru(self):
+        lru = PreferenceLRU(2, 60)
+        lru.set(1, {'bg_color': '111111'})
+        lru.set(2, {})
+        lru.get(1)
+        lru.set(3, {})
+        self.assertEquals(lru.get(1), {'bg_color': '111111'})
+        self.assertEquals(lru.get(2), None)
+        self.assertEquals(PreferenceLRU(2, -1).get(1), None)
+
+    def test_user_preference_invalidation(self):
+        self.assertEquals(user_preference(self.user.pk, 'bg_color'), '')
+        attribute = Attribute.objects.create(
+            attributetype=self.bg_color, subject=self.preference,
+            svalue='E8E8E8')
+        self.assertEquals(user_preference(self.user.pk, 'bg_color'),
+                          'E8E8E8')
+        attribute.svalue = 'FFFFFF'
+        attribute.save()
+        self.assertEquals(user_preference(self.user.pk, 'bg_color'),
+                          'FFFFFF')
+
+    def test_author_preferences(self):
+        Attribute.objects.create(attributetype=self.bg_color,
+                                 subject=self.preference, svalue='E8E8E8')
+        post = Gbobject.objects.create(title='Post', slug='post')
+        post.authors.add(self.user)
+        orphan = Gbobject.objects.create(title='Orphan', slug='orphan')
+        self.assertEquals(author_preferences([post, orphan]),
+                          {post.pk: {'bg_color': 'E8E8E8'}, orphan.pk: {}})
+        self.assertEquals(post.get_object_bgcolor, 'E8E8E8')
+        self.assertEquals(post.get_object_fontcolor, '')
@@ -0,0 +1,104 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's presence"""
+from datetime import datetime
+from datetime import timedelta
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.test.client import RequestFactory
+from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+
+from gstudio.models import Presence
+from gstudio.presence import touch
+from gstudio.presence import online_user_ids
+from gstudio.presence import user_sessions
+from gstudio.presence import clear_expired_presences
+from gstudio.middleware import PresenceMiddleware
+
+
+class PresenceTestCase(TestCase):
+    """Test cases for the presence of the users"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user('user%s' % i,
+                                               'user%s@example.com' % i)
+                      for i in range(3)]
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def request(self, user):
+        request = self.factory.get('/')
+        request.user = user
+        request.session = SessionStore()
+        request.session['_auth_user_id'] = user.pk
+        request.session.save()
+        return request
+
+    def test_middleware(self):
+        middleware = PresenceMiddleware()
+        request = self.request(self.users[0])
+        middleware.process_request(request)
+        middleware.process_request(request)
+        self.assertEquals(Presence.objects.count(), 1)
+        anonymous = self.factory.get('/')
+        anonymous.user = AnonymousUser()
+        anonymous.session = SessionStore()
+        middleware.process_request(anonymous)
+        self.assertEquals(Presence.objects.count(), 1)
+
+    def test_touch_throttled(self):
+        request = self.request(self.users[0])
+        self.assertTrue(touch(request))
+        self.assertFalse(touch(request))
+        Presence.objects.update(last_seen=datetime(2000, 1, 1))
+        self.assertTrue(touch(request, force=True))
+        self.assertTrue(Presence.objects.get().last_seen.year > 2000)
+
+    def test_online_user_ids(self):
+        for user in self.users[:2]:
+            touch(self.request(user))
+        Presence.objects.filter(user=self.users[1]).update(
+            last_seen=datetime.now() - timedelta(days=1))
+        self.assertEquals(online_user_ids(), set([self.users[0].pk]))
+        self.assertEquals(online_user_ids([self.users[1].pk,
+                                           self.users[2].pk]), set())
+        self.assertEquals(online_user_ids([]), set())
+
+    def test_user_sessions(self):
+        requests = [self.request(self.users[0]) for i in range(2)]
+        for request in requests:
+            touch(request)
+        touch(self.request(self.users[1]))
+        self.assertEquals(
+            sorted([session.session_key
+                    for session in user_sessions(self.users[0])]),
+            sorted([request.session.session_key for request in requests]))
+
+    def test_clear_expired_presences(self):
+        touch(self.request(self.users[0]))
+        touch(self.request(self.users[1]))
+        Presence.objects.filter(user=self.users[0]).update(
+            expire_date=datetime.now() - timedelta(seconds=1))
+        self.assertEquals(online_user_ids(), set([self.users[1].pk]))
+        self.assertEquals(clear_expired_presences(), 1)
+        self.assertEquals(Presence.objects.count(), 1)
@@ -0,0 +1,71 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test cases for Gstudio's RDF export"""
+from datetime import datetime
+from StringIO import StringIO
+
+from django.test import TestCase
+
+from gstudio.models import Attribute
+from gstudio.models import Attributetype
+from gstudio.models import Objecttype
+from gstudio.rdf import nt_term
+from gstudio.rdf import export_rdf
+from gstudio.settings import RDF_NAMESPACE
+from rdflib.term import Literal
+
+
+class RDFExportTestCase(TestCase):
+    """Test cases for the streaming RDF export"""
+
+    def setUp(self):
+        self.image = Objecttype.objects.create(title='Image', slug='image')
+        self.attributetype = Attributetype.objects.create(
+            title='color', slug='color', subjecttype=self.image)
+        self.attribute = Attribute.objects.create(
+            attributetype=self.attributetype, subject=self.image,
+            svalue='red "dark"')
+
+    def export(self, **kwargs):
+        stream = StringIO()
+        exported = export_rdf(stream, **kwargs)
+        return exported, stream.getvalue().decode('utf-8')
+
+    def test_nt_term(self):
+        self.assertEquals(nt_term(Literal('a "b"\nc')), u'"a \\"b\\"\\nc"')
+
+    def test_export_ntriples(self):
+        exported, rdf = self.export(chunk_size=1)
+        self.assertEquals(exported, 3)
+        self.assertTrue(u'<%s%s> <%stitle> "Image" .' % (
+            RDF_NAMESPACE, self.image.pk, RDF_NAMESPACE) in rdf)
+        self.assertTrue(u'<%s%s> <%scolor> "red \\"dark\\"" .' % (
+            RDF_NAMESPACE, self.image.pk, RDF_NAMESPACE) in rdf)
+        for line in rdf.splitlines():
+            self.assertTrue(line.endswith(' .'))
+
+    def test_export_turtle(self):
+        exported, rdf = self.export(notation='turtle',
+                                    nodemodels=['Objecttype'])
+        self.assertEquals(exported, 1)
+        self.assertTrue(rdf.startswith(u'@prefix gstudio: <%s> .' %
+                                       RDF_NAMESPACE))
+        self.assertTrue(u'gstudio:title "Image" ;' in rdf)
+
+    def test_export_since(self):
+        self.assertEquals(self.export(since=datetime(2000, 1, 1))[0], 3)
+        self.assertEquals(self.export(since=datetime(3000, 1, 1))[0], 0)
@@ -0,0 +1,59 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's resolver"""
+from __future__ import with_statement
+from django.test import TestCase
+
+from gstudio.models import NID
+from gstudio.models import Objecttype
+from gstudio.resolver import get_resolved
+from gstudio.resolver import resolver_scope
+from gstudio.resolver import open_resolver_scope
+from gstudio.resolver import close_resolver_scope
+
+
+class ResolverTestCase(TestCase):
+    """Test cases for the scope of the resolved nodes"""
+
+    def setUp(self):
+        self.objecttype = Objecttype.objects.create(title='My objecttype',
+                                                    slug='my-objecttype')
+
+    def test_no_memo_outside_scope(self):
+        NID.objects.resolve(self.objecttype.pk)
+        self.assertEquals(get_resolved(self.objecttype.pk), None)
+
+    def test_scope(self):
+        with resolver_scope():
+            node = NID.objects.resolve(self.objecttype.pk)
+            with resolver_scope():
+                self.assertEquals(get_resolved(self.objecttype.pk), node)
+            self.assertEquals(get_resolved(self.objecttype.pk), node)
+            self.objecttype.save()
+            self.assertEquals(get_resolved(self.objecttype.pk), None)
+        NID.objects.resolve(self.objecttype.pk)
+        self.assertEquals(get_resolved(self.objecttype.pk), None)
+
+    def test_request_scope(self):
+        open_resolver_scope()
+        NID.objects.resolve(self.objecttype.pk)
+        self.assertNotEquals(get_resolved(self.objecttype.pk), None)
+        open_resolver_scope()
+        self.assertEquals(get_resolved(self.objecttype.pk), None)
+        close_resolver_scope()
+        self.assertEquals(get_resolved(self.objecttype.pk), None)
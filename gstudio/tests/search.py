@@ -0,0 +1,103 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test cases for Gstudio's search parsing"""
+from django.test import TestCase
+from django.contrib.sites.models import Site
+
+from gstudio import search
+from gstudio.models import Nodetype
+from gstudio.managers import PUBLISHED
+from gstudio.search import parse_cache
+from gstudio.search import compile_query
+from gstudio.search import parse_pattern
+from gstudio.search import explain
+from gstudio.search import SearchQueryError
+from gstudio.search import SearchBudgetError
+
+
+class SearchParseTestCase(TestCase):
+    """Test cases for the cached parsing of the search patterns"""
+
+    def setUp(self):
+        parse_cache.clear()
+        site = Site.objects.get_current()
+        for title in ('My content 1', 'My content 2'):
+            nodetype = Nodetype.objects.create(
+                title=title, slug=title.lower().replace(' ', '-'),
+                status=PUBLISHED)
+            nodetype.sites.add(site)
+
+    def test_normalize_pattern(self):
+        self.assertEquals(search.normalize_pattern('  content   1 '),
+                          'content 1')
+        self.assertEquals(search.normalize_pattern(' "My  content" '),
+                          '"My  content"')
+
+    def test_parse_cache(self):
+        query, cached, parse_time = parse_pattern(search.QUERY, 'content 1')
+        self.assertFalse(cached)
+        query, cached, parse_time = parse_pattern(search.QUERY,
+                                                  ' content  1')
+        self.assertTrue(cached)
+        self.assertEquals(parse_time, 0.0)
+        self.assertEquals(compile_query('content 1').children,
+                          query.children)
+        self.assertEquals(Nodetype.published.advanced_search(
+            'content 1').count(), 1)
+        self.assertEquals(Nodetype.published.advanced_search(
+            'content 1').count(), 1)
+
+    def test_parse_cache_size(self):
+        original_size = parse_cache.size
+        parse_cache.size = 2
+        for pattern in ('content', 'content 1', 'content 2'):
+            compile_query(pattern)
+        self.assertEquals(parse_cache.items.keys(),
+                          [('query', 'content 1'), ('query', 'content 2')])
+        parse_cache.size = original_size
+
+    def test_parse_errors(self):
+        self.assertRaises(SearchQueryError, compile_query, 'content (')
+        self.assertEquals(parse_cache.get(('query', 'content ('))[0], None)
+        self.assertRaises(SearchQueryError, compile_query, 'content (')
+        original_length = search.SEARCH_PARSE_MAX_LENGTH
+        search.SEARCH_PARSE_MAX_LENGTH = 5
+        self.assertRaises(SearchQueryError, compile_query, 'content')
+        search.SEARCH_PARSE_MAX_LENGTH = original_length
+        self.assertEquals(Nodetype.published.search('content (').count(), 2)
+
+    def test_parse_budget(self):
+        original_budget = search.SEARCH_PARSE_TIME_BUDGET
+        search.SEARCH_PARSE_TIME_BUDGET = -1
+        self.assertRaises(SearchBudgetError, compile_query, 'content 1')
+        self.assertEquals(parse_cache.get(('query', 'content 1')), None)
+        search.SEARCH_PARSE_TIME_BUDGET = original_budget
+        self.assertFalse(parse_pattern(search.QUERY, 'content 1')[1])
+
+    def test_explain(self):
+        report = explain('content 1', Nodetype.published)
+        self.assertEquals(report['backend'], 'gstudio.search_backends.database')
+        self.assertEquals(report['normalized'], 'content 1')
+        self.assertEquals(report['results'], 1)
+        self.assertFalse(report['cached'])
+        self.assertFalse(report['fallback'])
+        self.assertTrue(report['parse_time'] >= 0)
+        self.assertTrue(report['db_time'] >= 0)
+        self.assertTrue(explain('content 1', Nodetype.published)['cached'])
+        report = explain('content (', Nodetype.published)
+        self.assertTrue(report['fallback'])
+        self.assertEquals(report['results'], 2)
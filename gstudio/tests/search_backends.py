@@ -0,0 +1,99 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's search backends"""
+from django.test import TestCase
+from django.contrib.sites.models import Site
+
+from gstudio.models import Nodetype
+from gstudio.models import SearchTerm
+from gstudio.managers import PUBLISHED
+from gstudio.search import parse_tree
+from gstudio import search_backends
+from gstudio.search_backends import inverted
+
+
+class InvertedSearchTestCase(TestCase):
+    """Test cases for the inverted index search backend"""
+
+    def setUp(self):
+        self.original_backend = search_backends.SEARCH_BACKEND
+        search_backends.SEARCH_BACKEND = 'gstudio.search_backends.inverted'
+        site = Site.objects.get_current()
+        self.nodetypes = []
+        for title, content, tags in (
+            ('Photosynthesis', 'Plants convert light', 'biology, plants'),
+            ('Light', 'Light travels fast', 'physics'),
+            ('Plants', 'Plants need water and light', 'biology')):
+            nodetype = Nodetype.objects.create(
+                title=title, content=content, tags=tags,
+                slug=title.lower(), status=PUBLISHED)
+            nodetype.sites.add(site)
+            self.nodetypes.append(nodetype)
+
+    def tearDown(self):
+        search_backends.SEARCH_BACKEND = self.original_backend
+
+    def search(self, pattern):
+        return list(inverted.search(Nodetype.published, pattern))
+
+    def test_tokenize(self):
+        self.assertEquals(inverted.tokenize('The Plants, and 2 trees!'),
+                          ['plants', '2', 'trees'])
+
+    def test_index_node(self):
+        photosynthesis = self.nodetypes[0]
+        self.assertEquals(SearchTerm.objects.filter(
+            node=photosynthesis.pk, term='plants').count(), 2)
+        photosynthesis.content = 'Leaves convert light'
+        photosynthesis.save()
+        self.assertEquals(SearchTerm.objects.filter(
+            node=photosynthesis.pk, term='leaves').count(), 1)
+
+    def test_search(self):
+        photosynthesis, light, plants = self.nodetypes
+        self.assertEquals(self.search('light'), [light, photosynthesis,
+                                                 plants])
+        self.assertEquals(self.search('plants -water'), [photosynthesis])
+        self.assertEquals(self.search('water or travels'), [light, plants])
+        self.assertEquals(self.search('tag:biology'),
+                          [photosynthesis, plants])
+        self.assertEquals(self.search('photo*'), [photosynthesis])
+        self.assertEquals(self.search('"need water"'), [plants])
+        self.assertEquals(self.search('"water need"'), [])
+        self.assertEquals(len(self.search('the')), 3)
+
+    def test_empty_index(self):
+        SearchTerm.objects.all().delete()
+        # the database backend matches the titles only
+        self.assertEquals([nodetype.pk for nodetype in self.search('light')],
+                          [self.nodetypes[1].pk])
+
+    def test_max_results(self):
+        original_max_results = inverted.SEARCH_MAX_RESULTS
+        inverted.SEARCH_MAX_RESULTS = 2
+        try:
+            self.assertEquals(self.search('light'), self.nodetypes[1::-1])
+        finally:
+            inverted.SEARCH_MAX_RESULTS = original_max_results
+
+    def test_parse_tree(self):
+        tree = parse_tree('light -water')
+        self.assertEquals(tree[0], 'and')
+        self.assertEquals(tree[1].search, 'light')
+        self.assertEquals(tree[2][0], 'not')
+        self.assertEquals(tree[2][1].search, 'water')
@@ -0,0 +1,103 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test cases for Gstudio's triple store import"""
+import os
+from cgi import parse_qs
+from tempfile import mkdtemp
+from threading import Thread
+from BaseHTTPServer import HTTPServer
+from BaseHTTPServer import BaseHTTPRequestHandler
+
+from django.test import TestCase
+
+from gstudio.models import Objecttype
+from gstudio.triplestore import import_rdf
+from gstudio.triplestore import TripleStoreError
+
+
+class DataHandler(BaseHTTPRequestHandler):
+    """Stand-in of the /data/ endpoint of 4store"""
+
+    def do_POST(self):
+        length = int(self.headers.getheader('content-length'))
+        data = parse_qs(self.rfile.read(length))
+        self.server.requests += 1
+        if self.server.requests in self.server.failures:
+            self.send_response(500)
+        else:
+            self.server.batches.append(data)
+            self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TripleStoreTestCase(TestCase):
+    """Test cases for the batched import into a triple store"""
+
+    def setUp(self):
+        for i in range(4):
+            Objecttype.objects.create(title='Type %s' % i,
+                                      slug='type-%s' % i)
+        self.server = HTTPServer(('127.0.0.1', 0), DataHandler)
+        self.server.batches = []
+        self.server.requests = 0
+        self.server.failures = ()
+        self.endpoint = 'http://127.0.0.1:%s' % self.server.server_port
+        self.thread = Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.checkpoint = os.path.join(mkdtemp(), 'checkpoint')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def import_rdf(self, **kwargs):
+        return import_rdf(self.endpoint, 'http://example.com/graph',
+                          chunk_size=1, batch_size=1,
+                          checkpoint=self.checkpoint, **kwargs)
+
+    def test_import_rdf(self):
+        stats = self.import_rdf(workers=3)
+        self.assertEquals(stats['nodes'], 4)
+        self.assertEquals(stats['batches'], 4)
+        self.assertEquals(len(self.server.batches), 4)
+        self.assertEquals(self.server.batches[0]['graph'],
+                          ['http://example.com/graph'])
+        self.assertEquals(stats['triples'], sum(
+            [batch['data'][0].count('\n') for batch in self.server.batches]))
+        self.assertTrue(stats['triples_per_second'] > 0)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_import_rdf_retries(self):
+        self.server.failures = (1,)
+        stats = self.import_rdf(workers=1)
+        self.assertEquals(stats['retries'], 1)
+        self.assertEquals(stats['batches'], 4)
+
+    def test_import_rdf_resume(self):
+        self.server.failures = (2,)
+        self.assertRaises(TripleStoreError, self.import_rdf,
+                          workers=1, retries=0)
+        first = self.server.batches[0]['data'][0]
+        self.server.batches = []
+        stats = self.import_rdf(workers=1)
+        self.assertEquals(stats['batches'], 3)
+        self.assertFalse(first in [batch['data'][0]
+                                   for batch in self.server.batches])
@@ -0,0 +1,98 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Test cases for Gstudio's typeahead"""
+from django.test import TestCase
+from django.core.cache import cache
+
+from gstudio.models import Objecttype
+from objectapp.models import Gbobject
+from gstudio.typeahead import compute_candidates
+from gstudio.typeahead import applicable_type_ids
+from gstudio.typeahead import search_page
+from gstudio.typeahead import subject_queryset
+from gstudio.typeahead import typeahead_generation
+
+
+class TypeaheadTestCase(TestCase):
+    """Test cases for the typeahead of the subjects"""
+    urls = 'gstudio.tests.objectapp_urls'
+
+    def setUp(self):
+        self.parent = Objecttype.objects.create(title='Animal', slug='animal')
+        self.child = Objecttype.objects.create(title='Bird', slug='bird',
+                                               parent=self.parent)
+        self.grandchild = Objecttype.objects.create(title='Crow', slug='crow',
+                                                    parent=self.child)
+        self.members = []
+        for title, objecttype in (('Ant', self.parent),
+                                  ('Blackbird', self.child),
+                                  ('Carrion crow', self.grandchild)):
+            member = Gbobject.objects.create(title=title, slug=title.lower().replace(' ', '-'))
+            member.objecttypes.add(objecttype)
+            self.members.append(member)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_compute_candidates(self):
+        self.assertEquals(
+            sorted(compute_candidates(self.parent.pk, 'NT')),
+            sorted([(member.pk, member.title) for member in self.members]))
+        self.assertEquals(len(compute_candidates(self.parent.pk, 'OT')), 6)
+        self.assertEquals(len(compute_candidates(self.parent.pk, 'OT',
+                                                 include_self=False)), 5)
+        self.assertEquals(compute_candidates(self.parent.pk, 'OB'),
+                          [(self.members[0].pk, 'Ant')])
+        self.assertEquals(compute_candidates(self.child.pk, 'ND'),
+                          [(self.child.pk, 'Bird')])
+        self.assertEquals(compute_candidates(9999, 'OT'), [])
+        self.assertEquals(compute_candidates(self.parent.pk, 'UN'), [])
+
+    def test_typeahead(self):
+        candidates = subject_queryset(self.parent.pk, 'OT')
+        self.assertEquals([title for pk, title in search_page(candidates)[0]],
+                          ['Animal', 'Ant', 'Bird', 'Blackbird',
+                           'Carrion crow', 'Crow'])
+        self.assertEquals(search_page(candidates, 'b'),
+                          ([(self.child.pk, 'Bird'),
+                            (self.members[1].pk, 'Blackbird')], False))
+        self.assertEquals(search_page(candidates, 'A', page_size=1),
+                          ([(self.parent.pk, 'Animal')], True))
+        self.assertEquals(search_page(candidates, 'A', page=2, page_size=1),
+                          ([(self.members[0].pk, 'Ant')], False))
+        self.assertEquals(search_page(candidates, 'z'), ([], False))
+        self.assertEquals(len(search_page(candidates, page_size=4)[0]), 4)
+
+    def test_invalidation(self):
+        self.assertEquals(len(compute_candidates(self.parent.pk, 'NT')), 3)
+        generation = typeahead_generation(self.parent.pk)
+        other_generation = typeahead_generation(self.grandchild.pk)
+        member = Gbobject.objects.create(title='Dodo', slug='dodo')
+        member.objecttypes.add(self.child)
+        self.assertEquals(typeahead_generation(self.parent.pk), generation)
+        self.assertEquals(len(compute_candidates(self.parent.pk, 'NT')), 4)
+        self.child.title = 'Birds'
+        self.child.save()
+        self.assertEquals(typeahead_generation(self.parent.pk), generation)
+        subtype = Objecttype.objects.create(title='Duck', slug='duck',
+                                            parent=self.child)
+        self.assertTrue(typeahead_generation(self.parent.pk) > generation)
+        self.assertEquals(typeahead_generation(self.grandchild.pk),
+                          other_generation)
+        self.assertTrue(subtype.pk in applicable_type_ids(self.parent.pk,
+                                                          'NT'))
@@ -0,0 +1,201 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Batched import of the gnowledge base into a 4store triple store.
+
+The triples of the RDF exporter are grouped into batches of N-Triples
+cut at the chunks of NIDs, and appended to the graph through the /data/
+endpoint of the store by a bounded pool of threads. The last NID of
+the batches acknowledged in order is kept in a checkpoint file, so an
+interrupted import resumes after it."""
+import os
+import urllib
+import urllib2
+from time import time
+from Queue import Queue
+from threading import Lock
+from threading import Thread
+from StringIO import StringIO
+
+from gstudio.rdf import RDFExporter
+from gstudio.rdf import StreamWriter
+from gstudio.settings import TRIPLESTORE_GRAPH
+from gstudio.settings import TRIPLESTORE_TIMEOUT
+from gstudio.settings import TRIPLESTORE_WORKERS
+from gstudio.settings import TRIPLESTORE_ENDPOINT
+from gstudio.settings import TRIPLESTORE_BATCH_SIZE
+
+
+class TripleStoreError(Exception):
+    """A batch has not been accepted by the triple store"""
+
+
+def upload_batch(endpoint, graph, data, timeout=TRIPLESTORE_TIMEOUT):
+    """Append N-Triples to a graph of the triple store"""
+    request = urllib2.Request('%s/data/' % endpoint.rstrip('/'),
+                              urllib.urlencode({
+                                  'data': data, 'graph': graph,
+                                  'mime-type': 'application/x-turtle'}))
+    response = urllib2.urlopen(request, timeout=timeout)
+    try:
+        return response.read()
+    finally:
+        response.close()
+
+
+class Checkpoint(object):
+    """The last NID imported, kept in a file"""
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        return int(open(self.path).read().strip() or 0)
+
+    def save(self, last_pk):
+        if not self.path:
+            return
+        temporary = '%s.tmp' % self.path
+        checkpoint = open(temporary, 'w')
+        checkpoint.write(str(last_pk))
+        checkpoint.close()
+        os.rename(temporary, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BatchImporter(object):
+    """Import the triples of the NIDs into a triple store,
+    by batches uploaded concurrently"""
+
+    def __init__(self, endpoint=TRIPLESTORE_ENDPOINT,
+                 graph=TRIPLESTORE_GRAPH, batch_size=TRIPLESTORE_BATCH_SIZE,
+                 workers=TRIPLESTORE_WORKERS, checkpoint=None,
+                 chunk_size=500, retries=2, upload=upload_batch):
+        self.endpoint = endpoint
+        self.graph = graph
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint = Checkpoint(checkpoint)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.upload = upload
+
+        # Bounded, the export waits for the uploads
+        self.queue = Queue(workers)
+        self.lock = Lock()
+        self.pending = []
+        self.done = set()
+        self.error = None
+        self.stats = {'nodes': 0, 'triples': 0, 'batches': 0,
+                      'bytes': 0, 'retries': 0}
+
+    def submit(self, last_pk, data):
+        """Queue a batch ending with the NID last_pk"""
+        with self.lock:
+            self.pending.append(last_pk)
+        self.queue.put((last_pk, data))
+
+    def acknowledge(self, last_pk, data):
+        """Record an uploaded batch, and move the checkpoint
+        to the last batch uploaded with all its predecessors"""
+        with self.lock:
+            self.stats['batches'] += 1
+            self.stats['triples'] += data.count('\n')
+            self.stats['bytes'] += len(data)
+            self.done.add(last_pk)
+            checkpoint = None
+            while self.pending and self.pending[0] in self.done:
+                checkpoint = self.pending.pop(0)
+                self.done.discard(checkpoint)
+            if checkpoint is not None:
+                self.checkpoint.save(checkpoint)
+
+    def work(self):
+        """Upload the queued batches, until a None is queued"""
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                last_pk, data = batch
+                attempt = 0
+                while True:
+                    try:
+                        self.upload(self.endpoint, self.graph, data)
+                        break
+                    except Exception:
+                        if attempt == self.retries:
+                            raise
+                        attempt += 1
+                        with self.lock:
+                            self.stats['retries'] += 1
+                self.acknowledge(last_pk, data)
+            except Exception, e:
+                with self.lock:
+                    self.error = self.error or e
+            finally:
+                self.queue.task_done()
+
+    def run(self, nodemodels=None, since=None):
+        """Import the NIDs following the checkpoint and return
+        the throughput metrics of the import"""
+        start = time()
+        threads = [Thread(target=self.work) for i in range(self.workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        stream = StringIO()
+        exporter = RDFExporter(StreamWriter(stream, 'nt'), self.chunk_size)
+        last_pk = None
+        try:
+            for last_pk, nodes in exporter.chunks(
+                nodemodels, since, self.checkpoint.load()):
+                if self.error is not None:
+                    break
+                self.stats['nodes'] += exporter.export_nodes(nodes)
+                if stream.getvalue().count('\n') >= self.batch_size:
+                    self.submit(last_pk, stream.getvalue())
+                    stream.truncate(0)
+            if stream.getvalue() and self.error is None:
+                self.submit(last_pk, stream.getvalue())
+        finally:
+            for thread in threads:
+                self.queue.put(None)
+            for thread in threads:
+                thread.join()
+
+        if self.error is not None:
+            raise TripleStoreError('Import interrupted after NID %s: %s' % (
+                self.checkpoint.load(), self.error))
+        self.checkpoint.clear()
+
+        self.stats['seconds'] = time() - start
+        self.stats['triples_per_second'] = self.stats['triples'] / max(
+            self.stats['seconds'], 0.001)
+        return self.stats
+
+
+def import_rdf(endpoint=TRIPLESTORE_ENDPOINT, graph=TRIPLESTORE_GRAPH,
+               nodemodels=None, since=None, **kwargs):
+    """Import the gnowledge base into a triple store by batches"""
+    return BatchImporter(endpoint, graph, **kwargs).run(nodemodels, since)
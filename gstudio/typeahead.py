@@ -0,0 +1,196 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Typeahead of the subjects of Gstudio.
+
+The subjects applicable to an attribute type or to a role of a relation
+type are the members of the subject type and of its descendants.  The
+ids of the types whose members apply are read from the MPTT tree and
+cached per subject type, under a generation of that subject type bumped
+when the tree or the metatypes of the nodetypes change.  The subjects
+themselves are searched by the prefix of their title in SQL and served
+page by page, so no cached value grows with the number of members."""
+from django.core.cache import cache
+from django.db.models import Q
+
+from gstudio.settings import TYPEAHEAD_PAGE_SIZE
+from gstudio.settings import TYPEAHEAD_CACHE_TIMEOUT
+
+TYPE_MODELS = {'OT': 'Objecttype', 'NT': 'Nodetype', 'AT': 'Attributetype',
+               'ST': 'Systemtype', 'PT': 'Processtype', 'RT': 'Relationtype'}
+
+NODE_MODELS = {'ND': 'Node', 'ED': 'Edge', 'RN': 'Relation',
+               'AS': 'AttributeSpecification', 'NS': 'NodeSpecification',
+               'RS': 'RelationSpecification', 'IN': 'Intersection',
+               'CP': 'Complement'}
+
+
+def generation_key(subjecttype_id):
+    """Return the cache key of the generation of a subject type"""
+    return 'gstudio.typeahead.generation.%s' % subjecttype_id
+
+
+def typeahead_generation(subjecttype_id):
+    """Return the current generation of the types of a subject type"""
+    key = generation_key(subjecttype_id)
+    generation = cache.get(key)
+    if generation is None:
+        generation = 1
+        cache.add(key, generation)
+    return generation
+
+
+def bump_typeahead_generations(ids):
+    """Expire the cached types of the subject types"""
+    for each in set(ids):
+        try:
+            cache.incr(generation_key(each))
+        except ValueError:
+            cache.set(generation_key(each), 2)
+
+
+def tree_ids_of(model, pks):
+    """Return the ids of the nodes of a tree and of their ancestors"""
+    ids = set()
+    for node in model._base_manager.filter(pk__in=[pk for pk in pks if pk]):
+        ids.update(node.get_ancestor_ids(include_self=True))
+    return ids
+
+
+def stash_typeahead_parent(sender, instance, **kwargs):
+    """Remember the stored parent of a nodetype or a metatype
+    before it is saved"""
+    from gstudio.models import Metatype
+    from gstudio.models import Nodetype
+
+    if not isinstance(instance, (Nodetype, Metatype)) or instance.pk is None:
+        return
+    parents = instance.__class__._base_manager.filter(
+        pk=instance.pk).values_list('parent', flat=True)
+    instance._typeahead_parent = parents and parents[0] or None
+
+
+def invalidate_typeahead(sender, instance, **kwargs):
+    """Expire the cached types of the subject types whose tree changed,
+    used as signal handler for the nodetypes, the metatypes and the
+    metatypes of the nodetypes"""
+    from gstudio.models import Metatype
+    from gstudio.models import Nodetype
+
+    action = kwargs.get('action')
+    if action is not None:
+        if action == 'pre_clear' and not kwargs.get('reverse'):
+            instance._typeahead_metatypes = tree_ids_of(
+                Metatype, instance.metatypes.values_list('pk', flat=True))
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        if kwargs.get('reverse'):
+            ids = tree_ids_of(Metatype, [instance.pk])
+        else:
+            ids = tree_ids_of(Metatype, kwargs.get('pk_set') or []) | \
+                  instance.__dict__.pop('_typeahead_metatypes', set())
+        bump_typeahead_generations(ids)
+        return
+
+    if not isinstance(instance, (Nodetype, Metatype)):
+        return
+    previous = instance.__dict__.pop('_typeahead_parent', None)
+    if 'created' in kwargs and not kwargs['created'] and \
+           previous == instance.parent_id:
+        return
+    model = isinstance(instance, Metatype) and Metatype or Nodetype
+    ids = set([instance.pk])
+    ids.update(instance.get_ancestor_ids())
+    ids.update(tree_ids_of(model, [previous]))
+    bump_typeahead_generations(ids)
+
+
+def applicable_type_ids(subjecttype_id, applicable):
+    """Return the ids of the types whose members apply to a subject
+    type, following the semantics of the applicable nodetypes:
+    the type and its descendants for the types, the member types of
+    the metatype and of its descendants for MT, the object type for OB"""
+    from gstudio import models
+
+    if applicable == 'OB':
+        return [subjecttype_id]
+    key = 'gstudio.typeahead.%s.%s.%s' % (
+        applicable, subjecttype_id, typeahead_generation(subjecttype_id))
+    type_ids = cache.get(key)
+    if type_ids is not None:
+        return type_ids
+    if applicable in TYPE_MODELS:
+        model = getattr(models, TYPE_MODELS[applicable])
+        try:
+            nodetype = model.objects.get(pk=subjecttype_id)
+        except model.DoesNotExist:
+            return []
+        type_ids = list(nodetype.get_descendant_ids(include_self=True))
+    else:
+        try:
+            metatype = models.Metatype.objects.get(pk=subjecttype_id)
+        except models.Metatype.DoesNotExist:
+            return []
+        type_ids = list(models.Nodetype.objects.filter(
+            metatypes__in=metatype.get_descendant_ids(include_self=True)
+            ).values_list('pk', flat=True).distinct())
+    cache.set(key, type_ids, TYPEAHEAD_CACHE_TIMEOUT)
+    return type_ids
+
+
+def subject_queryset(subjecttype_id, applicable, include_self=True):
+    """Return the queryset of the nodes applicable to a subject type,
+    the members of its types, with the types themselves for OT and MT,
+    the node itself for the other nodes"""
+    from gstudio import models
+    from objectapp.models import System
+
+    if applicable in TYPE_MODELS or applicable in ('MT', 'OB'):
+        type_ids = applicable_type_ids(subjecttype_id, applicable)
+        lookup = Q(gbobject__objecttypes__in=type_ids)
+        if applicable in ('OT', 'MT'):
+            lookup = lookup | Q(pk__in=type_ids)
+        queryset = models.Node._base_manager.filter(lookup).distinct()
+        if not include_self:
+            queryset = queryset.exclude(pk=subjecttype_id)
+        return queryset
+    if applicable == 'SY':
+        model = System
+    elif applicable in NODE_MODELS:
+        model = getattr(models, NODE_MODELS[applicable])
+    else:
+        return models.Node._base_manager.none()
+    return model._base_manager.filter(pk=subjecttype_id)
+
+
+def compute_candidates(subjecttype_id, applicable, include_self=True):
+    """Return the (id, title) of the subjects applicable to a subject
+    type"""
+    return list(subject_queryset(subjecttype_id, applicable,
+                                 include_self).values_list('pk', 'title'))
+
+
+def search_page(queryset, prefix='', page=1, page_size=TYPEAHEAD_PAGE_SIZE):
+    """Return a page of the (id, title) of the nodes of a queryset
+    whose title starts with the prefix, and whether a next page exists"""
+    prefix = prefix.strip()
+    if prefix:
+        queryset = queryset.filter(title__istartswith=prefix)
+    offset = (page - 1) * page_size
+    results = list(queryset.order_by('title', 'pk').values_list(
+        'pk', 'title')[offset:offset + page_size + 1])
+    return results[:page_size], len(results) > page_size
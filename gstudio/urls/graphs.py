@@ -30,4 +30,6 @@ urlpatterns = patterns(
     url(r'^version_graph_json/(?P<ssid>\d+)$','version_graph_json', name='version_graph_d3'), 
     url(r'^graph/(?P<node_id>\d+)$','force_graph', name='force_graph_d3'),  
     url(r'^graph_label/(?P<node_id>\d+)/(?P<key>[-\w]+)/$','graph_label', name='graph_label'),
+    url(r'^ego_graph_json/(?P<node_id>\d+)$','ego_graph_json', name='ego_graph_json'),
+    url(r'^graph_group/(?P<node_id>\d+)/(?P<group>.+)/$','graph_group_json', name='graph_group'),
     )
@@ -17,6 +17,7 @@ from django.shortcuts import render_to_response
 from django.template import RequestContext
 from gstudio.models import Relation,Relationtype
 from objectapp.models import System,Gbobject
+from objectapp.viewurls import view_object_urls
 from gstudio.models import NID
 from django.template.loader import get_template
 from django.template import Context
@@ -51,27 +52,30 @@ def puttagsearch(request):
         if tag1:
             for each in Gbobject.objects.all():
                 if ft in each.tags:
-                    lst[each]=each.get_view_object_url
+                    lst[each]=""
                     if not tag2:
                        flst=lst
         if tag2 and tag1:
             for each1 in lst:
                 if st in each1.tags:
-                    flst[each1]=each1.get_view_object_url
+                    flst[each1]=""
         else:
             if tag2:
                 for each in Gbobject.objects.all():
                     if st in each.tags:
-                        flst[each]=each.get_view_object_url
+                        flst[each]=""
     if oprtn=="OR":
         if tag1:
             for each in Gbobject.objects.all():
                 if ft in each.tags:
-                    flst[each]=each.get_view_object_url
+                    flst[each]=""
         if tag2:
             for each1 in Gbobject.objects.all():
                 if st in each1.tags:
-                    flst[each1]=each1.get_view_object_url
+                    flst[each1]=""
+    # resolve the urls of all the tagged objects at once
+    urls = view_object_urls(flst.keys())
+    flst = dict([(each, urls[each.id]) for each in flst])
     variables = RequestContext(request,{'tags':flst,'tag1':tag1,'tag2':tag2})
     template = "gstudio/reftags.html"
     return render_to_response(template, variables)
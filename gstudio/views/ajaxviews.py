@@ -21,6 +21,7 @@ from django.utils.encoding import smart_str,smart_unicode
 from django.template import RequestContext
 from django.http import HttpResponseRedirect
 from django.shortcuts import render_to_response
+from django.shortcuts import get_object_or_404
 from gstudio.methods import *
 from django.template.defaultfilters import slugify
 import json
@@ -28,327 +29,47 @@ import shutil
 import codecs
 from gstudio.models import *
 from objectapp.models import *
-rlist={}
 import os
 from settings import PYSCRIPT_URL_GSTUDIO
 from demo.settings import FILE_URL,PYSCRIPT_URL_GSTUDIO,HTML_FILE_URL
+from gstudio.orgrender import export_org
+from gstudio.orgrender import convert_source
+from gstudio.orgrender import ORG_FOOTER_LINES
 from gstudio.methods import sendMail_RegisterUser,sendMail_NonMember
-
+from gstudio.typeahead import subject_queryset
+from gstudio.typeahead import search_page
+
+
+def typeahead_response(request, subjecttype_id, applicable, include_self=True):
+    """Serve a page of the [id, title] of the candidates whose title
+    starts with the prefix q, the first page of all of them by default"""
+    candidates = subject_queryset(subjecttype_id, applicable, include_self)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    results, has_next = search_page(candidates, request.GET.get('q', ''), page)
+    jsonobject = json.dumps({'results': results, 'page': page,
+                             'has_next': has_next})
+    return HttpResponse(jsonobject, "application/json")
 
 def AjaxAttribute(request):
     iden = request.GET["id"]
     attr = Attributetype.objects.get(id=iden)
-    subjecttype = attr.subjecttype
-    returndict = {}
-
-    for ots in Objecttype.objects.all():
-        if attr.subjecttype.id ==ots.id:
-            for member in ots.get_members:
-                returndict[member.id] = member.title
-            childrenots = ots.get_children()
-        
-            if childrenots:
-                for eachchild in childrenots:
-                    returndict[eachchild.id] = eachchild.title    
-                    membs=eachchild.ref.get_members
-                    for each in membs:
-                        returndict[each.id] = each.title
-
-    jsonobject = json.dumps(returndict)
-    return HttpResponse(jsonobject, "application/json")
+    return typeahead_response(request, attr.subjecttype_id,
+                              attr.applicable_nodetypes, include_self=False)
 
 def AjaxRelationleft(request):
-    global rlist
-    rlist={}
     idenid=request.GET["id"]
-    rts=Relationtype.objects.filter(id=idenid)
-    for each in rts:
-        subj=str(each.left_subjecttype.title)
-        appltype=each.left_applicable_nodetypes
-        fnname= "selectionlist_"+appltype+"('"+subj+"')" 
-        
-        exec fnname
-    
-    returndict=rlist  
-    jsonobject = json.dumps(returndict)
-    return HttpResponse(jsonobject, "application/json") 
+    rt=get_object_or_404(Relationtype, id=idenid)
+    return typeahead_response(request, rt.left_subjecttype_id,
+                              rt.left_applicable_nodetypes)
 
 def AjaxRelationright(request):
-    global rlist
-    rlist={}
     idenid = request.GET["id"]
-    rts=Relationtype.objects.filter(id=idenid)
-    for each in rts:
-       subj=str(each.right_subjecttype.title)
-       appltype=each.right_applicable_nodetypes
-       fnname="selectionlist_"+appltype+"('"+subj+"')"
-       
-       exec fnname
-    
-    returndict=rlist
-    jsonobject = json.dumps(returndict)
-    return HttpResponse(jsonobject, "application/json") 
-                
-def additemdict(sdict,itemtoadd):
-    fl=0
-    for key,value in sdict.items():
-        if value==itemtoadd:
-            fl=1
-    if fl==0:
-        sdict[itemtoadd.id]=itemtoadd.title
-    return sdict                 
-def selectionlist_OT(obj):
-    # Basically the filter must filter out the OT, their members, the children and members of the children
-
-    global rlist
-    # Return all OTs and members of subtypes of OT
-    obs=Objecttype.objects.filter(title=obj)
-    #	Get all members of subtypes of each OT
-    if obs: 
-        # Add the items first
-        for each in obs:
-            rlist=additemdict(rlist,each)
-        obs=Objecttype.objects.get(title=obj)
-        # Add the objects first
-        # for each in obs:
-        #     rlist = additemdict(rlist,each)
-        memobs=obs.get_members
-        if memobs:
-            for each in memobs:
-               rlist=additemdict(rlist,each)
-        childrenots=obs.get_children()
-        # Add children first
-        for each in childrenots:
-            rlist=additemdict(rlist,each)
-        # Add memebers of each child
-        if childrenots:
-            for eachchild in childrenots: 
-                membs=eachchild.ref.get_members
-                for each in membs:
-                    rlist=additemdict(rlist,each)
-
-
-        
-    return rlist 
-            
-def selectionlist_MT(obj):
-    global rlist
-    # Return all MTs and members of subtypes of MT
-    obs=Metatype.objects.filter(title=obj)
-    #Get all members of subtypes of each MT
-    if obs:
-    	obs=Metatype.objects.get(title=obj)
-	memobs=obs.member_types.all()
-        if memobs:
-            for each in memobs:
-               rlist=additemdict(rlist,each)
-               childrenots=each.ref.get_members
-               if childrenots:
-    		   for eachchild in childrenots:
-        	        rlist=additemdict(rlist,eachchild)
-      
-    return rlist
-def selectionlist_NT(obj):
-    global rlist
-    # Return all NTs and members of subtypes of NT
-    obs=Nodetype.objects.filter(title=obj)
-    #Get all members of subtypes of each NT
-    if obs: 
-        obs=Nodetype.objects.get(title=obj)
-        memobs=obs.get_members
-        
-        if memobs:
-            for each in memobs:
-               rlist=additemdict(rlist,each)
-        childrenots=obs.get_children()
-        
-        if childrenots:
-            for eachchild in childrenots: 
-                membs=eachchild.ref.get_members
-                for each in membs:
-                    rlist=additemdict(rlist,each)
-    return rlist
-def selectionlist_AT(obj):
-    global rlist
-    # Return all ATs and members of subtypes of AT
-    obs=Attributetype.objects.filter(title=obj)
-    #Get all members of subtypes of each AT
-    if obs:
-        obs=Attributetype.objects.get(title=obj)
-        memobs=obs.get_members
-        
-        if memobs:
-            for each in memobs:
-               rlist=additemdict(rlist,each)
-        childrenots=obs.get_children()
-        
-        if childrenots:
-            for eachchild in childrenots: 
-                membs=eachchild.ref.get_members
-                for each in membs:
-                    rlist=additemdict(rlist,each)
-    return rlist
-def selectionlist_ST(obj):
-    global rlist
-    # Return all STs and members of subtypes of ST
-    obs=Systemtype.objects.filter(title=obj)
-    #Get all members of subtypes of each ST
-    if obs:
-        obs=Systemtype.objects.get(title=obj)
-        memobs=obs.get_members
-        
-        if memobs:
-            for each in memobs:
-               rlist=additemdict(rlist,each)
-        childrenots=obs.get_children()
-        
-        if childrenots:
-            for eachchild in childrenots: 
-                membs=eachchild.ref.get_members
-                for each in membs:
-                    rlist=additemdict(rlist,each)
-    return rlist
-def selectionlist_PT(obj):
-    global rlist
-    # Return all PTs and members of subtypes of PT
-    obs=Processtype.objects.filter(title=obj)
-    #Get all members of subtypes of each PT
-    if obs:
-        obs=Processtype.objects.get(title=obj)
-        memobs=obs.get_members
-        
-        if memobs:
-            for each in memobs:
-               rlist=additemdict(rlist,each)
-        childrenots=obs.get_children()
-        
-        if childrenots:
-            for eachchild in childrenots: 
-                membs=eachchild.ref.get_members
-                for each in membs:
-                    rlist=additemdict(rlist,each)
-    return rlist
-def selectionlist_RT(obj):
-    global rlist
-    # Return all RTs and members of subtypes of RT
-    obs=Relationtype.objects.filter(title=obj)
-    #Get all members of subtypes of each RT
-    if obs:
-        obs=Relationtype.objects.get(title=obj)
-        memobs=obs.get_members
-        
-        if memobs:
-            for each in memobs:
-               rlist=additemdict(rlist,each)
-        childrenots=obs.get_children()
-        
-        if childrenots:
-            for eachchild in childrenots: 
-                membs=eachchild.ref.get_members
-                for each in membs:
-                    rlist=additemdict(rlist,each)
-    return rlist
-
-def selectionlist_RN(obj):
-    global rlist
-    
-    obs=Relation.objects.filter(title=obj)
-    #Get all members of RN
-    if obs:
-        obs=Relation.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-
-def selectionlist_AS(obj):
-    global rlist
-    
-    obs=AttributeSpecification.objects.filter(title=obj)
-    #Get all members of AS
-    if obs:
-        obs=AttributeSpecification.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-def selectionlist_NS(obj):
-    global rlist
-    
-    obs=NodeSpecification.objects.filter(title=obj)
-    #Get all members of NS
-    if obs:
-        obs=NodeSpecification.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-def selectionlist_SY(obj):
-    global rlist
-    
-    obs=System.objects.filter(title=obj)
-    #Get all members of SY
-    if obs:
-        obs=System.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-def selectionlist_RS(obj):
-    global rlist
-    # Return all members of RS
-    obs=RelationSpecification.objects.filter(title=obj)
-    if obs:
-        obs=RelationSpecification.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-
-def selectionlist_ND(obj):
-    global rlist
-    
-    obs=Node.objects.filter(title=obj)
-    #Get all members of ND
-    if obs:
-        obs=Node.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-def selectionlist_ED(obj):
-    global rlist
-    
-    obs=Edge.objects.filter(title=obj)
-    #Get all members of ED
-    if obs:
-        obs=Edge.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-def selectionlist_IN(obj):
-    global rlist
-    
-    obs=Intersection.objects.filter(title=obj)
-    #Get all members of IN
-    if obs:
-        obs=Intersection.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-
-def selectionlist_CP(obj):
-    global rlist
-    
-    obs=Complement.objects.filter(title=obj)
-    #Get all members of CP
-    if obs:
-        obs=Complement.objects.get(title=obj)
-        rlist=additemdict(rlist,obs)
-    return rlist
-
-def selectionlist_UP(obj):
-    global rlist
-    
-    obs=Objecttype.objects.all()
-    #Get all members UP
-    for each in obs:
-        childrenots=each.get_children()
-        for eachchild in childrenots: 
-            membs=eachchild.objecttypes.all()
-def selectionlist_OB(obj):
-    global rlist
-    obs=Objecttype.objects.get(title=obj)
-    #Get all members of OB
-    for each in  obs.member_objects.all(): 
-        rlist=additemdict(rlist,each)
-    return rlist
+    rt=get_object_or_404(Relationtype, id=idenid)
+    return typeahead_response(request, rt.right_subjecttype_id,
+                              rt.right_applicable_nodetypes)
     
 def AjaxAddContentOrg(request):
     iden = request.GET["id"]
@@ -379,9 +100,12 @@ def AjaxCreateFile(request):
 
 def AjaxCreateHtml(request):
     usr=str(request.user)
-    ext='.org'
-    stdout = os.popen("%s %s"%(PYSCRIPT_URL_GSTUDIO,usr+ext))
-    output = stdout.read()
+    myfile = open(os.path.join('/tmp/',usr+'.org'),'r')
+    content_org = myfile.read()
+    myfile.close()
+    myfile = open(os.path.join('/tmp/',usr+'.html'),'w')
+    myfile.write(convert_source(content_org).encode('utf-8'))
+    myfile.close()
     return HttpResponse("sucess")
 
 def AjaxAddContent(request):
@@ -545,41 +269,11 @@ def HtmlExport(request):
 		
    
     fname=str(s)+"-download"
-    ext=".org"
-    myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-    content_org=content_org.encode("utf-8")
-    myfile.write(content_org)
-    myfile.close()
-
-    myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-    rfile=myfile.readlines()
-    scontent="".join(rfile)
-    newcontent=scontent.replace("\r","")
-    myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-    myfile.write(newcontent)
-
-    myfile = open(os.path.join(FILE_URL,fname+ext),'a')
-    myfile.write("\n  /All material is licensed under a Creative Commons Attribution-ShareAlike 3.0 Unported License unless mentioned otherwise./ ")
-    myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
-    myfile.write("\n#+TITLE: ")
-    myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-    stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
-    output = stdout.read()
-    file1= fname+".html"
-    a=open(os.path.join(FILE_URL,file1),'r')
-    r=a.readlines()
-    r1=r[:-6]
-    ap=open(os.path.join(FILE_URL,file1),'w')
-    s=""
-    s=r1
-    n=""
-    for line in s:
-        n += line.lstrip()
-    ap.write(n)
+    html = export_org(content_org, "\n  /All material is licensed under a Creative Commons Attribution-ShareAlike 3.0 Unported License unless mentioned otherwise./ ")
+    n = "".join([line.lstrip() for line in html.splitlines(True)[:-ORG_FOOTER_LINES]])
+    ap=open(os.path.join(HTML_FILE_URL,fname+".html"),'w')
+    ap.write(n.encode("utf-8"))
     ap.close()
-    src=FILE_URL+fname+".html"
-    des=HTML_FILE_URL
-    file_relocate=shutil.copy(src,des)
     fname1=fname+".html"
     variables = RequestContext(request, {'fname':fname1,'newfname':"test"})
     template = "metadashboard/newdownload.html"
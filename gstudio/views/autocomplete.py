@@ -0,0 +1,51 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Views for the autocomplete widgets of Gstudio admin"""
+import json
+
+from django.http import Http404
+from django.http import HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+
+from gstudio.models import Nodetype
+from gstudio.models import Metatype
+from gstudio.models import Relationtype
+from gstudio.models import Attributetype
+from gstudio.models import Processtype
+from gstudio.typeahead import search_page
+
+AUTOCOMPLETE_MODELS = dict([(model._meta.module_name, model) for model in (
+    Nodetype, Metatype, Relationtype, Attributetype, Processtype)])
+
+
+@staff_member_required
+def autocomplete(request, model_name):
+    """Search the nodes of a model by the prefix of their title,
+    page by page"""
+    model = AUTOCOMPLETE_MODELS.get(model_name)
+    if model is None:
+        raise Http404
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    results, has_next = search_page(model.objects.all(),
+                                    request.GET.get('q', ''), page)
+    return HttpResponse(json.dumps({'results': results, 'page': page,
+                                    'has_next': has_next}),
+                        mimetype='application/json')
@@ -22,7 +22,9 @@ from demo.settings import *
 from gstudio.models import *
 from objectapp.models import *
 from gstudio.methods import *
-import hashlib
+from gstudio.checksums import find_checksum
+from gstudio.checksums import file_checksum
+from gstudio.orgrender import render_org
 from django.template.defaultfilters import slugify
 import os
 
@@ -139,16 +141,10 @@ def save_file(file, path=""):
         	fd.write(chunk)
     		fd.close()
 	global md5_checksum
-	md5_checksum = md5Checksum(MEDIA_ROOTNEW2+"/"+str(slugfile))
-	attype = Attributetype.objects.get(title="md5_checksum_document")
-	att = Attribute.objects.all()
-	flag = 0
-	for each in att:
-		if each.attributetype.id == attype.id:
-			if each.svalue == md5_checksum :
-				flag = 1
-				imageeachid = each.subject.id
-	if flag == 1:
+	md5_checksum = file_checksum(MEDIA_ROOTNEW2+"/"+str(slugfile))
+	duplicate = find_checksum(md5_checksum, "md5_checksum_document")
+	if duplicate is not None:
+		imageeachid = duplicate
 		report = "false"
 		
         return report,imageeachid
@@ -188,31 +184,7 @@ def create_object(file,log,content,usr,title):
 	new_ob = content
 	ext='.org'
  	html='.html'
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- 	myfile.write(p.content_org)
- 	myfile.close()
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-        rfile=myfile.readlines()
-	scontent="".join(rfile)
-	newcontent=scontent.replace("\r","")
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(newcontent)
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- 	myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- 	myfile.write("\n#+TITLE: ")
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- 	stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- 	output = stdout.read()
- 	data = open(os.path.join(FILE_URL,fname+html))
- 	data1 = data.readlines()
-        
- 	data2 = data1[107:]
-        dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
-
-	data3 = data2[:-6]	
- 	newdata=""
- 	for line in data3:
-        	newdata += line.lstrip()
+ 	newdata = render_org(p.content_org)
  	p.content = newdata
  	p.save()	
 	a=Attribute()
@@ -297,42 +269,7 @@ def edit_description(sec_id,title,usr):
 	fname=str(ssid)+"-"+usr
 	ext='.org'
 	html='.html'
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- 	myfile.write(new_ob.content_org)
- 	myfile.close()
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-	rfile=myfile.readlines()
-	scontent="".join(rfile)
-	newcontent=scontent.replace("\r","")
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(newcontent)
-
- 	#myfile.readline()
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- 	myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- 	myfile.write("\n#+TITLE: ")
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- 	stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- 	output = stdout.read()
- 	data = open(os.path.join(FILE_URL,fname+html))
-	data1 = data.readlines()
-	data2 = data1[107:]
-        dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
-
-	data3 = data2[:-6]
-	newdata=""
-	for line in data3:
-		newdata += line.lstrip()
+ 	newdata = render_org(new_ob.content_org)
 	new_ob.content = newdata
 	new_ob.save()
 	return True
-
-def md5Checksum(filePath):
-    fh = open(filePath, 'rb')
-    m = hashlib.md5()
-    while True:
-        data = fh.read(8192)
-        if not data:
-            break
-        m.update(data)
-    return m.hexdigest()
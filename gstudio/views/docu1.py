@@ -22,6 +22,7 @@ from demo.settings import *
 from gstudio.models import *
 from objectapp.models import *
 from gstudio.methods import *
+from gstudio.orgrender import render_org_legacy
 
 def docu(request):
 	p=Objecttype.objects.get(title="Document")
@@ -128,28 +129,7 @@ def create_object(file,log,content,usr):
 	new_ob = content
 	ext='.org'
  	html='.html'
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- 	myfile.write(p.content_org)
- 	myfile.close()
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-        rfile=myfile.readlines()
-	scontent="".join(rfile)
-	newcontent=scontent.replace("\r","")
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(newcontent)
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- 	myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- 	myfile.write("\n#+TITLE: ")
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- 	stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- 	output = stdout.read()
- 	data = open(os.path.join(FILE_URL,fname+html))
- 	data1 = data.readlines()
- 	data2 = data1[72:]
-	data3 = data2[:-3]	
- 	newdata=""
- 	for line in data3:
-        	newdata += line.lstrip()
+ 	newdata = render_org_legacy(p.content_org)
  	p.content = newdata
  	p.save()	
 
@@ -188,30 +168,7 @@ def edit_description(sec_id,title,usr):
 	fname=str(ssid)+"-"+usr
 	ext='.org'
 	html='.html'
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
- 	myfile.write(new_ob.content_org)
- 	myfile.close()
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-	rfile=myfile.readlines()
-	scontent="".join(rfile)
-	newcontent=scontent.replace("\r","")
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(newcontent)
-
- 	#myfile.readline()
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'a')
- 	myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
- 	myfile.write("\n#+TITLE: ")
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
- 	stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
- 	output = stdout.read()
- 	data = open(os.path.join(FILE_URL,fname+html))
-	data1 = data.readlines()
-	data2 = data1[72:]
-	data3 = data2[:-3]
-	newdata=""
-	for line in data3:
-		newdata += line.lstrip()
+ 	newdata = render_org_legacy(new_ob.content_org)
 	new_ob.content = newdata
 	new_ob.save()
 	return True
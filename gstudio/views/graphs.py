@@ -21,6 +21,7 @@ from django.shortcuts import redirect
 from django.shortcuts import render_to_response
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
+from django.views.decorators.http import condition
 from gstudio.gnowql import *
 #import networkx as nx
 #import d3 
@@ -28,10 +29,36 @@ import json
 import os
 from gstudio.views.decorators import protect_nodetype
 from gstudio.views.decorators import update_queryset
+from gstudio.graphs import graph_version
+from gstudio.graphs import graph_last_modified as node_last_modified
+from gstudio.graphs import ego_network
+from gstudio.graphs import graph_group
+from gstudio.settings import GRAPH_MAX_NEIGHBOURS
 
 
 
 	
+def graph_node(request, node_id):
+    """Return the typed node of a graph request or None"""
+    try:
+        return NID.objects.resolve(int(node_id))
+    except (ValueError, NID.DoesNotExist):
+        return None
+
+
+def graph_etag(request, node_id):
+    node = graph_node(request, node_id)
+    if node is not None:
+        return graph_version(node)
+
+
+def graph_last_modified(request, node_id):
+    node = graph_node(request, node_id)
+    if node is not None:
+        return node_last_modified(node)
+
+
+@condition(etag_func=graph_etag, last_modified_func=graph_last_modified)
 def graph_json(request, node_id): 
     
     if(node_id=='189087228'):
@@ -40,11 +67,8 @@ def graph_json(request, node_id):
 
         return HttpResponse(str(jsonFile.read()), "application/json")
 
-    try:
-        node = NID.objects.get(id=node_id)
-        node = node.ref 
-    except:
-	
+    node = graph_node(request, node_id)
+    if node is None:
         return HttpResponse("node not found", "text/html")
 
     return HttpResponse(node.get_graph_json(), "application/json")
@@ -65,6 +89,35 @@ def graph_label(request, node_id,key):
    
 
 
+def int_param(request, name, default):
+    """Return a positive integer GET parameter or its default"""
+    try:
+        return max(int(request.GET.get(name, default)), 1)
+    except ValueError:
+        return default
+
+
+def ego_graph_json(request, node_id):
+    """Return the subgraph around a node, GET depth and fanout bound it"""
+    node = graph_node(request, node_id)
+    if node is None:
+        return HttpResponse("node not found", "text/html")
+
+    g_json = ego_network(node, int_param(request, 'depth', 1),
+                         int_param(request, 'fanout', GRAPH_MAX_NEIGHBOURS))
+    return HttpResponse(json.dumps(g_json), "application/json")
+
+
+def graph_group_json(request, node_id, group):
+    """Return a page of the nodes of a collapsed group"""
+    node = graph_node(request, node_id)
+    if node is None:
+        return HttpResponse("node not found", "text/html")
+
+    g_json = graph_group(node.id, group, int_param(request, 'page', 1))
+    return HttpResponse(json.dumps(g_json), "application/json")
+
+
 def force_graph(request, node_id):
     return render_to_response('gstudio/graph1.html',{'node_id': node_id })
 
@@ -28,6 +28,8 @@ from reversion.models import *
 from gstudio.views.decorators import protect_nodetype
 from gstudio.views.decorators import update_queryset
 import ast
+from gstudio.nbhood import load_nbhood
+from gstudio.nbhood import dump_nbhood
 
 def history(request,ssid,version_no):
    # iden=request.GET["id"]
@@ -35,7 +37,7 @@ def history(request,ssid,version_no):
     nt=nt1.object.ref
     ver_dict=nt.version_info(ssid)
     ver_nbh=ver_dict['nbhood']
-    ver_nbh_dict=ast.literal_eval(ver_nbh) 
+    ver_nbh_dict=load_nbhood(ver_nbh) 
     content = ""
     content=ver_dict['content']
     if content:
@@ -98,10 +100,10 @@ def compare_history(request,ssid):
     ver_old_dict['content']=content
     
     ver_new_nbh=ver_new_dict['nbhood']
-    ver_new_nbh_dict=ast.literal_eval(ver_new_nbh)
+    ver_new_nbh_dict=load_nbhood(ver_new_nbh)
     
     ver_old_nbh=ver_old_dict['nbhood']
-    ver_old_nbh_dict=ast.literal_eval(ver_old_nbh)
+    ver_old_nbh_dict=load_nbhood(ver_old_nbh)
 
     compare_dict={}
     for each in ver_new_nbh_dict:
@@ -342,8 +344,8 @@ def get_merge_dict(ssid1,ssid2,direction):
          temp=int(ssid1)
          ssid1=int(ssid2)
          ssid2=temp
-     ver_left_nbh_dict=ast.literal_eval(ver_left_dict['nbhood'])
-     ver_right_nbh_dict=ast.literal_eval(ver_right_dict['nbhood'])
+     ver_left_nbh_dict=load_nbhood(ver_left_dict['nbhood'])
+     ver_right_nbh_dict=load_nbhood(ver_right_dict['nbhood'])
      # By default value of content is removed 
      if ver_left_dict['content']=='<br />':
 	 ver_left_dict['content']=''
@@ -403,15 +405,15 @@ def get_merge_dict(ssid1,ssid2,direction):
      history_right_list=[]
      history_merged_list=[]
 
-     history_left_list=ver_left_nbh_dict['history']
+     history_left_list=ver_left_nbh_dict.get('history', [])
      history_left_list.append(ssid1)
-     history_right_list=ver_right_nbh_dict['history']
+     history_right_list=ver_right_nbh_dict.get('history', [])
      history_right_list.append(ssid2)
      history_merged_list.append(history_left_list)
      history_merged_list.append(history_right_list)
      ver_merge_nbh_dict['history']=history_merged_list
 
-     obj.nbhood = unicode(ver_merge_nbh_dict)
+     obj.nbhood = dump_nbhood(ver_merge_nbh_dict)
      if isinstance(obj,Objecttype):
 		obj=set_objecttype_field(obj,ver_merge)
      if isinstance(obj,Attributetype):
@@ -450,7 +452,7 @@ def merge_version(request,ssid1,ssid2):
      version_counter=len(slist)
      merged_ver_ssid=slist[version_counter-1]
      ver_merged_dict=obj.version_info(merged_ver_ssid)
-     ver_merged_nbh_dict=ast.literal_eval(ver_merged_dict['nbhood'])
+     ver_merged_nbh_dict=load_nbhood(ver_merged_dict['nbhood'])
      ver_merged_nbh_dict['content']=ver_merge['content']
      variables = RequestContext(request,{'ver_nbh_dict':ver_merged_nbh_dict ,'nt':obj,'ssid':merged_ver_ssid,'version_no':version_counter})
      template="gstudio/display.html"
@@ -468,15 +470,15 @@ def revert(ssid):
      del(ver_revert['creation_date'])
      del(ver_revert['last_update'])
      history=[]
-     ver_revert_nbh_dict=ast.literal_eval(ver_revert['nbhood'])
+     ver_revert_nbh_dict=load_nbhood(ver_revert['nbhood'])
      
-     history=ver_revert_nbh_dict['history']
+     history=ver_revert_nbh_dict.get('history', [])
      history.append(ssid)
      ver_revert_nbh_dict['history']=history
      
      
   #   ver_revert_nbh_dict['history']=ver_revert_nbh_history.append(ssid)
-     ver_revert['nbhood']=unicode(ver_revert_nbh_dict)
+     ver_revert['nbhood']=dump_nbhood(ver_revert_nbh_dict)
      obj.nbhood=ver_revert['nbhood']
      if isinstance(obj,Objecttype):
 		obj=set_objecttype_field(obj,ver_revert)
@@ -519,7 +521,7 @@ def revert_version(request):
      version_counter=len(slist)
      revert_ver_ssid=slist[version_counter-1]
      ver_revert_dict=obj.version_info(revert_ver_ssid)
-     ver_revert_nbh_dict=ast.literal_eval(ver_revert_dict['nbhood'])
+     ver_revert_nbh_dict=load_nbhood(ver_revert_dict['nbhood'])
      ver_revert_nbh_dict['content']=ver_revert['content']
 
      variables = RequestContext(request,{'ver_nbh_dict':ver_revert_nbh_dict ,'nt':obj,'ssid':revert_ver_ssid,'version_no':version_counter})
@@ -26,7 +26,11 @@ import os
 from gstudio.methods import *
 from PIL import Image
 import glob, os
-import hashlib
+from gstudio.checksums import find_checksum
+from gstudio.checksums import file_checksum
+from gstudio.derivatives import ensure_dir
+from gstudio.derivatives import enqueue_derivatives
+from gstudio.orgrender import render_org
 from django.template.defaultfilters import slugify
 from django.template.loader import get_template
 from django.template import Context
@@ -248,38 +252,20 @@ def save_file(file,title, user, path=""):
 	filename = title
 	slugfile = str(file)
 	slugfile=slugfile.replace(' ','_')
-	os.system("mkdir -p "+ MEDIA_ROOTNEW2+"/"+user)
+	ensure_dir('%s/%s/%s' % (MEDIA_ROOTNEW2, str(user), str(path) + str(slugfile)))
     	fd = open('%s/%s/%s' % (MEDIA_ROOTNEW2, str(user),str(path) + str(slugfile)), 'wb')
     	for chunk in file.chunks():
         	fd.write(chunk)
     		fd.close()
 	global md5_checksum
-	md5_checksum = md5Checksum(MEDIA_ROOTNEW2+"/"+ str(user)+"/"+slugfile)
-	attype = Attributetype.objects.get(title="md5_checksum_image")
-	att = Attribute.objects.all()
-	flag = 0
-	for each in att:
-		if each.attributetype.id == attype.id:
-			if each.svalue == md5_checksum :
-				flag = 1
-				imageeachid = each.subject.id
-	if flag == 1:
+	md5_checksum = file_checksum(MEDIA_ROOTNEW2+"/"+ str(user)+"/"+slugfile)
+	duplicate = find_checksum(md5_checksum, "md5_checksum_image")
+	if duplicate is not None:
+		imageeachid = duplicate
 		report = "false"
-	else:	
-		for infile in glob.glob(MEDIA_ROOTNEW2+"/"+str(user)+"/"+str(slugfile)):
-			file, ext = os.path.splitext(infile)
-			im = Image.open(infile)
-			imm = Image.open(infile)
-			im.thumbnail(size, Image.ANTIALIAS)
-			im.save(file + "-thumbnail", "JPEG")
-			width, height = imm.size
-			sizem = 1024,height
-			if int(width) > 1024:
-				imm.thumbnail(sizem, Image.ANTIALIAS)
-				imm.save(file + "_display_1024","JPEG")
-			else:
-				imm.thumbnail(imm.size,Image.ANTIALIAS)
-				imm.save(file + "_display_1024","JPEG")
+	else:
+		# the renditions are rendered by the process_derivatives command
+		enqueue_derivatives(MEDIA_ROOTNEW2+"/"+str(user)+"/"+str(slugfile), md5_checksum)
     	return report,imageeachid	
 
 
@@ -318,31 +304,7 @@ def create_object(f,log,title,content,usr):
 	new_ob = content
  	ext='.org'
         html='.html'
- 	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(p.content_org)
-	myfile.close()
-	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-        rfile=myfile.readlines()
-	scontent="".join(rfile)
-	newcontent=scontent.replace("\r","")
-	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(newcontent)
-	#myfile.readline()
-	myfile = open(os.path.join(FILE_URL,fname+ext),'a')
-	myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
-	myfile.write("\n#+TITLE: ")
-	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-	stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
-	output = stdout.read()
-	data = open(os.path.join(FILE_URL,fname+html))
- 	data1 = data.readlines()
- 	data2 = data1[107:]
-        dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
-
- 	data3 = data2[:-6]
- 	newdata=""
- 	for line in data3:
-        	newdata += line.lstrip()
+ 	newdata = render_org(p.content_org)
  	p.content = newdata
  	p.save()
         a=Attribute()
@@ -430,46 +392,11 @@ def edit_description(sec_id,title,usr):
 	new_ob.content_org=contorg.encode('utf8')
 	ext='.org'
 	html='.html'
-	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(new_ob.content_org)
-	myfile.close()
-	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-	rfile=myfile.readlines()
-	scontent="".join(rfile)
-	newcontent=scontent.replace("\r","")
-	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(newcontent)
-	#myfile.readline()
-	myfile = open(os.path.join(FILE_URL,fname+ext),'a')
-	myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
-	myfile.write("\n#+TITLE: ")
-	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-	stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
-	
-	output = stdout.read()
-	data = open(os.path.join(FILE_URL,fname+html))
-	data1 = data.readlines()
-	data2 = data1[107:]
-        dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
-
-	data3 = data2[:-6]
-	newdata=""
-	for line in data3:
-		newdata += line.lstrip()
+	newdata = render_org(new_ob.content_org)
 	new_ob.content = newdata
 	new_ob.save()
 	return True
 
-def md5Checksum(filePath):
-    fh = open(filePath, 'rb')
-    m = hashlib.md5()
-    while True:
-        data = fh.read(8192)
-        if not data:
-            break
-        m.update(data)
-    return m.hexdigest()
-
 
 def edit_title(request):
 	nidtitle = ""
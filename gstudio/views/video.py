@@ -28,7 +28,9 @@ from demo.settings import *
 from gstudio.methods import *
 from django.contrib.auth import authenticate
 from django.template.defaultfilters import slugify
-import hashlib
+from gstudio.checksums import find_checksum
+from gstudio.checksums import file_checksum
+from gstudio.orgrender import render_org
 report = "true"
 global md5_checksum
 md5_checksum = ""
@@ -347,32 +349,7 @@ def video(request):
 			usr=str(request.user)
 			ext='.org'
 			html='.html'
-			myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-			myfile.write(m.content_org)
-			myfile.close()
-			myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-			rfile=myfile.readlines()
-			scontent="".join(rfile)
-			newcontent=scontent.replace("\r","")
-			myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-			myfile.write(newcontent)
-			
-			#myfile.readline()
-			myfile = open(os.path.join(FILE_URL,fname+ext),'a')
-			myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
-			myfile.write("\n#+TITLE: ")
-			myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-			stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
-			output = stdout.read()
-			data = open(os.path.join(FILE_URL,fname+html))
-		 	data1 = data.readlines()
-		  	data2 = data1[107:]
-                        dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
-
-			data3 = data2[:-6]
-		 	newdata=""
-		 	for line in data3:
-		        	newdata += line.lstrip()
+			newdata = render_org(m.content_org)
 		 	m.content = newdata
 		 	m.save()
 		        a=Attribute()
@@ -412,16 +389,10 @@ def save_file(file, user,path=""):
 
 	fd.close()
 	global md5_checksum
-	md5_checksum = md5Checksum(MEDIA_ROOTNEW+"/"+ str(fileuser)+"/"+str(filename[0]).upper()+"/"+str(dirname)+"/"+str(filename))
-	attype = Attributetype.objects.get(title="md5_checksum_document")
-	att = Attribute.objects.all()
-	flag = 0
-	for each in att:
-		if each.attributetype.id == attype.id:
-			if each.svalue == md5_checksum :
-				flag = 1
-				imageeachid = each.subject.id
-	if flag == 1:
+	md5_checksum = file_checksum(MEDIA_ROOTNEW+"/"+ str(fileuser)+"/"+str(filename[0]).upper()+"/"+str(dirname)+"/"+str(filename))
+	duplicate = find_checksum(md5_checksum, "md5_checksum_document")
+	if duplicate is not None:
+		imageeachid = duplicate
 		report = "false"
         return report,imageeachid
 		
@@ -531,45 +502,12 @@ def edit_description(sec_id,title,usr):
 	new_ob.content_org=contorg.encode('utf8')
 	ext='.org'
 	html='.html'
-	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(new_ob.content_org)
-	myfile.close()
-	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-	rfile=myfile.readlines()
-	scontent="".join(rfile)
-	newcontent=scontent.replace("\r","")
-	myfile = open(os.path.join(FILE_URL,fname+ext),'w')
-	myfile.write(newcontent)
-				
-	#myfile.readline()
-	myfile = open(os.path.join(FILE_URL,fname+ext),'a')
-	myfile.write("\n#+OPTIONS: timestamp:nil author:nil creator:nil  H:3 num:nil toc:nil @:t ::t |:t ^:t -:t f:t *:t <:t")
-	myfile.write("\n#+TITLE: ")
-	myfile = open(os.path.join(FILE_URL,fname+ext),'r')
-	stdout = os.popen("%s %s %s"%(PYSCRIPT_URL_GSTUDIO,fname+ext,FILE_URL))
-	output = stdout.read()
-	data = open(os.path.join(FILE_URL,fname+html))
-	data1 = data.readlines()
-	data2 = data1[107:]
-        dataa = data2[data2.index('<div id="content">\n')]='<div id=" "\n'
-
-	data3 = data2[:-6]
-	newdata=""
-	for line in data3:
-		newdata += line.lstrip()
+	newdata = render_org(new_ob.content_org)
 	new_ob.content = newdata
 	new_ob.save()
 	return True
 
-def md5Checksum(filePath):
-    fh = open(filePath, 'rb')
-    m = hashlib.md5()
-    while True:
-        data = fh.read(8192)
-        if not data:
-            break
-        m.update(data)
-    return m.hexdigest()
+
 def wetube(request):
         vars=RequestContext({})
         template="gstudio/wetube.html"
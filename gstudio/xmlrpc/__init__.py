@@ -92,6 +92,8 @@ GSTUDIO_XMLRPC_METAWEBLOG = [
      'metaWeblog.getNeighbourhood'),
     ('gstudio.xmlrpc.metaweblog.get_all',
      'metaWeblog.getAll'),
+    ('gstudio.xmlrpc.metaweblog.get_all_page',
+     'metaWeblog.getAllPage'),
     ('gstudio.xmlrpc.metaweblog.get_datatype',
      'metaWeblog.getDatatype'),
     ('gstudio.xmlrpc.metaweblog.get_attributevalues',
@@ -112,6 +114,8 @@ GSTUDIO_XMLRPC_METAWEBLOG = [
      'metaWeblog.getlatestSSID'),
     ('gstudio.xmlrpc.metaweblog.get_all_snapshots',
      'metaWeblog.getAllSnapshots'),
+    ('gstudio.xmlrpc.metaweblog.get_snapshots_page',
+     'metaWeblog.getSnapshotsPage'),
     ('gstudio.xmlrpc.metaweblog.set_attributetype',
      'metaWeblog.setAttributetype'),
     ('gstudio.xmlrpc.metaweblog.set_relationtype',
@@ -126,6 +130,10 @@ GSTUDIO_XMLRPC_METAWEBLOG = [
      'metaWeblog.setRelation'),
     ('gstudio.xmlrpc.metaweblog.get_gbobject_neighbourhood',
      'metaWeblog.getGbobjectNeighbourhood'),
+    ('gstudio.xmlrpc.metaweblog.get_neighbourhoods',
+     'metaWeblog.getNeighbourhoods'),
+    ('gstudio.xmlrpc.metaweblog.get_gbobject_neighbourhoods',
+     'metaWeblog.getGbobjectNeighbourhoods'),
     ('gstudio.xmlrpc.metaweblog.list_id',
      'metaWeblog.list_id'),
     ('gstudio.xmlrpc.metaweblog.dict_id',
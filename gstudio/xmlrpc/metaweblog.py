@@ -55,20 +55,30 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 from django.core.urlresolvers import reverse
+from django.core.urlresolvers import NoReverseMatch
+from django.db.models import Model
+from django.db.models.query import QuerySet
 from django.utils.translation import gettext as _
 from django.utils.html import strip_tags
 from django.utils.text import truncate_words
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.template.defaultfilters import slugify
+from reversion.models import Version
 
 from gstudio.models import Nodetype
 from gstudio.models import Metatype
 from gstudio.models import NID
+from gstudio.models import Node
 from objectapp.models import Gbobject
 from objectapp.models import Gbobject, System, Process
 from gstudio.settings import PROTOCOL
 from gstudio.settings import UPLOAD_TO
+from gstudio.settings import XMLRPC_PAGE_SIZE
+from gstudio.settings import XMLRPC_LIST_LIMIT
+from gstudio.resolver import get_nodemodel_class
+from gstudio.nbhood import load_nbhood
+from gstudio.nbhood import flush_nbhood
 from gstudio.managers import DRAFT, PUBLISHED
 from django_xmlrpc.decorators import xmlrpc_func
 from django.utils.datastructures import SortedDict
@@ -410,22 +420,106 @@ def nid_exists(nid):
       except NID.DoesNotExist :
        return "Node Does Not Exist"
 
+def node_structure(node, site):
+    """A node structure"""
+    try:
+        url = '%s://%s%s' % (PROTOCOL, site.domain, node.get_absolute_url())
+    except NoReverseMatch:
+        url = ''
+    return {'id': node.pk,
+            'title': node.title,
+            'type': node.__class__.__name__,
+            'url': url}
+
+
+def nbh_structure(value, site):
+    """A neighbourhood structure, with the nodes as node structures
+    and the values XML-RPC cannot marshal converted"""
+    if isinstance(value, NID):
+        return node_structure(value, site)
+    if isinstance(value, Model):
+        return unicode(value)
+    if isinstance(value, dict):
+        return dict([(unicode(key), nbh_structure(item, site))
+                     for key, item in value.items()])
+    if isinstance(value, (list, tuple, set, QuerySet)):
+        return [nbh_structure(item, site) for item in value]
+    if value is None:
+        return ''
+    if isinstance(value, (bool, int, long, float, basestring, datetime)):
+        return value
+    return unicode(value)
+
+
+def resolve_neighbourhoods(ssid_list, get_what, model, not_of_type=None):
+    """Resolve the nodes of the ids in bulk and return for each id
+    the node and its neighbourhood, or an error message, not_of_type
+    being the one of the nodes of another model.
+    The neighbourhoods of the nodetypes, rendered or not, are read
+    from their stored field, kept up to date by the nbhood engine,
+    once their pending updates are flushed"""
+    not_of_type = not_of_type or 'Not of type %s' % model.__name__
+    ids = []
+    results = SortedDict()
+    for ssid in ssid_list:
+        try:
+            ids.append(int(ssid))
+        except (TypeError, ValueError):
+            results[str(ssid)] = (None, 'Node Does Not Exist')
+    nodes = NID.objects.resolve_many(ids)
+    stored = {}
+    if get_what in ('nbh', 'rendered_nbh'):
+        flush_nbhood(ids)
+        stored = dict(Node._base_manager.filter(pk__in=ids).values_list(
+            'pk', 'nbhood'))
+
+    for nid in ids:
+        node = nodes.get(nid)
+        if node is None:
+            results[str(nid)] = (None, 'Node Does Not Exist')
+        elif not isinstance(node, model):
+            results[str(nid)] = (None, not_of_type)
+        elif get_what in ('nbh', 'rendered_nbh') and hasattr(
+            node.__class__, 'get_%s' % get_what):
+            nbh = isinstance(node, Nodetype) and load_nbhood(stored.get(nid))
+            results[str(nid)] = (node, nbh or getattr(node, 'get_%s' % get_what))
+        else:
+            results[str(nid)] = (node, None)
+    return results
+
+
+def neighbourhood_page(ssid_list, get_what, model, page):
+    """A page of neighbourhood structures"""
+    page = max(int(page), 1)
+    start = (page - 1) * XMLRPC_PAGE_SIZE
+    site = Site.objects.get_current()
+    neighbourhoods = []
+    errors = {}
+    for ssid, (node, nbh) in resolve_neighbourhoods(
+        ssid_list[start:start + XMLRPC_PAGE_SIZE], get_what, model).items():
+        if node is None:
+            errors[ssid] = nbh
+        else:
+            structure = node_structure(node, site)
+            structure['nbh'] = nbh_structure(nbh or {}, site)
+            neighbourhoods.append(structure)
+    return {'page': page,
+            'has_next': len(ssid_list) > start + XMLRPC_PAGE_SIZE,
+            'neighbourhoods': neighbourhoods,
+            'errors': errors}
+
+
 @xmlrpc_func(returns='struct',args=['struct'])
 def get_info_fromSSID(ssid_list) :
    """Given a list of nids, it returns entire information of each ssid inside a dictionary with all the dictionaries contained within a list 
    => metaWeblog.getinfoFromSSID(nidlist)"""  
    lst = []
-   for ssid in ssid_list :
-    try :
-     t = NID.objects.get(id = ssid)
-     try :
-      p = Nodetype.objects.get(id = ssid)
-      nbh = p.ref.get_nbh
+   for ssid, (node, nbh) in resolve_neighbourhoods(
+       ssid_list, 'nbh', Nodetype).items():
+    if node is None:
+      lst.append(nbh)
+    else:
       lst.append(str(nbh))
-     except Nodetype.DoesNotExist :
-      lst.append('Not of type Nodetype')
-    except NID.DoesNotExist :
-      lst.append('Node Does Not Exist' )
    return lst 
 
 @xmlrpc_func(returns='struct', args=['struct','string']) 
@@ -433,21 +527,12 @@ def get_neighbourhood(ssid_list, get_what):
      """ Given a list of nids,it returns the neighbourhood(nbh/rendered) of the Nodetype
      => metaWeblog.getNeighbourhood(nidlist,nbh/rendered_nbh)"""  
      d = {}
-     for ssid in ssid_list:
-      try:
- 	p = NID.objects.get(id = ssid)
-        try :
-          t = Nodetype.objects.get(id = ssid)        
-          if get_what=='rendered_nbh' :
-   	     nbh = p.ref.get_rendered_nbh
-             d[str(p.id)]= str(nbh)
-	  elif get_what=='nbh':
-             nbh = p.ref.get_nbh
-       	     d[str(p.id)]= str(nbh)
-        except Nodetype.DoesNotExist :
-          d[str(ssid)] = "Not of type Nodetype"
-      except NID.DoesNotExist :
-          d[str(ssid)] = "Node Does Not Exist"
+     for ssid, (node, nbh) in resolve_neighbourhoods(
+         ssid_list, get_what, Nodetype).items():
+          if node is None:
+               d[ssid] = nbh
+          elif get_what in ('nbh', 'rendered_nbh'):
+               d[ssid] = str(nbh)
      return d
 
 @xmlrpc_func(returns='struct', args=['struct','string']) 
@@ -455,23 +540,28 @@ def get_gbobject_neighbourhood(ssid_list, get_what):
      """ Given a list of nids,it returns the neighbourhood(nbh/rendered) of the Gbobject
      => metaWeblog.getGbobjectNeighbourhood(nidlist,nbh/rendered_nbh)"""   	
      d = {}
-     for ssid in ssid_list:
-      try:
- 	p = NID.objects.get(id = ssid)
-        try :
-          t = Gbobject.objects.get(id = ssid)        
-          if get_what=='rendered_nbh' :
-   	     nbh = p.ref.get_rendered_nbh
-             d[str(p.id)]= str(nbh)
-	  elif get_what=='nbh':
-             nbh = p.ref.get_nbh
-       	     d[str(p.id)]= str(nbh)
-        except Gbobject.DoesNotExist :
-          d[str(ssid)] = "Not of type Gboject"
-      except NID.DoesNotExist :
-          d[str(ssid)] = "Node Does Not Exist"
+     for ssid, (node, nbh) in resolve_neighbourhoods(
+         ssid_list, get_what, Gbobject, 'Not of type Gboject').items():
+          if node is None:
+               d[ssid] = nbh
+          elif get_what in ('nbh', 'rendered_nbh'):
+               d[ssid] = str(nbh)
      return d
 
+@xmlrpc_func(returns='struct', args=['struct', 'string', 'int'])
+def get_neighbourhoods(ssid_list, get_what, page=1):
+    """Given a list of nids, returns a page of the neighbourhoods
+    (nbh/rendered_nbh) of the Nodetypes as structures
+    => metaWeblog.getNeighbourhoods(nidlist, nbh/rendered_nbh, page)"""
+    return neighbourhood_page(ssid_list, get_what, Nodetype, page)
+
+@xmlrpc_func(returns='struct', args=['struct', 'string', 'int'])
+def get_gbobject_neighbourhoods(ssid_list, get_what, page=1):
+    """Given a list of nids, returns a page of the neighbourhoods
+    (nbh/rendered_nbh) of the Gbobjects as structures
+    => metaWeblog.getGbobjectNeighbourhoods(nidlist, nbh/rendered_nbh, page)"""
+    return neighbourhood_page(ssid_list, get_what, Gbobject, page)
+
 
 
 @xmlrpc_func(returns='struct', args=['struct'])
@@ -501,15 +591,49 @@ def get_attributeType(subjecttypelist):
 def get_all(nodetype):
    """Given a class name it returns all the nids corresponding to their class name.
    => metaWeblog.getAll(classname)"""  
-   d = {}
-   try :
-    p = eval(nodetype)
-    h = p.objects.all()
-    for i in h:
-       d[str(i.title)] = i.id
-   except NameError :
+   p = get_nodemodel_class(str(nodetype))
+   if p is None :
        return "The class with the given name Does not exist"
-   return d
+   return dict([(title, nid) for nid, title in
+                p.objects.values_list('id', 'title').iterator()])
+
+def parse_since(since):
+    """Returns the datetime of a since argument, an XML-RPC
+    DateTime or an ISO 8601 string, None if empty"""
+    if not since:
+        return None
+    if isinstance(since, DateTime):
+        since = since.value
+    return datetime.strptime(
+        str(since).replace('Z', '').replace('-', '')[:17],
+        '%Y%m%dT%H:%M:%S')
+
+def cursor_page(key, rows, after, limit):
+    """A page of (id, ...) rows, fetched with one more row than the
+    limit, with the id to pass as after for the next page"""
+    rows = [list(row) for row in rows]
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    return {key: rows,
+            'after': rows and rows[-1][0] or after,
+            'has_next': has_next}
+
+@xmlrpc_func(returns='struct', args=['string', 'int', 'int', 'string'])
+def get_all_page(nodetype, after=0, limit=0, since=''):
+   """Given a class name, returns a page of the [nid, title] of its
+   nodes ordered by nid, following the nid after and updated since a date
+   => metaWeblog.getAllPage(classname, after, limit, since)"""
+   p = get_nodemodel_class(str(nodetype))
+   if p is None or not issubclass(p, NID) :
+       return "The class with the given name Does not exist"
+   after = int(after)
+   limit = max(1, min(int(limit) or XMLRPC_LIST_LIMIT, XMLRPC_LIST_LIMIT))
+   nodes = p.objects.filter(id__gt=after).order_by('id')
+   since = parse_since(since)
+   if since :
+       nodes = nodes.filter(last_update__gte=since)
+   return cursor_page('nodes', nodes.values_list('id', 'title')[:limit + 1],
+                      after, limit)
 
 
 @xmlrpc_func(returns='struct', args=['struct'])
@@ -680,10 +804,29 @@ def get_all_snapshots(nid) :
   => metaWeblog.getAllSnapshots(nid)""" 
   try :
    p = NID.objects.get(id = nid)
-   n = p.get_ssid
   except NID.DoesNotExist :
    return "Node Does Not Exist"
-  return n
+  return list(Version.objects.get_for_object(p).order_by(
+      'pk').values_list('pk', flat=True))
+
+@xmlrpc_func(returns='struct', args=['int', 'int', 'int', 'string'])
+def get_snapshots_page(nid, after=0, limit=0, since=''):
+  """Given the id, returns a page of the [ssid, date] of its snapshots
+  ordered by ssid, following the ssid after and created since a date
+  => metaWeblog.getSnapshotsPage(nid, after, limit, since)"""
+  try :
+   p = NID.objects.get(id = nid)
+  except NID.DoesNotExist :
+   return "Node Does Not Exist"
+  after = int(after)
+  limit = max(1, min(int(limit) or XMLRPC_LIST_LIMIT, XMLRPC_LIST_LIMIT))
+  versions = Version.objects.get_for_object(p).filter(
+      pk__gt=after).order_by('pk')
+  since = parse_since(since)
+  if since :
+   versions = versions.filter(revision__date_created__gte=since)
+  return cursor_page('snapshots', versions.values_list(
+      'pk', 'revision__date_created')[:limit + 1], after, limit)
 
 # Set functions begin from here
 @xmlrpc_func(returns='string', args=['struct','string'])
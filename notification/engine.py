@@ -1,78 +1,238 @@
 import sys
 import time
 import logging
+import datetime
 import traceback
-
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
+from threading import Thread, Lock
 
 from django.conf import settings
+from django.db import connection as db_connection
 from django.core.mail import mail_admins
+from django.core.mail import get_connection
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 
-from lockfile import FileLock, AlreadyLocked, LockTimeout
-
 from notification.models import NoticeQueueBatch
 from notification import models as notification
 
-# lock timeout value. how long to wait for the lock to become available.
-# default behavior is to never wait for the lock to be available.
-LOCK_WAIT_TIMEOUT = getattr(settings, "NOTIFICATION_LOCK_WAIT_TIMEOUT", -1)
+# number of threads emitting the queued batches.
+WORKERS = getattr(settings, "NOTIFICATION_WORKERS", 1)
+
+# how long a batch stays invisible to the other workers once leased.
+LEASE_SECONDS = getattr(settings, "NOTIFICATION_LEASE_SECONDS", 300)
+
+# number of attempts per recipient, the batches of the recipients having
+# failed as many times are kept in the queue without being emitted.
+MAX_ATTEMPTS = getattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 5)
 
+# delay before the first retry of a recipient, doubled at each attempt.
+RETRY_DELAY = getattr(settings, "NOTIFICATION_RETRY_DELAY", 60)
 
-def send_all():
-    lock = FileLock("send_notices")
+
+class Stats(object):
+    """
+    Throughput and lag of the emitted batches, shared by the workers.
+    """
     
-    logging.debug("acquiring lock...")
-    try:
-        lock.acquire(LOCK_WAIT_TIMEOUT)
-    except AlreadyLocked:
-        logging.debug("lock already in place. quitting.")
-        return
-    except LockTimeout:
-        logging.debug("waiting for the lock timed out. quitting.")
-        return
-    logging.debug("acquired.")
+    def __init__(self):
+        self.lock = Lock()
+        self.start_time = time.time()
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.lag = 0.0
     
-    batches, sent = 0, 0
-    start_time = time.time()
+    def add(self, queued_batch, sent, retried):
+        lag = datetime.datetime.now() - queued_batch.created
+        lag = lag.days * 86400 + lag.seconds
+        self.lock.acquire()
+        try:
+            self.batches += 1
+            self.sent += sent
+            if queued_batch.attempts + 1 < MAX_ATTEMPTS:
+                self.retried += retried
+            else:
+                self.failed += retried
+            self.lag = max(self.lag, lag)
+        finally:
+            self.lock.release()
     
+    def as_dict(self):
+        seconds = time.time() - self.start_time
+        return {"batches": self.batches, "sent": self.sent,
+                "retried": self.retried, "failed": self.failed,
+                "lag": self.lag, "seconds": seconds,
+                "notices_per_second": seconds and self.sent / seconds}
+
+
+def queue_stats():
+    """
+    Depth of the queue: the batches due, leased, waiting for a retry or
+    failed for good, and the age in seconds of the oldest batch due.
+    """
+    now = datetime.datetime.now()
+    batches = NoticeQueueBatch.objects.all()
+    due = NoticeQueueBatch.objects.available(now).filter(
+        attempts__lt=MAX_ATTEMPTS)
+    oldest = list(due.order_by("created").values_list("created", flat=True)[:1])
+    lag = oldest and now - oldest[0]
+    return {"due": due.count(),
+            "leased": batches.filter(leased_until__gte=now).count(),
+            "delayed": batches.filter(available_at__gt=now).count(),
+            "failed": batches.filter(attempts__gte=MAX_ATTEMPTS).count(),
+            "lag": lag and lag.days * 86400 + lag.seconds or 0}
+
+
+def retry_delay(attempts):
+    return datetime.timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def emit_notice(notice, recipients, connection):
+    """
+    Sends the notice to the recipients in one go. The recipients whose
+    email failed are returned as they are, the others were delivered; on
+    any other failure it falls back to one recipient at a time. Returns
+    the pks of the recipients which failed and the last error.
+    """
+    arguments = (notice["label"], notice["extra_context"],
+                 notice["on_site"], notice["sender"])
     try:
-        # nesting the try statement to be Python 2.4
+        notification.send_now(recipients, *arguments, connection=connection)
+        return [], None
+    except notification.NoticeDeliveryError, e:
+        for user in e.failed:
+            logging.warning("emitting notice %s to user %s failed: %r" % (notice["label"], user.pk, e.error))
+        return [user.pk for user in e.failed], e.error
+    except Exception, e:
+        if len(recipients) == 1:
+            return [recipients[0].pk], e
+    failed, error = [], None
+    for user in recipients:
         try:
-            for queued_batch in NoticeQueueBatch.objects.all():
-                notices = pickle.loads(str(queued_batch.pickled_data).decode("base64"))
-                for user, label, extra_context, on_site, sender in notices:
-                    try:
-                        user = User.objects.get(pk=user)
-                        logging.info("emitting notice %s to %s" % (label, user))
-                        # call this once per user to be atomic and allow for logging to
-                        # accurately show how long each takes.
-                        notification.send_now([user], label, extra_context, on_site, sender)
-                    except User.DoesNotExist:
-                        # Ignore deleted users, just warn about them
-                        logging.warning("not emitting notice %s to user %s since it does not exist" % (label, user))
-                    sent += 1
-                queued_batch.delete()
-                batches += 1
-        except:
-            # get the exception
-            exc_class, e, t = sys.exc_info()
-            # email people
-            current_site = Site.objects.get_current()
-            subject = "[%s emit_notices] %r" % (current_site.name, e)
-            message = "%s" % ("\n".join(traceback.format_exception(*sys.exc_info())),)
-            mail_admins(subject, message, fail_silently=True)
-            # log it as critical
-            logging.critical("an exception occurred: %r" % e)
-    finally:
-        logging.debug("releasing lock...")
-        lock.release()
-        logging.debug("released.")
+            notification.send_now([user], *arguments, connection=connection)
+        except Exception, e:
+            logging.warning("emitting notice %s to user %s failed: %r" % (notice["label"], user.pk, e))
+            failed.append(user.pk)
+            error = e
+    return failed, error
+
+
+def emit_batch(queued_batch, connection=None, stats=None):
+    """
+    Emits the notices of a leased batch and releases it. The users are
+    fetched in one query, the recipients which failed are queued again in
+    a new batch, available after an exponential backoff.
+    """
+    sent, retried = 0, 0
+    for notice in queued_batch.get_notices():
+        users = User.objects.in_bulk(notice["users"])
+        recipients = []
+        for user in notice["users"]:
+            if user not in users:
+                # Ignore deleted users, just warn about them
+                logging.warning("not emitting notice %s to user %s since it does not exist" % (notice["label"], user))
+                continue
+            recipients.append(users[user])
+        if not recipients:
+            continue
+        logging.info("emitting notice %s to %s users" % (notice["label"], len(recipients)))
+        failed, error = emit_notice(notice, recipients, connection)
+        if failed:
+            attempts = queued_batch.attempts + 1
+            retry = NoticeQueueBatch(created=queued_batch.created,
+                                     attempts=attempts,
+                                     available_at=datetime.datetime.now() + retry_delay(attempts),
+                                     last_error=repr(error))
+            retry.set_notice(failed, notice["label"], notice["extra_context"],
+                             notice["on_site"], notice["sender"])
+            retry.save()
+            if attempts >= MAX_ATTEMPTS:
+                logging.error("notice %s to %s users failed %s times: %r" % (notice["label"], len(failed), attempts, error))
+        sent += len(recipients) - len(failed)
+        retried += len(failed)
+    queued_batch.release()
+    if stats is not None:
+        stats.add(queued_batch, sent, retried)
+    return sent
+
+
+def threaded(function):
+    """
+    Closes the database connection of the thread once the function is done.
+    """
+    def wrapper():
+        try:
+            function()
+        finally:
+            db_connection.close()
+    return wrapper
+
+
+def emit_batches(workers=WORKERS, lease_seconds=LEASE_SECONDS):
+    """
+    Emits the queued batches in a pool of threads, each one with its own
+    mail connection and leasing the batches one at a time until none is
+    available, so several emit_notices can run at once. Returns the stats
+    of the run, or re-raises the first exception of the threads once they
+    are done.
+    """
+    stats = Stats()
+    errors = []
+    
+    def work():
+        connection = get_connection()
+        connection.open()
+        try:
+            while not errors:
+                queued_batch = NoticeQueueBatch.objects.lease(lease_seconds,
+                                                              MAX_ATTEMPTS)
+                if queued_batch is None:
+                    return
+                try:
+                    emit_batch(queued_batch, connection, stats)
+                except:
+                    errors.append(sys.exc_info())
+        finally:
+            connection.close()
+    
+    if workers <= 1:
+        work()
+    else:
+        threads = [Thread(target=threaded(work)) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0][0], errors[0][1], errors[0][2]
+    return stats.as_dict()
+
+
+def send_all(workers=WORKERS):
+    """
+    Emits the queued batches. No lock is taken: the batches are leased,
+    so the concurrent runs share the queue.
+    """
+    stats = None
+    try:
+        stats = emit_batches(workers)
+    except:
+        # get the exception
+        exc_class, e, t = sys.exc_info()
+        # email people
+        current_site = Site.objects.get_current()
+        subject = "[%s emit_notices] %r" % (current_site.name, e)
+        message = "%s" % ("\n".join(traceback.format_exception(*sys.exc_info())),)
+        mail_admins(subject, message, fail_silently=True)
+        # log it as critical
+        logging.critical("an exception occurred: %r" % e)
     
-    logging.info("")
-    logging.info("%s batches, %s sent" % (batches, sent,))
-    logging.info("done in %.2f seconds" % (time.time() - start_time))
+    if stats is not None:
+        logging.info("")
+        logging.info("%(batches)s batches, %(sent)s sent, %(retried)s retried, %(failed)s failed" % stats)
+        logging.info("%(notices_per_second).1f notices per second, lag %(lag).0f seconds" % stats)
+        logging.info("done in %(seconds).2f seconds" % stats)
+    queued = queue_stats()
+    logging.info("queue: %(due)s due, %(delayed)s delayed, %(leased)s leased, %(failed)s failed, lag %(lag)s seconds" % queued)
+    return stats
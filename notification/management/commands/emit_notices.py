@@ -1,15 +1,21 @@
 
 import logging
+from optparse import make_option
 
 from django.core.management.base import NoArgsCommand
 
-from notification.engine import send_all
+from notification.engine import send_all, WORKERS
 
 class Command(NoArgsCommand):
     help = "Emit queued notices."
     
+    option_list = NoArgsCommand.option_list + (
+        make_option("--workers", dest="workers", type="int", default=WORKERS,
+                    help="Number of threads emitting the queued batches."),
+    )
+    
     def handle_noargs(self, **options):
         logging.basicConfig(level=logging.DEBUG, format="%(message)s")
         logging.info("-" * 72)
-        send_all()
+        send_all(options.get("workers"))
     
\ No newline at end of file
@@ -0,0 +1,42 @@
+from django.core.management.base import NoArgsCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from notification.models import NoticeQueueBatch
+
+class Command(NoArgsCommand):
+    help = ("Add the columns of the leased notice queue missing from a "
+            "notice queue table created before them.")
+    
+    def handle_noargs(self, **options):
+        verbosity = int(options.get("verbosity", 1))
+        table = NoticeQueueBatch._meta.db_table
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        existing = set([row[0] for row in
+                        connection.introspection.get_table_description(
+                            cursor, table)])
+        added = []
+        for field in NoticeQueueBatch._meta.local_fields:
+            if field.column in existing:
+                continue
+            # added nullable, then filled for the batches already queued,
+            # as not every backend can add a column with a computed default
+            cursor.execute("ALTER TABLE %s ADD COLUMN %s %s NULL" % (
+                qn(table), qn(field.column),
+                field.db_type(connection=connection)))
+            if not field.null:
+                cursor.execute("UPDATE %s SET %s = %%s" % (
+                    qn(table), qn(field.column)),
+                    [field.get_db_prep_save(field.get_default(),
+                                            connection=connection)])
+            for sql in connection.creation.sql_indexes_for_field(
+                    NoticeQueueBatch, field, no_style()):
+                cursor.execute(sql)
+            added.append(field.column)
+        transaction.commit_unless_managed()
+        if verbosity:
+            if added:
+                print "Added the columns %s to %s." % (", ".join(added), table)
+            else:
+                print "%s is up to date." % table
@@ -1,3 +1,5 @@
+import json
+import uuid
 import datetime
 
 try:
@@ -6,13 +8,18 @@ except ImportError:
     import pickle
 
 from django.db import models
+from django.db import transaction
+from django.db import IntegrityError
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
+from django.core.mail import get_connection
 from django.core.urlresolvers import reverse
 from django.template import Context
-from django.template.loader import render_to_string
+from django.template.loader import get_template
+from django.utils.datastructures import SortedDict
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import ugettext, get_language, activate
 
@@ -24,10 +31,23 @@ from django.contrib.contenttypes import generic
 
 QUEUE_ALL = getattr(settings, "NOTIFICATION_QUEUE_ALL", False)
 
+# number of recipients per queued batch.
+BATCH_SIZE = getattr(settings, "NOTIFICATION_BATCH_SIZE", 100)
+
 
 class LanguageStoreNotAvailable(Exception):
     pass
 
+class NoticeDeliveryError(Exception):
+    """
+    Some emails of a notice could not be sent: ``failed`` lists the users
+    which were not delivered, the others got their email and notice.
+    """
+    def __init__(self, failed, error):
+        Exception.__init__(self, failed, error)
+        self.failed = failed
+        self.error = error
+
 class NoticeType(models.Model):
     
     label = models.CharField(_("label"), max_length=40)
@@ -73,19 +93,51 @@ class NoticeSetting(models.Model):
 
 
 def get_notification_setting(user, notice_type, medium):
-    try:
-        return NoticeSetting.objects.get(user=user, notice_type=notice_type, medium=medium)
-    except NoticeSetting.DoesNotExist:
-        default = (NOTICE_MEDIA_DEFAULTS[medium] <= notice_type.default)
-        setting = NoticeSetting(user=user, notice_type=notice_type, medium=medium, send=default)
-        setting.save()
-        return setting
+    default = (NOTICE_MEDIA_DEFAULTS[medium] <= notice_type.default)
+    setting, created = NoticeSetting.objects.get_or_create(user=user,
+        notice_type=notice_type, medium=medium, defaults={"send": default})
+    return setting
 
 
 def should_send(user, notice_type, medium):
     return get_notification_setting(user, notice_type, medium).send
 
 
+def get_notification_sends(users, notice_type, medium):
+    """
+    Returns a dict of user id: whether to send notifications of a given
+    type to a given medium, for several users. The missing settings are
+    created with the default in one query, or one by one when another
+    process created some of them meanwhile.
+    """
+    users = dict([(user.pk, user) for user in users])
+    user_ids = users.keys()
+    sends = {}
+    for start in range(0, len(user_ids), 500):
+        sends.update(NoticeSetting.objects.filter(
+            user__in=user_ids[start:start + 500], notice_type=notice_type,
+            medium=medium).values_list("user", "send"))
+    default = (NOTICE_MEDIA_DEFAULTS[medium] <= notice_type.default)
+    missing = [NoticeSetting(user_id=user_id, notice_type=notice_type,
+                             medium=medium, send=default)
+               for user_id in user_ids if user_id not in sends]
+    if not missing:
+        return sends
+    sid = transaction.savepoint()
+    try:
+        NoticeSetting.objects.bulk_create(missing)
+        transaction.savepoint_commit(sid)
+    except IntegrityError:
+        transaction.savepoint_rollback(sid)
+        for setting in missing:
+            sends[setting.user_id] = get_notification_setting(
+                users[setting.user_id], notice_type, medium).send
+        return sends
+    for setting in missing:
+        sends[setting.user_id] = default
+    return sends
+
+
 class NoticeManager(models.Manager):
     
     def notices_for(self, user, archived=False, unseen=None, on_site=None, sent=False):
@@ -179,12 +231,122 @@ class Notice(models.Model):
         return reverse("notification_notice", args=[str(self.pk)])
 
 
+def encode_value(value):
+    """
+    Serializes the model instances and the dates of a queued notice.
+    """
+    if isinstance(value, models.Model):
+        return {"__model__": "%s.%s" % (value._meta.app_label,
+                                        value._meta.object_name),
+                "pk": value.pk}
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.strftime("%Y-%m-%dT%H:%M:%S")}
+    raise TypeError("%r can not be queued" % (value,))
+
+
+def decode_value(value):
+    """
+    Restores the model instances and the dates of a queued notice, the
+    deleted instances being restored as None.
+    """
+    if "__model__" in value:
+        model = models.get_model(*value["__model__"].split("."))
+        try:
+            return model._default_manager.get(pk=value["pk"])
+        except model.DoesNotExist:
+            return None
+    if "__datetime__" in value:
+        return datetime.datetime.strptime(value["__datetime__"],
+                                          "%Y-%m-%dT%H:%M:%S")
+    return value
+
+
+class NoticeQueueBatchManager(models.Manager):
+    
+    def available(self, now=None):
+        """
+        The batches which are not leased and due, retries included.
+        """
+        now = now or datetime.datetime.now()
+        return self.filter(Q(leased_until__isnull=True) |
+                           Q(leased_until__lt=now),
+                           available_at__lte=now)
+    
+    def lease(self, seconds, attempts):
+        """
+        Leases the next available batch for the given number of seconds.
+        The lease is taken with a conditional update so concurrent workers
+        never get the same batch, and expires if the worker dies: the batch
+        is then visible again. Returns None when nothing is available.
+        """
+        now = datetime.datetime.now()
+        candidates = self.available(now).filter(attempts__lt=attempts).order_by(
+            "available_at", "pk").values_list("pk", flat=True)
+        for batch_id in candidates[:10]:
+            token = uuid.uuid4().hex
+            if self.available(now).filter(pk=batch_id).update(
+                    leased_until=now + datetime.timedelta(seconds=seconds),
+                    lease_token=token):
+                return self.get(pk=batch_id)
+        return None
+
+
 class NoticeQueueBatch(models.Model):
     """
-    A queued notice.
-    Denormalized data for a notice.
+    A queued notice sent to a batch of users.
+    Denormalized data for the notice, in JSON, or pickled for the batches
+    queued before the JSON format.
+    
+    The batches are leased by the workers emitting them, and the recipients
+    which failed are queued again in a new batch, available after a delay.
+    
+    The columns added with the leases are created on an existing table by
+    the upgrade_notice_queue command.
     """
-    pickled_data = models.TextField()
+    pickled_data = models.TextField(blank=True)
+    data = models.TextField(blank=True)
+    created = models.DateTimeField(default=datetime.datetime.now)
+    available_at = models.DateTimeField(default=datetime.datetime.now,
+                                        db_index=True)
+    leased_until = models.DateTimeField(null=True, blank=True, db_index=True)
+    lease_token = models.CharField(max_length=32, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    objects = NoticeQueueBatchManager()
+    
+    def get_notices(self):
+        """
+        Returns the notices of the batch as dicts with the users, label,
+        extra_context, on_site and sender keys.
+        """
+        if self.data:
+            return [json.loads(self.data, object_hook=decode_value)]
+        notices = []
+        for user, label, extra_context, on_site, sender in pickle.loads(
+                str(self.pickled_data).decode("base64")):
+            notice = {"users": [user], "label": label,
+                      "extra_context": extra_context, "on_site": on_site,
+                      "sender": sender}
+            for queued in notices:
+                if dict(queued, users=[user]) == notice:
+                    queued["users"].append(user)
+                    break
+            else:
+                notices.append(notice)
+        return notices
+    
+    def set_notice(self, users, label, extra_context, on_site, sender):
+        self.data = json.dumps({
+            "users": users, "label": label, "extra_context": extra_context,
+            "on_site": on_site, "sender": sender}, default=encode_value)
+    
+    def release(self):
+        """
+        Deletes the batch unless its lease was taken over by another worker.
+        """
+        NoticeQueueBatch.objects.filter(
+            pk=self.pk, lease_token=self.lease_token).delete()
 
 
 def create_notice_type(label, display, description, default=2, verbosity=1):
@@ -251,7 +413,19 @@ def get_formatted_messages(formats, label, context):
     return format_templates
 
 
-def send_now(users, label, extra_context=None, on_site=True, sender=None):
+def render_template(template, dictionary, context):
+    """
+    Renders a compiled template with a dictionary pushed on the context.
+    """
+    context.update(dictionary)
+    try:
+        return template.render(context)
+    finally:
+        context.pop()
+
+
+def send_now(users, label, extra_context=None, on_site=True, sender=None,
+             connection=None):
     """
     Creates a new notice.
     
@@ -264,9 +438,18 @@ def send_now(users, label, extra_context=None, on_site=True, sender=None):
     
     You can pass in on_site=False to prevent the notice emitted from being
     displayed on the site.
+    
+    The recipients are grouped by language: the context is built once per
+    language and the messages, the subject and the body are rendered with
+    the compiled templates for each recipient, who is in the context as
+    "recipient". The notices are created in one query and the emails are
+    sent one by one over one mail connection, the given one or a new one.
+    A NoticeDeliveryError lists the recipients whose email failed, they get
+    no notice so that they alone can be retried.
     """
     if extra_context is None:
         extra_context = {}
+    users = list(users)
     
     notice_type = NoticeType.objects.get(label=label)
     
@@ -288,22 +471,30 @@ def send_now(users, label, extra_context=None, on_site=True, sender=None):
         "full.html",
     ) # TODO make formats configurable
     
+    sends = get_notification_sends(users, notice_type, "1")
+    
+    # get user language for user from language store defined in
+    # NOTIFICATION_LANGUAGE_MODULE setting
+    languages = SortedDict()
     for user in users:
-        recipients = []
-        # get user language for user from language store defined in
-        # NOTIFICATION_LANGUAGE_MODULE setting
         try:
             language = get_notification_language(user)
         except LanguageStoreNotAvailable:
             language = None
-        
+        languages.setdefault(language, []).append(user)
+    
+    subject_template = get_template("gstudio/notification/email_subject.txt")
+    body_template = get_template("gstudio/notification/email_body.txt")
+    
+    notices = []
+    emails = []
+    for language, recipients in languages.items():
         if language is not None:
-            # activate the user's language
+            # activate the language of the recipients
             activate(language)
         
-        # update context with user specific translations
+        # update context with language specific translations
         context = Context({
-            "recipient": user,
             "sender": sender,
             "notice": ugettext(notice_type.display),
             "notices_url": notices_url,
@@ -311,26 +502,55 @@ def send_now(users, label, extra_context=None, on_site=True, sender=None):
         })
         context.update(extra_context)
         
-        # get prerendered format messages
-        messages = get_formatted_messages(formats, label, context)
-        
-        # Strip newlines from subject
-        subject = "".join(render_to_string("gstudio/notification/email_subject.txt", {
-            "message": messages["short.txt"],
-        }, context).splitlines())
-        
-        body = render_to_string("gstudio/notification/email_body.txt", {
-            "message": messages["full.txt"],
-        }, context)
-        
-        notice = Notice.objects.create(recipient=user, message=messages["notice.html"],
-            notice_type=notice_type, on_site=on_site, sender=sender)
-        if should_send(user, notice_type, "1") and user.email and user.is_active: # Email
-            recipients.append(user.email)
-        send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, recipients)
+        for user in recipients:
+            context.update({"recipient": user})
+            try:
+                # get prerendered format messages
+                messages = get_formatted_messages(formats, label, context)
+                notices.append(Notice(recipient=user,
+                    message=messages["notice.html"], notice_type=notice_type,
+                    on_site=on_site, sender=sender))
+                if not (sends.get(user.pk) and user.email and user.is_active):
+                    continue
+                
+                # Strip newlines from subject
+                subject = "".join(render_template(subject_template, {
+                    "message": messages["short.txt"],
+                }, context).splitlines())
+                
+                body = render_template(body_template, {
+                    "message": messages["full.txt"],
+                }, context)
+                
+                emails.append((user, EmailMessage(subject, body,
+                    settings.DEFAULT_FROM_EMAIL, [user.email]))) # Email
+            finally:
+                context.pop()
+    
+    # the emails are sent first, so a failed recipient gets no notice
+    # and can be retried without sending again to the others
+    failed, error = [], None
+    if emails:
+        connection = connection or get_connection()
+        opened = connection.open()
+        try:
+            for user, email in emails:
+                try:
+                    connection.send_messages([email])
+                except Exception, e:
+                    failed.append(user)
+                    error = e
+        finally:
+            if opened:
+                connection.close()
+    Notice.objects.bulk_create([notice for notice in notices
+                                if notice.recipient not in failed])
     
     # reset environment to original language
     activate(current_language)
+    
+    if failed:
+        raise NoticeDeliveryError(failed, error)
 
 
 def send(*args, **kwargs):
@@ -359,6 +579,10 @@ def queue(users, label, extra_context=None, on_site=True, sender=None):
     Queue the notification in NoticeQueueBatch. This allows for large amounts
     of user notifications to be deferred to a seperate process running outside
     the webserver.
+    
+    The users are split in batches of NOTIFICATION_BATCH_SIZE, and the
+    extra_context and the sender are stored in JSON: the model instances
+    are stored by reference and fetched again when emitted.
     """
     if extra_context is None:
         extra_context = {}
@@ -366,10 +590,11 @@ def queue(users, label, extra_context=None, on_site=True, sender=None):
         users = [row["pk"] for row in users.values("pk")]
     else:
         users = [user.pk for user in users]
-    notices = []
-    for user in users:
-        notices.append((user, label, extra_context, on_site, sender))
-    NoticeQueueBatch(pickled_data=pickle.dumps(notices).encode("base64")).save()
+    for i in range(0, len(users), BATCH_SIZE):
+        queued_batch = NoticeQueueBatch()
+        queued_batch.set_notice(users[i:i + BATCH_SIZE], label,
+                                extra_context, on_site, sender)
+        queued_batch.save()
 
 
 class ObservedItemManager(models.Manager):
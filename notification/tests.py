@@ -0,0 +1,181 @@
+import datetime
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.contrib.auth.models import User
+
+from notification import engine
+from notification import models as notification
+from notification.engine import emit_batches, queue_stats, MAX_ATTEMPTS
+from notification.models import Notice, NoticeSetting, NoticeQueueBatch
+
+
+class BatchDeliveryTestCase(TestCase):
+    urls = "notification.urls"
+    
+    def setUp(self):
+        notification.create_notice_type("announcement", "Announcement",
+                                        "an announcement", default=2)
+        self.users = [User.objects.create_user("user%s" % i,
+                                               "user%s@example.com" % i)
+                      for i in range(3)]
+        self.users.append(User.objects.create_user("noemail", ""))
+    
+    def test_send_now(self):
+        notification.send_now(self.users, "announcement")
+        self.assertEquals(Notice.objects.count(), 4)
+        self.assertEquals(NoticeSetting.objects.count(), 4)
+        self.assertEquals(sorted([message.to[0] for message in mail.outbox]),
+                          ["user0@example.com", "user1@example.com",
+                           "user2@example.com"])
+        self.assertEquals(len(set([message.subject
+                                   for message in mail.outbox])), 1)
+    
+    def test_send_now_settings(self):
+        notification.send_now(self.users[:1], "announcement")
+        NoticeSetting.objects.filter(user=self.users[0]).update(send=False)
+        mail.outbox = []
+        notification.send_now(self.users, "announcement")
+        self.assertEquals([message.to[0] for message in mail.outbox],
+                          ["user1@example.com", "user2@example.com"])
+        self.assertEquals(NoticeSetting.objects.count(), 4)
+    
+    def test_concurrent_settings(self):
+        notice_type = notification.NoticeType.objects.get(label="announcement")
+        manager = NoticeSetting.objects
+        bulk_create = manager.bulk_create
+        def racing_bulk_create(settings):
+            # another worker creates a setting between the read and the insert
+            NoticeSetting.objects.create(user=self.users[0],
+                notice_type=notice_type, medium="1", send=False)
+            return bulk_create(settings)
+        manager.bulk_create = racing_bulk_create
+        try:
+            sends = notification.get_notification_sends(self.users,
+                                                        notice_type, "1")
+        finally:
+            del manager.bulk_create
+        self.assertEquals(sends[self.users[0].pk], False)
+        self.assertEquals(sends[self.users[1].pk], True)
+        self.assertEquals(NoticeSetting.objects.count(), 4)
+    
+    def test_emit_batches(self):
+        notification.queue(self.users[:2], "announcement")
+        notification.queue(self.users[2:], "announcement")
+        self.users[0].delete()
+        stats = emit_batches(workers=1)
+        self.assertEquals(stats["batches"], 2)
+        self.assertEquals(stats["sent"], 3)
+        self.assertEquals(NoticeQueueBatch.objects.count(), 0)
+        self.assertEquals(Notice.objects.count(), 3)
+        self.assertEquals(len(mail.outbox), 2)
+    
+    def test_queue_payload(self):
+        notification.queue(self.users[:2], "announcement",
+                           {"user": self.users[2]}, sender=self.users[3])
+        queued_batch = NoticeQueueBatch.objects.get()
+        self.assertEquals(queued_batch.pickled_data, "")
+        notice = queued_batch.get_notices()[0]
+        self.assertEquals(notice["users"], [user.pk for user in self.users[:2]])
+        self.assertEquals(notice["extra_context"], {"user": self.users[2]})
+        self.assertEquals(notice["sender"], self.users[3])
+        self.assertRaises(TypeError, notification.queue, self.users,
+                          "announcement", {"spam": object()})
+    
+    def test_legacy_payload(self):
+        notices = [(user.pk, "announcement", {}, True, None)
+                   for user in self.users]
+        NoticeQueueBatch.objects.create(
+            pickled_data=pickle.dumps(notices).encode("base64"))
+        self.assertEquals(emit_batches(workers=1)["sent"], 4)
+        self.assertEquals(Notice.objects.count(), 4)
+    
+    def test_lease(self):
+        notification.queue(self.users, "announcement")
+        queued_batch = NoticeQueueBatch.objects.lease(60, MAX_ATTEMPTS)
+        self.assertNotEquals(queued_batch, None)
+        self.assertEquals(NoticeQueueBatch.objects.lease(60, MAX_ATTEMPTS), None)
+        self.assertEquals(queue_stats()["leased"], 1)
+        NoticeQueueBatch.objects.update(
+            leased_until=datetime.datetime.now() - datetime.timedelta(seconds=1))
+        expired = NoticeQueueBatch.objects.lease(60, MAX_ATTEMPTS)
+        self.assertEquals(expired.pk, queued_batch.pk)
+        queued_batch.release()
+        self.assertEquals(NoticeQueueBatch.objects.count(), 1)
+        expired.release()
+        self.assertEquals(NoticeQueueBatch.objects.count(), 0)
+    
+    def test_retry(self):
+        send_now = notification.send_now
+        
+        def failing_send_now(users, *args, **kwargs):
+            if self.users[1] in users:
+                raise IOError("mailbox unavailable")
+            return send_now(users, *args, **kwargs)
+        
+        notification.queue(self.users, "announcement")
+        notification.send_now = failing_send_now
+        try:
+            stats = emit_batches(workers=1)
+        finally:
+            notification.send_now = send_now
+        self.assertEquals(stats["sent"], 3)
+        self.assertEquals(stats["retried"], 1)
+        retry = NoticeQueueBatch.objects.get()
+        self.assertEquals(retry.attempts, 1)
+        self.assertEquals(retry.get_notices()[0]["users"], [self.users[1].pk])
+        self.assertTrue(retry.available_at > datetime.datetime.now())
+        self.assertTrue("mailbox unavailable" in retry.last_error)
+        self.assertEquals(emit_batches(workers=1)["batches"], 0)
+        self.assertEquals(queue_stats()["delayed"], 1)
+        
+        NoticeQueueBatch.objects.update(available_at=datetime.datetime.now())
+        self.assertEquals(emit_batches(workers=1)["sent"], 1)
+        self.assertEquals(Notice.objects.count(), 4)
+        self.assertEquals(len(mail.outbox), 3)
+    
+    def test_retry_failed_emails(self):
+        failing_address = self.users[1].email
+        
+        class FailingBackend(locmem.EmailBackend):
+            def send_messages(self, messages):
+                # delivers the messages up to the failing one, like smtp
+                for message in messages:
+                    if failing_address in message.to:
+                        raise IOError("mailbox unavailable")
+                    super(FailingBackend, self).send_messages([message])
+                return len(messages)
+        
+        notification.queue(self.users, "announcement")
+        engine.get_connection = FailingBackend
+        try:
+            stats = emit_batches(workers=1)
+        finally:
+            engine.get_connection = get_connection
+        self.assertEquals(stats["sent"], 3)
+        self.assertEquals(stats["retried"], 1)
+        self.assertEquals(len(mail.outbox), 2)
+        self.assertEquals(Notice.objects.count(), 3)
+        retry = NoticeQueueBatch.objects.get()
+        self.assertEquals(retry.get_notices()[0]["users"], [self.users[1].pk])
+
+
+class UpgradeNoticeQueueTestCase(TransactionTestCase):
+    """
+    The upgrade reads the columns with PRAGMA table_info, which commits
+    under sqlite, so it cannot run in the transaction of a TestCase.
+    """
+    
+    def test_upgrade_notice_queue(self):
+        batch = NoticeQueueBatch.objects.create(data="{}")
+        call_command("upgrade_notice_queue", verbosity=0)
+        self.assertEquals(NoticeQueueBatch.objects.get(pk=batch.pk).data, "{}")
@@ -0,0 +1,216 @@
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Discussion index of Objectapp.
+
+A twist is posted in the box of a thread, and every response hangs
+below a twist through its prior nodes.  The twist, the thread and the
+box of each post are kept in the ``DiscussionIndex`` table, updated
+when the boxes, the threads or the prior nodes change, so that they
+are fetched with a single query instead of scanning all the systems.
+
+The index is only written by these changes, the posts made before it
+are indexed by ``manage.py index_discussions``: reading a post which
+is not indexed finds no discussion."""
+
+
+def first_priors(ids):
+    """Return the first prior node of each post"""
+    from objectapp.models import Gbobject
+
+    priors = {}
+    for gbobject, prior in Gbobject.prior_nodes.through.objects.filter(
+        from_gbobject__in=ids).order_by(
+        'to_gbobject__creation_date').values_list(
+        'from_gbobject', 'to_gbobject'):
+        priors[gbobject] = prior
+    return priors
+
+
+def thread_boxes(ids):
+    """Return the thread and the box holding each twist, a twist
+    belonging to a thread when it is in the first box of the thread"""
+    from objectapp.models import System
+
+    containers = {}
+    for box, gbobject in System.gbobject_set.through.objects.filter(
+        gbobject__in=ids).values_list('system', 'gbobject'):
+        containers.setdefault(gbobject, set()).add(box)
+    boxes = set()
+    for each in containers.values():
+        boxes.update(each)
+
+    nested = System.system_set.through.objects
+    threads = nested.filter(to_system__in=boxes).values_list(
+        'from_system', flat=True)
+    first_boxes = {}
+    for thread, box in nested.filter(from_system__in=set(threads)).order_by(
+        'to_system__creation_date').values_list('from_system', 'to_system'):
+        first_boxes[thread] = box
+    ordered = System.objects.filter(pk__in=first_boxes.keys()).order_by(
+        'creation_date').values_list('pk', flat=True)
+
+    result = {}
+    for thread in ordered:
+        box = first_boxes[thread]
+        for gbobject, each in containers.items():
+            if box in each:
+                result[gbobject] = (thread, box)
+    return result
+
+
+def index_discussions(ids):
+    """Index the given posts and all the responses below them"""
+    from objectapp.models import Gbobject
+    from objectapp.models import DiscussionIndex
+
+    ids = set(Gbobject.objects.filter(pk__in=ids).values_list(
+        'pk', flat=True))
+    if not ids:
+        return
+
+    # walk up to the twists, one level per query
+    priors = {}
+    visited = set(ids)
+    frontier = ids
+    while frontier:
+        found = first_priors(frontier)
+        priors.update(found)
+        frontier = set(found.values()) - visited
+        visited.update(frontier)
+
+    def root_of(post):
+        seen = set([post])
+        while post in priors and priors[post] not in seen:
+            post = priors[post]
+            seen.add(post)
+        return post
+
+    roots = dict([(post, root_of(post)) for post in ids])
+    threads = thread_boxes(set(roots.values()))
+    entries = {}
+    for post, root in roots.items():
+        thread, box = threads.get(root, (None, None))
+        entries[post] = (root != post and root or None, thread, box)
+
+    # walk down the responses whose first prior node moved
+    through = Gbobject.prior_nodes.through
+    frontier = ids
+    while frontier:
+        children = set(through.objects.filter(
+            to_gbobject__in=frontier).values_list(
+            'from_gbobject', flat=True)) - set(entries)
+        next_frontier = set()
+        for child, prior in first_priors(children).items():
+            if prior in frontier:
+                twist, thread, box = entries[prior]
+                entries[child] = (twist or prior, thread, box)
+                next_frontier.add(child)
+        frontier = next_frontier
+
+    DiscussionIndex.objects.filter(gbobject__in=entries.keys()).delete()
+    DiscussionIndex.objects.bulk_create(
+        [DiscussionIndex(gbobject_id=post, twist_id=twist,
+                         thread_id=thread, box_id=box)
+         for post, (twist, thread, box) in entries.items()])
+
+
+def discussion_of(gbobject_id):
+    """Return the index entry of a post, None when it is not indexed"""
+    from objectapp.models import DiscussionIndex
+
+    try:
+        return DiscussionIndex.objects.select_related(
+            'twist', 'thread', 'box').get(gbobject=gbobject_id)
+    except DiscussionIndex.DoesNotExist:
+        return None
+
+
+def thread_of_twist(gbobject_id):
+    """Return the thread holding a twist"""
+    entry = discussion_of(gbobject_id)
+    if entry is not None and entry.twist_id is None:
+        return entry.thread
+    return None
+
+
+def box_of_twist(gbobject_id):
+    """Return the box of the thread holding a twist"""
+    entry = discussion_of(gbobject_id)
+    if entry is not None and entry.twist_id is None:
+        return entry.box
+    return None
+
+
+def thread_of_response(gbobject_id):
+    """Return the thread of a response or of a twist"""
+    entry = discussion_of(gbobject_id)
+    return entry is not None and entry.thread or None
+
+
+def twist_of_response(gbobject_id):
+    """Return the twist a response belongs to"""
+    entry = discussion_of(gbobject_id)
+    return entry is not None and entry.twist or None
+
+
+def reindex_prior_nodes(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex the responses whose prior nodes change"""
+    from objectapp.models import Gbobject
+
+    if action == 'pre_clear' and reverse:
+        instance._discussion_posts = list(
+            Gbobject.prior_nodes.through.objects.filter(
+            to_gbobject=instance.pk).values_list('from_gbobject', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        index_discussions([instance.pk])
+    elif action == 'post_clear':
+        index_discussions(getattr(instance, '_discussion_posts', []))
+    else:
+        index_discussions(pk_set)
+
+
+def reindex_box_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex the twists joining or leaving a box"""
+    if action == 'pre_clear' and not reverse:
+        instance._discussion_posts = list(
+            instance.gbobject_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        index_discussions([instance.pk])
+    elif action == 'post_clear':
+        index_discussions(getattr(instance, '_discussion_posts', []))
+    else:
+        index_discussions(pk_set)
+
+
+def reindex_thread_boxes(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex the twists of the boxes joining or leaving a thread"""
+    from objectapp.models import System
+
+    if action == 'pre_clear':
+        instance._discussion_systems = list(
+            instance.system_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_discussion_systems', [])
+    systems = set(pk_set or []) | set([instance.pk])
+    index_discussions(System.gbobject_set.through.objects.filter(
+        system__in=systems).values_list('gbobject', flat=True))
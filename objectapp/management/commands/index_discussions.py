@@ -0,0 +1,53 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Discussion index backfill command module for Objectapp"""
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from objectapp.models import Gbobject
+from objectapp.discussions import index_discussions
+
+
+class Command(NoArgsCommand):
+    """Command object for indexing the twist, thread and box
+    of all the posts"""
+    help = 'Index the twist, thread and box of all the posts.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--chunk-size', dest='chunk_size', type='int',
+                    default=500, help='Number of posts read per query.'),
+        )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        chunk_size = options.get('chunk_size')
+
+        posts = Gbobject.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = 0
+        indexed = 0
+        while True:
+            chunk = list(posts.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+            index_discussions(chunk)
+            indexed += len(chunk)
+
+        if verbosity:
+            print '%i posts indexed.' % indexed
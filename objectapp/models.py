@@ -73,6 +73,9 @@ from django.utils.html import linebreaks
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import pre_delete
 from django.utils.importlib import import_module
 from django.contrib import comments
 from django.contrib.comments.models import CommentFlag
@@ -85,6 +88,7 @@ from django.contrib.markup.templatetags.markup import restructuredtext
 
 
 from djangoratings.fields import RatingField
+from djangoratings.models import Vote
 from tagging.fields import TagField
 from gstudio.models import Nodetype
 from gstudio.models import Objecttype
@@ -98,6 +102,22 @@ from gstudio.models import Node
 from gstudio.models import Edge
 from gstudio.models import Author
 from gstudio.models import NID
+from gstudio.resolver import forget_resolved
+from gstudio.nbhood import mark_members_dirty
+from gstudio.nbhood import load_nbhood
+from gstudio.nbhood import dump_nbhood
+from gstudio.graphs import get_graph_json
+from gstudio.graphs import view_object_url
+from gstudio.loom import invalidate_loom_statistics
+from gstudio.loom import prepare_loom_invalidation
+from objectapp.discussions import thread_of_twist
+from objectapp.discussions import thread_of_response
+from objectapp.discussions import twist_of_response
+from objectapp.discussions import reindex_prior_nodes
+from objectapp.discussions import reindex_box_posts
+from objectapp.discussions import reindex_thread_boxes
+from objectapp.viewurls import view_object_urls
+from gstudio.preferences import author_preferences
 import ast
 from objectapp.settings import UPLOAD_TO
 from objectapp.settings import MARKUP_LANGUAGE
@@ -121,10 +141,6 @@ if OBJECTAPP_VERSIONING:
 
 
 
-counter = 1
-attr_counter = -1
-
-
 class Author(User):
     """Proxy Model around User"""
 
@@ -213,56 +229,25 @@ class Gbobject(Node):
 
     @property
     def getthread_of_response(self):
-        """                                                                                                                          
-        Returns the thread corresponding to a reply(response)"                                                                       
         """
-        obj=self
-        try:
-            loop=True
-            while loop:
-                if obj.prior_nodes.all():
-                    obj=obj.prior_nodes.all()[0]
-                else:
-                    break
-            if not obj.prior_nodes.all():
-                    loop=False
-            return obj.getthread_of_twist
-        except:
-            return None
+        Returns the thread corresponding to a reply(response)
+        """
+        return thread_of_response(self.id)
 
     @property
     def gettwist_of_response(self):
-        """                                                                                                                          
-        Returns twist of a response(reply)                                                                                           
         """
-        obj=self
-        try:
-            loop=True
-            while loop:
-                obj=obj.prior_nodes.all()[0]
-                if not obj.prior_nodes.all():
-                    loop=False
-            return obj
-        except:
-            return None
+        Returns twist of a response(reply)
+        """
+        return twist_of_response(self.id)
+
     @property
     def getthread_of_twist(self):
-        """                                                                                                                          
-        Returns thread of a twist                                                                                                    
         """
-        try:
-            obj=self
-            for each in System.objects.all():
-                if each.system_set.all():
-                    sys_set=each.system_set.all()[0]
-                    for eachsys in sys_set.gbobject_set.all():
-                        if eachsys==self:
-                            return each
-        except:
-            pass
-
+        Returns thread of a twist
+        """
+        return thread_of_twist(self.id)
 
-        
     @property
     def getattributetypes(self):
         """ 
@@ -560,93 +545,13 @@ class Gbobject(Node):
 
     
     def get_graph_json(self):
-        
-        
-        
-	g_json = {}
-	g_json["node_metadata"]= [] 
-	g_json["relations"]=[]
-	
-
-	global counter 
-	global attr_counter
-	nbh = self.get_nbh
-	predicate_id = {}
-        
-        for key in nbh.keys():
-            val = str(counter) + "b"
-            predicate_id[key] = val
-            counter = counter + 1
-        #print predicate_id
-
-       
-
-        this_node = {"_id":str(self.id),"title":self.title,"screen_name":self.title, "url":self.get_view_object_url,"refType":self.reftype}
-        g_json["node_metadata"].append(this_node)      
-	
-
-	for key in predicate_id.keys():
-		if nbh[key]:
-                    try:
-				
-                        g_json["node_metadata"].append({"_id":str(predicate_id[key]),"screen_name":key})
-                        
-                        g_json["relations"].append({"from":self.id ,"type":str(key),"value":1,"to":predicate_id[key] })
-
-                        if not isinstance(nbh[key],basestring) and len(nbh[key])<=10:
-                            for item in nbh[key]:
-                                if isinstance(item,unicode):
-                                    g_json["node_metadata"].append({"_id":(str(attr_counter)+"b"),"screen_name":str(item)})
-                                    g_json["relations"].append({"from":predicate_id[key] ,"type":str(key) ,"value":1,"to":(str(attr_counter)+"b") })
-                                    attr_counter-=1
-                                    
-                                elif item.reftype!="Relation":
-                                    # create nodes
-                                    g_json["node_metadata"].append({"_id":str(item.id),"screen_name":item.title,"title":self.title, "url":item.get_view_object_url,"refType":item.reftype})
-                                    g_json["relations"].append({"from":predicate_id[key] ,"type":str(key), "value":1,"to":item.id  })
-                                    
-                                else:
-                                    
-                                    if item.left_subject.id==self.id:
-                                        item1=item.right_subject
-                                        itemid=item.right_subject.id
-                                        flag=1
-                                        
-                                    elif item.right_subject.id==self.id:
-                                        item1=item.left_subject
-                                        itemid=item.left_subject.id
-                                        flag=0						
-                                    getit=Gbobject.objects.get(id=itemid)
-                                    getiturl=getit.get_view_object_url
-                                    g_json["node_metadata"].append({"_id":str(item1.id),"screen_name":item1.title,"title":self.title, "url":getiturl,"refType":item.reftype,"inverse":item.relationtype.inverse,"flag":flag})
-                                        
-                                        
-                                    g_json["relations"].append({"from":predicate_id[key] ,"type":str(key), "value":1,"to":item1.id  })
-                        else:
-                            if not isinstance(nbh[key],basestring):
-                                g_json["node_metadata"].append({"_id":(str(attr_counter))+"a","screen_name":str(len(nbh[key]))+" nodes...","title":str(key),"url":"/nodetypes/graphs/graph_label/"+str(self.id)+"/"+str(key)})
-					#g_json["relations"].append({"from":predicate_id[key] ,"type":str(key) ,"value":1,"to":(str(attr_counter))})
-                            else:
-                                g_json["node_metadata"].append({"_id":(str(attr_counter)+"a"),"screen_name":nbh[key]})
-    
-                            g_json["relations"].append({"from":predicate_id[key] ,"type":str(key) ,"value":1,"to":(str(attr_counter)+"a")})
-
-                            attr_counter-=1
-
-                    except:
-                            pass
-                            
-        #print g_json
-        return json.dumps(g_json)   
+        """Returns the graph JSON of the neighbourhood of the object"""
+        return get_graph_json(self, view_object_url)
     def get_label(self,key):
         nbh=self.get_nbh
-        list_of_nodes=[]
         if not key=='Tags':
-            for item in nbh[key]:
-                node = NID.objects.get(id=item.id)
-                node = node.ref
-                list_of_nodes.append(node)
-                return list_of_nodes
+            nodes=NID.objects.resolve_many([item.id for item in nbh[key]])
+            return [nodes[item.id] for item in nbh[key] if item.id in nodes]
         else:
             return nbh[key]
 
@@ -660,7 +565,7 @@ class Gbobject(Node):
         ver_dict=self.version_info(ssid)
         ver_dict1=self.version_info(ssid)
         #ver_dict=str(ver['nbhood'])
-        ver_dict=ast.literal_eval(ver_dict['nbhood'])
+        ver_dict=load_nbhood(ver_dict['nbhood'])
         g_json = {}
         g_json["node_metadata"]= [] 
         g_json["relations"]=[]
@@ -786,9 +691,9 @@ class Gbobject(Node):
 		length=len(version_list)
         	history_ssid=version_list[length-1]
         	history_dict=self.version_info(history_ssid)
-        	history_nbh_dict=ast.literal_eval(history_dict['nbhood'])
+        	history_nbh_dict=load_nbhood(history_dict['nbhood'])
         	#ssid_current.append(history_ssid)
-        	history=history_nbh_dict['history']
+        	history=history_nbh_dict.get('history', [])
         	history.append(history_ssid)
         else:
                 history.append(0)
@@ -968,7 +873,7 @@ class Gbobject(Node):
 
     @property
     def ref(self):
-        return eval(self.nodemodel).objects.get(id=self.id)
+        return NID.objects.resolve(self.id, self.nodemodel)
     @models.permalink
     def get_absolute_url(self):
         """Return gbobject's URL"""
@@ -981,12 +886,23 @@ class Gbobject(Node):
     # @reversion.create_revision()
     def save(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
-	super(Gbobject, self).save(*args, **kwargs) # Call the "real" save() method.
-	self.nbhood=self.get_rendered_nbh
         if OBJECTAPP_VERSIONING:
             with reversion.create_revision():
-                super(Gbobject, self).save(*args, **kwargs) # Call the "real" save() method.        
-        
+                super(Gbobject, self).save(*args, **kwargs) # Call the "real" save() method.
+                self.store_nbhood()
+        else:
+            super(Gbobject, self).save(*args, **kwargs) # Call the "real" save() method.
+            self.store_nbhood()
+        forget_resolved(self.pk)
+
+    def store_nbhood(self):
+        """
+        Renders and stores the neighbourhood of the saved object,
+        without saving it again
+        """
+        self.nbhood = dump_nbhood(self.get_rendered_nbh)
+        Node._base_manager.filter(pk=self.pk).update(nbhood=self.nbhood)
+
     def save_revert_or_merge(self, *args, **kwargs):
         if OBJECTAPP_VERSIONING:
             with reversion.create_revision():
@@ -994,52 +910,13 @@ class Gbobject(Node):
 
     @property
     def get_view_object_url(self, *args, **kwargs):
-        object_id = ""
-        objmem = self.ref.get_nbh['member_of']
-        objectname = ""
-        objstr = str(objmem)
-        if objstr != '[]':
-           objectname = objmem[0].title
-           if objectname == "Image":
-               return '/gstudio/resources/images/show/'+ str(self.id)
-           elif objectname == "Document":
-               return '/gstudio/resources/documents/show/'+str(self.id)
-           elif objectname == "Video":
-               return '/gstudio/resources/videos/show/'+str(self.id)
-           elif objectname == "Topic":
-               for each in self.in_gbobject_set_of.all():
-                   for each1 in each.system_set.all():
-                       object_id = each1.id
-               return '/gstudio/group/gnowsys-grp/'+str(object_id)
-           elif objectname == "Section":
-               for each in self.in_gbobject_set_of.all():
-                   for each1 in each.system_set.all():
-                       object_id = each1.id
-               return '/gstudio/page/gnowsys-page/'+str(object_id)
-           elif objectname == "Subsection":
-               return self.get_absolute_url()
-           elif objectname == "Reply":
-               tes = self.gettwist_of_response
-               systes = tes.getthread_of_twist
-               return '/'+systes.get_view_url
-           else:
-            # show=show_systemobjecturl(self.id)                                                                                             
-            # if show != "":                                                                                                                 
-            #     return '/gstudio/'+show                                                                                                    
-            # else:                                                                                                                          
-            return self.get_absolute_url()
-        else:
-            systemtype = ""
-            systemtype = self.ref.system.systemtypes.all()[0].title
-            if systemtype == "Wikipage":
-                return '/gstudio/page/gnowsys-page/'+str(self.id)
-            elif systemtype == "Collection":
-                return '/gstudio/page/gnowsys-page/'+str(self.id)
-           
-            elif systemtype == "Meeting":
-                return '/gstudio/group/gnowsys-grp/'+str(self.id)
-            else:
-                return self.get_absolute_url()
+        """
+        Returns the url of the page showing the object, resolved by
+        prefetch_view_object_urls for the listings
+        """
+        if '_view_object_url' not in self.__dict__:
+            self._view_object_url = view_object_urls([self])[self.id]
+        return self._view_object_url
 
  	# def show_systemobjecturl(object_id):
     	# 	search=object_id    
@@ -1093,33 +970,22 @@ class Gbobject(Node):
 	#     else:
 	# 	return self.get_absolute_url   
     @property
+    def get_author_preferences(self):
+        """
+        Returns the preferences of the first author, resolved by
+        prefetch_author_preferences for the threads
+        """
+        if '_author_preferences' not in self.__dict__:
+            self._author_preferences = author_preferences([self])[self.id]
+        return self._author_preferences
+
+    @property
     def get_object_bgcolor(self, *args, **kwargs):
-	username = self.authors.all()[0]
-	userobject = Gbobject.objects.get(title=username.username+"_preference").get_attributes()
-	if userobject:
-		bgc = ""
-		for key in userobject.keys():
-			if key == 'bg_color':
-				bgc = str(userobject['bg_color'][0])
-	#else :
-		#bgc = 'E8E8E8'
-			#if key == 'font_color':
-			#	fc =  str(usergbobjectattribute['font_color'][0])
-	return bgc
+        return self.get_author_preferences.get('bg_color', '')
+
     @property
     def get_object_fontcolor(self, *args, **kwargs):
-	username = self.authors.all()[0]
-	userobject = Gbobject.objects.get(title=username.username+"_preference").get_attributes()
-	if userobject:
-		fc = ""
-		for key in userobject.keys():
-			if key == 'font_color':
-				fc = str(userobject['font_color'][0])
-	#else :
-	#	fc = 'E81809'
-			#if key == 'font_color':
-			#	fc =  str(usergbobjectattribute['font_color'][0])
-	return fc
+        return self.get_author_preferences.get('font_color', '')
 
     class Meta:
         """Gbobject's Meta"""
@@ -1163,11 +1029,8 @@ class Process(Gbobject):
     # @reversion.create_revision()
     def save(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
-	super(Process, self).save(*args, **kwargs) # Call the "real" save() method.
-	self.nbhood=self.get_rendered_nbh
-        if OBJECTAPP_VERSIONING:
-            with reversion.create_revision():
-		super(Process, self).save(*args, **kwargs) # Call the "real" save() method.
+        # Gbobject.save saves once, in a revision, and stores the nbhood
+        super(Process, self).save(*args, **kwargs) # Call the "real" save() method.
     
     def save_revert_or_merge(self, *args, **kwargs):
 	self.nodemodel = self.__class__.__name__
@@ -1218,7 +1081,7 @@ class System(Gbobject):
     '''def save(self, *args, **kwargs):
         self.nodemodel = self.__class__.__name__
 	super(System, self).save(*args, **kwargs) # Call the "real" save() method.
-	self.nbhood=self.get_rendered_nbh
+	self.nbhood=dump_nbhood(self.get_rendered_nbh)
         if OBJECTAPP_VERSIONING:
             with reversion.create_revision():
                 super(System, self).save(*args, **kwargs) # Call the "real" save() method.
@@ -1242,6 +1105,32 @@ class System(Gbobject):
         return self.title
 
 
+class DiscussionIndex(models.Model):
+    """
+    Twist, thread and box of a twist or of a response, kept in sync
+    with the boxes, the threads and the prior nodes.
+    """
+    gbobject = models.OneToOneField(Gbobject, primary_key=True,
+                                    related_name='discussion_index',
+                                    verbose_name=_('post'))
+    twist = models.ForeignKey(Gbobject, null=True, blank=True,
+                              related_name='discussion_responses',
+                              verbose_name=_('twist'))
+    thread = models.ForeignKey(System, null=True, blank=True,
+                               related_name='discussion_posts',
+                               verbose_name=_('thread'))
+    box = models.ForeignKey(System, null=True, blank=True,
+                            related_name='discussion_box_posts',
+                            verbose_name=_('box'))
+
+    def __unicode__(self):
+        return unicode(self.gbobject_id)
+
+    class Meta:
+        verbose_name = _('discussion index')
+        verbose_name_plural = _('discussion indexes')
+
+
 if OBJECTAPP_VERSIONING == True:   
     if not reversion.is_registered(Process):
         reversion.register(Process, follow=["gbobject_ptr","priorstate_attribute_set", "priorstate_relation_set", "poststate_attribute_set", "poststate_relation_set", "prior_nodes", "posterior_nodes"])
@@ -1261,3 +1150,24 @@ post_save.connect(ping_external_urls_handler, sender=Gbobject,
                   dispatch_uid='objectapp.gbobject.post_save.ping_external_urls')
 
          
+m2m_changed.connect(mark_members_dirty, sender=Gbobject.objecttypes.through,
+                    dispatch_uid='objectapp.gbobject.m2m_changed.nbhood')
+for through in (Gbobject.posterior_nodes.through, Gbobject.authors.through,
+                Gbobject.objecttypes.through, System.gbobject_set.through,
+                System.system_set.through, System.member_set.through):
+    m2m_changed.connect(invalidate_loom_statistics, sender=through,
+                        dispatch_uid='objectapp.%s.m2m_changed.loom' % through.__name__.lower())
+pre_delete.connect(prepare_loom_invalidation, sender=Gbobject,
+                   dispatch_uid='objectapp.gbobject.pre_delete.loom')
+post_delete.connect(invalidate_loom_statistics, sender=Gbobject,
+                    dispatch_uid='objectapp.gbobject.post_delete.loom')
+post_save.connect(invalidate_loom_statistics, sender=Vote,
+                  dispatch_uid='objectapp.vote.post_save.loom')
+post_delete.connect(invalidate_loom_statistics, sender=Vote,
+                    dispatch_uid='objectapp.vote.post_delete.loom')
+m2m_changed.connect(reindex_prior_nodes, sender=Gbobject.prior_nodes.through,
+                    dispatch_uid='objectapp.gbobject.m2m_changed.discussions')
+m2m_changed.connect(reindex_box_posts, sender=System.gbobject_set.through,
+                    dispatch_uid='objectapp.system_gbobject_set.m2m_changed.discussions')
+m2m_changed.connect(reindex_thread_boxes, sender=System.system_set.through,
+                    dispatch_uid='objectapp.system_system_set.m2m_changed.discussions')
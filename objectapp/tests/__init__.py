@@ -72,6 +72,8 @@ from objectapp.tests.templatetags import TemplateTagsTestCase  # ~0.4s
 from objectapp.tests.moderator import GbobjectCommentModeratorTestCase  # ~0.1s
 from objectapp.tests.spam_checker import SpamCheckerTestCase
 from objectapp.tests.url_shortener import URLShortenerTestCase
+from objectapp.tests.discussions import DiscussionsTestCase
+from objectapp.tests.viewurls import ViewUrlsTestCase
 from objectapp.signals import disconnect_objectapp_signals
 # TOTAL ~ 6.6s
 
@@ -90,7 +92,8 @@ def suite():
                   TemplateTagsTestCase, QuickGbobjectTestCase,
                   URLShortenerTestCase, GbobjectCommentModeratorTestCase,
                   ObjectappCustomDetailViews, SpamCheckerTestCase,
-                  GbobjectAdminTestCase, ObjecttypeAdminTestCase)
+                  GbobjectAdminTestCase, ObjecttypeAdminTestCase,
+                  DiscussionsTestCase, ViewUrlsTestCase)
 
     if 'django_xmlrpc' in settings.INSTALLED_APPS:
         test_cases += (PingBackTestCase, MetaWeblogTestCase)
@@ -0,0 +1,103 @@
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# This project incorporates work covered by the following copyright and permission notice:  
+
+#    Copyright (c) 2009, Julien Fache
+#    All rights reserved.
+
+#    Redistribution and use in source and binary forms, with or without
+#    modification, are permitted provided that the following conditions
+#    are met:
+
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in
+#      the documentation and/or other materials provided with the
+#      distribution.
+#    * Neither the name of the author nor the names of other
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+
+#    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#    "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#    LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+#    FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+#    COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+#    INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+#    (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+#    HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+#    STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+#    OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Test cases for Objectapp's discussion index"""
+from django.test import TestCase
+from django.core.management import call_command
+
+from objectapp.models import Gbobject
+from objectapp.models import System
+from objectapp.models import DiscussionIndex
+from objectapp.discussions import box_of_twist
+from objectapp.discussions import thread_of_twist
+from objectapp.discussions import twist_of_response
+from objectapp.discussions import thread_of_response
+
+
+class DiscussionsTestCase(TestCase):
+    """Test cases for the discussion index"""
+
+    def setUp(self):
+        self.thread = System.objects.create(title='Thread', slug='thread')
+        self.box = System.objects.create(title='Box', slug='box')
+        self.thread.system_set.add(self.box)
+        self.twist = Gbobject.objects.create(title='Twist', slug='twist')
+        self.response = Gbobject.objects.create(title='Response',
+                                                slug='response')
+        self.reply = Gbobject.objects.create(title='Reply', slug='reply')
+        self.box.gbobject_set.add(self.twist)
+        self.response.prior_nodes.add(self.twist)
+        self.reply.prior_nodes.add(self.response)
+
+    def test_twist(self):
+        self.assertEquals(thread_of_twist(self.twist.pk), self.thread)
+        self.assertEquals(box_of_twist(self.twist.pk), self.box)
+        self.assertEquals(twist_of_response(self.twist.pk), None)
+        self.assertEquals(self.twist.getthread_of_twist, self.thread)
+
+    def test_responses(self):
+        for post in (self.response, self.reply):
+            self.assertEquals(twist_of_response(post.pk), self.twist)
+            self.assertEquals(thread_of_response(post.pk), self.thread)
+            self.assertEquals(thread_of_twist(post.pk), None)
+
+    def test_index_follows_changes(self):
+        self.box.gbobject_set.remove(self.twist)
+        self.assertEquals(thread_of_response(self.reply.pk), None)
+        self.box.gbobject_set.add(self.twist)
+        self.reply.prior_nodes.clear()
+        self.assertEquals(twist_of_response(self.reply.pk), None)
+        self.assertEquals(thread_of_twist(self.reply.pk), None)
+
+    def test_backfill(self):
+        DiscussionIndex.objects.all().delete()
+        self.assertEquals(thread_of_response(self.reply.pk), None)
+        self.assertEquals(DiscussionIndex.objects.count(), 0)
+        call_command('index_discussions', verbosity=0)
+        self.assertEquals(thread_of_response(self.reply.pk), self.thread)
+        self.assertEquals(twist_of_response(self.reply.pk), self.twist)
@@ -0,0 +1,101 @@
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# This project incorporates work covered by the following copyright and permission notice:  
+
+#    Copyright (c) 2009, Julien Fache
+#    All rights reserved.
+
+#    Redistribution and use in source and binary forms, with or without
+#    modification, are permitted provided that the following conditions
+#    are met:
+
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in
+#      the documentation and/or other materials provided with the
+#      distribution.
+#    * Neither the name of the author nor the names of other
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+
+#    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#    "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#    LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+#    FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+#    COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+#    INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+#    (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+#    HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+#    STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+#    OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Test cases for Objectapp's view urls"""
+from django.test import TestCase
+
+from gstudio.models import Objecttype
+from gstudio.models import Systemtype
+from objectapp.models import Gbobject
+from objectapp.models import System
+from objectapp.viewurls import view_object_urls
+from objectapp.viewurls import prefetch_view_object_urls
+
+
+class ViewUrlsTestCase(TestCase):
+    """Test cases for the view urls"""
+    urls = 'gstudio.tests.objectapp_urls'
+
+    def setUp(self):
+        self.meeting = Systemtype.objects.create(title='Meeting',
+                                                 slug='meeting')
+        self.thread = System.objects.create(title='Thread', slug='thread')
+        self.thread.systemtypes.add(self.meeting)
+        self.box = System.objects.create(title='Box', slug='box')
+        self.thread.system_set.add(self.box)
+
+    def member(self, title, objecttype):
+        gbobject = Gbobject.objects.create(title=title, slug=title.lower().replace(' ', '-'))
+        gbobject.objecttypes.add(Objecttype.objects.get_or_create(
+            title=objecttype, slug=objecttype.lower())[0])
+        return gbobject
+
+    def test_view_object_urls(self):
+        image = self.member('Picture', 'Image')
+        twist = self.member('Twist', 'Topic')
+        reply = self.member('Answer', 'Reply')
+        plain = Gbobject.objects.create(title='Plain', slug='plain')
+        self.box.gbobject_set.add(twist)
+        reply.prior_nodes.add(twist)
+        urls = view_object_urls([image, twist, reply, plain, self.thread])
+        self.assertEquals(urls[image.pk],
+                          '/gstudio/resources/images/show/%s' % image.pk)
+        self.assertEquals(urls[twist.pk],
+                          '/gstudio/group/gnowsys-grp/%s' % self.thread.pk)
+        self.assertEquals(urls[reply.pk],
+                          '/gstudio/group/gnowsys-grp/%s' % self.thread.pk)
+        self.assertEquals(urls[plain.pk], plain.get_absolute_url())
+        self.assertEquals(urls[self.thread.pk],
+                          '/gstudio/group/gnowsys-grp/%s' % self.thread.pk)
+
+    def test_prefetch_view_object_urls(self):
+        gbobjects = [self.member('Picture %s' % i, 'Image')
+                     for i in range(5)]
+        gbobjects = prefetch_view_object_urls(gbobjects)
+        self.assertNumQueries(0, lambda: [gbobject.get_view_object_url
+                                          for gbobject in gbobjects])
@@ -0,0 +1,131 @@
+
+# Copyright (c) 2011,  2012 Free Software Foundation
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""View URLs of the objects of Objectapp.
+
+The page showing an object depends on its first object type, on the
+system types of the systems and on the thread a topic, a section or a
+reply belongs to.  ``view_object_urls`` resolves them for a whole list
+of objects with a constant number of queries."""
+
+GROUP_URL = '/gstudio/group/gnowsys-grp/%s'
+PAGE_URL = '/gstudio/page/gnowsys-page/%s'
+MEDIA_URLS = {'Image': '/gstudio/resources/images/show/%s',
+              'Document': '/gstudio/resources/documents/show/%s',
+              'Video': '/gstudio/resources/videos/show/%s'}
+
+
+def first_titles(through, source, target, ids):
+    """Return the title of the first member of a many to many relation
+    for each source id, following the default ordering of the types"""
+    titles = {}
+    for each, title in through.objects.filter(
+        **{'%s__in' % source: ids}).order_by(
+        '-%s__creation_date' % target).values_list(
+        source, '%s__title' % target):
+        titles.setdefault(each, title)
+    return titles
+
+
+def box_threads(ids):
+    """Return the system nested in the boxes of each object, the last
+    one found when walking the boxes in their default ordering"""
+    from objectapp.models import System
+
+    boxes = {}
+    for box, gbobject in System.gbobject_set.through.objects.filter(
+        gbobject__in=ids).order_by('-system__creation_date').values_list(
+        'system', 'gbobject'):
+        boxes.setdefault(gbobject, []).append(box)
+    nested = {}
+    for box, system in System.system_set.through.objects.filter(
+        from_system__in=set(sum(boxes.values(), []))).order_by(
+        '-to_system__creation_date').values_list('from_system', 'to_system'):
+        nested.setdefault(box, []).append(system)
+    threads = {}
+    for gbobject, each in boxes.items():
+        threads[gbobject] = ''
+        for box in each:
+            for system in nested.get(box, []):
+                threads[gbobject] = system
+    return threads
+
+
+def reply_threads(ids):
+    """Return the thread of each indexed reply"""
+    from objectapp.models import DiscussionIndex
+
+    return dict(DiscussionIndex.objects.filter(
+        gbobject__in=ids).values_list('gbobject', 'thread'))
+
+
+def view_object_urls(gbobjects):
+    """Return the view URL of each object indexed by id"""
+    from objectapp.models import Gbobject
+    from objectapp.models import System
+
+    gbobjects = list(gbobjects)
+    ids = [gbobject.id for gbobject in gbobjects]
+    objecttypes = first_titles(Gbobject.objecttypes.through,
+                               'gbobject', 'nodetype', ids)
+    boxed = [gbobject for gbobject, title in objecttypes.items()
+             if title in ('Topic', 'Section')]
+    threads = boxed and box_threads(boxed) or {}
+    replies = [gbobject for gbobject, title in objecttypes.items()
+               if title == 'Reply']
+    reply_thread = replies and reply_threads(replies) or {}
+    systems = set(reply_thread.values()) | set(
+        [gbobject for gbobject in ids if gbobject not in objecttypes])
+    systems.discard(None)
+    systemtypes = systems and first_titles(System.systemtypes.through,
+                                           'system', 'systemtype',
+                                           systems) or {}
+
+    urls = {}
+    for gbobject in gbobjects:
+        title = objecttypes.get(gbobject.id)
+        if title in MEDIA_URLS:
+            url = MEDIA_URLS[title] % gbobject.id
+        elif title == 'Topic':
+            url = GROUP_URL % threads.get(gbobject.id, '')
+        elif title == 'Section':
+            url = PAGE_URL % threads.get(gbobject.id, '')
+        elif title == 'Reply' and reply_thread.get(gbobject.id):
+            thread = reply_thread[gbobject.id]
+            if systemtypes.get(thread) == 'Meeting':
+                url = GROUP_URL % thread
+            else:
+                url = PAGE_URL % thread
+        elif title is None and systemtypes.get(gbobject.id) in (
+            'Wikipage', 'Collection'):
+            url = PAGE_URL % gbobject.id
+        elif title is None and systemtypes.get(gbobject.id) == 'Meeting':
+            url = GROUP_URL % gbobject.id
+        else:
+            url = gbobject.get_absolute_url()
+        urls[gbobject.id] = url
+    return urls
+
+
+def prefetch_view_object_urls(gbobjects):
+    """Resolve the view URLs of a list of objects at once and keep
+    them on the objects for their ``get_view_object_url``"""
+    gbobjects = list(gbobjects)
+    urls = view_object_urls(gbobjects)
+    for gbobject in gbobjects:
+        gbobject._view_object_url = urls[gbobject.id]
+    return gbobjects